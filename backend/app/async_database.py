@@ -0,0 +1,110 @@
+# app/async_database.py
+import os
+import threading
+import weakref
+import asyncio
+from decouple import config
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ConnectionFailure
+import logging
+from .database import db_manager, COMMAND_LISTENERS, MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE, \
+    MONGODB_MAX_IDLE_TIME_MS, MONGODB_SERVER_SELECTION_TIMEOUT_MS, MONGODB_CONNECT_TIMEOUT_MS
+
+logger = logging.getLogger(__name__)
+
+# Pool of the motor client of each event loop (one per uvicorn worker); reads only
+MONGODB_ASYNC_MAX_POOL_SIZE = config('MONGODB_ASYNC_MAX_POOL_SIZE', default=MONGODB_MAX_POOL_SIZE, cast=int)
+
+
+class AsyncDatabaseManager:
+    """
+    motor clients for the async read path (app.services.async_read_service).
+
+    A motor client belongs to the event loop it first runs on, so one pair
+    (cloud, local) is kept per loop; a uvicorn worker has a single loop, so
+    in practice this is one pair per process. Clients are created on first
+    use and dropped in forked children, like the sync clients.
+
+    The async path only reads. It follows the sync DatabaseManager's circuit
+    breaker: while the process is failed over, reads go to the local MongoDB.
+    A read that cannot reach Atlas is retried locally once; tripping the
+    breaker, journaling writes and replaying them stay with the sync services.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = weakref.WeakKeyDictionary()  # loop -> {'cloud': client, 'local': client}
+
+    def _client_options(self):
+        return {
+            'maxPoolSize': MONGODB_ASYNC_MAX_POOL_SIZE,
+            'minPoolSize': MONGODB_MIN_POOL_SIZE,
+            'maxIdleTimeMS': MONGODB_MAX_IDLE_TIME_MS,
+            'serverSelectionTimeoutMS': MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            'connectTimeoutMS': MONGODB_CONNECT_TIMEOUT_MS,
+            # motor runs commands in its executor with the caller's context, so
+            # request metrics and the query guard attribute them to the right request
+            'event_listeners': COMMAND_LISTENERS,
+        }
+
+    def _client(self, target):
+        loop = asyncio.get_running_loop()
+        clients = self._clients.get(loop)
+        if clients is None:
+            with self._lock:
+                clients = self._clients.setdefault(loop, {})
+        client = clients.get(target)
+        if client is None:
+            if target == 'cloud':
+                uri = config('MONGODB_URI')
+            else:
+                uri = config('MONGODB_LOCAL_URI', default='mongodb://localhost:27017')
+            client = clients[target] = AsyncIOMotorClient(uri, **self._client_options())
+            logger.info(f"Created motor client ({target}) for process {os.getpid()}")
+        return client
+
+    def _target(self):
+        if db_manager.failed_over or not config('MONGODB_URI', default=''):
+            return 'local'
+        return 'cloud'
+
+    def get_database(self, target=None):
+        """The motor database serving reads for the running event loop"""
+        target = target or self._target()
+        if target == 'cloud':
+            name = config('MONGODB_DATABASE', default='pos_system')
+        else:
+            name = config('MONGODB_LOCAL_DATABASE', default='pos_system')
+        return self._client(target)[name]
+
+    async def read(self, operation):
+        """
+        Run `await operation(db)` against the serving database; a connection
+        failure on Atlas is retried once against the local MongoDB.
+        """
+        target = self._target()
+        try:
+            return await operation(self.get_database(target))
+        except ConnectionFailure as e:
+            if target != 'cloud':
+                raise
+            logger.warning(f"Async read could not reach MongoDB Atlas, reading locally: {e}")
+            return await operation(self.get_database('local'))
+
+    def after_fork(self):
+        """motor clients, like pymongo's, must not cross a fork"""
+        self._lock = threading.Lock()
+        self._clients = weakref.WeakKeyDictionary()
+
+    def close(self):
+        for clients in list(self._clients.values()):
+            for client in clients.values():
+                client.close()
+        self._clients.clear()
+
+
+# Singleton instance
+async_db_manager = AsyncDatabaseManager()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=async_db_manager.after_fork)
@@ -1,17 +1,109 @@
 # app/database.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta
 import pymongo
+from pymongo import InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import (
+    BulkWriteError, ConnectionFailure, ServerSelectionTimeoutError, DuplicateKeyError, InvalidDocument
+)
 from django.conf import settings
 from decouple import config
 import logging
+from .services.metrics_service import metrics_service, mongo_command_listener
+from .services.query_guard_service import query_guard_listener
+from .services.slow_query_service import slow_query_listener
+from .services.index_service import index_service
 
 logger = logging.getLogger(__name__)
 
+# Request metrics, the N+1 / query budget guard and the slow query log
+COMMAND_LISTENERS = [mongo_command_listener, query_guard_listener, slow_query_listener]
+
+# Connection pool sizing, per process
+MONGODB_MAX_POOL_SIZE = config('MONGODB_MAX_POOL_SIZE', default=50, cast=int)
+MONGODB_MIN_POOL_SIZE = config('MONGODB_MIN_POOL_SIZE', default=0, cast=int)
+MONGODB_MAX_IDLE_TIME_MS = config('MONGODB_MAX_IDLE_TIME_MS', default=300000, cast=int)
+# Connect and ping as soon as get_database() is called (fail fast at boot)
+# instead of on the first real database operation
+MONGODB_CONNECT_ON_STARTUP = config('MONGODB_CONNECT_ON_STARTUP', default=False, cast=bool)
+# Short timeouts so a degraded Atlas fails requests quickly instead of hanging them
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = config('MONGODB_SERVER_SELECTION_TIMEOUT_MS', default=5000, cast=int)
+MONGODB_CONNECT_TIMEOUT_MS = config('MONGODB_CONNECT_TIMEOUT_MS', default=5000, cast=int)
+# Circuit breaker: this many cloud connection failures within the window fail over to local
+MONGODB_BREAKER_FAILURES = config('MONGODB_BREAKER_FAILURES', default=3, cast=int)
+MONGODB_BREAKER_WINDOW_SECONDS = config('MONGODB_BREAKER_WINDOW_SECONDS', default=30, cast=float)
+# How often a failed-over process checks whether the cloud is back
+MONGODB_PROBE_INTERVAL_SECONDS = config('MONGODB_PROBE_INTERVAL_SECONDS', default=15, cast=float)
+
+# Collection methods that modify data; while failed over they are journaled for replay
+WRITE_METHODS = frozenset((
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one', 'delete_one',
+    'delete_many', 'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete', 'bulk_write',
+))
+# Methods returning a cursor whose queries run while it is iterated
+CURSOR_METHODS = frozenset(('find', 'aggregate'))
+FAILOVER_JOURNAL = 'failover_journal'
+# A replay claim older than this belonged to a process that died mid-replay
+REPLAY_CLAIM_SECONDS = 300
+
 class DatabaseManager:
+    """
+    Holds this process's MongoClients and decides which one serves requests.
+
+    get_database() returns a lazy handle, so importing a module or building
+    a service never opens a connection or pings Atlas; the client is created
+    (and pinged, cloud first with local fallback) on the first real operation.
+    A forked child (gunicorn --preload workers) drops the parent's client and
+    creates its own, and handles that services stored before the fork follow
+    it, since they resolve the current client on every use.
+
+    Failover is a per-process circuit breaker. Collection calls made through
+    the handle report connection failures here; MONGODB_BREAKER_FAILURES of
+    them within MONGODB_BREAKER_WINDOW_SECONDS switch the process to the
+    local MongoDB. While failed over, reads are served locally and every write
+    is applied locally and appended to the `failover_journal` collection. A
+    background probe pings Atlas every MONGODB_PROBE_INTERVAL_SECONDS; once it
+    answers, the journal is replayed into Atlas in order and the process
+    switches back. A journaled write that collides with a different document
+    already in Atlas is not dropped: its entry stays in the journal in state
+    'conflict' for someone to review.
+    """
+
     def __init__(self):
         self.cloud_client = None
         self.local_client = None
         self.current_client = None
         self.current_db = None
+        self.cloud_database_name = None
+        self.local_database_name = None
+        self._lock = threading.RLock()
+        self._database = LazyDatabase(self)
+        self.connected_pid = None
+        self._journal_indexed = False
+        self._reset_breaker()
+
+    def _reset_breaker(self):
+        self.failed_over = False
+        self.failed_over_at = None
+        self.failovers = 0
+        self._failures = 0
+        self._first_failure_at = 0.0
+        self._probe = None
+        self._probe_pid = None
+    
+    def _client_options(self):
+        return {
+            'maxPoolSize': MONGODB_MAX_POOL_SIZE,
+            'minPoolSize': MONGODB_MIN_POOL_SIZE,
+            'maxIdleTimeMS': MONGODB_MAX_IDLE_TIME_MS,
+            'serverSelectionTimeoutMS': MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            'connectTimeoutMS': MONGODB_CONNECT_TIMEOUT_MS,
+            'event_listeners': COMMAND_LISTENERS,
+        }
         
     def connect_to_cloud(self):
         """Connect to MongoDB Atlas"""
@@ -19,11 +111,15 @@ class DatabaseManager:
             uri = config('MONGODB_URI')
             database_name = config('MONGODB_DATABASE', default='pos_system')
             
-            self.cloud_client = pymongo.MongoClient(uri)
+            # The client reconnects by itself; keep one per process rather than one per attempt
+            if self.cloud_client is None:
+                self.cloud_client = pymongo.MongoClient(uri, **self._client_options())
+            self.cloud_database_name = database_name
             # Test connection
             self.cloud_client.admin.command('ping')
             self.current_client = self.cloud_client
             self.current_db = self.cloud_client[database_name]
+            self.connected_pid = os.getpid()
             
             logger.info("Successfully connected to MongoDB Atlas")
             return True
@@ -37,11 +133,14 @@ class DatabaseManager:
             uri = config('MONGODB_LOCAL_URI', default='mongodb://localhost:27017')
             database_name = config('MONGODB_LOCAL_DATABASE', default='pos_system')
             
-            self.local_client = pymongo.MongoClient(uri)
+            if self.local_client is None:
+                self.local_client = pymongo.MongoClient(uri, **self._client_options())
+            self.local_database_name = database_name
             # Test connection
             self.local_client.admin.command('ping')
             self.current_client = self.local_client
             self.current_db = self.local_client[database_name]
+            self.connected_pid = os.getpid()
             
             logger.info("Connected to local MongoDB")
             return True
@@ -50,19 +149,526 @@ class DatabaseManager:
             return False
     
     def get_database(self):
-        """Get current database connection with fallback"""
-        if self.current_db is not None:  # ✅ Fixed: Compare with None
-            return self.current_db
-            
-        # Try cloud first
-        if self.connect_to_cloud():
-            return self.current_db
-            
-        # Fallback to local
-        if self.connect_to_local():
-            return self.current_db
+        """Lazy handle to the current database; connects on first use"""
+        if MONGODB_CONNECT_ON_STARTUP:
+            self.resolve()
+        return self._database
+    
+    def resolve(self):
+        """The real pymongo Database, connecting with fallback if needed"""
+        db = self.current_db
+        if db is not None:
+            return db
+        
+        with self._lock:
+            if self.current_db is not None:
+                return self.current_db
             
+            # Try cloud first
+            if self.connect_to_cloud():
+                return self.current_db
+                
+            # Fallback to local, and keep probing for the cloud
+            if self.connect_to_local():
+                self._open_breaker("Atlas unreachable at startup")
+                return self.current_db
+                
         raise Exception("Could not connect to any database")
+    
+    def after_fork(self):
+        """Forget the parent's clients; pymongo clients must not cross a fork"""
+        self._lock = threading.RLock()
+        if self.current_client is not None:
+            logger.info(f"Process {os.getpid()} forked from a connected parent; reconnecting on first use")
+        self.cloud_client = None
+        self.local_client = None
+        self.current_client = None
+        self.current_db = None
+        self.connected_pid = None
+        self._reset_breaker()
+
+    # ================================================================
+    # CIRCUIT BREAKER
+    # ================================================================
+
+    def is_local(self, db):
+        return self.local_client is not None and db.client is self.local_client
+
+    def record_failure(self, client, error):
+        """
+        Count a connection failure against the cloud client. Returns True when
+        the process is failed over afterwards, i.e. the caller may retry locally.
+        """
+        if client is not self.cloud_client or client is None:
+            return self.failed_over
+        with self._lock:
+            if self.failed_over:
+                return True
+            now = time.monotonic()
+            if not self._failures or now - self._first_failure_at > MONGODB_BREAKER_WINDOW_SECONDS:
+                self._failures = 0
+                self._first_failure_at = now
+            self._failures += 1
+            logger.warning(f"MongoDB Atlas failure {self._failures}/{MONGODB_BREAKER_FAILURES}: {error}")
+            if self._failures < MONGODB_BREAKER_FAILURES:
+                return False
+            if not self.connect_to_local():
+                logger.error("Circuit breaker tripped but local MongoDB is unavailable; staying on Atlas")
+                self._failures = 0
+                return False
+            self._open_breaker(f"{self._failures} failures in {MONGODB_BREAKER_WINDOW_SECONDS:.0f}s")
+            return True
+
+    def record_success(self):
+        if self._failures:
+            self._failures = 0
+
+    def _open_breaker(self, reason):
+        self.failed_over = True
+        self.failed_over_at = datetime.utcnow()
+        self.failovers += 1
+        self._failures = 0
+        logger.error(f"Failing over to local MongoDB ({reason}); writes are journaled for replay")
+        self._ensure_probe()
+
+    def _close_breaker(self):
+        with self._lock:
+            self.current_client = self.cloud_client
+            self.current_db = self.cloud_client[self.cloud_database_name]
+            self.failed_over = False
+            self.failed_over_at = None
+            self._failures = 0
+        logger.warning("MongoDB Atlas is reachable again; switched back from local")
+
+    def status(self):
+        return {
+            'serving': 'local' if self.failed_over else 'cloud',
+            'failed_over_since': self.failed_over_at,
+            'failovers': self.failovers,
+            'recent_failures': self._failures,
+            'journal_pending': self._journal_pending(),
+            'journal_conflicts': self._journal_count('conflict'),
+        }
+
+    def metrics(self):
+        """Failover gauges for the /metrics scrape"""
+        return [
+            ('pos_mongo_failover_active', 'Whether this process is serving from the local MongoDB', int(self.failed_over)),
+            ('pos_mongo_failovers', 'Failovers to the local MongoDB since the process started', self.failovers),
+            ('pos_mongo_failover_journal_pending', 'Local writes waiting to be replayed into Atlas', self._journal_pending()),
+            ('pos_mongo_failover_journal_conflicts', 'Journaled writes that clashed with different data in Atlas', self._journal_count('conflict')),
+        ]
+
+    # ================================================================
+    # CLOUD PROBE
+    # ================================================================
+
+    def _ensure_probe(self):
+        if self._probe is not None and self._probe.is_alive() and self._probe_pid == os.getpid():
+            return
+        self._probe_pid = os.getpid()
+        self._probe = threading.Thread(target=self._run_probe, name='mongo-failover-probe', daemon=True)
+        self._probe.start()
+
+    def _run_probe(self):
+        # Keeps running after a restore, to replay writes that landed locally during the switch
+        while True:
+            time.sleep(MONGODB_PROBE_INTERVAL_SECONDS)
+            try:
+                self.probe()
+            except Exception as e:
+                logger.warning(f"Failover probe error: {e}")
+
+    def probe(self):
+        """Restore the cloud connection if Atlas answers; returns True when serving from the cloud"""
+        if self.failed_over:
+            if not self._cloud_reachable():
+                return False
+            # Replay first so the cloud has every local write before requests move back to it
+            if not self.replay_journal():
+                return False
+            self._close_breaker()
+        if self.local_client is not None and self._journal_pending():
+            self.replay_journal()
+        return True
+
+    def _cloud_reachable(self):
+        try:
+            if self.cloud_client is None:
+                self.cloud_client = pymongo.MongoClient(config('MONGODB_URI'), **self._client_options())
+                self.cloud_database_name = config('MONGODB_DATABASE', default='pos_system')
+            self.cloud_client.admin.command('ping')
+            return True
+        except Exception as e:
+            logger.info(f"MongoDB Atlas still unreachable: {e}")
+            return False
+
+    # ================================================================
+    # WRITE JOURNAL
+    # ================================================================
+
+    @property
+    def journal(self):
+        return self.local_client[self.local_database_name][FAILOVER_JOURNAL]
+
+    def journal_write(self, collection_name, method, args, kwargs):
+        """Record a write applied locally while failed over, for replay into the cloud"""
+        self._ensure_journal_indexes()
+        try:
+            kwargs = {key: value for key, value in kwargs.items() if key != 'session'}
+            if method == 'bulk_write':
+                args = ([encode_bulk_operation(operation) for operation in args[0]],) + tuple(args[1:])
+            self.journal.insert_one({
+                'collection': collection_name,
+                'method': method,
+                'args': list(args),
+                'kwargs': kwargs,
+                'state': 'pending',
+                'journaled_at': datetime.utcnow(),
+                'pid': os.getpid(),
+            })
+        except (InvalidDocument, TypeError, ValueError) as e:
+            logger.error(f"Local {method} on {collection_name} cannot be journaled and will not reach Atlas: {e}")
+
+    def _ensure_journal_indexes(self):
+        if self._journal_indexed:
+            return
+        try:
+            index_service.ensure(self.journal, FAILOVER_JOURNAL)
+            self._journal_indexed = True
+        except Exception as e:
+            logger.warning(f"Could not create {FAILOVER_JOURNAL} indexes: {e}")
+
+    def _journal_pending(self):
+        return self._journal_count('pending')
+
+    def _journal_count(self, state):
+        if self.local_client is None or self.local_database_name is None:
+            return 0
+        try:
+            return self.journal.count_documents({'state': state})
+        except Exception:
+            return None
+
+    def replay_journal(self):
+        """
+        Apply journaled writes to the cloud in the order they were made.
+        Returns False when the cloud dropped out again mid-replay.
+        """
+        if self.local_client is None or self.local_database_name is None:
+            return True
+        journal = self.journal
+        cloud = self.cloud_client[self.cloud_database_name]
+
+        # Claims left behind by a process that died while replaying
+        journal.update_many(
+            {'state': 'replaying', 'claimed_at': {'$lt': datetime.utcnow() - timedelta(seconds=REPLAY_CLAIM_SECONDS)}},
+            {'$set': {'state': 'pending'}}
+        )
+
+        replayed = 0
+        while True:
+            entry = journal.find_one_and_update(
+                {'state': 'pending'},
+                {'$set': {'state': 'replaying', 'claimed_at': datetime.utcnow(), 'claimed_by': os.getpid()}},
+                sort=[('_id', 1)]
+            )
+            if entry is None:
+                break
+            try:
+                conflicts = self._replay_entry(cloud[entry['collection']], entry)
+            except ConnectionFailure as e:
+                journal.update_one({'_id': entry['_id']}, {'$set': {'state': 'pending'}})
+                logger.warning(f"Journal replay interrupted after {replayed} writes: {e}")
+                return False
+            except Exception as e:
+                journal.update_one({'_id': entry['_id']}, {'$set': {'state': 'failed', 'error': str(e)}})
+                logger.error(f"Journaled {entry['method']} on {entry['collection']} failed to replay: {e}")
+                continue
+            if conflicts:
+                journal.update_one({'_id': entry['_id']}, {'$set': {'state': 'conflict', 'conflicts': conflicts}})
+                logger.error(
+                    f"Journaled {entry['method']} on {entry['collection']} conflicts with data already in Atlas; "
+                    f"kept in {FAILOVER_JOURNAL} as entry {entry['_id']} for review"
+                )
+                continue
+            journal.delete_one({'_id': entry['_id']})
+            replayed += 1
+
+        if replayed:
+            logger.warning(f"Replayed {replayed} journaled writes into MongoDB Atlas")
+        return True
+
+    def _replay_entry(self, collection, entry):
+        """
+        Apply one journaled write to its cloud collection. A duplicate key is
+        fine when Atlas already holds exactly the journaled document (the
+        write reached Atlas before the failover); anything else is returned
+        as a conflict: [{'index': position in the write, 'error': message}].
+        """
+        method = entry['method']
+        args = list(entry['args'])
+        kwargs = entry['kwargs']
+
+        if method not in ('insert_many', 'bulk_write'):
+            try:
+                getattr(collection, method)(*args, **kwargs)
+            except DuplicateKeyError as e:
+                if method == 'insert_one' and self._already_stored(collection, args[0]):
+                    return []
+                return [{'index': 0, 'error': str(e)}]
+            return []
+
+        operations = args[0]
+        if method == 'bulk_write':
+            operations = [decode_bulk_operation(operation) for operation in operations]
+        ordered = kwargs.get('ordered', True)
+
+        # An ordered write stops at its first error: carry on after it
+        conflicts = []
+        offset = 0
+        while offset < len(operations):
+            remaining = operations[offset:]
+            try:
+                getattr(collection, method)(remaining, *args[1:], **kwargs)
+                break
+            except BulkWriteError as e:
+                write_errors = e.details.get('writeErrors', [])
+                if not write_errors:
+                    raise
+                for error in write_errors:
+                    operation = remaining[error['index']]
+                    document = operation._doc if isinstance(operation, InsertOne) else operation
+                    if error.get('code') == 11000 and isinstance(document, dict) and self._already_stored(collection, document):
+                        continue
+                    conflicts.append({'index': offset + error['index'], 'error': error.get('errmsg', 'Write failed')})
+                if not ordered:
+                    break
+                offset += write_errors[-1]['index'] + 1
+        return conflicts
+
+    @staticmethod
+    def _already_stored(collection, document):
+        if '_id' not in document:
+            return False
+        return collection.find_one({'_id': document['_id']}) == document
+
+
+# bulk_write operations by name, for the journal
+BULK_OPERATIONS = {cls.__name__: cls for cls in (InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany)}
+
+def encode_bulk_operation(operation):
+    name = type(operation).__name__
+    if name not in BULK_OPERATIONS:
+        raise TypeError(f"unsupported bulk operation {name}")
+    encoded = {'op': name}
+    for field in ('filter', 'doc', 'upsert', 'array_filters', 'hint'):
+        value = getattr(operation, f'_{field}', None)
+        if value is not None:
+            encoded[field] = value
+    return encoded
+
+def decode_bulk_operation(encoded):
+    cls = BULK_OPERATIONS[encoded['op']]
+    if cls is InsertOne:
+        return InsertOne(encoded['doc'])
+    options = {key: encoded[key] for key in ('upsert', 'array_filters', 'hint') if key in encoded}
+    if cls in (DeleteOne, DeleteMany):
+        options.pop('upsert', None)
+        options.pop('array_filters', None)
+        return cls(encoded['filter'], **options)
+    if cls is ReplaceOne:
+        options.pop('array_filters', None)
+    return cls(encoded['filter'], encoded['doc'], **options)
+
+
+class LazyDatabase:
+    """
+    Stands in for pymongo's Database. Database attributes (client, command,
+    list_collection_names, ...) are read from the real database at call time;
+    any other attribute or item is a collection, returned as a LazyCollection.
+    """
+
+    __slots__ = ('_manager',)
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getattr__(self, name):
+        if name.startswith('_') or hasattr(Database, name):
+            return getattr(self._manager.resolve(), name)
+        return LazyCollection(self._manager, name)
+
+    def __getitem__(self, name):
+        return LazyCollection(self._manager, name)
+
+    def __repr__(self):
+        return f"LazyDatabase({self._manager.current_db!r})"
+
+
+class LazyCollection:
+    """
+    Stands in for a pymongo Collection; resolves it against the current client
+    on use. Method calls go through the circuit breaker: cloud connection
+    failures are counted, reads (and writes that never reached a server) are
+    retried locally once the breaker trips, and local writes are journaled.
+    Cursors from find() and aggregate() are wrapped in a BreakerCursor, since
+    their queries only run while they are iterated.
+    """
+
+    __slots__ = ('_manager', '_name', '_cached')
+
+    def __init__(self, manager, name):
+        self._manager = manager
+        self._name = name
+        self._cached = (None, None)  # (database it came from, collection)
+
+    def resolve(self):
+        db = self._manager.resolve()
+        cached_db, collection = self._cached
+        if cached_db is not db:
+            collection = db[self._name]
+            self._cached = (db, collection)
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            return getattr(self.resolve(), name)
+        if not hasattr(Collection, name):
+            return LazyCollection(self._manager, f"{self._name}.{name}")
+        attr = getattr(self.resolve(), name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._call(name, args, kwargs)
+        return call
+
+    def _call(self, method, args, kwargs):
+        manager = self._manager
+        collection = self.resolve()
+        try:
+            result = getattr(collection, method)(*args, **kwargs)
+        except ConnectionFailure as e:
+            if not manager.record_failure(collection.database.client, e):
+                raise
+            # A session belongs to the failed client; a write may have been applied before the error
+            if 'session' in kwargs or (method in WRITE_METHODS and not isinstance(e, ServerSelectionTimeoutError)):
+                raise
+            collection = self.resolve()
+            result = getattr(collection, method)(*args, **kwargs)
+        else:
+            if method != 'find':  # find() has not queried yet; its cursor reports instead
+                manager.record_success()
+
+        if method in WRITE_METHODS and manager.is_local(collection.database) and manager.failed_over:
+            manager.journal_write(self._name, method, args, kwargs)
+        if method in CURSOR_METHODS:
+            return BreakerCursor(self, method, args, kwargs, result, collection.database.client)
+        return result
+
+    def __getitem__(self, name):
+        return LazyCollection(self._manager, f"{self._name}.{name}")
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+class BreakerCursor:
+    """
+    Wraps a cursor from LazyCollection.find() / aggregate(). Connection
+    failures raised while iterating are counted against the circuit breaker;
+    if the breaker trips before the cursor yielded anything, the query is run
+    again (with the same sort/limit/... calls) on the local database. A cursor
+    that already yielded documents cannot resume elsewhere and re-raises.
+    """
+
+    __slots__ = ('_lazy', '_method', '_args', '_kwargs', '_cursor', '_client', '_chain', '_started', '_retried')
+
+    def __init__(self, lazy, method, args, kwargs, cursor, client):
+        self._lazy = lazy
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+        self._cursor = cursor
+        self._client = client
+        self._chain = []  # (method, args, kwargs) applied to the cursor, for a retry
+        self._started = False
+        self._retried = False
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if result is self._cursor:
+                # Chained modifier (sort, limit, skip, ...)
+                self._chain.append((name, args, kwargs))
+                return self
+            return result
+        return call
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            document = next(self._cursor)
+        except StopIteration:
+            self._fetched()
+            raise
+        except ConnectionFailure as e:
+            failed_over = self._lazy._manager.record_failure(self._client, e)
+            if not failed_over or self._started or self._retried or 'session' in self._kwargs:
+                raise
+            document = self._restart()
+        self._fetched()
+        return document
+
+    next = __next__
+
+    def _fetched(self):
+        if not self._started:
+            self._started = True
+            self._lazy._manager.record_success()
+
+    def _restart(self):
+        self._retried = True
+        try:
+            self._cursor.close()
+        except Exception:
+            pass
+        collection = self._lazy.resolve()
+        cursor = getattr(collection, self._method)(*self._args, **self._kwargs)
+        for name, args, kwargs in self._chain:
+            cursor = getattr(cursor, name)(*args, **kwargs)
+        self._cursor = cursor
+        self._client = collection.database.client
+        return next(cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def __repr__(self):
+        return f"BreakerCursor({self._cursor!r})"
+
+# Topologies that support multi-document transactions
+TRANSACTION_TOPOLOGIES = ('ReplicaSetWithPrimary', 'Sharded', 'LoadBalanced')
+
+def supports_transactions(db):
+    """True when `db` lives on a deployment that can run multi-document transactions"""
+    try:
+        return db.client.topology_description.topology_type_name in TRANSACTION_TOPOLOGIES
+    except Exception:
+        return False
 
 # Singleton instance
-db_manager = DatabaseManager()
\ No newline at end of file
+db_manager = DatabaseManager()
+metrics_service.add_collector(db_manager.metrics)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=db_manager.after_fork)
\ No newline at end of file
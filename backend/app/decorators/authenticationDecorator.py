@@ -1,6 +1,10 @@
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from ..services.service_registry import service_registry
 from ..services.auth_services import AuthService
+from ..services.token_cache_service import token_cache_service
 from ..database import db_manager
 import logging
 from functools import wraps
@@ -20,11 +24,17 @@ def get_authenticated_user_from_jwt(request):
 
         token = authorization.split(" ", 1)[1]
 
-        auth_service = AuthService()
+        auth_service = service_registry.get(AuthService)
         payload = auth_service.verify_token(token)
         if not payload:
             return None
 
+        # Profile resolved by an earlier request with this token
+        token_hash = token_cache_service.token_hash(token)
+        principal = token_cache_service.get_principal(token_hash)
+        if principal is not None:
+            return dict(principal)
+
         user_id = payload.get('sub')
         role = (payload.get('role') or '').lower()
 
@@ -47,13 +57,15 @@ def get_authenticated_user_from_jwt(request):
         username = (user_doc.get('username') or '').strip()
         display_username = username or user_doc.get('email', 'unknown')
 
-        return {
+        principal = {
             "user_id": user_id,
             "username": display_username,
             "email": user_doc.get('email'),
             "branch_id": user_doc.get('branch_id', 1),
             "role": user_doc.get('role', role or 'customer')
         }
+        token_cache_service.put_principal(token_hash, principal)
+        return dict(principal)
 
     except Exception as e:
         logger.error(f"JWT authentication error: {e}")
@@ -170,6 +182,24 @@ def require_permission(*allowed_roles):
         return wrapper
     return decorator
 
+def require_authentication_async(view_func):
+    """require_authentication for async function views (the ASGI read path)"""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        # Token checks hit the principal cache and, on a miss, MongoDB through pymongo
+        current_user = await sync_to_async(get_authenticated_user_from_jwt, thread_sensitive=False)(request)
+        if not current_user:
+            return JsonResponse(
+                {"error": "Authentication required"}, 
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        request.current_user = current_user
+        request.user_context = current_user
+        
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
 # Convenience aliases for different naming conventions
 jwt_required = require_authentication
 admin_required = require_admin
\ No newline at end of file
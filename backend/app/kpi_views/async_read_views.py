@@ -0,0 +1,130 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from ..decorators.authenticationDecorator import require_authentication_async
+from ..services.async_read_service import async_read_service
+from .category_pos_views import format_pos_catalog
+from .order_status_views import format_order_status
+from .product_views import product_list_filters
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ================================================================
+# ASYNC READ PATH
+# ================================================================
+# Async twins of polled read endpoints, for ASGI (uvicorn) workers. Same
+# queries (app.services.query_builders) and response bodies as the sync views
+# (paths under /api/v1/):
+#   /notifications/recent/                -> /async/notifications/recent/
+#   /online/orders/<order_id>/status/     -> /async/online/orders/<order_id>/status/
+#   /pos/catalog/                         -> /async/pos/catalog/
+#   /products/                            -> /async/products/
+# Under WSGI they still work, one event loop per request, with no gain.
+
+
+@require_GET
+async def recent_notifications(request):
+    """Get recent notifications (notification polling)"""
+    try:
+        limit = int(request.GET.get('limit', 10))
+        hours = request.GET.get('hours')
+        include_archived = request.GET.get('include_archived', 'false').lower() == 'true'
+
+        notifications = await async_read_service.get_recent_notifications(
+            limit=limit,
+            hours=int(hours) if hours else None,
+            include_archived=include_archived
+        )
+
+        return JsonResponse({
+            'success': True,
+            'message': f'Retrieved {len(notifications)} recent notifications',
+            'count': len(notifications),
+            'data': notifications
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Error retrieving recent notifications: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+@require_authentication_async
+async def order_status(request, order_id):
+    """Get current order status (customer app polling)"""
+    try:
+        customer_id = request.current_user.get('user_id')
+        if not customer_id:
+            return JsonResponse({
+                'success': False,
+                'message': 'Customer ID is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        order = await async_read_service.get_order_status(order_id)
+
+        if not order:
+            return JsonResponse({
+                'success': False,
+                'message': 'Order not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # Verify customer owns this order (security check)
+        if order.get('customer_id') != customer_id:
+            return JsonResponse({
+                'success': False,
+                'message': 'Unauthorized access to order'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        return JsonResponse({
+            'success': True,
+            'data': format_order_status(order_id, order)
+        })
+
+    except Exception as e:
+        logger.error(f"Error fetching order status: {e}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'message': f'Failed to fetch order status: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+async def pos_catalog(request):
+    """Lightweight POS catalog for product selection"""
+    try:
+        categories = await async_read_service.get_all_categories(include_deleted=False)
+        catalog = format_pos_catalog(categories)
+
+        return JsonResponse({
+            "message": "POS catalog retrieved successfully",
+            "catalog": catalog,
+            "count": len(catalog)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting POS catalog: {e}")
+        return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+async def product_list(request):
+    """Get all products with optional filters"""
+    try:
+        include_deleted = request.GET.get('include_deleted', 'false').lower() == 'true'
+
+        products = await async_read_service.get_all_products(
+            filters=product_list_filters(request.GET),
+            include_deleted=include_deleted
+        )
+
+        return JsonResponse({
+            'message': f'Found {len(products)} products',
+            'data': products
+        })
+
+    except Exception as e:
+        logger.error(f"Error in async product_list: {e}")
+        return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -2,7 +2,9 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import HttpResponse
+from ..services.service_registry import service_registry
 from ..services.auth_services import AuthService
+from ..services.password_service import PasswordServiceBusy
 from ..services.session_services import SessionLogService 
 import logging
 
@@ -12,7 +14,7 @@ class LoginView(APIView):
     def post(self, request):
         """User login"""
         try:
-            auth_service = AuthService()
+            auth_service = service_registry.get(AuthService)
             email = request.data.get('email')
             password = request.data.get('password')
             
@@ -25,6 +27,12 @@ class LoginView(APIView):
             result = auth_service.login(email, password)
             return Response(result, status=status.HTTP_200_OK)
         
+        except PasswordServiceBusy as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(e.retry_after)}
+            )
         except Exception as e:
             return Response(
                 {"error": str(e)}, 
@@ -35,7 +43,7 @@ class LogoutView(APIView):
     def post(self, request):
         """User logout"""
         try:
-            auth_service = AuthService()
+            auth_service = service_registry.get(AuthService)
             
             authorization = request.headers.get("Authorization")
             if not authorization or not authorization.startswith("Bearer "):
@@ -60,7 +68,7 @@ class RefreshTokenView(APIView):
     def post(self, request):
         """Refresh access token"""
         try:
-            auth_service = AuthService()
+            auth_service = service_registry.get(AuthService)
             refresh_token = request.data.get('refresh_token')
             
             if not refresh_token:
@@ -82,7 +90,7 @@ class CurrentUserView(APIView):
     def get(self, request):
         """Get current authenticated user"""
         try:
-            auth_service = AuthService()
+            auth_service = service_registry.get(AuthService)
             
             authorization = request.headers.get("Authorization")
             if not authorization or not authorization.startswith("Bearer "):
@@ -112,7 +120,7 @@ class VerifyTokenView(APIView):
     def post(self, request):
         """Verify if token is valid"""
         try:
-            auth_service = AuthService()
+            auth_service = service_registry.get(AuthService)
             
             authorization = request.headers.get("Authorization")
             if authorization and authorization.startswith("Bearer "):
@@ -8,6 +8,7 @@ import json
 import logging
 from datetime import datetime, timedelta
 
+from ..services.service_registry import service_registry
 from ..services.batch_service import BatchService
 from ..services.product_service import ProductService
 from ..services.supplier_service import SupplierService
@@ -17,9 +18,9 @@ logger = logging.getLogger(__name__)
 class BatchView(View):
     def __init__(self):
         super().__init__()
-        self.batch_service = BatchService()
-        self.product_service = ProductService()
-        self.supplier_service = SupplierService()
+        self.batch_service = service_registry.get(BatchService)
+        self.product_service = service_registry.get(ProductService)
+        self.supplier_service = service_registry.get(SupplierService)
 
     @method_decorator(csrf_exempt)
     def dispatch(self, request, *args, **kwargs):
@@ -431,6 +432,26 @@ class ProcessSaleFIFOView(BatchView):
         try:
             data = json.loads(request.body)
             
+            # Cart form: {"items": [{"product_id": ..., "quantity": ...}, ...]}
+            items = data.get('items')
+            if items:
+                if not all(item.get('product_id') and item.get('quantity') for item in items):
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'Each item requires product_id and a quantity greater than 0'
+                    }, status=400)
+                
+                batches_used = self.batch_service.process_cart_fifo(items)
+                
+                return JsonResponse({
+                    'success': True,
+                    'message': 'Sale processed successfully using FIFO',
+                    'data': {
+                        'items': items,
+                        'batches_used': batches_used
+                    }
+                })
+            
             product_id = data.get('product_id')
             quantity_sold = data.get('quantity_sold')
             
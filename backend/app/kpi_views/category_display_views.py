@@ -4,6 +4,7 @@ from rest_framework import status
 from django.http import HttpResponse, JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from ..services.service_registry import service_registry
 from ..services.category_service import CategoryService
 import logging
 import csv
@@ -21,7 +22,7 @@ class CategoryDataView(APIView):
     def get(self, request):
         """Get all categories with product counts and data"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             include_deleted = request.query_params.get('include_deleted', 'false').lower() == 'true'
             
             # Use the refactored method that includes product counts
@@ -55,7 +56,7 @@ class CategoryExportView(APIView):
     def get(self, request):
         """Export categories with optional filters"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             format_type = request.GET.get('format', 'csv').lower()
             include_deleted = request.GET.get('include_deleted', 'false').lower() == 'true'
@@ -151,7 +152,7 @@ class CategoryStatsView(APIView):
     def get(self, request):
         """Get comprehensive category statistics"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             # Use the refactored stats method
             stats = category_service.get_category_stats()
@@ -176,7 +177,7 @@ class CategoryWithProductsView(APIView):
     def get(self, request, category_id):
         """Get category with products organized by subcategory"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             include_deleted = request.query_params.get('include_deleted', 'false').lower() == 'true'
             
             # Use the new method that organizes products by subcategory
@@ -211,7 +212,7 @@ class CategoryProductCountsView(APIView):
     def get(self, request):
         """Get detailed product counts for categories and subcategories"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             include_deleted = request.query_params.get('include_deleted', 'false').lower() == 'true'
             
             categories = category_service.get_all_categories(include_deleted=include_deleted)
@@ -1,6 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from ..services.service_registry import service_registry
 from ..services.category_service import CategoryService
 from ..services.product_service import ProductService
 import logging
@@ -9,39 +10,52 @@ logger = logging.getLogger(__name__)
 
 # ================ POS CATEGORY VIEWS ================
 
+def format_pos_catalog(categories):
+    """
+    Active categories that have products, with their non-empty subcategories.
+    Shared with the async POS catalog (async_read_views).
+    """
+    pos_catalog = []
+    for category in categories:
+        if category.get('status') == 'active':
+            subcategories = category.get('sub_categories', [])
+            catalog_item = {
+                'category_id': category.get('_id'),
+                'category_name': category.get('category_name'),
+                'subcategories': [],
+                # get_all_categories() counts per subcategory; a stored total wins when present
+                'total_products': category.get(
+                    'product_count',
+                    sum(subcategory.get('product_count', 0) for subcategory in subcategories)
+                )
+            }
+            
+            # Add subcategories with product counts
+            for subcategory in subcategories:
+                if subcategory.get('product_count', 0) > 0:  # Only include subcategories with products
+                    catalog_item['subcategories'].append({
+                        'name': subcategory.get('name'),
+                        'product_count': subcategory.get('product_count', 0)
+                    })
+            
+            # Only include categories that have products
+            if catalog_item['total_products'] > 0:
+                pos_catalog.append(catalog_item)
+    return pos_catalog
+
+
 class POSCatalogView(APIView):
     """Lightweight POS catalog for product selection"""
     
     def get(self, request):
         """Get POS catalog structure"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             # Get all active categories with product counts
             categories = category_service.get_all_categories(include_deleted=False)
             
-            # Filter only active categories and format for POS
-            pos_catalog = []
-            for category in categories:
-                if category.get('status') == 'active':
-                    catalog_item = {
-                        'category_id': category.get('_id'),
-                        'category_name': category.get('category_name'),
-                        'subcategories': [],
-                        'total_products': category.get('product_count', 0)
-                    }
-                    
-                    # Add subcategories with product counts
-                    for subcategory in category.get('sub_categories', []):
-                        if subcategory.get('product_count', 0) > 0:  # Only include subcategories with products
-                            catalog_item['subcategories'].append({
-                                'name': subcategory.get('name'),
-                                'product_count': subcategory.get('product_count', 0)
-                            })
-                    
-                    # Only include categories that have products
-                    if catalog_item['total_products'] > 0:
-                        pos_catalog.append(catalog_item)
+            pos_catalog = format_pos_catalog(categories)
             
             return Response({
                 "message": "POS catalog retrieved successfully",
@@ -60,7 +74,7 @@ class POSProductBatchView(APIView):
     def post(self, request):
         """Batch fetch multiple products by IDs for POS cart"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             product_ids = request.data.get('product_ids', [])
             
             if not product_ids or not isinstance(product_ids, list):
@@ -103,7 +117,7 @@ class POSBarcodeView(APIView):
     def get(self, request, barcode):
         """Get product by barcode for POS scanner"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
             # Find product by barcode using ProductService filter
             products = product_service.get_all_products(
@@ -153,7 +167,7 @@ class POSSearchView(APIView):
     def get(self, request):
         """Search products for POS by name or code"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             search_term = request.query_params.get('q')
             limit = int(request.query_params.get('limit', 20))
             
@@ -202,7 +216,7 @@ class POSSubcategoryProductsView(APIView):
     def get(self, request, category_id, subcategory_name):
         """Get all products in subcategory for POS"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             # Use CategoryService to get products in subcategory
             products = category_service.get_products_in_subcategory(
@@ -247,7 +261,7 @@ class POSStockCheckView(APIView):
     def post(self, request):
         """Check product stock before adding to cart"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             product_id = request.data.get('product_id')
             requested_quantity = int(request.data.get('quantity', 1))
             
@@ -287,7 +301,7 @@ class POSLowStockView(APIView):
     def get(self, request):
         """Get products with low stock for POS alerts"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             threshold = int(request.query_params.get('threshold', 10))
             
             # Get low stock products using ProductService
@@ -1,6 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from ..services.service_registry import service_registry
 from ..services.category_service import CategoryService
 from ..decorators.authenticationDecorator import require_authentication, require_admin
 import logging
@@ -25,7 +26,7 @@ class CategoryKPIView(APIView):
     def post(self, request):
         """Create a new category"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             category_data = {
                 'category_name': request.data.get('category_name'),
@@ -54,7 +55,7 @@ class CategoryKPIView(APIView):
     def get(self, request):
         """Get all categories or search categories"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             search_term = request.query_params.get('search')
             active_only = request.query_params.get('active_only', 'false').lower() == 'true'
@@ -88,7 +89,7 @@ class CategoryDetailView(APIView):
     def get(self, request, category_id):
         """Get a specific category by ID"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             include_deleted = request.query_params.get('include_deleted', 'false').lower() == 'true'
             category = category_service.get_category_by_id(category_id, include_deleted=include_deleted)
             
@@ -105,7 +106,7 @@ class CategoryDetailView(APIView):
     def put(self, request, category_id):
         """Update a category"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             logger.info(f"Updating category {category_id} by user: {request.current_user['username']}")
             
@@ -139,7 +140,7 @@ class CategorySoftDeleteView(APIView):
     def delete(self, request, category_id):
         """Soft delete a category"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             result = category_service.soft_delete_category(category_id, request.current_user)
             
             if not result:
@@ -162,7 +163,7 @@ class CategoryHardDeleteView(APIView):
     def delete(self, request, category_id):
         """Hard delete a category (Admin only)"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             result = category_service.hard_delete_category(category_id, request.current_user)
             
             if not result:
@@ -185,7 +186,7 @@ class CategoryRestoreView(APIView):
     def post(self, request, category_id):
         """Restore a soft-deleted category (Admin only)"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             result = category_service.restore_category(category_id, request.current_user)
             
             if not result:
@@ -206,7 +207,7 @@ class CategoryDeletedListView(APIView):
     def get(self, request):
         """Get list of soft-deleted categories (Admin only)"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             deleted_categories = category_service.get_deleted_categories()
             
             return Response({
@@ -224,7 +225,7 @@ class CategoryBulkOperationsView(APIView):
     def post(self, request):
         """Bulk operations on categories"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             operation = request.data.get('operation')
             category_ids = request.data.get('category_ids', [])
             
@@ -255,7 +256,7 @@ class CategoryDeleteInfoView(APIView):
     def get(self, request, category_id):
         """Get information about category before deletion"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             delete_info = category_service.get_category_delete_info(category_id)
             
             if not delete_info:
@@ -275,7 +276,7 @@ class CategorySubcategoryView(APIView):
     def post(self, request, category_id):
         """Add a subcategory to a category"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             subcategory_data = request.data.get('subcategory')
             
             if not subcategory_data:
@@ -297,7 +298,7 @@ class CategorySubcategoryView(APIView):
     def delete(self, request, category_id):
         """Remove a subcategory from a category"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             subcategory_name = request.data.get('subcategory_name')
             
             if not subcategory_name:
@@ -318,7 +319,7 @@ class CategorySubcategoryView(APIView):
     def get(self, request, category_id):
         """Get all subcategories for a category"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             subcategories = category_service.get_subcategories(category_id)
             
             return Response({
@@ -335,7 +336,7 @@ class UncategorizedCategoryView(APIView):
     def get(self, request):
         """Get information about the Uncategorized category"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             uncategorized_category = category_service.ensure_uncategorized_category_exists()
             
             return Response({
@@ -349,7 +350,7 @@ class UncategorizedCategoryView(APIView):
     def post(self, request):
         """Create/ensure the Uncategorized category exists (Admin only)"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             category = category_service.ensure_uncategorized_category_exists()
             
             return Response({
@@ -366,7 +367,7 @@ class SubcategoryProductsView(APIView):
     def get(self, request, category_id, subcategory_name):
         """Get all products in a subcategory"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             # Use the refactored method to get products in subcategory
             products = category_service.get_products_in_subcategory(
@@ -393,7 +394,7 @@ class CategoryProductManagementView(APIView):
     def put(self, request):
         """Move product to different category or subcategory"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             product_id = request.data.get('product_id')
             new_category_id = request.data.get('new_category_id')
@@ -430,7 +431,7 @@ class CategoryProductManagementView(APIView):
     def post(self, request):
         """Bulk move products to category/subcategory"""
         try:
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             
             product_ids = request.data.get('product_ids', [])
             new_category_id = request.data.get('new_category_id')
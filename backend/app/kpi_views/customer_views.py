@@ -2,9 +2,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
+from ..services.service_registry import service_registry
 from ..services.customer_service import CustomerService
 from ..services.auth_services import AuthService
+from ..services.password_service import PasswordServiceBusy
 from ..services.session_services import SessionLogService
+from ..services.query_guard_service import query_budget
 from ..decorators.authenticationDecorator import require_admin, require_authentication, get_authenticated_user_from_jwt
 from django.conf import settings
 from datetime import datetime, timedelta
@@ -16,8 +19,8 @@ logger = logging.getLogger(__name__)
 class CustomerLoginView(APIView):
     """Customer login using email/password; returns JWT compatible with auth decorator."""
     def __init__(self):
-        self.customer_service = CustomerService()
-        self.auth_service = AuthService()
+        self.customer_service = service_registry.get(CustomerService)
+        self.auth_service = service_registry.get(AuthService)
 
     def post(self, request):
         try:
@@ -52,6 +55,12 @@ class CustomerLoginView(APIView):
                 "user": sanitized
             }, status=status.HTTP_200_OK)
 
+        except PasswordServiceBusy as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(e.retry_after)}
+            )
         except Exception as e:
             logger.error(f"Customer login error: {e}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -59,7 +68,7 @@ class CustomerLoginView(APIView):
 class CustomerCurrentUserView(APIView):
     """Return current authenticated customer profile using JWT"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def get(self, request):
@@ -87,8 +96,9 @@ class CustomerCurrentUserView(APIView):
 
 class CustomerListView(APIView):
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
+    @query_budget(6)
     @require_admin  
     def get(self, request):
         """Get customers with pagination and filters - Admin only"""
@@ -109,9 +119,16 @@ class CustomerListView(APIView):
                 status=status_filter,
                 min_loyalty_points=min_loyalty_points,
                 include_deleted=include_deleted,
-                sort_by=sort_by
+                sort_by=sort_by,
+                cursor=request.query_params.get('cursor'),
+                total=request.query_params.get('total')
             )
             return Response(result, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response(
+                {"error": str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             logger.error(f"Error getting customers: {e}")
             return Response(
@@ -139,7 +156,7 @@ class CustomerListView(APIView):
 
 class CustomerDetailView(APIView):
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def get(self, request, customer_id):
@@ -214,7 +231,7 @@ class CustomerDetailView(APIView):
 class CustomerRestoreView(APIView):
     """View for restoring soft-deleted customers"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_admin
     def post(self, request, customer_id):
@@ -245,7 +262,7 @@ class CustomerRestoreView(APIView):
 class CustomerHardDeleteView(APIView):
     """View for permanently deleting customers"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_admin
     def delete(self, request, customer_id):
@@ -283,7 +300,7 @@ class CustomerHardDeleteView(APIView):
 class CustomerSearchView(APIView):
     """View for searching customers"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def get(self, request):
@@ -309,7 +326,7 @@ class CustomerSearchView(APIView):
 class CustomerByEmailView(APIView):
     """View for getting customer by email"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
         
     @require_authentication
     def get(self, request, email):
@@ -332,7 +349,7 @@ class CustomerByEmailView(APIView):
 class CustomerStatisticsView(APIView):
     """View for customer statistics and analytics"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def get(self, request):
@@ -351,7 +368,7 @@ class CustomerStatisticsView(APIView):
 class CustomerLoyaltyView(APIView):
     """View for managing customer loyalty points"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def post(self, request, customer_id):
@@ -393,7 +410,7 @@ class CustomerLoyaltyView(APIView):
 class CustomerLoyaltyBalanceView(APIView):
     """Get current customer's loyalty points balance (JWT auth)"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def get(self, request):
@@ -433,7 +450,7 @@ class CustomerLoyaltyBalanceView(APIView):
 class CustomerLoyaltyRedeemView(APIView):
     """Redeem loyalty points for current customer (JWT auth)"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def post(self, request):
@@ -491,7 +508,7 @@ class CustomerLoyaltyRedeemView(APIView):
 class CustomerLoyaltyAwardView(APIView):
     """Award loyalty points to current customer (JWT auth)"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication  
     def post(self, request):
@@ -548,7 +565,7 @@ class CustomerLoyaltyAwardView(APIView):
 class CustomerLoyaltyHistoryView(APIView):
     """Get current customer's loyalty points history (JWT auth)"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def get(self, request):
@@ -590,7 +607,7 @@ class CustomerLoyaltyHistoryView(APIView):
 class CustomerLoyaltyCurrentTierView(APIView):
     """Get current customer's loyalty tier (JWT auth)"""
     def __init__(self):
-        self.customer_service = CustomerService()
+        self.customer_service = service_registry.get(CustomerService)
 
     @require_authentication
     def get(self, request):
@@ -669,7 +686,7 @@ class CustomerRegisterView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Create customer using CustomerService
-            customer_service = CustomerService()
+            customer_service = service_registry.get(CustomerService)
             customer = customer_service.create_customer(customer_data)
             
             # Generate JWT token
@@ -683,7 +700,7 @@ class CustomerRegisterView(APIView):
             token = jwt.encode(token_payload, settings.SECRET_KEY, algorithm='HS256')
             
             # Create session
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             session_data = {
                 'user_id': customer['_id'],
                 'username': customer['username'],
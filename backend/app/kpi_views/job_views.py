@@ -0,0 +1,171 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from django.http import FileResponse
+from ..services.job_service import job_service, JOB_STATUSES
+from ..decorators.authenticationDecorator import get_authenticated_user_from_jwt, require_authentication
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# ================ HELPERS FOR ASYNC-CAPABLE VIEWS ================
+
+def wants_async(request):
+    """True when the client asked for a background job (?async=true or async in the body)"""
+    value = request.query_params.get('async')
+    if value is None and hasattr(request.data, 'get'):
+        value = request.data.get('async')
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def submit_job(request, job_type, params=None, upload=None):
+    """
+    Queue a job for the requesting user and build the 202 response. Jobs
+    belong to whoever submitted them, so background jobs need a signed-in user.
+    """
+    user = get_authenticated_user_from_jwt(request)
+    if not user:
+        return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    job = job_service.submit(
+        job_type,
+        params,
+        created_by=user['user_id'],
+        upload=upload
+    )
+    return Response({
+        'message': 'Job queued',
+        'job_id': job['_id'],
+        'status': job['status'],
+        'status_url': f"/api/v1/jobs/{job['_id']}/",
+        'result_url': f"/api/v1/jobs/{job['_id']}/result/"
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def _is_admin(user):
+    return (user or {}).get('role', '').lower() == 'admin'
+
+
+def _can_access_job(user, job):
+    """Admins see every job; other users only the jobs they submitted"""
+    if _is_admin(user):
+        return True
+    return job.get('created_by') is not None and job.get('created_by') == user.get('user_id')
+
+
+def _job_forbidden():
+    return Response({'error': 'Unauthorized access to job'}, status=status.HTTP_403_FORBIDDEN)
+
+
+# ================ JOB VIEWS ================
+
+class JobListView(APIView):
+    """Recent background jobs, newest first (only the caller's own unless admin)"""
+
+    @require_authentication
+    def get(self, request):
+        try:
+            job_status = request.query_params.get('status')
+            if job_status and job_status not in JOB_STATUSES:
+                return Response({
+                    'error': f"status must be one of {', '.join(JOB_STATUSES)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            user = request.current_user
+            created_by = request.query_params.get('created_by') if _is_admin(user) else user.get('user_id')
+            jobs = job_service.list_jobs(
+                job_type=request.query_params.get('type'),
+                status=job_status,
+                created_by=created_by,
+                limit=min(int(request.query_params.get('limit', 50)), 200)
+            )
+            return Response({
+                'jobs': [job_service.serialize(job) for job in jobs],
+                'count': len(jobs)
+            }, status=status.HTTP_200_OK)
+
+        except ValueError:
+            return Response({'error': 'Invalid limit parameter'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error in JobListView: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class JobDetailView(APIView):
+    """Poll a job's status, progress and result"""
+
+    @require_authentication
+    def get(self, request, job_id):
+        try:
+            job = job_service.get_job(job_id)
+            if not job:
+                return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+            if not _can_access_job(request.current_user, job):
+                return _job_forbidden()
+            if job.get('status') == 'queued':
+                # Queued before a restart: make sure this process has workers
+                job_service.ensure_workers()
+            return Response(job_service.serialize(job), status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"Error in JobDetailView: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def delete(self, request, job_id):
+        """Same as POST .../cancel/"""
+        return JobCancelView().post(request, job_id)
+
+
+class JobCancelView(APIView):
+    """Cancel a queued job, or ask a running one to stop"""
+
+    @require_authentication
+    def post(self, request, job_id):
+        try:
+            job = job_service.get_job(job_id)
+            if not job:
+                return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+            if not _can_access_job(request.current_user, job):
+                return _job_forbidden()
+
+            job = job_service.cancel_job(job_id)
+            if not job:
+                return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(job_service.serialize(job), status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"Error in JobCancelView: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class JobResultView(APIView):
+    """Download the file a completed job produced"""
+
+    @require_authentication
+    def get(self, request, job_id):
+        try:
+            job = job_service.get_job(job_id)
+            if not job:
+                return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+            if not _can_access_job(request.current_user, job):
+                return _job_forbidden()
+            if job.get('status') != 'completed':
+                return Response({
+                    'error': f"Job is {job.get('status')}",
+                    'job': job_service.serialize(job)
+                }, status=status.HTTP_409_CONFLICT)
+
+            result_file = job_service.result_file(job)
+            if result_file is None:
+                return Response({
+                    'message': 'Job produced no file',
+                    'result': job.get('result')
+                }, status=status.HTTP_200_OK)
+
+            path, filename, content_type = result_file
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+        except Exception as e:
+            logger.error(f"Error in JobResultView: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
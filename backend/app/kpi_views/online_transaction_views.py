@@ -2,6 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from ..decorators.authenticationDecorator import require_authentication
+from ..services.service_registry import service_registry
 from ..services.online_transactions_service import OnlineTransactionService
 from ..database import db_manager
 from datetime import datetime
@@ -16,7 +17,7 @@ class CreateOnlineOrderView(APIView):
     @require_authentication
     def post(self, request):
         try:
-            service = OnlineTransactionService()
+            service = service_registry.get(OnlineTransactionService)
 
             # ALWAYS use customer_id from JWT token for consistency
             # This ensures orders can be retrieved properly
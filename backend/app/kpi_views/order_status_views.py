@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from ..decorators.authenticationDecorator import require_authentication
 from ..database import db_manager
+from ..services.query_builders import find_options, order_status_query
 from datetime import datetime
 import logging
 
@@ -131,12 +132,9 @@ class GetOrderStatusView(APIView):
                     'message': 'Customer ID is required'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Get MongoDB database
+            # Find the order (status fields only)
             db = db_manager.get_database()
-            online_transactions = db.online_transactions
-
-            # Find the order
-            order = online_transactions.find_one({'_id': order_id})
+            order = db.online_transactions.find_one(**find_options(order_status_query(order_id)))
 
             if not order:
                 return Response({
@@ -151,33 +149,11 @@ class GetOrderStatusView(APIView):
                     'message': 'Unauthorized access to order'
                 }, status=status.HTTP_403_FORBIDDEN)
 
-            # Get status information
-            current_status = order.get('order_status', 'pending')
-            status_history = order.get('status_history', [])
-
-            # Format status history
-            formatted_history = []
-            for entry in status_history:
-                formatted_history.append({
-                    'status': entry.get('status'),
-                    'timestamp': entry.get('timestamp').isoformat() if entry.get('timestamp') else None,
-                    'notes': entry.get('notes', '')
-                })
-
-            # Status display information
-            status_info = get_status_display_info(current_status)
-
             logger.info(f"Customer {customer_id} checked status for order {order_id}")
 
             return Response({
                 'success': True,
-                'data': {
-                    'order_id': order_id,
-                    'current_status': current_status,
-                    'status_info': status_info,
-                    'status_history': formatted_history,
-                    'last_updated': order.get('updated_at').isoformat() if order.get('updated_at') else None
-                }
+                'data': format_order_status(order_id, order)
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -188,6 +164,28 @@ class GetOrderStatusView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def format_order_status(order_id, order):
+    """Customer-facing status of an order (shared with the async status endpoint)"""
+    current_status = order.get('order_status', 'pending')
+
+    # Format status history
+    formatted_history = []
+    for entry in order.get('status_history', []):
+        formatted_history.append({
+            'status': entry.get('status'),
+            'timestamp': entry.get('timestamp').isoformat() if entry.get('timestamp') else None,
+            'notes': entry.get('notes', '')
+        })
+
+    return {
+        'order_id': order_id,
+        'current_status': current_status,
+        'status_info': get_status_display_info(current_status),
+        'status_history': formatted_history,
+        'last_updated': order.get('updated_at').isoformat() if order.get('updated_at') else None
+    }
+
+
 def get_status_display_info(status_code):
     """Get display information for order status."""
     status_map = {
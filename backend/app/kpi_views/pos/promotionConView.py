@@ -2,8 +2,10 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import HttpResponse
+from ...services.service_registry import service_registry
 from ...services.pos.promotionCon import PromoConnection
 from ...services.pos.salesReport import SalesReport
+from ...services.query_guard_service import query_budget
 import logging
 
 def get_authenticated_user_from_jwt(request):
@@ -18,7 +20,7 @@ def get_authenticated_user_from_jwt(request):
         from app.services.auth_services import AuthService
         from bson import ObjectId
         
-        auth_service = AuthService()
+        auth_service = service_registry.get(AuthService)
         user_data = auth_service.get_current_user(token)
         
         if not user_data:
@@ -57,6 +59,7 @@ def get_authenticated_user_from_jwt(request):
 class POSTransactionView(APIView):
     """Handle complete POS transactions with promotions and inventory management"""
     
+    @query_budget(15)
     def post(self, request):
         """Process a complete POS transaction"""
         try:
@@ -69,7 +72,7 @@ class POSTransactionView(APIView):
                     status=status.HTTP_401_UNAUTHORIZED
                 )
             
-            promo_service = PromoConnection()
+            promo_service = service_registry.get(PromoConnection)
             
             # Extract required data
             checkout_data = request.data.get('checkout_data', [])
@@ -120,7 +123,7 @@ class StockValidationView(APIView):
     def post(self, request):
         """Check if sufficient stock is available for checkout items"""
         try:
-            promo_service = PromoConnection()
+            promo_service = service_registry.get(PromoConnection)
             checkout_data = request.data.get('checkout_data', [])
             
             if not checkout_data:
@@ -153,7 +156,7 @@ class StockWarningsView(APIView):
             # Get authenticated user from JWT
             current_user = get_authenticated_user_from_jwt(request)
             
-            promo_service = PromoConnection()
+            promo_service = service_registry.get(PromoConnection)
             checkout_data = request.data.get('checkout_data', [])
             
             if not checkout_data:
@@ -181,7 +184,7 @@ class StockWarningsView(APIView):
     def get(self, request):
         """Get all products with low stock"""
         try:
-            promo_service = PromoConnection()
+            promo_service = service_registry.get(PromoConnection)
             low_stock_products = promo_service.check_all_low_stock_products()
             
             return Response({
@@ -207,7 +210,7 @@ class PromotionCheckoutView(APIView):
     def post(self, request):
         """Apply promotion to checkout and calculate discounts (preview only)"""
         try:
-            promo_service = PromoConnection()
+            promo_service = service_registry.get(PromoConnection)
             checkout_data = request.data.get('checkout_data', [])
             promotion_name = request.data.get('promotion_name')
             
@@ -248,7 +251,7 @@ class POSTransactionKPIView(APIView):
     
     def get(self, request):
         try:
-            sales_report = SalesReport()
+            sales_report = service_registry.get(SalesReport)
             
             # Get comprehensive dashboard data
             dashboard = sales_report.get_dashboard_summary()
@@ -292,7 +295,7 @@ class InventoryKPIView(APIView):
     
     def get(self, request):
         try:
-            promo_service = PromoConnection()
+            promo_service = service_registry.get(PromoConnection)
             low_stock_products = promo_service.check_all_low_stock_products()
             
             return Response({
@@ -313,7 +316,7 @@ class StockAlertKPIView(APIView):
     
     def get(self, request):
         try:
-            promo_service = PromoConnection()
+            promo_service = service_registry.get(PromoConnection)
             low_stock_products = promo_service.check_all_low_stock_products()
             
             # Calculate KPIs
@@ -357,11 +360,11 @@ class POSHealthCheckView(APIView):
     def get(self, request):
         try:
             # Test PromoConnection (inventory/products)
-            promo_service = PromoConnection()
+            promo_service = service_registry.get(PromoConnection)
             product_count = promo_service.products_collection.count_documents({"isDeleted": {"$ne": True}})
             
             # Test SalesReport (sales data)
-            sales_report = SalesReport()
+            sales_report = service_registry.get(SalesReport)
             today_summary = sales_report.get_todays_sales()
             
             return Response({
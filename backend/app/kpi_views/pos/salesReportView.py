@@ -2,7 +2,9 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import HttpResponse
+from ...services.service_registry import service_registry
 from ...services.pos.salesReport import SalesReport
+from ...services.query_guard_service import query_budget
 from datetime import datetime, date, timedelta, time
 import logging
 
@@ -18,7 +20,7 @@ def get_authenticated_user_from_jwt(request):
         from app.services.auth_services import AuthService
         from bson import ObjectId
         
-        auth_service = AuthService()
+        auth_service = service_registry.get(AuthService)
         user_data = auth_service.get_current_user(token)
         
         if not user_data:
@@ -59,6 +61,7 @@ class SalesSummaryView(APIView):
     🎯 MAIN VIEW: Get sales summary with flexible filtering
     Replaces: DailyReports, WeeklyReports, MonthlyReports, etc.
     """
+    @query_budget(8)
     def get(self,request):
         try:
             #current_user = get_authenticated_user_from_jwt(request)
@@ -69,7 +72,7 @@ class SalesSummaryView(APIView):
             #        status=status.HTTP_401_UNAUTHORIZED
             #    )
 
-            sales_report = SalesReport()
+            sales_report = service_registry.get(SalesReport)
 
             period = request.GET.get('period')
             start_date = request.GET.get('start_date')
@@ -171,7 +174,7 @@ class SalesByPeriodView(APIView):
             #        status=status.HTTP_401_UNAUTHORIZED
             #    )
 
-            sales_report = SalesReport()
+            sales_report = service_registry.get(SalesReport)
 
             
             start_date = request.GET.get('start_date')
@@ -185,9 +188,9 @@ class SalesByPeriodView(APIView):
                     status = status.HTTP_400_BAD_REQUEST
                 )
             
-            if period not in ['daily', 'weekly', 'monthly']:
+            if period not in ['hourly', 'daily', 'weekly', 'monthly']:
                 return Response(
-                    {"error": "start_date and end_date are required"},
+                    {"error": "period must be one of: hourly, daily, weekly, monthly"},
                     status = status.HTTP_400_BAD_REQUEST
                 )
 
@@ -222,6 +225,7 @@ class SalesByPeriodView(APIView):
 
 class DashboardSummaryView(APIView):
     """Get comprehensive dashboard data"""
+    @query_budget(20)
     def get(self, request):
         try:
              #current_user = get_authenticated_user_from_jwt(request)
@@ -232,7 +236,7 @@ class DashboardSummaryView(APIView):
             #        status=status.HTTP_401_UNAUTHORIZED
             #    )
 
-            sales_report = SalesReport()
+            sales_report = service_registry.get(SalesReport)
             result = sales_report.get_dashboard_summary()
 
             return Response(result, status = status.HTTP_200_OK)
@@ -266,7 +270,7 @@ class SalesComparisonView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            sales_report = SalesReport()
+            sales_report = service_registry.get(SalesReport)
             result = sales_report.get_sales_comparison(period)
                 
             return Response(result, status=status.HTTP_200_OK)
@@ -293,7 +297,7 @@ class SalesTransactionsView(APIView):
             #        status=status.HTTP_401_UNAUTHORIZED
             #    )
 
-            sales_report = SalesReport()
+            sales_report = service_registry.get(SalesReport)
             
             # Get parameters
             start_date = request.GET.get('start_date')
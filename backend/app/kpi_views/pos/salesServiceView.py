@@ -2,6 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import HttpResponse
+from ...services.service_registry import service_registry
 from ...services.pos.SalesService import SalesService
 import logging
 
@@ -17,7 +18,7 @@ def get_authenticated_user_from_jwt(request):
         from app.services.auth_services import AuthService
         from bson import ObjectId
         
-        auth_service = AuthService()
+        auth_service = service_registry.get(AuthService)
         user_data = auth_service.get_current_user(token)
         
         if not user_data:
@@ -77,7 +78,7 @@ class SalesServiceView(APIView):
                     status = status.HTTP_400_BAD_REQUEST
                 )
 
-            sales_service = SalesService()
+            sales_service = service_registry.get(SalesService)
             result = sales_service.create_unified_sale(sale_data,source)
 
             return Response(result, status = status.HTTP_201_CREATED)
@@ -117,7 +118,7 @@ class CreatePOSSale(APIView):
                         {"error": f"{field} is required"}, 
                         status=status.HTTP_400_BAD_REQUEST
                     )
-            sales_service = SalesService()
+            sales_service = service_registry.get(SalesService)
             result = sales_service._create_pos_sale(sale_data)
 
             return Response(result, status = status.HTTP_200_OK)
@@ -151,7 +152,7 @@ class CreateSalesLog(APIView):
                     status = status.HTTP_400_BAD_REQUEST
                 )
 
-            sales_service = SalesService()
+            sales_service = service_registry.get(SalesService)
             result = sales_service._create_sales_log(sale_data,source)
 
             return Response(result, status = status.HTTP_200_OK)
@@ -181,7 +182,7 @@ class GetSaleID(APIView):
                     status = status.HTTP_400_BAD_REQUEST
                 )
 
-            sales_service = SalesService()
+            sales_service = service_registry.get(SalesService)
             result = sales_service.get_pos_sale_by_id(sale_id)
 
             if result:
@@ -211,7 +212,7 @@ class FetchRecentSales(APIView):
 
             limit = min(int(request.GET.get('limit', 10)), 50)  # Max 50 for safety
             
-            sales_service = SalesService()
+            sales_service = service_registry.get(SalesService)
             result = sales_service.get_recent_sales(limit)
             
             return Response({
@@ -223,7 +224,7 @@ class FetchRecentSales(APIView):
             
         except ValueError:  # Handle invalid limit values
             limit = 10
-            sales_service = SalesService()
+            sales_service = service_registry.get(SalesService)
             result = sales_service.get_recent_sales(limit)
             
 
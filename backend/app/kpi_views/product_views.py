@@ -4,7 +4,10 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from django.http import HttpResponse
 from django.views import View  # ← ADD THIS LINE
+from ..services.service_registry import service_registry
 from ..services.product_service import ProductService
+from ..services.query_guard_service import query_budget
+from .job_views import wants_async, submit_job
 import logging
 import json  # ← ADD THIS LINE
 
@@ -19,29 +22,28 @@ class TestTemplateView(APIView):
     def get(self, request):
         return Response({"message": "TEST ENDPOINT WORKS!"}, status=200)
 
+def product_list_filters(params):
+    """Product list filters from query parameters (shared with the async product list)"""
+    filters = {}
+    for name in ('category_id', 'subcategory_name', 'status', 'stock_level', 'search'):
+        if params.get(name):
+            filters[name] = params.get(name)
+    return filters or None
+
+
 class ProductListView(APIView):
+    @query_budget(6)
     def get(self, request):
         """Get all products with optional filters and pagination"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
-            # Get query parameters for filtering
-            filters = {}
-            if request.GET.get('category_id'):
-                filters['category_id'] = request.GET.get('category_id')
-            if request.GET.get('subcategory_name'):  # ADDED subcategory filtering
-                filters['subcategory_name'] = request.GET.get('subcategory_name')
-            if request.GET.get('status'):
-                filters['status'] = request.GET.get('status')
-            if request.GET.get('stock_level'):
-                filters['stock_level'] = request.GET.get('stock_level')
-            if request.GET.get('search'):
-                filters['search'] = request.GET.get('search')
+            filters = product_list_filters(request.GET)
             
             include_deleted = request.GET.get('include_deleted', 'false').lower() == 'true'
             
             products = product_service.get_all_products(
-                filters=filters if filters else None, 
+                filters=filters, 
                 include_deleted=include_deleted
             )
             
@@ -59,7 +61,7 @@ class ProductListView(APIView):
     def post(self, request):
         """Create a new product"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
             # Convert to plain dict
             product_data = dict(request.data)
@@ -85,7 +87,7 @@ class ProductDetailView(APIView):
     def get(self, request, product_id):
         """Get product by ID"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             include_deleted = request.GET.get('include_deleted', 'false').lower() == 'true'
             product = product_service.get_product_by_id(product_id, include_deleted)
             if not product:
@@ -106,7 +108,7 @@ class ProductDetailView(APIView):
     def put(self, request, product_id):
         """Update product - SIMPLIFIED (no complex category sync)"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             product_data = request.data
             
             updated_product = product_service.update_product(product_id, product_data)
@@ -134,7 +136,7 @@ class ProductDetailView(APIView):
     def delete(self, request, product_id):
         """Delete product (soft delete by default)"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             hard_delete = request.GET.get('hard_delete', 'false').lower() == 'true'
             deleted = product_service.delete_product(product_id, hard_delete)
             if not deleted:
@@ -157,7 +159,7 @@ class ProductDetailView(APIView):
     def patch(self, request, product_id):
         """Partial update product - SIMPLIFIED"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             product_data = request.data
             
             # Note: Removed partial_update parameter since the refactored service doesn't need it
@@ -187,7 +189,7 @@ class ProductRestoreView(APIView):
     def post(self, request, product_id):
         """Restore a soft-deleted product"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             restored = product_service.restore_product(product_id)
             if not restored:
                 return Response(
@@ -209,7 +211,7 @@ class ProductBySkuView(APIView):
     def get(self, request, sku):
         """Get product by SKU"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             include_deleted = request.GET.get('include_deleted', 'false').lower() == 'true'
             product = product_service.get_product_by_sku(sku, include_deleted)
             if not product:
@@ -233,7 +235,7 @@ class ProductStockUpdateView(APIView):
     def put(self, request, product_id):
         """Update product stock with operation types"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
             stock_data = {
                 'operation_type': request.data.get('operation_type', 'set'),
@@ -287,7 +289,7 @@ class StockAdjustmentView(APIView):
     def post(self, request, product_id):
         """Adjust stock for sales (remove stock)"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             quantity_sold = request.data.get('quantity_sold')
             
             if quantity_sold is None:
@@ -325,7 +327,7 @@ class RestockProductView(APIView):
     def post(self, request, product_id):
         """Restock product from supplier"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             quantity_received = request.data.get('quantity_received')
             supplier_info = request.data.get('supplier_info')
             
@@ -372,7 +374,7 @@ class BulkStockUpdateView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             results = product_service.bulk_update_stock(stock_updates)
             
             return Response({
@@ -391,7 +393,7 @@ class StockHistoryView(APIView):
     def get(self, request, product_id):
         """Get stock change history for a specific product"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
             product = product_service.get_product_by_id(product_id)
             
@@ -429,7 +431,7 @@ class LowStockProductsView(APIView):
     def get(self, request):
         """Get products with low stock"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             branch_id = request.GET.get('branch_id')
             products = product_service.get_low_stock_products(branch_id)
             return Response({
@@ -447,7 +449,7 @@ class ExpiringProductsView(APIView):
     def get(self, request):
         """Get products expiring within specified days"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             days_ahead = int(request.GET.get('days_ahead', 30))
             products = product_service.get_expiring_products(days_ahead)
             return Response({
@@ -465,7 +467,7 @@ class ProductsByCategoryView(APIView):
     def get(self, request, category_id):
         """Get products by category with optional subcategory filter"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             subcategory_name = request.GET.get('subcategory_name')  # ADDED subcategory filtering
             
             products = product_service.get_products_by_category(category_id, subcategory_name)
@@ -489,7 +491,7 @@ class DeletedProductsView(APIView):
     def get(self, request):
         """Get all soft-deleted products"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             products = product_service.get_deleted_products()
             return Response({
                 'message': f'Found {len(products)} deleted products',
@@ -508,7 +510,7 @@ class ProductSyncView(APIView):
     def post(self, request):
         """Sync products between local and cloud"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             sync_direction = request.data.get('direction', 'to_cloud')
             
             if sync_direction == 'to_cloud':
@@ -540,7 +542,7 @@ class BulkCreateProductsView(APIView):
     def post(self, request):
         """Create multiple products in batch"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
             # Handle different payload structures
             products_data = None
@@ -583,7 +585,7 @@ class ProductImportView(APIView):
     def post(self, request):
         """Import products from CSV/Excel file"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
             if 'file' not in request.FILES:
                 return Response(
@@ -595,6 +597,13 @@ class ProductImportView(APIView):
             file_type = uploaded_file.name.split('.')[-1].lower()
             validate_only = request.data.get('validate_only', 'false').lower() == 'true'
             
+            # Large catalogs: run in the background and poll /jobs/<job_id>/
+            if wants_async(request):
+                return submit_job(request, 'product_import', {
+                    'file_type': file_type,
+                    'validate_only': validate_only
+                }, upload=uploaded_file)
+            
             # Save file temporarily
             import tempfile
             import os
@@ -630,7 +639,7 @@ class ProductExportView(APIView):
     def get(self, request):
         """Export products to CSV/Excel"""
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             file_type = request.GET.get('format', 'csv').lower()
             
             # Get filters - UPDATED to include subcategory
@@ -703,7 +712,7 @@ class ImportTemplateView(View):  # ← Inherit from View, not APIView!
         print("=" * 100)
         
         try:
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             file_type = request.GET.get('format', 'csv').lower()
        
             template_path = product_service.generate_import_template(file_type)
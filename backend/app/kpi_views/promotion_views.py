@@ -3,6 +3,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from datetime import datetime
+from ..services.service_registry import service_registry
 from ..services.promotions_service import PromotionService
 from ..decorators.authenticationDecorator import require_admin, require_authentication, get_authenticated_user_from_jwt
 import logging
@@ -26,7 +27,7 @@ class PromotionHealthCheckView(APIView):
 class PromotionListView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_authentication
     def get(self, request):
@@ -123,7 +124,7 @@ class PromotionListView(APIView):
 class PromotionDetailView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_authentication
     def get(self, request, promotion_id):
@@ -208,7 +209,7 @@ class PromotionDetailView(APIView):
 class ActivePromotionsView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_authentication
     def get(self, request):
@@ -231,7 +232,7 @@ class ActivePromotionsView(APIView):
 class PromotionActivationView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_admin
     def post(self, request, promotion_id):
@@ -257,7 +258,7 @@ class PromotionActivationView(APIView):
 class PromotionDeactivationView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_admin
     def post(self, request, promotion_id):
@@ -283,7 +284,7 @@ class PromotionDeactivationView(APIView):
 class PromotionExpirationView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_admin
     def post(self, request, promotion_id):
@@ -309,7 +310,7 @@ class PromotionExpirationView(APIView):
 class PromotionApplicationView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_authentication
     def post(self, request):
@@ -342,7 +343,7 @@ class PromotionApplicationView(APIView):
 class PromotionStatisticsView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_admin
     def get(self, request):
@@ -387,7 +388,7 @@ class PromotionStatisticsView(APIView):
 class PromotionAuditView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_admin
     def get(self, request, promotion_id):
@@ -412,7 +413,7 @@ class PromotionAuditView(APIView):
 class PromotionSearchView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_authentication
     def get(self, request):
@@ -453,7 +454,7 @@ class PromotionSearchView(APIView):
 class PromotionReportView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_admin
     def get(self, request, promotion_id):
@@ -482,7 +483,7 @@ class PromotionReportView(APIView):
 class PromotionByNameView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
     
     @require_authentication
     def get(self, request, promotion_name):
@@ -521,7 +522,7 @@ class PromotionByNameView(APIView):
 class PromotionRestoreView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
 
     @require_admin
     def post(self, request, promotion_id):
@@ -547,7 +548,7 @@ class PromotionRestoreView(APIView):
 class PromotionHardDeleteView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
 
     @require_admin
     def delete(self, request, promotion_id):
@@ -582,7 +583,7 @@ class PromotionHardDeleteView(APIView):
 class DeletedPromotionsView(APIView):
     def __init__(self):
         super().__init__()
-        self.promotion_service = PromotionService()
+        self.promotion_service = service_registry.get(PromotionService)
 
     @require_admin
     def get(self, request):
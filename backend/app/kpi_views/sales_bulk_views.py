@@ -2,8 +2,14 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import HttpResponse
+from ..services.service_registry import service_registry
 from ..services.saleslog_service import SalesLogService
+from ..services.export_service import (
+    export_service, EXPORT_FORMATS, SALES_EXPORT_HEADER, SALES_EXPORT_PROJECTION, sales_export_rows
+)
+from .job_views import wants_async, submit_job
 from bson import ObjectId
+from decouple import config
 from datetime import datetime
 import logging
 import csv
@@ -20,10 +26,10 @@ class SalesLogBulkImportView(APIView):
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.sales_service = SalesLogService()
+        self.sales_service = service_registry.get(SalesLogService)
         
         # Configuration constants
-        self.BATCH_SIZE = 50
+        self.BATCH_SIZE = config('SALES_IMPORT_BATCH_SIZE', default=1000, cast=int)
         self.MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
         self.DEFAULT_CUSTOMER_ID = ObjectId("6841a20f37eca0bad1552dd5")
         self.DEFAULT_USER_ID = ObjectId("6841a20f37eca0bad1552dd5")
@@ -67,6 +73,10 @@ class SalesLogBulkImportView(APIView):
             if validation_error:
                 return validation_error
             
+            # Historical imports: run in the background and poll /jobs/<job_id>/
+            if wants_async(request):
+                return submit_job(request, 'sales_import', upload=csv_file)
+            
             # Read and parse CSV
             decoded_file = csv_file.read().decode('utf-8')
             csv_data = csv.DictReader(io.StringIO(decoded_file))
@@ -86,7 +96,7 @@ class SalesLogBulkImportView(APIView):
             validation_results = self._validate_transactions(transactions)
             
             # Process transactions
-            results = self._process_transactions(transactions)
+            results = self._process_transactions(transactions, csv_file.name)
             
             # Add validation warnings
             if validation_results['warnings']:
@@ -169,8 +179,8 @@ class SalesLogBulkImportView(APIView):
     # TRANSACTION PROCESSING
     # ====================================================================
 
-    def _process_transactions(self, transactions):
-        """Process transactions in batches"""
+    def _process_transactions(self, transactions, file_name='CSV import'):
+        """Map each batch, then write it with one unordered insert_many"""
         created_invoices = []
         failed_transactions = []
         total_transactions = len(transactions)
@@ -179,34 +189,75 @@ class SalesLogBulkImportView(APIView):
         
         # Process in batches
         for batch_start in range(0, total_transactions, self.BATCH_SIZE):
-            batch_end = min(batch_start + self.BATCH_SIZE, total_transactions)
-            batch = transactions[batch_start:batch_end]
-            
-            # Process each transaction in batch
-            for index, transaction in enumerate(batch):
-                row_number = batch_start + index + 1
-                
-                try:
-                    # Map transaction to invoice
-                    invoice_data = self._map_transaction_to_invoice(
-                        transaction, row_number
-                    )
-                    
-                    # Create invoice
-                    created_invoice = self.sales_service.create_invoice(invoice_data)
-                    created_invoices.append(created_invoice)
-                    
-                except Exception as e:
-                    failed_transactions.append({
-                        'row': row_number,
-                        'data': self._sanitize_transaction_data(transaction),
-                        'error': str(e)
-                    })
-                    logger.warning(f"Failed to process row {row_number}: {str(e)}")
+            batch = transactions[batch_start:batch_start + self.BATCH_SIZE]
+            created, failed = self._import_batch(batch, batch_start, transactions)
+            created_invoices.extend(created)
+            failed_transactions.extend(failed)
+        
+        # Single summary notification for the whole import
+        if total_transactions:
+            self.sales_service.send_import_summary(
+                file_name,
+                total_transactions,
+                len(created_invoices),
+                len(failed_transactions),
+                round(sum(invoice.get('total_amount', 0) for invoice in created_invoices), 2)
+            )
         
         # Generate results
         return self._generate_results(total_transactions, created_invoices, failed_transactions)
 
+    def _import_batch(self, batch, batch_start, transactions, job_id=None):
+        """
+        Map and validate one batch, then write it with a single insert_many.
+        Background imports pass their job_id: every row then carries an
+        `import_key` of "<job_id>:<row number>" (unique in sales_log), so a
+        batch replayed after a crash skips the rows it had already written
+        instead of duplicating them.
+        """
+        failed_transactions = []
+        
+        # Map and validate the whole batch first
+        invoices = []
+        row_numbers = []
+        for index, transaction in enumerate(batch):
+            row_number = batch_start + index + 1
+            try:
+                invoice = self._map_transaction_to_invoice(transaction, row_number)
+                if job_id is not None:
+                    invoice['import_key'] = f"{job_id}:{row_number}"
+                invoices.append(invoice)
+                row_numbers.append(row_number)
+            except Exception as e:
+                failed_transactions.append(self._failed_row(row_number, transaction, str(e)))
+        
+        if not invoices:
+            return [], failed_transactions
+        
+        # One insert_many per batch; per-row write errors come back by position
+        try:
+            created, errors = self.sales_service.bulk_create_invoices(invoices, existing_ok=job_id is not None)
+        except Exception as e:
+            created = []
+            errors = [{'index': index, 'error': str(e)} for index in range(len(invoices))]
+        
+        for error in errors:
+            row_number = row_numbers[error['index']]
+            failed_transactions.append(
+                self._failed_row(row_number, transactions[row_number - 1], error['error'])
+            )
+        
+        failed_transactions.sort(key=lambda failed: failed['row'])
+        return created, failed_transactions
+
+    def _failed_row(self, row_number, transaction, error):
+        logger.warning(f"Failed to process row {row_number}: {error}")
+        return {
+            'row': row_number,
+            'data': self._sanitize_transaction_data(transaction),
+            'error': error
+        }
+
     def _map_transaction_to_invoice(self, transaction, row_number):
         """Map CSV transaction to invoice format"""
         
@@ -527,14 +578,21 @@ class SalesLogTemplateView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 class SalesLogExportView(APIView):
-    """Export sales transactions to CSV"""
+    """Export sales transactions as streamed CSV, gzip CSV or XLSX"""
+    
+    EXPORT_HEADER = SALES_EXPORT_HEADER
+    EXPORT_PROJECTION = SALES_EXPORT_PROJECTION
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.sales_service = SalesLogService()
+        self.sales_service = service_registry.get(SalesLogService)
     
     def get(self, request):
-        """Export sales transactions to CSV with optional filtering"""
+        """
+        Export sales transactions with optional filtering.
+        ?file_format=csv (default), csv.gz or xlsx; rows are streamed, never
+        capped. (Not ?format=, which DRF reserves for renderer selection.)
+        """
         try:
             # Get filter parameters from query string
             filters = {
@@ -548,80 +606,37 @@ class SalesLogExportView(APIView):
             
             # Remove None values
             filters = {k: v for k, v in filters.items() if v is not None}
+            file_format = request.GET.get('file_format', 'csv').lower()
+            
+            # Export to a file in the background; download from /jobs/<job_id>/result/
+            if wants_async(request):
+                if file_format not in EXPORT_FORMATS:
+                    raise ValueError("Invalid format. Use 'csv', 'csv.gz' or 'xlsx'")
+                return submit_job(request, 'sales_export', {
+                    'filters': filters,
+                    'file_format': file_format
+                })
             
-            logger.info(f"Exporting sales transactions with filters: {filters}")
-            
-            # Get transactions from service
-            transactions = self.sales_service.get_transactions_for_export(filters)
-            
-            # Create CSV response
-            response = HttpResponse(content_type='text/csv')
-            
-            # Generate filename with timestamp
-            from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f'sales_export_{timestamp}.csv'
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            logger.info(f"Exporting sales transactions as {file_format} with filters: {filters}")
             
-            # Write CSV data
-            writer = csv.writer(response)
+            transactions = self.sales_service.iter_transactions_for_export(
+                filters, projection=self.EXPORT_PROJECTION
+            )
             
-            # Write header
-            writer.writerow([
-                'Transaction ID',
-                'Transaction Date',
-                'Customer ID', 
-                'Item Code',
-                'Item Name',
-                'Quantity',
-                'Unit Price',
-                'Total Price',
-                'Payment Method',
-                'Sales Type',
-                'Status',
-                'Tax Amount',
-                'Total Amount'
-            ])
-            
-            # Write data rows
-            for transaction in transactions:
-                transaction_id = str(transaction.get('_id', ''))
-                transaction_date = transaction.get('transaction_date', '')
-                customer_id = str(transaction.get('customer_id', ''))
-                payment_method = transaction.get('payment_method', '')
-                sales_type = transaction.get('sales_type', '')
-                status_val = transaction.get('status', '')
-                tax_amount = transaction.get('tax_amount', 0)
-                total_amount = transaction.get('total_amount', 0)
-                
-                # Handle item list
-                item_list = transaction.get('item_list', [])
-                if not isinstance(item_list, list):
-                    item_list = [item_list] if item_list else []
-                
-                # Write one row per item
-                for item in item_list:
-                    writer.writerow([
-                        transaction_id,
-                        transaction_date,
-                        customer_id,
-                        item.get('item_code', ''),
-                        item.get('item_name', ''),
-                        item.get('quantity', 0),
-                        item.get('unit_price', 0),
-                        item.get('total_price', 0),
-                        payment_method,
-                        sales_type,
-                        status_val,
-                        tax_amount,
-                        total_amount
-                    ])
-            
-            logger.info(f"Successfully exported {len(transactions)} transactions")
-            return response
+            return export_service.streaming_response(
+                sales_export_rows(transactions),
+                self.EXPORT_HEADER,
+                'sales_export',
+                file_format,
+                sheet_title='Sales'
+            )
             
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Error exporting transactions: {str(e)}")
             return Response({
                 'error': f'Export failed: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,6 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from ..services.service_registry import service_registry
 from ..services.sales_display_service import SalesDisplayService
 from datetime import datetime
 
@@ -16,7 +17,7 @@ class SalesDisplayPOSItemSummaryView(APIView):
                 end_date = datetime.strptime(end_date, "%Y-%m-%d")
         except ValueError:
             return Response({"error": "Invalid date format, use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
-        service = SalesDisplayService()
+        service = service_registry.get(SalesDisplayService)
         items = service.top_selling_pos_items(start_date=start_date, end_date=end_date)
         return Response(items, status=status.HTTP_200_OK)
 
@@ -32,21 +33,21 @@ class SalesDisplayOnlineItemSummaryView(APIView):
                 end_date = datetime.strptime(end_date, "%Y-%m-%d")
         except ValueError:
             return Response({"error": "Invalid date format, use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
-        service = SalesDisplayService()
+        service = service_registry.get(SalesDisplayService)
         items = service.top_selling_online_items(start_date=start_date, end_date=end_date)
         return Response(items, status=status.HTTP_200_OK)
 
 # POS sales listing
 class SalesDisplayAllSalesView(APIView):
     def get(self, request):
-        service = SalesDisplayService()
+        service = service_registry.get(SalesDisplayService)
         sales = service.fetch_all_sales()
         return Response(sales, status=status.HTTP_200_OK)
 
 # Online transaction listing
 class SalesDisplayAllOnlineTransactionsView(APIView):
     def get(self, request):
-        service = SalesDisplayService()
+        service = service_registry.get(SalesDisplayService)
         transactions = service.fetch_all_online_transactions()
         return Response(transactions, status=status.HTTP_200_OK)
 
@@ -65,7 +66,7 @@ class SalesDisplayByItemView(APIView):
         except ValueError:
             return Response({"error": "Invalid date format, use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
         
-        service = SalesDisplayService()
+        service = service_registry.get(SalesDisplayService)
         # Use the new method with proper date filtering
         rows = service.get_sales_by_item_with_date_filter(
             start_date=start_date, 
@@ -88,7 +89,7 @@ class SalesDisplaySummaryView(APIView):
         except ValueError:
             return Response({"error": "Invalid date format, use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
         
-        service = SalesDisplayService()
+        service = service_registry.get(SalesDisplayService)
         summary = service.get_sales_summary_by_date_range(
             start_date=start_date, 
             end_date=end_date
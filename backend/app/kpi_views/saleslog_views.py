@@ -2,7 +2,9 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import HttpResponse
+from ..services.service_registry import service_registry
 from ..services.saleslog_service import SalesLogService, SalesItemHistory, SalesTopItem
+from ..services.query_guard_service import query_budget
 from bson import ObjectId
 from datetime import datetime
 import logging
@@ -13,7 +15,7 @@ logger = logging.getLogger(__name__)
 class SalesLogView(APIView):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.sales_service = SalesLogService()
+        self.sales_service = service_registry.get(SalesLogService)
 
     def post(self, request, invoice_id=None):
         """Create a new invoice/sales log"""
@@ -97,39 +99,46 @@ class SalesLogView(APIView):
                         status=status.HTTP_404_NOT_FOUND
                     )
             else:
-                # Get all invoices with pagination
+                # Get all invoices with pagination: ?cursor= (keyset) or ?page=
                 page = int(request.GET.get('page', 1))
                 limit = int(request.GET.get('limit', 20))
-                skip = (page - 1) * limit
+                cursor = request.GET.get('cursor')
                 
-                # Optional filters
-                customer_id = request.GET.get('customer_id')
-                sales_type = request.GET.get('sales_type')
-                status_filter = request.GET.get('status')
+                # Optional filters, applied in the query
+                filters = {
+                    'customer_id': request.GET.get('customer_id'),
+                    'sales_type': request.GET.get('sales_type'),
+                    'status': request.GET.get('status')
+                }
                 
-                # Get invoices
-                invoices = self.sales_service.get_all_invoices(limit=limit, skip=skip)
-                
-                # Apply filters if provided (basic filtering)
-                if customer_id:
-                    invoices = [inv for inv in invoices if inv.get('customer_id') == customer_id]
-                
-                if sales_type:
-                    invoices = [inv for inv in invoices if inv.get('sales_type') == sales_type]
-                
-                if status_filter:
-                    invoices = [inv for inv in invoices if inv.get('status') == status_filter]
+                result = self.sales_service.get_invoices_page(
+                    limit=limit,
+                    page=page,
+                    cursor=cursor,
+                    filters=filters,
+                    total=request.GET.get('total')
+                )
+                invoices = result['items']
                 
                 return Response(
                     {
                         'invoices': invoices,
-                        'page': page,
+                        'page': result['page'],
                         'limit': limit,
-                        'total': len(invoices)
+                        'total': len(invoices),
+                        'total_count': result['total'],
+                        'total_is_exact': result['total_is_exact'],
+                        'has_more': result['has_more'],
+                        'next_cursor': result['next_cursor']
                     }, 
                     status=status.HTTP_200_OK
                 )
                 
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             logger.error(f"Error retrieving invoice(s): {str(e)}")
             return Response(
@@ -232,7 +241,7 @@ class SalesLogStatsView(APIView):
     
     def __init__(self):
         super().__init__()
-        self.sales_service = SalesLogService()
+        self.sales_service = service_registry.get(SalesLogService)
     
     def get(self, request):
         """Get sales statistics"""
@@ -310,10 +319,15 @@ class SalesItemHistoryView(APIView):
                 page_size = 10
             
             # Create service instance
-            Report= SalesItemHistory()
-            
-            # Fetch item history data
-            result = Report.fetch_item_history(page=page, page_size=page_size)
+            Report= service_registry.get(SalesItemHistory)
+            
+            # Fetch item history data (?cursor= continues from next_cursor)
+            result = Report.fetch_item_history(
+                page=page,
+                page_size=page_size,
+                cursor=request.GET.get('cursor'),
+                total=request.GET.get('total')
+            )
             
             return Response({
                 'success': True,
@@ -324,7 +338,7 @@ class SalesItemHistoryView(APIView):
         except ValueError as e:
             return Response({
                 'success': False,
-                'message': 'Invalid page or page_size parameter'
+                'message': 'Invalid page, page_size, cursor or total parameter'
             }, status=status.HTTP_400_BAD_REQUEST)
             
         except Exception as e:
@@ -334,13 +348,14 @@ class SalesItemHistoryView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class SalesTopItemView(APIView):
+    @query_budget(6)
     def get(self, request):
         try:
             # Get limit parameter from query params
             limit = int(request.GET.get('limit', 5))
             
             # Initialize your Report class (assuming SalesTopItem is a class)
-            report = SalesTopItem()  # Create an instance
+            report = service_registry.get(SalesTopItem)  # Create an instance
             
             # Call the method (note the parentheses to actually call it)
             result = report.fetch_top_item(limit=limit)
@@ -399,7 +414,7 @@ class SalesTopItemChartView(APIView):
                     }, status=status.HTTP_400_BAD_REQUEST)
             
             # Initialize your Report class
-            report = SalesTopItem()
+            report = service_registry.get(SalesTopItem)
             
             # ✅ FIXED: Use the correct method name
             result = report.fetch_all_top_item(
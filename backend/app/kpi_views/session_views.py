@@ -2,16 +2,25 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import HttpResponse, JsonResponse
+from ..services.service_registry import service_registry
 from ..services.session_services import SessionLogService, SessionDisplayService
 from ..services.customer_service import CustomerService
 from ..services.product_service import ProductService
 from ..services.user_service import UserService
+from ..services.outbox_service import outbox_service
+from ..services.metrics_service import metrics_service
+from ..services.slow_query_service import slow_query_service
+from ..decorators.authenticationDecorator import require_admin
+from decouple import config
+from .job_views import wants_async, submit_job
 import logging
 import json
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # ================ CORE SESSION VIEWS ================
 
 class SessionLogsView(APIView):
@@ -25,7 +34,7 @@ class SessionLogsView(APIView):
             user_filter = request.query_params.get('user', None)
             
             # Use display service for formatted output
-            display_service = SessionDisplayService()
+            display_service = service_registry.get(SessionDisplayService)
             result = display_service.get_session_logs(
                 limit=limit, 
                 status_filter=status_filter,
@@ -48,7 +57,7 @@ class SessionDetailView(APIView):
     def get(self, request, session_id):
         """Get specific session by session_id (SESS-#####)"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             session = session_service.get_session_by_id(session_id)
             
             if not session:
@@ -75,7 +84,7 @@ class ActiveSessionsView(APIView):
     def get(self, request):
         """Get all active sessions"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             sessions = session_service.get_active_sessions()
             return Response({
                 'success': True,
@@ -97,7 +106,7 @@ class UserSessionsView(APIView):
     def get(self, request, user_id):
         """Get sessions for specific user"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             limit = int(request.query_params.get('limit', 50))
             
             sessions = session_service.get_user_sessions(user_id, limit=limit)
@@ -122,7 +131,7 @@ class SessionStatisticsView(APIView):
     def get(self, request):
         """Get session statistics"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             stats = session_service.get_session_statistics()
             return Response({
                 'success': True,
@@ -149,7 +158,7 @@ class SessionCleanupView(APIView):
     def post(self, request):
         """Manual cleanup with date range and CSV export"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             start_date = request.data.get('start_date')
             end_date = request.data.get('end_date')
             export_path = request.data.get('export_path')
@@ -174,6 +183,14 @@ class SessionCleanupView(APIView):
                         'error': 'Invalid end_date format. Use ISO format (YYYY-MM-DD)'
                     }, status=status.HTTP_400_BAD_REQUEST)
             
+            # Export + delete in the background; the CSV is the job's result file
+            if wants_async(request):
+                return submit_job(request, 'session_cleanup', {
+                    'start_date': start_date,
+                    'end_date': end_date,
+                    'dry_run': dry_run
+                })
+            
             # Perform cleanup with export
             result = session_service.manual_cleanup_with_export(
                 start_date=start_date,
@@ -197,7 +214,7 @@ class CleanupStatusView(APIView):
     def get(self, request):
         """Get cleanup status and what would be cleaned"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             status_data = session_service.get_cleanup_status()
             preview_data = session_service.get_cleanup_preview()
             
@@ -220,7 +237,7 @@ class AutoCleanupControlView(APIView):
     def post(self, request):
         """Start automated cleanup"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             action = request.data.get('action', 'start')
             cleanup_interval_hours = int(request.data.get('cleanup_interval_hours', 720))  # Default monthly
             months_old = int(request.data.get('months_old', 6))
@@ -259,7 +276,7 @@ class SessionExportView(APIView):
     def post(self, request):
         """Export session logs to CSV"""
         try:
-            display_service = SessionDisplayService()
+            display_service = service_registry.get(SessionDisplayService)
             export_format = request.data.get('format', 'csv')
             date_filter = request.data.get('date_filter')
             status_filter = request.data.get('status_filter')
@@ -324,7 +341,7 @@ class ForceLogoutView(APIView):
     def post(self, request, user_id):
         """Force logout a specific user"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             result = session_service.log_logout(user_id, reason="admin_forced")
             
             if result.get('success'):
@@ -353,7 +370,7 @@ class BulkSessionControlView(APIView):
     def post(self, request):
         """Bulk expire sessions for multiple users"""
         try:
-            session_service = SessionLogService()
+            session_service = service_registry.get(SessionLogService)
             action = request.data.get('action', 'expire')
             user_ids = request.data.get('user_ids', [])
             
@@ -388,7 +405,7 @@ class SessionDisplayView(APIView):
         """Get formatted session logs"""
         try:
             print("SessionDisplayView.get() called")
-            display_service = SessionDisplayService()
+            display_service = service_registry.get(SessionDisplayService)
             limit = int(request.query_params.get('limit', 100))
             status_filter = request.query_params.get('status', None)
             user_filter = request.query_params.get('user', None)
@@ -433,7 +450,7 @@ class CombinedLogsView(APIView):
         """Get combined session and audit logs"""
         try:
             # Initialize service here instead
-            display_service = SessionDisplayService()
+            display_service = service_registry.get(SessionDisplayService)
             
             limit = min(int(request.query_params.get('limit', 100)), 500)
             log_type = request.query_params.get('type', 'all')
@@ -469,10 +486,10 @@ class SystemStatusView(APIView):
     def get(self, request):
         """Get system status with statistics"""
         try:
-            user_service = UserService()
-            customer_service = CustomerService()
-            product_service = ProductService()
-            session_service = SessionLogService()
+            user_service = service_registry.get(UserService)
+            customer_service = service_registry.get(CustomerService)
+            product_service = service_registry.get(ProductService)
+            session_service = service_registry.get(SessionLogService)
             
             session_stats = session_service.get_session_statistics()
             cleanup_status = session_service.get_cleanup_status()
@@ -516,4 +533,77 @@ class SystemStatusView(APIView):
                 "system": "PANN User Management System",
                 "status": "error",
                 "error": str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# ================ OUTBOX METRICS VIEW ================
+
+class OutboxMetricsView(APIView):
+    """Queue depth and lag of the side-effect outbox"""
+    
+    def get(self, request):
+        try:
+            return Response({
+                "timestamp": datetime.utcnow().isoformat(),
+                "outbox": outbox_service.get_metrics()
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            logger.error(f"Error in OutboxMetricsView: {e}")
+            return Response({
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# ================ PROMETHEUS METRICS VIEW ================
+
+class MetricsView(APIView):
+    """Per-endpoint latency and MongoDB command metrics in Prometheus text format"""
+    
+    def get(self, request):
+        try:
+            # Scrapers authenticate with a static bearer token when METRICS_TOKEN is set
+            if METRICS_TOKEN and request.headers.get("Authorization", "") != f"Bearer {METRICS_TOKEN}":
+                return HttpResponse("unauthorized\n", status=401, content_type="text/plain")
+            
+            return HttpResponse(
+                metrics_service.render(),
+                content_type="text/plain; version=0.0.4; charset=utf-8"
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in MetricsView: {e}")
+            return HttpResponse(f"# error: {e}\n", status=500, content_type="text/plain")
+
+# ================ SLOW QUERY LOG VIEW ================
+
+class SlowQueryView(APIView):
+    """Slowest MongoDB query shapes by total time, with their explained plans"""
+    
+    @require_admin
+    def get(self, request):
+        try:
+            since_hours = float(request.query_params.get('since_hours', 24))
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+            collscan_only = request.query_params.get('collscan', 'false').lower() == 'true'
+            
+            offenders = slow_query_service.top_offenders(
+                since_hours=since_hours,
+                limit=limit,
+                collscan_only=collscan_only
+            )
+            return Response({
+                "timestamp": datetime.utcnow().isoformat(),
+                "since_hours": since_hours,
+                "log": slow_query_service.stats(),
+                "offenders": offenders,
+                "count": len(offenders)
+            }, status=status.HTTP_200_OK)
+            
+        except ValueError:
+            return Response({
+                "error": "since_hours and limit must be numbers"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error in SlowQueryView: {e}")
+            return Response({
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,6 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from ..services.service_registry import service_registry
 from ..services.supplier_service import SupplierService
 from ..services.batch_service import BatchService
 from ..decorators.authenticationDecorator import require_admin, require_authentication, require_permission, get_authenticated_user_from_jwt
@@ -23,7 +24,7 @@ class SupplierHealthCheckView(APIView):
 
 class SupplierListView(APIView):
     def __init__(self):
-        self.supplier_service = SupplierService()
+        self.supplier_service = service_registry.get(SupplierService)
     
     @require_authentication
     def get(self, request):
@@ -97,7 +98,7 @@ class SupplierListView(APIView):
 class SupplierDetailView(APIView):
     def __init__(self):
         super().__init__()
-        self.supplier_service = SupplierService()
+        self.supplier_service = service_registry.get(SupplierService)
 
     @require_authentication
     def get(self, request, supplier_id):
@@ -204,7 +205,7 @@ class SupplierRestoreView(APIView):
     """View for restoring soft-deleted suppliers"""
     def __init__(self):
         super().__init__()
-        self.supplier_service = SupplierService()
+        self.supplier_service = service_registry.get(SupplierService)
 
     @require_authentication
     def post(self, request, supplier_id):
@@ -246,7 +247,7 @@ class SupplierHardDeleteView(APIView):
     """View for permanently deleting suppliers (DANGEROUS)"""
     def __init__(self):
         super().__init__()
-        self.supplier_service = SupplierService()
+        self.supplier_service = service_registry.get(SupplierService)
 
     @require_authentication
     def delete(self, request, supplier_id):
@@ -295,7 +296,7 @@ class DeletedSuppliersView(APIView):
     """View for getting all soft-deleted suppliers"""
     def __init__(self):
         super().__init__()
-        self.supplier_service = SupplierService()
+        self.supplier_service = service_registry.get(SupplierService)
 
     @require_authentication
     def get(self, request):
@@ -330,7 +331,7 @@ class SupplierBatchesView(APIView):
     """View for getting all batches associated with a supplier"""
     def __init__(self):
         super().__init__()
-        self.supplier_service = SupplierService()
+        self.supplier_service = service_registry.get(SupplierService)
 
     @require_authentication
     def get(self, request, supplier_id):
@@ -371,7 +372,7 @@ class SupplierStatisticsView(APIView):
     """View for getting comprehensive statistics for a supplier"""
     def __init__(self):
         super().__init__()
-        self.supplier_service = SupplierService()
+        self.supplier_service = service_registry.get(SupplierService)
 
     @require_authentication
     def get(self, request, supplier_id):
@@ -395,8 +396,8 @@ class CreateBatchForSupplierView(APIView):
     """Convenience view for creating a batch directly through a supplier endpoint"""
     def __init__(self):
         super().__init__()
-        self.batch_service = BatchService()
-        self.supplier_service = SupplierService()
+        self.batch_service = service_registry.get(BatchService)
+        self.supplier_service = service_registry.get(SupplierService)
 
     @require_authentication
     def post(self, request, supplier_id):
@@ -1,7 +1,9 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from ..services.service_registry import service_registry
 from ..services.user_service import UserService
+from ..services.query_guard_service import query_budget
 from ..decorators.authenticationDecorator import require_admin, require_authentication, require_permission, get_authenticated_user_from_jwt
 from ..serializers import UserCreateSerializer
 import logging
@@ -22,9 +24,10 @@ class HealthCheckView(APIView):
 
 class UserListView(APIView):
     def __init__(self):
-        self.user_service = UserService()
+        self.user_service = service_registry.get(UserService)
     
     
+    @query_budget(6)
     def get(self, request):
         """Get users with pagination and filters"""
         try:
@@ -44,10 +47,17 @@ class UserListView(APIView):
                 page=page, 
                 limit=limit, 
                 status=status_filter, 
-                include_deleted=include_deleted
+                include_deleted=include_deleted,
+                cursor=request.query_params.get('cursor'),
+                total=request.query_params.get('total')
             )
             return Response(result, status=status.HTTP_200_OK)
             
+        except ValueError as e:
+            return Response(
+                {"error": str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             logger.error(f"Error getting users: {e}")
             return Response(
@@ -80,7 +90,7 @@ class UserListView(APIView):
 class UserDetailView(APIView):
     def __init__(self):
         super().__init__()
-        self.user_service = UserService()
+        self.user_service = service_registry.get(UserService)
 
     @require_authentication
     def get(self, request, user_id):
@@ -187,7 +197,7 @@ class UserRestoreView(APIView):
     """View for restoring soft-deleted users"""
     def __init__(self):
         super().__init__()
-        self.user_service = UserService()
+        self.user_service = service_registry.get(UserService)
 
     @require_authentication
     def post(self, request, user_id):
@@ -217,7 +227,7 @@ class UserHardDeleteView(APIView):
     """View for permanently deleting users (DANGEROUS)"""
     def __init__(self):
         super().__init__()
-        self.user_service = UserService()
+        self.user_service = service_registry.get(UserService)
 
     @require_authentication
     def delete(self, request, user_id):
@@ -253,10 +263,39 @@ class UserHardDeleteView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class DisabledUsersView(APIView):
+    def __init__(self):
+        super().__init__()
+        self.user_service = service_registry.get(UserService)
+
+    @require_admin
+    def get(self, request):
+        """Get disabled (not deleted) users - Admin only"""
+        try:
+            result = self.user_service.get_disabled_users(
+                page=int(request.query_params.get('page', 1)),
+                limit=int(request.query_params.get('limit', 50)),
+                cursor=request.query_params.get('cursor'),
+                total=request.query_params.get('total')
+            )
+            return Response(result, status=status.HTTP_200_OK)
+
+        except ValueError as e:
+            return Response(
+                {"error": str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error getting disabled users: {e}")
+            return Response(
+                {"error": str(e)}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class DeletedUsersView(APIView):
     def __init__(self):
         super().__init__()
-        self.user_service = UserService()
+        self.user_service = service_registry.get(UserService)
 
     @require_authentication
     def get(self, request):
@@ -292,7 +331,7 @@ class DeletedUsersView(APIView):
 class UserByEmailView(APIView):
     def __init__(self):
         super().__init__()
-        self.user_service = UserService()
+        self.user_service = service_registry.get(UserService)
 
     @require_authentication    
     def get(self, request, email):
@@ -327,7 +366,7 @@ class UserByEmailView(APIView):
 class UserByUsernameView(APIView):
     def __init__(self):
         super().__init__()
-        self.user_service = UserService()
+        self.user_service = service_registry.get(UserService)
 
     @require_authentication    
     def get(self, request, username):
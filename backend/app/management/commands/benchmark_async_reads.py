@@ -0,0 +1,223 @@
+from django.core.management.base import BaseCommand, CommandError
+from urllib.parse import urlsplit
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from app.management.commands.benchmark_checkout import percentile
+from app.management.commands.benchmark_startup import BACKEND_DIR
+
+# name -> (sync path on the WSGI deployment, async path on the ASGI deployment)
+ENDPOINTS = {
+    'notifications': ('/api/v1/notifications/recent/', '/api/v1/async/notifications/recent/'),
+    'order-status': ('/api/v1/online/orders/{order_id}/status/', '/api/v1/async/online/orders/{order_id}/status/'),
+    'pos-catalog': ('/api/v1/pos/catalog/', '/api/v1/async/pos/catalog/'),
+    'products': ('/api/v1/products/', '/api/v1/async/products/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the polled read endpoints: the sync views on a WSGI deployment against '
+        'their motor twins on an ASGI (uvicorn) deployment, at increasing numbers of concurrent connections'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000', help='Base URL of the WSGI deployment')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001', help='Base URL of the ASGI deployment')
+        parser.add_argument(
+            '--start-servers',
+            action='store_true',
+            help='Start both deployments with gunicorn (gthread workers for WSGI, uvicorn workers for ASGI) and stop them afterwards',
+        )
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per deployment with --start-servers')
+        parser.add_argument('--threads', type=int, default=8, help='Threads per WSGI worker with --start-servers')
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            dest='endpoints',
+            choices=sorted(ENDPOINTS),
+            help='Endpoint to load (repeatable; default: all except order-status without --token)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            action='append',
+            type=int,
+            dest='levels',
+            help='Concurrent keep-alive connections (repeatable; default 1, 16, 64, 256)',
+        )
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per endpoint, deployment and level')
+        parser.add_argument('--token', help='Bearer token for order-status (a customer who owns --order-id)')
+        parser.add_argument('--order-id', default='ORDER-000001', help='Order polled by order-status')
+
+    def handle(self, *args, **options):
+        endpoints = options['endpoints'] or [name for name in sorted(ENDPOINTS) if name != 'order-status' or options['token']]
+        if 'order-status' in endpoints and not options['token']:
+            raise CommandError('order-status needs --token')
+        levels = options['levels'] or [1, 16, 64, 256]
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else {}
+
+        servers = self._start_servers(options) if options['start_servers'] else []
+        try:
+            deployments = [('wsgi', options['wsgi_url'], 0), ('asgi', options['asgi_url'], 1)]
+            for _, base_url, _ in deployments:
+                asyncio.run(self._wait_until_up(base_url, timeout=60 if servers else 5))
+
+            self.stdout.write(f"duration: {options['duration']}s per run")
+            self.stdout.write(
+                f"{'endpoint':<14} {'deploy':<6} {'conns':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+                f"{'p99 ms':>8} {'errors':>7}"
+            )
+            for name in endpoints:
+                for concurrency in levels:
+                    throughput = {}
+                    for deployment, base_url, side in deployments:
+                        path = ENDPOINTS[name][side].format(order_id=options['order_id'])
+                        result = asyncio.run(
+                            self._load(base_url, path, headers, concurrency, options['duration'])
+                        )
+                        throughput[deployment] = result['rps']
+                        self.stdout.write(
+                            f"{name:<14} {deployment:<6} {concurrency:>6} {result['rps']:>9.1f} "
+                            f"{percentile(result['latencies'], 50):>8.1f} {percentile(result['latencies'], 95):>8.1f} "
+                            f"{percentile(result['latencies'], 99):>8.1f} {result['errors']:>7}"
+                        )
+                    if throughput['wsgi']:
+                        self.stdout.write(f"{'':<14} asgi/wsgi throughput: {throughput['asgi'] / throughput['wsgi']:.2f}x")
+        finally:
+            for server in servers:
+                server.terminate()
+            for server in servers:
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+    # ================================================================
+    # SERVERS
+    # ================================================================
+
+    def _start_servers(self, options):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', os.environ.get('DJANGO_SETTINGS_MODULE', 'settings.local'))
+        commands = [
+            [sys.executable, '-m', 'gunicorn', 'posbackend.wsgi:application',
+             '--bind', self._bind(options['wsgi_url']), '--workers', str(options['workers']),
+             '--worker-class', 'gthread', '--threads', str(options['threads'])],
+            [sys.executable, '-m', 'gunicorn', 'posbackend.asgi:application',
+             '--bind', self._bind(options['asgi_url']), '--workers', str(options['workers']),
+             '--worker-class', 'uvicorn.workers.UvicornWorker'],
+        ]
+        servers = []
+        for command in commands:
+            self.stdout.write(' '.join(command[1:]))
+            servers.append(subprocess.Popen(
+                command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+        return servers
+
+    @staticmethod
+    def _bind(url):
+        parts = urlsplit(url)
+        return f"{parts.hostname}:{parts.port or 80}"
+
+    async def _wait_until_up(self, base_url, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                connection = await _Connection.open(base_url)
+                await connection.get('/api/v1/health/', {})
+                connection.close()
+                return
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                if time.monotonic() > deadline:
+                    raise CommandError(f'{base_url} is not answering; start it or pass --start-servers')
+                await asyncio.sleep(0.5)
+
+    # ================================================================
+    # LOAD
+    # ================================================================
+
+    async def _load(self, base_url, path, headers, concurrency, duration):
+        """`concurrency` keep-alive connections issuing GETs back to back for `duration` seconds"""
+        latencies = []
+        errors = 0
+        deadline = time.monotonic() + duration
+
+        async def client():
+            nonlocal errors
+            connection = None
+            while time.monotonic() < deadline:
+                try:
+                    if connection is None or connection.closed:
+                        connection = await _Connection.open(base_url)
+                    began = time.perf_counter()
+                    status_code = await connection.get(path, headers)
+                    if status_code >= 400:
+                        errors += 1
+                    else:
+                        latencies.append((time.perf_counter() - began) * 1000)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    errors += 1
+                    if connection is not None:
+                        connection.close()
+                    connection = None
+            if connection is not None:
+                connection.close()
+
+        started = time.monotonic()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+        return {'rps': len(latencies) / elapsed if elapsed else 0.0, 'latencies': latencies, 'errors': errors}
+
+
+class _Connection:
+    """Minimal HTTP/1.1 keep-alive client, so the benchmark needs nothing beyond the standard library"""
+
+    def __init__(self, host, reader, writer):
+        self.host = host
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+
+    @classmethod
+    async def open(cls, base_url):
+        parts = urlsplit(base_url)
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        return cls(parts.netloc, reader, writer)
+
+    async def get(self, path, headers):
+        """Send a GET and read the whole response; returns the status code"""
+        lines = [f'GET {path} HTTP/1.1', f'Host: {self.host}', 'Connection: keep-alive']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        status_code = int(status_line.split()[1])
+        response_headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in response_headers:
+            await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            raise ValueError('Response without a length; cannot keep the connection alive')
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status_code
+
+    def close(self):
+        self.closed = True
+        self.writer.close()
@@ -0,0 +1,126 @@
+from django.core.management.base import BaseCommand
+from datetime import datetime
+from decouple import config
+from pymongo import MongoClient, monitoring
+import time
+
+from app.services.pos.checkoutEngine import CheckoutEngine
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts every command the benchmark client sends to the server"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Compare round-trips and latency of per-line vs batched POS checkout'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uri',
+            default=config('MONGODB_LOCAL_URI', default='mongodb://localhost:27017'),
+            help='MongoDB to benchmark against (defaults to the local instance)',
+        )
+        parser.add_argument(
+            '--database',
+            default='pos_benchmark',
+            help='Scratch database; it is dropped afterwards unless --keep is given',
+        )
+        parser.add_argument('--sizes', default='1,10,50', help='Comma separated cart sizes')
+        parser.add_argument('--iterations', type=int, default=50, help='Checkouts per cart size and mode')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        iterations = options['iterations']
+
+        counter = CommandCounter()
+        client = MongoClient(options['uri'], event_listeners=[counter])
+        db = client[options['database']]
+
+        try:
+            self._seed_products(db, max(sizes))
+            engine = CheckoutEngine(db)
+
+            self.stdout.write(
+                f"Transactions available: {engine.supports_transactions()}  "
+                f"iterations per case: {iterations}"
+            )
+            self.stdout.write(f"{'lines':>5} {'mode':<10} {'round-trips':>11} {'p50 ms':>8} {'p95 ms':>8}")
+
+            for size in sizes:
+                cart = [
+                    {'product_id': f"BENCH-{i:05d}", 'quantity': 1, 'price': 10.0}
+                    for i in range(size)
+                ]
+
+                for mode, run in (('per-line', self._legacy_checkout), ('batched', self._batched_checkout)):
+                    latencies = []
+                    commands_before = counter.count
+
+                    for _ in range(iterations):
+                        started = time.perf_counter()
+                        run(db, engine, cart)
+                        latencies.append((time.perf_counter() - started) * 1000)
+
+                    round_trips = (counter.count - commands_before) / float(iterations)
+                    self.stdout.write(
+                        f"{size:>5} {mode:<10} {round_trips:>11.1f} "
+                        f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}"
+                    )
+        finally:
+            if not options['keep']:
+                client.drop_database(options['database'])
+            client.close()
+
+    def _seed_products(self, db, count):
+        db.products.drop()
+        db.sales.drop()
+        db.products.insert_many([
+            {
+                '_id': f"BENCH-{i:05d}",
+                'product_name': f"Benchmark Product {i}",
+                'stock': 10 ** 9,
+                'low_stock_threshold': 5,
+                'isDeleted': False,
+            }
+            for i in range(count)
+        ])
+
+    def _legacy_checkout(self, db, engine, cart):
+        """The previous pos_transaction pattern: find/find/update per line"""
+        for item in cart:
+            db.products.find_one({'_id': item['product_id']})  # validate_stock_availability
+        for item in cart:
+            db.products.find_one({'_id': item['product_id']})  # check_low_stock_warnings
+        db.sales.insert_one({'items': cart, 'transaction_date': datetime.utcnow()})
+        for item in cart:
+            db.products.update_one(  # update_inventory
+                {'_id': item['product_id']},
+                {'$inc': {'stock': -item['quantity']}}
+            )
+
+    def _batched_checkout(self, db, engine, cart):
+        products = engine.load_cart_products(cart)
+        engine.find_shortfalls(cart, products)
+        engine.stock_warnings(cart, products)
+        engine.commit(cart, {'items': cart, 'transaction_date': datetime.utcnow()})
@@ -0,0 +1,134 @@
+from django.core.management.base import BaseCommand
+from datetime import datetime
+from decouple import config
+from pymongo import MongoClient
+import threading
+import time
+import bcrypt
+
+from app.services.password_service import PasswordService, PasswordServiceBusy, BCRYPT_ROUNDS
+from app.services.pos.checkoutEngine import CheckoutEngine
+from app.management.commands.benchmark_checkout import percentile
+
+
+class Command(BaseCommand):
+    help = 'Measure checkout latency while a burst of logins runs bcrypt inline vs on the bounded pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uri',
+            default=config('MONGODB_LOCAL_URI', default='mongodb://localhost:27017'),
+            help='MongoDB to benchmark against (defaults to the local instance)',
+        )
+        parser.add_argument(
+            '--database',
+            default='login_storm_benchmark',
+            help='Scratch database; it is dropped afterwards unless --keep is given',
+        )
+        parser.add_argument('--logins', type=int, default=100, help='Logins in flight at once')
+        parser.add_argument('--rounds', type=int, default=BCRYPT_ROUNDS, help='bcrypt cost of the stored hash')
+        parser.add_argument('--workers', type=int, default=None, help='Override PASSWORD_WORKERS')
+        parser.add_argument('--queue-limit', type=int, default=None, help='Override PASSWORD_QUEUE_LIMIT')
+        parser.add_argument('--cart-size', type=int, default=10, help='Lines per checkout')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+
+    def handle(self, *args, **options):
+        client = MongoClient(options['uri'])
+        db = client[options['database']]
+
+        try:
+            self._seed_products(db, options['cart_size'])
+            engine = CheckoutEngine(db)
+            cart = [
+                {'product_id': f"BENCH-{i:05d}", 'quantity': 1, 'price': 10.0}
+                for i in range(options['cart_size'])
+            ]
+
+            password = 'benchmark-password'
+            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=options['rounds'])).decode('utf-8')
+            pool = PasswordService(
+                workers=options['workers'],
+                queue_limit=options['queue_limit'],
+                rounds=options['rounds']
+            )
+
+            self.stdout.write(
+                f"logins in flight: {options['logins']}  bcrypt cost: {options['rounds']}  "
+                f"pool workers: {pool.workers}  queue limit: {pool.queue_limit}"
+            )
+            self.stdout.write(
+                f"{'mode':<8} {'checkouts':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                f"{'logins ok':>9} {'503s':>6} {'login s':>8}"
+            )
+
+            def inline_login():
+                return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+            def pooled_login():
+                return pool.verify(password, hashed)
+
+            for mode, login in (('idle', None), ('inline', inline_login), ('pool', pooled_login)):
+                latencies, outcome, elapsed = self._run_storm(engine, cart, login, options['logins'])
+                self.stdout.write(
+                    f"{mode:<8} {len(latencies):>9} {percentile(latencies, 50):>8.2f} "
+                    f"{percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f} "
+                    f"{outcome['ok']:>9} {outcome['busy']:>6} {elapsed:>8.2f}"
+                )
+        finally:
+            if not options['keep']:
+                client.drop_database(options['database'])
+            client.close()
+
+    def _run_storm(self, engine, cart, login, logins):
+        """Check out in a loop until every login thread has finished"""
+        outcome = {'ok': 0, 'busy': 0}
+        lock = threading.Lock()
+        start = threading.Event()
+
+        def attempt():
+            start.wait()
+            try:
+                login()
+                result = 'ok'
+            except PasswordServiceBusy:
+                result = 'busy'
+            with lock:
+                outcome[result] += 1
+
+        threads = [threading.Thread(target=attempt) for _ in range(logins if login else 0)]
+        for thread in threads:
+            thread.start()
+
+        latencies = []
+        started = time.perf_counter()
+        start.set()
+        # With no logins, sample a fixed number of checkouts for the baseline
+        while any(thread.is_alive() for thread in threads) or (not threads and len(latencies) < 200):
+            began = time.perf_counter()
+            self._checkout(engine, cart)
+            latencies.append((time.perf_counter() - began) * 1000)
+        elapsed = time.perf_counter() - started
+
+        for thread in threads:
+            thread.join()
+        return latencies, outcome, elapsed
+
+    def _checkout(self, engine, cart):
+        products = engine.load_cart_products(cart)
+        engine.find_shortfalls(cart, products)
+        engine.stock_warnings(cart, products)
+        engine.commit(cart, {'items': cart, 'transaction_date': datetime.utcnow()})
+
+    def _seed_products(self, db, count):
+        db.products.drop()
+        db.sales.drop()
+        db.products.insert_many([
+            {
+                '_id': f"BENCH-{i:05d}",
+                'product_name': f"Benchmark Product {i}",
+                'stock': 10 ** 9,
+                'low_stock_threshold': 5,
+                'isDeleted': False,
+            }
+            for i in range(count)
+        ])
@@ -0,0 +1,179 @@
+from django.core.management.base import BaseCommand
+from datetime import datetime, timedelta
+from decouple import config
+from pymongo import MongoClient
+import random
+import time
+
+from app.services.promotions_service import PromotionService
+from app.services.promotion_index import CompiledPromotions, PROMOTION_INDEX_VERSION_ID
+from app.management.commands.benchmark_checkout import CommandCounter, percentile
+
+
+class Command(BaseCommand):
+    help = 'Compare scanning every active promotion vs the compiled promotion index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uri',
+            default=config('MONGODB_LOCAL_URI', default='mongodb://localhost:27017'),
+            help='MongoDB to benchmark against (defaults to the local instance)',
+        )
+        parser.add_argument(
+            '--database',
+            default='promotion_benchmark',
+            help='Scratch database; it is dropped afterwards unless --keep is given',
+        )
+        parser.add_argument('--promotions', type=int, default=500, help='Active promotions to create')
+        parser.add_argument('--products', type=int, default=2000, help='Catalogue size')
+        parser.add_argument('--categories', type=int, default=50, help='Number of categories')
+        parser.add_argument('--lines', type=int, default=30, help='Cart lines per order')
+        parser.add_argument('--iterations', type=int, default=200, help='Orders evaluated per mode')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        counter = CommandCounter()
+        client = MongoClient(options['uri'], event_listeners=[counter])
+        db = client[options['database']]
+
+        # The discount helpers only need an instance, not its collections
+        evaluator = PromotionService.__new__(PromotionService)
+
+        try:
+            self._seed_promotions(db, rng, options)
+            carts = [self._random_cart(rng, options) for _ in range(options['iterations'])]
+
+            started = time.perf_counter()
+            compiled = self._compile(db)
+            compile_ms = (time.perf_counter() - started) * 1000
+
+            self.stdout.write(
+                f"{len(compiled)} active promotions, {options['lines']}-line carts, "
+                f"{options['iterations']} orders per mode; index compiled in {compile_ms:.1f} ms"
+            )
+            self.stdout.write(f"{'mode':<10} {'round-trips':>11} {'evaluated':>10} {'p50 ms':>8} {'p95 ms':>8}")
+
+            results = {}
+            for mode, run in (('scan', self._scan), ('indexed', self._indexed)):
+                latencies = []
+                evaluated = 0
+                commands_before = counter.count
+
+                for cart in carts:
+                    started = time.perf_counter()
+                    best, count = run(db, evaluator, compiled, cart)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    evaluated += count
+                    results.setdefault(mode, []).append(best)
+
+                round_trips = (counter.count - commands_before) / float(len(carts))
+                self.stdout.write(
+                    f"{mode:<10} {round_trips:>11.1f} {evaluated / float(len(carts)):>10.1f} "
+                    f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}"
+                )
+
+            mismatches = sum(1 for a, b in zip(results['scan'], results['indexed']) if a != b)
+            if mismatches:
+                self.stdout.write(self.style.ERROR(f"{mismatches} orders picked a different promotion"))
+            else:
+                self.stdout.write(self.style.SUCCESS('Both modes picked the same promotion for every order'))
+        finally:
+            if not options['keep']:
+                client.drop_database(options['database'])
+            client.close()
+
+    def _seed_promotions(self, db, rng, options):
+        db.promotions.drop()
+        db.counters.drop()
+        now = datetime.utcnow()
+        promotions = []
+
+        for i in range(options['promotions']):
+            promotion_id = f"PROM-{i + 1:04d}"
+            roll = rng.random()
+            if roll < 0.6:
+                target_type = 'products'
+                target_ids = [f"PROD-{rng.randrange(options['products']):05d}" for _ in range(rng.randint(1, 5))]
+            elif roll < 0.9:
+                target_type = 'categories'
+                target_ids = [f"CTGY-{rng.randrange(options['categories']):03d}"]
+            else:
+                target_type = 'all'
+                target_ids = []
+
+            promotion_type = rng.choice(['percentage', 'percentage', 'fixed_amount', 'buy_x_get_y'])
+            promotions.append({
+                '_id': promotion_id,
+                'promotion_id': promotion_id,
+                'name': f"Benchmark Promotion {i + 1}",
+                'type': promotion_type,
+                'discount_value': rng.randint(1, 30) if promotion_type != 'fixed_amount' else rng.randint(10, 200),
+                'discount_config': {'buy_quantity': 2, 'get_quantity': 1},
+                'target_type': target_type,
+                'target_ids': target_ids,
+                'start_date': now - timedelta(days=1),
+                'end_date': now + timedelta(days=30),
+                'status': 'active',
+                'isDeleted': False,
+                'usage_limit': rng.choice([None, None, 1000]),
+                'current_usage': 0,
+                'created_at': now - timedelta(seconds=i),
+            })
+
+        db.promotions.insert_many(promotions)
+        db.counters.insert_one({'_id': PROMOTION_INDEX_VERSION_ID, 'seq': 1})
+
+    def _random_cart(self, rng, options):
+        items = []
+        for _ in range(options['lines']):
+            product_number = rng.randrange(options['products'])
+            items.append({
+                'product_id': f"PROD-{product_number:05d}",
+                'category_id': f"CTGY-{product_number % options['categories']:03d}",
+                'price': float(rng.randint(20, 500)),
+                'quantity': rng.randint(1, 3),
+            })
+        return {'items': items, 'total_amount': sum(item['price'] * item['quantity'] for item in items)}
+
+    def _compile(self, db):
+        now = datetime.utcnow()
+        promotions = db.promotions.find({
+            'isDeleted': {'$ne': True},
+            'status': 'active',
+            'end_date': {'$gte': now}
+        }, {'usage_history': 0}).sort('created_at', -1)
+        return CompiledPromotions(1, promotions, now)
+
+    def _scan(self, db, evaluator, compiled, order_data):
+        """The previous apply_promotion_to_order loop"""
+        now = datetime.utcnow()
+        promotions = list(db.promotions.find({
+            'isDeleted': {'$ne': True},
+            'status': 'active',
+            'start_date': {'$lte': now},
+            'end_date': {'$gte': now}
+        }).sort('created_at', -1))
+
+        best_promotion, best_discount = None, 0.0
+        for promotion in promotions:
+            discount = evaluator._calculate_promotion_discount(promotion, order_data)
+            if discount > best_discount and evaluator._check_usage_limit(promotion):
+                best_promotion, best_discount = promotion['promotion_id'], discount
+        return best_promotion, len(promotions)
+
+    def _indexed(self, db, evaluator, compiled, order_data):
+        """The compiled path, including the version stamp read on each order"""
+        db.counters.find_one({'_id': PROMOTION_INDEX_VERSION_ID}, {'seq': 1})
+
+        candidates = compiled.candidates(order_data)
+        scored = [
+            (evaluator._discount_for_eligible_amount(promotion, amount, order_data), promotion)
+            for promotion, amount in candidates
+        ]
+        scored.sort(key=lambda entry: (-entry[0], compiled.rank[entry[1]['promotion_id']]))
+        for discount, promotion in scored:
+            if discount > 0 and evaluator._check_usage_limit(promotion):
+                return promotion['promotion_id'], len(candidates)
+        return None, len(candidates)
@@ -0,0 +1,140 @@
+from django.core.management.base import BaseCommand
+from datetime import datetime, date, time, timedelta
+from decouple import config
+from pymongo import MongoClient
+import random
+
+from app.services.pos.salesReport import SalesReport
+from app.management.commands.benchmark_checkout import CommandCounter
+
+
+class Command(BaseCommand):
+    help = 'Compare the day-by-day sales_by_period loop with the single $unionWith/$dateTrunc pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uri',
+            default=config('MONGODB_LOCAL_URI', default='mongodb://localhost:27017'),
+            help='MongoDB to benchmark against (defaults to the local instance)',
+        )
+        parser.add_argument(
+            '--database',
+            default='sales_period_benchmark',
+            help='Scratch database; it is dropped afterwards unless --keep is given',
+        )
+        parser.add_argument('--sales-log', type=int, default=1000000, help='sales_log documents to seed')
+        parser.add_argument('--sales', type=int, default=100000, help='POS sales documents to seed')
+        parser.add_argument('--days', type=int, default=365, help='Length of the reporting window')
+        parser.add_argument('--skip-legacy', action='store_true', help='Only time the pipeline')
+        parser.add_argument('--reuse', action='store_true', help='Reuse data already seeded in --database')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+
+    def handle(self, *args, **options):
+        counter = CommandCounter()
+        client = MongoClient(options['uri'], event_listeners=[counter])
+        db = client[options['database']]
+
+        end_day = date.today()
+        start_day = end_day - timedelta(days=options['days'] - 1)
+
+        try:
+            # Only the collections are needed, not SalesReport's cloud connection
+            report = SalesReport.__new__(SalesReport)
+            report.sales_collection = db.sales
+            report.sales_log_collection = db.sales_log
+
+            if not options['reuse']:
+                self._seed(db, report, options, start_day)
+
+            self.stdout.write(
+                f"sales_log={db.sales_log.estimated_document_count()} "
+                f"sales={db.sales.estimated_document_count()} window={options['days']} days"
+            )
+            self.stdout.write(f"{'mode':<22} {'round-trips':>11} {'seconds':>9} {'revenue':>16}")
+
+            if not options['skip_legacy']:
+                self._run('day-by-day', counter, lambda: self._legacy_daily(report, start_day, end_day))
+
+            for period_type in ('daily', 'weekly', 'monthly', 'hourly'):
+                self._run(
+                    f"pipeline {period_type}", counter,
+                    lambda: report.get_sales_by_period(start_day, end_day, period_type)['period_summary']['total_revenue']
+                )
+        finally:
+            if not options['keep']:
+                client.drop_database(options['database'])
+            client.close()
+
+    def _run(self, label, counter, func):
+        commands_before = counter.count
+        started = datetime.now()
+        revenue = func()
+        elapsed = (datetime.now() - started).total_seconds()
+        self.stdout.write(f"{label:<22} {counter.count - commands_before:>11} {elapsed:>9.2f} {revenue:>16.2f}")
+
+    def _seed(self, db, report, options, start_day):
+        db.sales.drop()
+        db.sales_log.drop()
+        rng = random.Random(7)
+        # Keep every sale inside both the UTC-day window of the old loop and
+        # the local-day window of the pipeline so their totals are comparable
+        origin = datetime.combine(start_day, time.min)
+        window_end = report._local_to_utc(datetime.combine(start_day + timedelta(days=options['days']), time.min))
+        window_seconds = int((min(window_end, origin + timedelta(days=options['days'])) - origin).total_seconds())
+
+        def random_moment():
+            return origin + timedelta(seconds=rng.randrange(window_seconds))
+
+        batch = []
+        for i in range(options['sales_log']):
+            amount = float(rng.randint(50, 5000))
+            batch.append({
+                'transaction_date': random_moment(),
+                'total_amount': amount,
+                'status': 'completed',
+                'payment_method': 'cash',
+                'source': rng.choice(['manual', 'csv']),
+                'item_list': [{'item_code': f"PROD-{rng.randrange(500):05d}", 'quantity': 1, 'unit_price': amount}],
+            })
+            if len(batch) == 10000:
+                db.sales_log.insert_many(batch, ordered=False)
+                batch = []
+                self.stdout.write(f"  seeded {i + 1} sales_log documents", ending='\r')
+        if batch:
+            db.sales_log.insert_many(batch, ordered=False)
+
+        batch = []
+        for _ in range(options['sales']):
+            amount = float(rng.randint(50, 2000))
+            batch.append({
+                'transaction_date': random_moment(),
+                'total_amount': amount,
+                'total_discount': 0,
+                'final_amount': amount,
+                'status': 'completed',
+                'source': 'pos',
+            })
+            if len(batch) == 10000:
+                db.sales.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            db.sales.insert_many(batch, ordered=False)
+
+        db.sales.create_index([('transaction_date', 1)])
+        db.sales_log.create_index([('transaction_date', 1)])
+        self.stdout.write('')
+
+    def _legacy_daily(self, report, start_day, end_day):
+        """The previous _get_daily_breakdown: two full-document finds per day"""
+        total_revenue = 0.0
+        current = start_day
+        while current <= end_day:
+            query = {'transaction_date': {
+                '$gte': datetime.combine(current, time.min),
+                '$lte': datetime.combine(current, time.max)
+            }}
+            pos_totals = report._calculate_pos_totals(list(report.sales_collection.find(query)))
+            log_totals = report._calculate_log_totals(list(report.sales_log_collection.find(query)))
+            total_revenue += pos_totals['revenue'] + log_totals['revenue']
+            current += timedelta(days=1)
+        return total_revenue
@@ -0,0 +1,106 @@
+from django.core.management.base import BaseCommand
+from decouple import config
+from pymongo import MongoClient
+import random
+import time
+
+from app.database import db_manager
+from app.management.commands.benchmark_checkout import CommandCounter
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput of the per-row and batched sales CSV import paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uri',
+            default=config('MONGODB_LOCAL_URI', default='mongodb://localhost:27017'),
+            help='MongoDB to benchmark against (defaults to the local instance)',
+        )
+        parser.add_argument(
+            '--database',
+            default='sales_import_benchmark',
+            help='Scratch database; it is dropped afterwards unless --keep is given',
+        )
+        parser.add_argument('--rows', type=int, default=50000, help='CSV rows for the batched import')
+        parser.add_argument(
+            '--legacy-rows', type=int, default=5000,
+            help='CSV rows for the per-row import (it is slow; throughput is what gets compared)',
+        )
+        parser.add_argument('--batch-size', type=int, default=None, help='Override SALES_IMPORT_BATCH_SIZE')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+
+    def handle(self, *args, **options):
+        counter = CommandCounter()
+        client = MongoClient(options['uri'], event_listeners=[counter])
+        db = client[options['database']]
+
+        # Every service below resolves its database through db_manager
+        previous = (db_manager.current_client, db_manager.current_db)
+        db_manager.current_client, db_manager.current_db = client, db
+
+        try:
+            from app.kpi_views.sales_bulk_views import SalesLogBulkImportView
+
+            view = SalesLogBulkImportView()
+            if options['batch_size']:
+                view.BATCH_SIZE = options['batch_size']
+
+            self.stdout.write(f"batch size: {view.BATCH_SIZE}")
+            self.stdout.write(f"{'mode':<10} {'rows':>8} {'round-trips':>12} {'seconds':>9} {'rows/s':>10}")
+
+            cases = (
+                ('per-row', options['legacy_rows'], self._per_row_import),
+                ('batched', options['rows'], self._batched_import),
+            )
+            for label, rows, run in cases:
+                if rows <= 0:
+                    continue
+                db.sales_log.drop()
+                db.sales_rollups.drop()
+                transactions = self._transactions(rows)
+
+                commands_before = counter.count
+                started = time.perf_counter()
+                imported = run(view, transactions)
+                elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f"{label:<10} {imported:>8} {counter.count - commands_before:>12} "
+                    f"{elapsed:>9.2f} {imported / elapsed if elapsed else 0:>10.0f}"
+                )
+        finally:
+            db_manager.current_client, db_manager.current_db = previous
+            if not options['keep']:
+                client.drop_database(options['database'])
+            client.close()
+
+    def _transactions(self, count):
+        """Rows shaped like the downloadable import template"""
+        rng = random.Random(11)
+        rows = []
+        for i in range(count):
+            quantity = rng.randint(1, 12)
+            total = round(quantity * rng.uniform(10, 400), 2)
+            rows.append({
+                'Code': f"BN{i % 500:04d}" if i % 10 else '',
+                'Product': f"Benchmark Noodle {i % 500}",
+                'Quantity': str(quantity),
+                'UOM': 'pc',
+                'Total before tax': f"{total:,.2f}",
+                'Total': f"{total:,.2f}",
+            })
+        return rows
+
+    def _per_row_import(self, view, transactions):
+        """The previous loop: map and create_invoice one row at a time"""
+        imported = 0
+        for index, transaction in enumerate(transactions):
+            invoice_data = view._map_transaction_to_invoice(transaction, index + 1)
+            view.sales_service.create_invoice(invoice_data)
+            imported += 1
+        return imported
+
+    def _batched_import(self, view, transactions):
+        results = view._process_transactions(transactions, 'benchmark.csv')
+        return results['summary']['successful']
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from decouple import config
+from pymongo import MongoClient
+import time
+
+from app.database import db_manager
+from app.services.service_registry import ServiceRegistry, WARM_SERVICES
+from app.management.commands.benchmark_checkout import CommandCounter, percentile
+
+
+class Command(BaseCommand):
+    help = 'Compare building each service per request with fetching it from the service registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uri',
+            default=config('MONGODB_LOCAL_URI', default='mongodb://localhost:27017'),
+            help='MongoDB to benchmark against (defaults to the local instance)',
+        )
+        parser.add_argument(
+            '--database',
+            default='services_benchmark',
+            help='Scratch database; it is dropped afterwards unless --keep is given',
+        )
+        parser.add_argument('--iterations', type=int, default=200, help='Constructions / lookups per service')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+
+    def handle(self, *args, **options):
+        counter = CommandCounter()
+        client = MongoClient(options['uri'], event_listeners=[counter])
+        previous = (db_manager.current_client, db_manager.current_db)
+        db_manager.current_client, db_manager.current_db = client, client[options['database']]
+        iterations = options['iterations']
+
+        try:
+            self.stdout.write(f"iterations: {iterations}")
+            self.stdout.write(
+                f"{'service':<26} {'new p50 us':>10} {'new p95 us':>10} {'cmds/new':>9} "
+                f"{'registry p50 us':>15} {'cmds/get':>9}"
+            )
+            registry = ServiceRegistry()
+            totals = {'new': 0.0, 'registry': 0.0}
+            for path in WARM_SERVICES:
+                cls = import_string(path)
+                cls()  # first construction may seed documents (e.g. the Uncategorized category)
+
+                new_times, new_commands = self._measure(lambda: cls(), iterations, counter)
+                registry.get(cls)
+                get_times, get_commands = self._measure(lambda: registry.get(cls), iterations, counter)
+
+                totals['new'] += sum(new_times)
+                totals['registry'] += sum(get_times)
+                self.stdout.write(
+                    f"{cls.__name__:<26} {percentile(new_times, 50):>10.1f} {percentile(new_times, 95):>10.1f} "
+                    f"{new_commands / iterations:>9.2f} {percentile(get_times, 50):>15.2f} "
+                    f"{get_commands / iterations:>9.2f}"
+                )
+
+            self.stdout.write(
+                f"all services once: {totals['new'] / iterations / 1000:.2f} ms built, "
+                f"{totals['registry'] / iterations / 1000:.4f} ms from the registry"
+            )
+        finally:
+            db_manager.current_client, db_manager.current_db = previous
+            if not options['keep']:
+                client.drop_database(options['database'])
+            client.close()
+
+    def _measure(self, fn, iterations, counter):
+        """Per-call times in microseconds, plus the MongoDB commands issued"""
+        times = []
+        before = counter.count
+        for _ in range(iterations):
+            began = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - began) * 1e6)
+        return times, counter.count - before
@@ -0,0 +1,112 @@
+from django.core.management.base import BaseCommand
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+
+from app.management.commands.benchmark_checkout import percentile
+
+# Directory holding manage.py; workers import the project from here
+BACKEND_DIR = Path(__file__).resolve().parents[3]
+
+# mode -> MONGODB_CONNECT_ON_STARTUP
+MODES = {'eager': 'True', 'lazy': 'False'}
+
+# Runs in a fresh interpreter: load the WSGI module the way the server does
+# (including service warm-up), then serve each path once through it
+WORKER_SCRIPT = r'''
+import io, json, os, sys, time
+started = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+from posbackend.wsgi import application
+booted = time.perf_counter()
+
+from app.database import db_manager
+connected_at_boot = db_manager.current_client is not None
+
+timings = []
+for path in json.loads(sys.argv[1]):
+    environ = {'PATH_INFO': path, 'HTTP_HOST': 'localhost', 'wsgi.input': io.BytesIO()}
+    setup_testing_defaults(environ)
+    statuses = []
+    began = time.perf_counter()
+    b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    timings.append({'path': path, 'status': statuses[0].split()[0], 'ms': (time.perf_counter() - began) * 1000})
+
+print(json.dumps({
+    'boot_ms': (booted - started) * 1000,
+    'first_request_ms': (time.perf_counter() - booted) * 1000,
+    'connected_at_boot': connected_at_boot,
+    'requests': timings,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure worker boot and first-request time with lazy vs eager MongoDB connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Worker processes started per mode')
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Path served after boot, in order (repeatable; default /api/v1/health/)',
+        )
+        parser.add_argument(
+            '--mode',
+            action='append',
+            dest='modes',
+            choices=list(MODES),
+            help='Connection mode to measure (repeatable; default both)',
+        )
+        parser.add_argument(
+            '--settings-module',
+            default=os.environ.get('DJANGO_SETTINGS_MODULE', 'settings.local'),
+            help='DJANGO_SETTINGS_MODULE for the worker processes',
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/api/v1/health/']
+        self.stdout.write(f"runs per mode: {options['runs']}  paths: {' '.join(paths)}")
+        self.stdout.write(
+            f"{'mode':<6} {'boot p50':>9} {'boot p95':>9} {'first p50':>10} {'first p95':>10} "
+            f"{'total p50':>10} {'connected':>10}"
+        )
+
+        for mode in options['modes'] or list(MODES):
+            connect_on_startup = MODES[mode]
+            results = [
+                self._start_worker(paths, options['settings_module'], connect_on_startup)
+                for _ in range(options['runs'])
+            ]
+            boot = [result['boot_ms'] for result in results]
+            first = [result['first_request_ms'] for result in results]
+            total = [result['boot_ms'] + result['first_request_ms'] for result in results]
+            connected = sum(1 for result in results if result['connected_at_boot'])
+            self.stdout.write(
+                f"{mode:<6} {percentile(boot, 50):>9.1f} {percentile(boot, 95):>9.1f} "
+                f"{percentile(first, 50):>10.1f} {percentile(first, 95):>10.1f} "
+                f"{percentile(total, 50):>10.1f} {connected:>6}/{len(results):<3}"
+            )
+            for request in results[-1]['requests']:
+                self.stdout.write(f"       {request['path']} -> {request['status']} in {request['ms']:.1f} ms (last run)")
+
+    def _start_worker(self, paths, settings_module, connect_on_startup):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=settings_module,
+            MONGODB_CONNECT_ON_STARTUP=connect_on_startup,
+        )
+        completed = subprocess.run(
+            [sys.executable, '-c', WORKER_SCRIPT, json.dumps(paths)],
+            cwd=str(BACKEND_DIR),
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Worker failed to start:\n{completed.stderr[-2000:]}")
+        # Apps may print while booting; the timings are the last line
+        return json.loads(completed.stdout.strip().splitlines()[-1])
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from datetime import date, timedelta
+from app.services.sales_rollup_service import sales_rollup_service, local_today
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Compare sales_rollups day totals with the raw sales collections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First local date to check (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last local date to check (YYYY-MM-DD, default: today)')
+        parser.add_argument('--days', type=int, default=7, help='Days to check when --start is omitted')
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild every day that disagrees',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            end_day = date.fromisoformat(options['end']) if options['end'] else local_today()
+            start_day = (
+                date.fromisoformat(options['start']) if options['start']
+                else end_day - timedelta(days=options['days'] - 1)
+            )
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        mismatches = sales_rollup_service.find_inconsistencies(start_day, end_day)
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(f'sales_rollups match the raw sales for {start_day} .. {end_day}'))
+            return
+
+        for mismatch in mismatches:
+            expected, actual = mismatch['expected'], mismatch['actual']
+            self.stdout.write(self.style.WARNING(
+                f"{mismatch['date']} {mismatch['collection']}: "
+                f"count {actual['count']} (expected {expected['count']}), "
+                f"revenue {actual['revenue']:.2f} (expected {expected['revenue']:.2f})"
+            ))
+
+        if options['fix']:
+            days = sorted({date.fromisoformat(mismatch['date']) for mismatch in mismatches})
+            for day in days:
+                sales_rollup_service.rebuild(day, day)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {len(days)} days'))
+        else:
+            logger.warning(f'{len(mismatches)} sales rollup mismatches between {start_day} and {end_day}')
+            self.stdout.write(self.style.ERROR(f'{len(mismatches)} mismatches; re-run with --fix to rebuild them'))
@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.database import db_manager
+from app.services.index_service import index_service, index_name
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Diff the index manifest against the database and create missing indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only show the differences',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Also rebuild indexes whose options changed and drop retired indexes',
+        )
+        parser.add_argument(
+            '--allow-drop',
+            action='append',
+            default=[],
+            metavar='COLLECTION.INDEX',
+            help='With --drop, also drop this undeclared index (repeatable); others are never dropped',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Explain the canonical query of each service and fail on any COLLSCAN',
+        )
+
+    def handle(self, *args, **options):
+        if options['allow_drop'] and not options['drop']:
+            raise CommandError('--allow-drop only applies together with --drop')
+        db = db_manager.get_database()
+        report = index_service.diff(db)
+
+        pending = 0
+        for collection_name, entry in report.items():
+            for spec in entry['missing']:
+                pending += 1
+                self.stdout.write(f"+ {collection_name}.{index_name(spec['keys'])} {spec['options'] or ''}")
+            for change in entry['changed']:
+                pending += 1
+                self.stdout.write(self.style.WARNING(
+                    f"~ {collection_name}.{change['live_name']} options {change['live_options']} "
+                    f"-> {change['spec']['options']}"
+                ))
+            for name in entry['extra']:
+                pending += 1
+                self.stdout.write(self.style.WARNING(f"- {collection_name}.{name} (not in manifest)"))
+
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('Indexes match the manifest'))
+        elif options['dry_run']:
+            self.stdout.write(f'{pending} differences; run without --dry-run to apply')
+        else:
+            actions = index_service.apply(db, report, drop=options['drop'], allow_drop=options['allow_drop'])
+            kept = [(collection_name, name) for action, collection_name, name in actions if action == 'kept']
+            for action, collection_name, name in actions:
+                if action != 'kept':
+                    self.stdout.write(f'{action} {collection_name}.{name}')
+            self.stdout.write(self.style.SUCCESS(f'{len(actions) - len(kept)} index changes applied'))
+            if not options['drop'] and any(entry['changed'] or entry['extra'] for entry in report.values()):
+                self.stdout.write('Changed and undeclared indexes were left alone; re-run with --drop to reconcile them')
+            for collection_name, name in kept:
+                self.stdout.write(self.style.WARNING(
+                    f'kept {collection_name}.{name}: not in the manifest; pass --allow-drop {collection_name}.{name} to drop it'
+                ))
+
+        if options['verify']:
+            self._verify(db)
+
+    def _verify(self, db):
+        results = index_service.verify(db)
+        failures = errors = 0
+        for result in results:
+            if result['error']:
+                errors += 1
+                self.stdout.write(self.style.ERROR(f"! {result['name']} ({result['collection']}): {result['error']}"))
+            elif result['collscan']:
+                failures += 1
+                self.stdout.write(self.style.ERROR(
+                    f"COLLSCAN {result['name']} ({result['collection']}): {' > '.join(result['stages'])}"
+                ))
+            else:
+                self.stdout.write(f"ok {result['name']} ({result['collection']}): {' > '.join(result['stages'])}")
+
+        if failures or errors:
+            logger.warning(f'Index verification: {failures} collection scans, {errors} queries could not be explained')
+            raise CommandError(
+                f'{failures} of {len(results)} canonical queries scan a collection, {errors} could not be explained'
+            )
+        self.stdout.write(self.style.SUCCESS(f'All {len(results)} canonical queries use an index'))
@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from app.services.promotions_service import PromotionService
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Move embedded promotion usage_history arrays into the promotion_usage collection (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Run migration without saving changes (preview only)',
+        )
+        parser.add_argument(
+            '--keep-arrays',
+            action='store_true',
+            help='Copy the entries but leave usage_history on the promotions',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Usage entries written per bulk_write',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        try:
+            promotion_service = PromotionService()
+            promotions_collection = promotion_service.collection
+            usage_collection = promotion_service.usage_collection
+
+            promotions = promotions_collection.find(
+                {'usage_history.0': {'$exists': True}},
+                {'promotion_id': 1, 'usage_history': 1}
+            )
+
+            migrated_promotions = 0
+            migrated_entries = 0
+
+            for promotion in promotions:
+                promotion_id = promotion.get('promotion_id', promotion['_id'])
+                usage_history = promotion.get('usage_history', [])
+
+                # legacy_index makes the copy idempotent if the command is re-run
+                operations = [
+                    UpdateOne(
+                        {'promotion_id': promotion_id, 'legacy_index': index},
+                        {'$setOnInsert': {
+                            'promotion_id': promotion_id,
+                            'customer_id': entry.get('customer_id'),
+                            'discount_amount': entry.get('discount_amount', 0),
+                            'order_summary': entry.get('order_summary', {}),
+                            'used_at': entry.get('used_at'),
+                            'legacy_index': index
+                        }},
+                        upsert=True
+                    )
+                    for index, entry in enumerate(usage_history)
+                ]
+
+                if not dry_run:
+                    for start in range(0, len(operations), batch_size):
+                        usage_collection.bulk_write(operations[start:start + batch_size], ordered=False)
+
+                    if not options['keep_arrays']:
+                        promotions_collection.update_one(
+                            {'_id': promotion['_id']},
+                            {'$unset': {'usage_history': ''}}
+                        )
+
+                migrated_promotions += 1
+                migrated_entries += len(usage_history)
+                self.stdout.write(f'{promotion_id}: {len(usage_history)} usage entries')
+
+            # Summary
+            self.stdout.write(self.style.SUCCESS('\n=== Migration Summary ==='))
+            if dry_run:
+                self.stdout.write(self.style.WARNING(
+                    f'Would migrate: {migrated_entries} entries from {migrated_promotions} promotions'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Migrated: {migrated_entries} entries from {migrated_promotions} promotions'
+                ))
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Migration failed: {str(e)}'))
+            logger.error(f'Migration error: {str(e)}', exc_info=True)
+            raise
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from app.services.outbox_service import outbox_service
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox side-effects (notifications, audit logs, loyalty, order history)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain everything that is due right now and exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Entries claimed per batch',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty (ignored with --once)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        delivered = 0
+
+        try:
+            while True:
+                processed = outbox_service.drain_once(batch_size)
+                delivered += processed
+
+                if not processed:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Outbox processing failed: {str(e)}'))
+            logger.error(f'Outbox processing error: {str(e)}', exc_info=True)
+            raise
+
+        metrics = outbox_service.get_metrics()
+        self.stdout.write(f"Handled {delivered} entries; queue depth: {metrics['queue_depth']}")
+        self.stdout.write(self.style.SUCCESS('Outbox processing complete'))
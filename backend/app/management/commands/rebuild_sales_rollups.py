@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from datetime import date, timedelta
+from app.database import db_manager
+from app.services.sales_rollup_service import sales_rollup_service, ROLLUP_COLLECTIONS, utc_to_local, local_today
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Recompute sales_rollups (and product_sales_daily) from sales, sales_log and online_transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First local date to rebuild (YYYY-MM-DD, default: earliest sale)')
+        parser.add_argument('--end', help='Last local date to rebuild (YYYY-MM-DD, default: today)')
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='Days recomputed per pass, keeps each aggregation small',
+        )
+        parser.add_argument(
+            '--products',
+            action='store_true',
+            help='Also rebuild product_sales_daily even if PRODUCT_SALES_COUNTERS is off',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count the rollup documents without writing them',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        try:
+            start_day = self._parse(options['start']) if options['start'] else self._earliest_sale_day()
+            end_day = self._parse(options['end']) if options['end'] else local_today()
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        if start_day is None:
+            self.stdout.write('No sales to roll up')
+            return
+
+        written = 0
+        chunk_start = start_day
+        while chunk_start <= end_day:
+            chunk_end = min(chunk_start + timedelta(days=options['chunk_days'] - 1), end_day)
+            count = sales_rollup_service.rebuild(
+                chunk_start, chunk_end, dry_run=dry_run, products=options['products'] or None
+            )
+            written += count
+            self.stdout.write(f'{chunk_start} .. {chunk_end}: {count} rollup documents')
+            chunk_start = chunk_end + timedelta(days=1)
+
+        verb = 'Would write' if dry_run else 'Wrote'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {written} rollup documents for {start_day} .. {end_day}'))
+
+    def _parse(self, value):
+        return date.fromisoformat(value)
+
+    def _earliest_sale_day(self):
+        db = db_manager.get_database()
+        earliest = None
+        for collection_name in ROLLUP_COLLECTIONS:
+            first = db[collection_name].find_one(
+                {'transaction_date': {'$type': 'date'}},
+                {'transaction_date': 1},
+                sort=[('transaction_date', 1)]
+            )
+            if first and (earliest is None or first['transaction_date'] < earliest):
+                earliest = first['transaction_date']
+        return utc_to_local(earliest).date() if earliest else None
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from app.services.job_service import job_service
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (imports, exports, session cleanup) in this process'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run every job that is queued right now and exit',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when no job is queued (ignored with --once)',
+        )
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            default=None,
+            help='Also delete finished jobs and their files older than this many days',
+        )
+
+    def handle(self, *args, **options):
+        ran = 0
+
+        if options['purge_days'] is not None:
+            purged = job_service.purge_finished(options['purge_days'])
+            self.stdout.write(f"Purged {purged} finished jobs")
+
+        try:
+            while True:
+                if job_service.run_once():
+                    ran += 1
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Job processing failed: {str(e)}'))
+            logger.error(f'Job processing error: {str(e)}', exc_info=True)
+            raise
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs'))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from app.services.sequence_service import sequence_service, SEQUENCES
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Seed the counters collection from the highest IDs currently in use (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sequence',
+            action='append',
+            choices=sorted(SEQUENCES.keys()),
+            help='Only seed the given sequence (repeatable). Defaults to all sequences.',
+        )
+        parser.add_argument(
+            '--skip-batches',
+            action='store_true',
+            help='Do not seed the per-product batch counters',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the maxima that would be written without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        names = options['sequence'] or list(SEQUENCES.keys())
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        try:
+            for name in names:
+                if dry_run:
+                    current_max = sequence_service._scan_current_max(name)
+                else:
+                    current_max = sequence_service.seed_sequence(name)
+
+                next_id = sequence_service.format_id(name, current_max + 1)
+                self.stdout.write(f'{name:<22} max={current_max:<8} next={next_id}')
+
+            if not options['skip_batches'] and not dry_run:
+                seeded = sequence_service.seed_batch_sequences()
+                self.stdout.write(f'Seeded {len(seeded)} per-product batch counters')
+
+            self.stdout.write(self.style.SUCCESS('Counter seeding complete'))
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Counter seeding failed: {str(e)}'))
+            logger.error(f'Counter seeding error: {str(e)}', exc_info=True)
+            raise
@@ -1,6 +1,8 @@
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from .services.auth_services import AuthService
+from .services.metrics_service import metrics_service, METRICS_ENABLED
+from .services.query_guard_service import query_guard_service
 import json
 
 class JWTAuthenticationMiddleware(MiddlewareMixin):
@@ -69,6 +71,47 @@ class JWTAuthenticationMiddleware(MiddlewareMixin):
         
         return None
 
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """Record latency and MongoDB command usage per endpoint for /api/v1/metrics"""
+    
+    def process_request(self, request):
+        if METRICS_ENABLED:
+            request._metrics_scope = metrics_service.begin_request()
+        return None
+    
+    def process_response(self, request, response):
+        scope = getattr(request, '_metrics_scope', None)
+        if scope is None:
+            return response
+        
+        # Label by route pattern so /products/123/ and /products/456/ share a series
+        match = getattr(request, 'resolver_match', None)
+        endpoint = f"/{match.route}" if match and match.route else 'unmatched'
+        metrics_service.end_request(*scope, request.method, endpoint, response.status_code)
+        request._metrics_scope = None
+        return response
+
+class QueryGuardMiddleware(MiddlewareMixin):
+    """Flag N+1 query patterns and query budget overruns per request (QUERY_GUARD)"""
+    
+    def process_request(self, request):
+        if query_guard_service.enabled:
+            request._query_guard = query_guard_service.begin(f"{request.method} {request.path}")
+        return None
+    
+    def process_response(self, request, response):
+        guard = getattr(request, '_query_guard', None)
+        if guard is None:
+            return response
+        
+        request._query_guard = None
+        scope = guard[0]
+        response['X-Query-Count'] = str(scope.count)
+        if scope.declared is not None:
+            response['X-Query-Budget'] = str(scope.declared)
+        query_guard_service.end(*guard)
+        return response
+
 class RequestLoggingMiddleware(MiddlewareMixin):
     """Log all API requests for audit purposes"""
     
@@ -0,0 +1,115 @@
+# app/services/async_read_service.py
+"""
+Async (motor) versions of the read-heavy endpoints: notification polling,
+order status polling, the POS catalog and the product list.
+
+These endpoints are pure I/O and are polled by many clients at once; on
+uvicorn workers one process can keep hundreds of them waiting on MongoDB
+instead of one per WSGI thread. The queries come from
+app.services.query_builders, the same ones the sync services run, so both
+paths return the same documents.
+"""
+
+from ..async_database import async_db_manager
+from .query_builders import (
+    find_options,
+    notifications_query,
+    recent_notifications_query,
+    order_status_query,
+    categories_query,
+    subcategory_counts_pipeline,
+    products_query,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncReadService:
+    """Read-only service for the async endpoints"""
+
+    def __init__(self, manager=None):
+        self.manager = manager or async_db_manager
+
+    async def _find(self, collection_name, spec):
+        async def operation(db):
+            return await db[collection_name].find(**find_options(spec)).to_list(length=None)
+        return await self.manager.read(operation)
+
+    # ================================================================
+    # NOTIFICATIONS
+    # ================================================================
+
+    async def get_notifications(self, recipient_id=None, notification_type=None, is_read=None, limit=50, include_archived=False):
+        try:
+            spec = notifications_query(recipient_id, notification_type, is_read, limit, include_archived)
+            return self._format_notifications(await self._find('notifications', spec))
+        except Exception as e:
+            raise Exception(f"Error getting notifications: {str(e)}")
+
+    async def get_recent_notifications(self, limit=10, hours=None, include_archived=False):
+        try:
+            spec = recent_notifications_query(limit, hours, include_archived)
+            return self._format_notifications(await self._find('notifications', spec))
+        except Exception as e:
+            raise Exception(f"Error getting recent notifications: {str(e)}")
+
+    @staticmethod
+    def _format_notifications(notifications):
+        # Same shape as NotificationService._format_notifications
+        for notification in notifications:
+            notification['id'] = notification['_id']
+        return notifications
+
+    # ================================================================
+    # ONLINE ORDERS
+    # ================================================================
+
+    async def get_order_status(self, order_id):
+        """The status fields of an order, or None"""
+        try:
+            async def operation(db):
+                return await db.online_transactions.find_one(**find_options(order_status_query(order_id)))
+            return await self.manager.read(operation)
+        except Exception as e:
+            raise Exception(f"Error getting order status: {str(e)}")
+
+    # ================================================================
+    # CATALOG
+    # ================================================================
+
+    async def get_all_categories(self, include_deleted=False):
+        """
+        Categories with product counts on their subcategories, like
+        CategoryService.get_all_categories, but counted with one aggregation
+        instead of one count per subcategory.
+        """
+        try:
+            categories = await self._find('category', categories_query(include_deleted))
+            if not categories:
+                return categories
+
+            async def count(db):
+                pipeline = subcategory_counts_pipeline(category['_id'] for category in categories)
+                return await db.products.aggregate(pipeline).to_list(length=None)
+            counts = {
+                (row['_id'].get('category_id'), row['_id'].get('subcategory_name')): row['count']
+                for row in await self.manager.read(count)
+            }
+
+            for category in categories:
+                for subcategory in category.get('sub_categories', []):
+                    subcategory['product_count'] = counts.get((category['_id'], subcategory.get('name')), 0)
+            return categories
+        except Exception as e:
+            raise Exception(f"Error getting categories: {str(e)}")
+
+    async def get_all_products(self, filters=None, include_deleted=False):
+        try:
+            return await self._find('products', products_query(filters, include_deleted))
+        except Exception as e:
+            raise Exception(f"Error getting products: {str(e)}")
+
+
+# Singleton instance
+async_read_service = AsyncReadService()
@@ -6,6 +6,7 @@
 from datetime import datetime
 from bson import ObjectId
 from ..database import db_manager
+from .sequence_service import sequence_service
 import logging
 
 class AuditLogService:
@@ -16,38 +17,7 @@ class AuditLogService:
     def generate_audit_id(self):
         """Generate sequential AUD-###### ID (6 digits - high volume system logs)"""
         try:
-            # Use aggregation to find highest existing number
-            pipeline = [
-                {
-                    '$match': {
-                        '_id': {'$regex': '^AUD-\\d{6}$'}  # Changed from audit_id to _id
-                    }
-                },
-                {
-                    '$addFields': {
-                        'numeric_part': {
-                            '$toInt': {'$substr': ['$_id', 4, 6]}  # Changed from audit_id to _id
-                        }
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': None,
-                        'max_number': {'$max': '$numeric_part'}
-                    }
-                }
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            
-            if result and result[0]['max_number'] is not None:
-                next_number = result[0]['max_number'] + 1
-            else:
-                # Fallback to count-based approach
-                next_number = self.collection.count_documents({}) + 1
-            
-            return f"AUD-{next_number:06d}"
-            
+            return sequence_service.next_id('audit_logs')
         except Exception as e:
             logging.error(f"Error generating audit ID: {e}")
             # Emergency fallback using timestamp
@@ -59,44 +29,51 @@ class AuditLogService:
         # No conversion needed since _id is already a string
         return document
     
+    def _build_audit_document(self, audit_id, event_type, user_data, target_data=None, old_values=None, new_values=None, metadata=None):
+        """Shape a standardized audit log entry with AUD-###### as _id"""
+        audit_data = {
+            "_id": audit_id,  # AUD-###### as the MongoDB _id field
+            "event_type": event_type,
+            "user_id": user_data.get("user_id", user_data.get("username", "system")),  # USER-#### format
+            "username": user_data.get("username", user_data.get("email", "system")),
+            "branch_id": user_data.get("branch_id", 1),
+            "ip_address": user_data.get("ip_address"),
+            "user_agent": user_data.get("user_agent"),
+            "timestamp": datetime.utcnow(),
+            "status": "success",
+            "source": "audit_service",
+            "last_updated": datetime.utcnow()
+        }
+        
+        # Add target information if provided
+        if target_data:
+            audit_data.update({
+                "target_type": target_data.get("type"),
+                "target_id": target_data.get("id"),  # Will be proper format (PROD-#####, CUST-#####, etc.)
+                "target_name": target_data.get("name")
+            })
+        
+        # Add change information if provided
+        if old_values or new_values:
+            audit_data["changes"] = {
+                "old_values": old_values or {},
+                "new_values": new_values or {},
+                "changed_fields": list(new_values.keys()) if new_values else []
+            }
+        
+        # Add metadata if provided
+        if metadata:
+            audit_data["metadata"] = metadata
+        
+        return audit_data
+
     def _create_audit_log(self, event_type, user_data, target_data=None, old_values=None, new_values=None, metadata=None):
         """Create a standardized audit log entry with sequential AUD-###### as _id"""
         try:
             audit_id = self.generate_audit_id()
-            
-            audit_data = {
-                "_id": audit_id,  # AUD-###### as the MongoDB _id field
-                "event_type": event_type,
-                "user_id": user_data.get("user_id", user_data.get("username", "system")),  # USER-#### format
-                "username": user_data.get("username", user_data.get("email", "system")),
-                "branch_id": user_data.get("branch_id", 1),
-                "ip_address": user_data.get("ip_address"),
-                "user_agent": user_data.get("user_agent"),
-                "timestamp": datetime.utcnow(),
-                "status": "success",
-                "source": "audit_service",
-                "last_updated": datetime.utcnow()
-            }
-            
-            # Add target information if provided
-            if target_data:
-                audit_data.update({
-                    "target_type": target_data.get("type"),
-                    "target_id": target_data.get("id"),  # Will be proper format (PROD-#####, CUST-#####, etc.)
-                    "target_name": target_data.get("name")
-                })
-            
-            # Add change information if provided
-            if old_values or new_values:
-                audit_data["changes"] = {
-                    "old_values": old_values or {},
-                    "new_values": new_values or {},
-                    "changed_fields": list(new_values.keys()) if new_values else []
-                }
-            
-            # Add metadata if provided
-            if metadata:
-                audit_data["metadata"] = metadata
+            audit_data = self._build_audit_document(
+                audit_id, event_type, user_data, target_data, old_values, new_values, metadata
+            )
             
             result = self.collection.insert_one(audit_data)
             return {"_id": audit_id}  # Return the generated AUD-###### ID
@@ -104,6 +81,27 @@ class AuditLogService:
         except Exception as e:
             raise Exception(f"Error creating audit log: {str(e)}")
 
+    def create_audit_logs_bulk(self, entries):
+        """
+        Insert many audit entries with one ID block reservation and one insert_many.
+        `entries` is a list of _create_audit_log keyword dicts.
+        """
+        try:
+            if not entries:
+                return []
+            
+            audit_ids = sequence_service.reserve_block('audit_logs', len(entries))
+            audit_docs = [
+                self._build_audit_document(audit_id, **entry)
+                for audit_id, entry in zip(audit_ids, entries)
+            ]
+            
+            self.collection.insert_many(audit_docs, ordered=False)
+            return [{"_id": audit_id} for audit_id in audit_ids]
+            
+        except Exception as e:
+            raise Exception(f"Error creating audit logs: {str(e)}")
+
     # ========================================
     # CORE BUSINESS ENTITIES - HIGH FREQUENCY
     # ========================================
@@ -617,7 +615,7 @@ class AuditLogService:
                 'success': True,
                 'total_logs': total_logs,
                 'by_event_type': stats,
-                'total_audit_id': self.generate_audit_id()  # Shows next ID
+                'total_audit_id': sequence_service.peek_next_id('audit_logs')  # Shows next ID
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -697,7 +695,7 @@ class AuditLogService:
                 'success': True,
                 'total_logs': total_logs,
                 'by_event_type': stats,
-                'next_audit_id': self.generate_audit_id()  # Shows what the next ID would be
+                'next_audit_id': sequence_service.peek_next_id('audit_logs')  # Shows what the next ID would be
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
\ No newline at end of file
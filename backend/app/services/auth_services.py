@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-import bcrypt
 from ..database import db_manager
+from .service_registry import service_registry
+from .token_cache_service import token_cache_service
+from .password_service import password_service, PasswordServiceBusy
 
 # JWT settings
 SECRET_KEY = "your-secret-key-here-change-in-production"
@@ -23,9 +25,11 @@ class AuthService:
         print(f"🔐 Hash starts with: {hashed[:10] if hashed else 'None'}...")
         
         try:
-            result = bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+            result = password_service.verify(password, hashed)
             print(f"🔐 bcrypt.checkpw result: {result}")
             return result
+        except PasswordServiceBusy:
+            raise
         except Exception as e:
             print(f"❌ Password verification exception: {e}")
             return False
@@ -51,15 +55,21 @@ class AuthService:
         return encoded_jwt
     
     def verify_token(self, token: str):
-        """Verify JWT token"""
+        """Verify JWT token (answered from the per-process token cache when possible)"""
         try:
-            if self.blacklist_collection.find_one({"token": token}):
+            token_hash = token_cache_service.token_hash(token)
+            if token_cache_service.is_blacklisted(token_hash):
                 return None
             
+            payload = token_cache_service.get_payload(token_hash)
+            if payload is not None:
+                return payload
+            
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             user_id = payload.get("sub")
             if user_id is None:
                 return None
+            token_cache_service.put_payload(token_hash, payload)
             return payload
         except JWTError:
             return None
@@ -86,7 +96,7 @@ class AuthService:
             
             # Password verification
             print(f"🔐 Starting password verification...")
-            password_valid = self.verify_password(password, user["password"])
+            password_valid, new_hash = password_service.verify_and_rehash(password, user["password"])
             print(f"🔐 Password verification result: {password_valid}")
             
             if not password_valid:
@@ -112,9 +122,13 @@ class AuthService:
             
             # Update last login
             print(f"⏰ Updating last login timestamp...")
+            login_update = {"last_login": datetime.utcnow()}
+            if new_hash:
+                print(f"🔐 Upgrading password hash to the configured bcrypt cost")
+                login_update["password"] = new_hash
             update_result = self.user_collection.update_one(
                 {"_id": user["_id"]},
-                {"$set": {"last_login": datetime.utcnow()}}
+                {"$set": login_update}
             )
             print(f"⏰ Last login update result - matched: {update_result.matched_count}, modified: {update_result.modified_count}")
             
@@ -143,7 +157,7 @@ class AuthService:
             print(f"📝 Starting session logging...")
             try:
                 from .session_services import SessionLogService
-                session_service = SessionLogService()
+                session_service = service_registry.get(SessionLogService)
                 session_user = {
                     "user_id": user_id,  # Pass the USER-#### ID
                     "username": user.get("username", user["email"]),
@@ -192,7 +206,7 @@ class AuthService:
                     # Log session logout
                     try:
                         from .session_services import SessionLogService
-                        session_service = SessionLogService()
+                        session_service = service_registry.get(SessionLogService)
                         session_service.log_logout(user_id)
                     except Exception as session_error:
                         print(f"Session logout failed: {session_error}")
@@ -200,11 +214,13 @@ class AuthService:
             except Exception as user_error:
                 print(f"Could not get current user: {user_error}")
             
-            # Blacklist token
-            self.blacklist_collection.insert_one({
-                "token": clean_token,
-                "blacklisted_at": datetime.utcnow()
-            })
+            # Blacklist token; the entry can be dropped once the token expires
+            try:
+                exp = jwt.get_unverified_claims(clean_token).get("exp")
+                expires_at = datetime.utcfromtimestamp(exp) if exp else None
+            except (JWTError, TypeError, ValueError):
+                expires_at = None
+            token_cache_service.revoke(clean_token, expires_at)
             
             return {"message": "Successfully logged out"}
         except Exception as e:
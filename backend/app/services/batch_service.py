@@ -1,10 +1,17 @@
 from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
 from ..database import db_manager
+from .sequence_service import sequence_service, BATCH_SEQUENCE_PREFIX
 from notifications.services import notification_service
 import logging
 
 logger = logging.getLogger(__name__)
 
+# A cart deduction that loses a race with a concurrent sale is rolled back and
+# reallocated from fresh batch quantities at most this many times
+FIFO_MAX_ATTEMPTS = 3
+
 class BatchService:
     def __init__(self):
         self.db = db_manager.get_database()
@@ -85,48 +92,9 @@ class BatchService:
             logger.error(f"Failed to send batch notification: {e}")
 
     def generate_batch_id(self, product_id):
-        """Generate unique batch ID for a product"""
+        """Generate unique batch ID for a product (BATCH-00001-001 format)"""
         try:
-            # Format: BATCH-PROD00001-001
-            product_suffix = product_id.replace('PROD-', '')
-            base_pattern = f"BATCH-{product_suffix}-"
-            
-            # Find all existing batch IDs for this product
-            existing_batches = self.batch_collection.find(
-                {'product_id': product_id},
-                {'_id': 1}
-            )
-            
-            # Extract sequence numbers from existing batch IDs
-            max_sequence = 0
-            for batch in existing_batches:
-                batch_id = batch.get('_id', '')
-                if batch_id.startswith(base_pattern):
-                    try:
-                        # Extract the sequence number (last part after final dash)
-                        sequence_str = batch_id.split('-')[-1]
-                        sequence_num = int(sequence_str)
-                        max_sequence = max(max_sequence, sequence_num)
-                    except (ValueError, IndexError):
-                        continue
-            
-            # Generate next sequence number
-            next_sequence = max_sequence + 1
-            batch_id = f"{base_pattern}{next_sequence:03d}"
-            
-            # Double-check uniqueness (safety check)
-            counter = 0
-            while self.batch_collection.find_one({'_id': batch_id}) and counter < 1000:
-                next_sequence += 1
-                batch_id = f"{base_pattern}{next_sequence:03d}"
-                counter += 1
-            
-            if counter >= 1000:
-                # If somehow we can't find a unique ID after 1000 tries, use timestamp
-                raise Exception("Could not generate unique batch ID")
-            
-            return batch_id
-        
+            return sequence_service.next_id(f"{BATCH_SEQUENCE_PREFIX}{product_id}")
         except Exception as e:
             # Fallback to timestamp-based ID
             logger.warning(f"Failed to generate sequential batch ID: {e}, using timestamp fallback")
@@ -711,99 +679,250 @@ class BatchService:
     def process_sale_fifo(self, product_id, quantity_sold):
         """Process a sale using FIFO (First In, First Out) logic"""
         try:
-            # Get active batches sorted by expiry date (FIFO)
-            active_batches = list(self.batch_collection.find({
-                'product_id': product_id,
+            allocations = self.process_cart_fifo([{'product_id': product_id, 'quantity': quantity_sold}])
+            return allocations[product_id]
+        
+        except Exception as e:
+            raise Exception(f"Error processing FIFO sale: {str(e)}")
+
+    def process_cart_fifo(self, items, adjustment_type="sale", adjusted_by=None, notes="POS sale transaction"):
+        """
+        Deduct a whole cart from batches using FIFO in a fixed number of round-trips.
+        
+        Active batches for every product are loaded with one query, the
+        allocation is computed in memory, and the result is written with one
+        bulk_write to `batches` and one to `products`. Nothing is written if
+        any product cannot be fulfilled.
+        
+        Each batch update is guarded on the exact remaining quantity it was
+        allocated from, so the status and remaining_after it writes are
+        correct. If a concurrent sale changed a batch first, the updates that
+        did apply are rolled back and the cart is reallocated from fresh
+        quantities, up to FIFO_MAX_ATTEMPTS times.
+        
+        Returns {product_id: [batch usage, ...]} in cart order.
+        """
+        quantities = {}
+        for item in items:
+            quantity = int(item['quantity'])
+            if quantity <= 0:
+                raise ValueError(f"Quantity for product {item['product_id']} must be greater than 0")
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + quantity
+        
+        if not quantities:
+            return {}
+        
+        for attempt in range(1, FIFO_MAX_ATTEMPTS + 1):
+            batches_by_product, allocations = self._allocate_cart_fifo(quantities)
+            
+            # Step 3: one bulk_write for batches, one for product summaries
+            current_time = datetime.utcnow()
+            deduction_id = str(ObjectId())
+            batch_operations = []
+            product_operations = []
+            depleted = []
+            result = {}
+            
+            for product_id, product_allocations in allocations.items():
+                result[product_id] = []
+                
+                for batch, quantity_from_batch in product_allocations:
+                    new_quantity = batch['quantity_remaining'] - quantity_from_batch
+                    new_status = 'depleted' if new_quantity == 0 else 'active'
+                    
+                    batch_operations.append(UpdateOne(
+                        # Only the snapshot new_quantity/new_status were computed from;
+                        # a concurrent sale changing the batch sends us to a retry
+                        {'_id': batch['_id'], 'quantity_remaining': batch['quantity_remaining']},
+                        {
+                            '$inc': {'quantity_remaining': -quantity_from_batch},
+                            '$set': {'status': new_status, 'updated_at': current_time},
+                            '$push': {'usage_history': {
+                                'timestamp': current_time,
+                                'quantity_used': quantity_from_batch,
+                                'remaining_after': new_quantity,
+                                'adjustment_type': adjustment_type,
+                                'adjusted_by': adjusted_by,
+                                'approved_by': None,
+                                'notes': notes,
+                                'source': 'pos_sale' if adjustment_type == 'sale' else 'manual_adjustment',
+                                'deduction_id': deduction_id
+                            }}
+                        }
+                    ))
+                    
+                    if new_status == 'depleted':
+                        depleted.append(batch)
+                    
+                    result[product_id].append({
+                        'batch_id': batch['_id'],
+                        'batch_number': batch['batch_number'],
+                        'quantity_used': quantity_from_batch,
+                        'remaining_in_batch': new_quantity,
+                        'cost_price': batch['cost_price'],
+                        'expiry_date': batch['expiry_date']
+                    })
+                
+                product_operations.append(UpdateOne(
+                    {'_id': product_id},
+                    self._incremental_summary_update(
+                        batches_by_product[product_id], product_allocations, quantities[product_id], current_time
+                    )
+                ))
+            
+            write_result = self.batch_collection.bulk_write(batch_operations, ordered=False)
+            if write_result.matched_count == len(batch_operations):
+                break
+            
+            logger.warning(
+                f"FIFO deduction attempt {attempt}: {len(batch_operations) - write_result.matched_count} "
+                f"batch updates lost a race with a concurrent sale; rolling back and reallocating"
+            )
+            self._rollback_cart_fifo(deduction_id, allocations)
+        else:
+            raise Exception(
+                f"Could not deduct the cart from batches after {FIFO_MAX_ATTEMPTS} attempts; "
+                f"stock is changing concurrently"
+            )
+        
+        self.product_collection.bulk_write(product_operations, ordered=False)
+        
+        if depleted:
+            self._notify_depleted_batches(depleted)
+        
+        return result
+
+    def _allocate_cart_fifo(self, quantities):
+        """Load active batches for the cart and allocate FIFO in memory; raises if any product falls short"""
+        # Step 1: every active batch for every product in the cart, FIFO order
+        batches_by_product = {product_id: [] for product_id in quantities}
+        cursor = self.batch_collection.find(
+            {
+                'product_id': {'$in': list(quantities.keys())},
                 'status': 'active',
                 'quantity_remaining': {'$gt': 0}
-            }).sort('expiry_date', 1))
-            
-            if not active_batches:
+            },
+            {'product_id': 1, 'batch_number': 1, 'quantity_remaining': 1, 'cost_price': 1, 'expiry_date': 1}
+        ).sort([('product_id', 1), ('expiry_date', 1)])
+        for batch in cursor:
+            batches_by_product[batch['product_id']].append(batch)
+        
+        # Step 2: allocate in memory; fail before writing anything
+        allocations = {}
+        for product_id, quantity in quantities.items():
+            batches = batches_by_product[product_id]
+            if not batches:
                 raise Exception(f"No active batches available for product {product_id}")
             
-            remaining_to_sell = quantity_sold
-            batches_used = []
-            
-            for batch in active_batches:
-                if remaining_to_sell <= 0:
+            remaining_to_allocate = quantity
+            allocations[product_id] = []
+            for batch in batches:
+                if remaining_to_allocate <= 0:
                     break
-                
-                quantity_from_batch = min(remaining_to_sell, batch['quantity_remaining'])
-                
-                # Update batch quantity with SALE type (NO reason parameter)
-                self.update_batch_quantity(
-                    batch['_id'], 
-                    quantity_from_batch,
-                    adjustment_type="sale",
-                    adjusted_by=None,
-                    notes="POS sale transaction"
-                )
-                
-                batches_used.append({
-                    'batch_id': batch['_id'],
-                    'batch_number': batch['batch_number'],
-                    'quantity_used': quantity_from_batch,
-                    'cost_price': batch['cost_price'],
-                    'expiry_date': batch['expiry_date']
-                })
-                
-                remaining_to_sell -= quantity_from_batch
-            
-            if remaining_to_sell > 0:
-                raise Exception(f"Insufficient stock: {remaining_to_sell} units could not be fulfilled")
+                quantity_from_batch = min(remaining_to_allocate, batch['quantity_remaining'])
+                allocations[product_id].append((batch, quantity_from_batch))
+                remaining_to_allocate -= quantity_from_batch
             
-            return batches_used
+            if remaining_to_allocate > 0:
+                raise Exception(f"Insufficient stock for product {product_id}: {remaining_to_allocate} units could not be fulfilled")
         
-        except Exception as e:
-            raise Exception(f"Error processing FIFO sale: {str(e)}")
+        return batches_by_product, allocations
+
+    def _rollback_cart_fifo(self, deduction_id, allocations):
+        """Undo the batch updates of one deduction attempt; only batches carrying its usage entry match"""
+        rollback = [
+            UpdateOne(
+                {'_id': batch['_id'], 'usage_history.deduction_id': deduction_id},
+                {
+                    '$inc': {'quantity_remaining': quantity_from_batch},
+                    '$set': {'status': 'active'},
+                    '$pull': {'usage_history': {'deduction_id': deduction_id}}
+                }
+            )
+            for product_allocations in allocations.values()
+            for batch, quantity_from_batch in product_allocations
+        ]
+        self.batch_collection.bulk_write(rollback, ordered=False)
+
+    def _incremental_summary_update(self, batches, product_allocations, quantity, current_time):
+        """
+        Build the product summary update from the batches already in memory.
+        Stock totals move by $inc; expiry/cost fields only change when the
+        allocation emptied a batch at the head of the FIFO queue.
+        """
+        update = {
+            '$inc': {'stock': -quantity, 'total_stock': -quantity},
+            '$set': {'updated_at': current_time}
+        }
+        
+        used = {batch['_id']: quantity_from_batch for batch, quantity_from_batch in product_allocations}
+        remaining_batches = [
+            batch for batch in batches
+            if batch['quantity_remaining'] - used.get(batch['_id'], 0) > 0
+        ]
+        
+        if len(remaining_batches) == len(batches):
+            return update
+        
+        expiry_dates = [batch['expiry_date'] for batch in remaining_batches if batch.get('expiry_date')]
+        if expiry_dates:
+            warning_date = datetime.utcnow() + timedelta(days=30)
+            update['$set'].update({
+                'oldest_batch_expiry': min(expiry_dates),
+                'newest_batch_expiry': max(expiry_dates),
+                'expiry_alert': any(exp_date <= warning_date for exp_date in expiry_dates)
+            })
+        else:
+            update['$set'].update({
+                'oldest_batch_expiry': None,
+                'newest_batch_expiry': None,
+                'expiry_alert': False
+            })
+        
+        # Cost price follows the oldest remaining batch (FIFO)
+        update['$set']['cost_price'] = remaining_batches[0].get('cost_price', 0) if remaining_batches else 0
+        return update
+
+    def _notify_depleted_batches(self, depleted_batches):
+        """Send batch_depleted notifications with one product-name lookup"""
+        product_ids = list({batch['product_id'] for batch in depleted_batches})
+        names = {
+            product['_id']: product.get('product_name', 'Unknown Product')
+            for product in self.product_collection.find({'_id': {'$in': product_ids}}, {'product_name': 1})
+        }
+        
+        for batch in depleted_batches:
+            self._send_batch_notification(
+                'batch_depleted',
+                names.get(batch['product_id'], 'Unknown Product'),
+                {
+                    'batch_id': batch['_id'],
+                    'batch_number': batch['batch_number']
+                }
+            )
 
     def process_batch_adjustment(self, product_id, quantity_used, adjustment_type, adjusted_by=None, notes=None):
         """Process a batch adjustment using FIFO logic"""
         try:
             logger.info(f"Processing batch adjustment for product {product_id}: {quantity_used} units, type: {adjustment_type}")
             
-            # Get active batches sorted by expiry date (FIFO)
-            active_batches = list(self.batch_collection.find({
-                'product_id': product_id,
-                'status': 'active',
-                'quantity_remaining': {'$gt': 0}
-            }).sort('expiry_date', 1))
-            
-            if not active_batches:
-                raise Exception(f"No active batches available for product {product_id}")
-            
-            remaining_to_adjust = quantity_used
-            batches_adjusted = []
+            allocations = self.process_cart_fifo(
+                [{'product_id': product_id, 'quantity': quantity_used}],
+                adjustment_type=adjustment_type,
+                adjusted_by=adjusted_by,
+                notes=notes
+            )
             
-            for batch in active_batches:
-                if remaining_to_adjust <= 0:
-                    break
-                
-                quantity_from_batch = min(remaining_to_adjust, batch['quantity_remaining'])
-                
-                logger.info(f"Adjusting batch {batch['_id']}: {quantity_from_batch} units")
-                
-                # Update batch quantity with the specified adjustment type
-                self.update_batch_quantity(
-                    batch['_id'], 
-                    quantity_from_batch,
-                    adjustment_type=adjustment_type,
-                    adjusted_by=adjusted_by,
-                    notes=notes
-                )
-                
-                batches_adjusted.append({
-                    'batch_id': batch['_id'],
-                    'batch_number': batch['batch_number'],
-                    'quantity_adjusted': quantity_from_batch,
+            batches_adjusted = [
+                {
+                    'batch_id': usage['batch_id'],
+                    'batch_number': usage['batch_number'],
+                    'quantity_adjusted': usage['quantity_used'],
                     'adjustment_type': adjustment_type,
-                    'remaining_in_batch': batch['quantity_remaining'] - quantity_from_batch
-                })
-                
-                remaining_to_adjust -= quantity_from_batch
-            
-            if remaining_to_adjust > 0:
-                raise Exception(f"Insufficient stock: {remaining_to_adjust} units could not be adjusted")
+                    'remaining_in_batch': usage['remaining_in_batch']
+                }
+                for usage in allocations[product_id]
+            ]
             
             logger.info(f"Successfully adjusted {quantity_used} units across {len(batches_adjusted)} batches")
             
@@ -1,5 +1,6 @@
 from datetime import datetime
 from ..database import db_manager
+from .sequence_service import sequence_service
 from ..models import Category
 import logging
 import re
@@ -15,7 +16,6 @@ class CategoryService:
         self.collection = self.db.category
         self.product_collection = self.db.products  
         self.audit_service = AuditLogService()
-        self._ensure_indexes()
         self.ensure_uncategorized_category_exists()
 
     # ================================================================
@@ -75,38 +75,7 @@ class CategoryService:
     def generate_category_id(self):
         """Generate sequential CTGY-### ID"""
         try:
-            # Use aggregation to find highest existing number
-            pipeline = [
-                {
-                    '$match': {
-                        '_id': {'$regex': '^CTGY-\\d{3}$'}
-                    }
-                },
-                {
-                    '$addFields': {
-                        'numeric_part': {
-                            '$toInt': {'$substr': ['$_id', 5, 3]}
-                        }
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': None,
-                        'max_number': {'$max': '$numeric_part'}
-                    }
-                }
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            
-            if result and result[0]['max_number'] is not None:
-                next_number = result[0]['max_number'] + 1
-            else:
-                # Fallback to count-based approach
-                next_number = self.collection.count_documents({}) + 1
-            
-            return f"CTGY-{next_number:03d}"
-            
+            return sequence_service.next_id('category')
         except Exception as e:
             logger.error(f"Error generating category ID: {e}")
             # Emergency fallback
@@ -117,38 +86,7 @@ class CategoryService:
     def generate_subcategory_id(self):
         """Generate sequential SUBCAT-##### ID"""
         try:
-            # Use aggregation to find highest existing number across all categories
-            pipeline = [
-                {"$unwind": "$sub_categories"},
-                {
-                    '$match': {
-                        'sub_categories.subcategory_id': {'$regex': '^SUBCAT-\\d{5}$'}
-                    }
-                },
-                {
-                    '$addFields': {
-                        'numeric_part': {
-                            '$toInt': {'$substr': ['$sub_categories.subcategory_id', 7, 5]}
-                        }
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': None,
-                        'max_number': {'$max': '$numeric_part'}
-                    }
-                }
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            
-            if result and result[0]['max_number'] is not None:
-                next_number = result[0]['max_number'] + 1
-            else:
-                next_number = 1
-            
-            return f"SUBCAT-{next_number:05d}"
-            
+            return sequence_service.next_id('subcategory')
         except Exception as e:
             logger.error(f"Error generating subcategory ID: {e}")
             # Emergency fallback
@@ -156,33 +94,6 @@ class CategoryService:
             fallback_number = int(time.time()) % 100000
             return f"SUBCAT-{fallback_number:05d}"
 
-    def _ensure_indexes(self):
-        """Create indexes for efficient queries"""
-        try:
-            indexes = [
-                [("_id", 1), ("isDeleted", 1)],
-                [("category_name", 1), ("isDeleted", 1)],
-                [("status", 1), ("isDeleted", 1)],
-                [("sub_categories.name", 1)]
-            ]
-            
-            # Add product collection indexes for efficient category queries
-            product_indexes = [
-                [("category_id", 1), ("subcategory_name", 1)],
-                [("category_id", 1), ("isDeleted", 1)],
-                [("subcategory_name", 1)]
-            ]
-            
-            for index_fields in indexes:
-                self.collection.create_index(index_fields, background=True)
-                
-            for index_fields in product_indexes:
-                self.product_collection.create_index(index_fields, background=True)
-                
-            logger.info("Category and product indexes created successfully")
-        except Exception as e:
-            logger.warning(f"Could not create indexes: {e}")
-
     def _validate_category_data(self, category_data):
         """Validate category data before processing"""
         if not category_data:
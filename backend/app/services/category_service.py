@@ -1,5 +1,8 @@
 from datetime import datetime
 from ..database import db_manager
+from .service_registry import service_registry
+from .sequence_service import sequence_service
+from .query_builders import find_options, categories_query, subcategory_products_filter
 from ..models import Category
 import logging
 import re
@@ -15,8 +18,6 @@ class CategoryService:
         self.collection = self.db.category
         self.product_collection = self.db.products  
         self.audit_service = AuditLogService()
-        self._ensure_indexes()
-
         self.ensure_uncategorized_category_exists()
 
     # ================================================================
@@ -74,61 +75,11 @@ class CategoryService:
             raise Exception(f"Error creating uncategorized category: {str(e)}")
 
     def generate_category_id(self):
-        """Generate sequential CTGY-### ID with conflict checking"""
+        """Generate sequential CTGY-### ID"""
         try:
-            max_attempts = 100  # Safety limit
-            
-            for attempt in range(max_attempts):
-                # Find the highest existing CTGY number
-                pipeline = [
-                    {
-                        '$match': {
-                            '_id': {'$regex': '^CTGY-\\d{3}$'}
-                        }
-                    },
-                    {
-                        '$addFields': {
-                            'numeric_part': {
-                                '$toInt': {'$substr': ['$_id', 5, 3]}
-                            }
-                        }
-                    },
-                    {
-                        '$sort': {'numeric_part': -1}
-                    },
-                    {
-                        '$limit': 1
-                    }
-                ]
-                
-                result = list(self.collection.aggregate(pipeline))
-                
-                if result:
-                    next_number = result[0]['numeric_part'] + 1 + attempt
-                else:
-                    # No CTGY categories exist, start from 1
-                    next_number = 1 + attempt
-                
-                # Generate candidate ID
-                candidate_id = f"CTGY-{next_number:03d}"
-                
-                # Check if this ID already exists
-                existing = self.collection.find_one({'_id': candidate_id})
-                
-                if not existing:
-                    logger.info(f"Generated unique category ID: {candidate_id}")
-                    return candidate_id
-                
-                logger.warning(f"ID {candidate_id} already exists, trying next number...")
-            
-            # If we exhausted all attempts, use timestamp-based fallback
-            logger.error("Could not generate unique ID after 100 attempts, using fallback")
-            import time
-            fallback_number = int(time.time()) % 1000
-            return f"CTGY-{fallback_number:03d}"
-            
+            return sequence_service.next_id('category')
         except Exception as e:
-            logger.error(f"Error generating category ID: {e}", exc_info=True)
+            logger.error(f"Error generating category ID: {e}")
             # Emergency fallback
             import time
             fallback_number = int(time.time()) % 1000
@@ -137,38 +88,7 @@ class CategoryService:
     def generate_subcategory_id(self):
         """Generate sequential SUBCAT-##### ID"""
         try:
-            # Use aggregation to find highest existing number across all categories
-            pipeline = [
-                {"$unwind": "$sub_categories"},
-                {
-                    '$match': {
-                        'sub_categories.subcategory_id': {'$regex': '^SUBCAT-\\d{5}$'}
-                    }
-                },
-                {
-                    '$addFields': {
-                        'numeric_part': {
-                            '$toInt': {'$substr': ['$sub_categories.subcategory_id', 7, 5]}
-                        }
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': None,
-                        'max_number': {'$max': '$numeric_part'}
-                    }
-                }
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            
-            if result and result[0]['max_number'] is not None:
-                next_number = result[0]['max_number'] + 1
-            else:
-                next_number = 1
-            
-            return f"SUBCAT-{next_number:05d}"
-            
+            return sequence_service.next_id('subcategory')
         except Exception as e:
             logger.error(f"Error generating subcategory ID: {e}")
             # Emergency fallback
@@ -176,24 +96,6 @@ class CategoryService:
             fallback_number = int(time.time()) % 100000
             return f"SUBCAT-{fallback_number:05d}"
 
-    def _ensure_indexes(self):
-        """Create indexes for string-based operations"""
-        try:
-            indexes = [
-                [("category_id", 1), ("isDeleted", 1)],
-                [("category_name", 1), ("isDeleted", 1)],
-                [("status", 1), ("isDeleted", 1)],
-                [("sub_categories.products.product_id", 1)],
-                [("sub_categories.name", 1)]
-            ]
-            
-            for index_fields in indexes:
-                self.collection.create_index(index_fields, background=True)
-                
-            logger.info("String-based indexes created successfully")
-        except Exception as e:
-            logger.warning(f"Could not create indexes: {e}")
-
     def _validate_category_data(self, category_data):
         """Validate category data before processing"""
         if not category_data:
@@ -438,11 +340,7 @@ class CategoryService:
     def get_all_categories(self, include_deleted=False, limit=None, skip=None):
         """Get all categories with product counts added to subcategories"""
         try:
-            query = {}
-            if not include_deleted:
-                query['isDeleted'] = {'$ne': True}
-
-            cursor = self.collection.find(query)
+            cursor = self.collection.find(**find_options(categories_query(include_deleted)))
 
             if skip:
                 cursor = cursor.skip(skip)
@@ -479,11 +377,9 @@ class CategoryService:
     def get_subcategory_product_count(self, category_id, subcategory_name):
         """Get number of products in a specific subcategory"""
         try:
-            count = self.product_collection.count_documents({
-                'category_id': category_id,
-                'subcategory_name': subcategory_name,
-                'isDeleted': {'$ne': True}
-            })
+            count = self.product_collection.count_documents(
+                subcategory_products_filter(category_id, subcategory_name)
+            )
             return count
         except Exception as e:
             logger.error(f"Error getting subcategory product count: {e}")
@@ -1518,7 +1414,7 @@ class CategoryService:
         """Get all products in a specific subcategory"""
         try:
             from ..services.product_service import ProductService
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
             # Get products by category and subcategory
             filters = {
@@ -1541,7 +1437,7 @@ class CategoryService:
         """Move a product to a different category/subcategory using ProductService"""
         try:
             from ..services.product_service import ProductService
-            product_service = ProductService()
+            product_service = service_registry.get(ProductService)
             
             # Validate the target category exists
             target_category = self.get_category_by_id(new_category_id)
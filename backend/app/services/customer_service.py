@@ -1,7 +1,10 @@
 from bson import ObjectId
 from datetime import datetime, timedelta
 from ..database import db_manager
-import bcrypt
+from .sequence_service import sequence_service
+from .pagination_service import pagination_service
+from .token_cache_service import token_cache_service
+from .password_service import password_service, PasswordServiceBusy
 import logging
 from .audit_service import AuditLogService
 
@@ -21,16 +24,14 @@ class CustomerService:
     
     def hash_password(self, password: str) -> str:
         """Hash password using bcrypt"""
-        if not password:
-            raise ValueError("Password cannot be empty")
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        return password_service.hash(password)
     
     def verify_password(self, password: str, hashed_password: str) -> bool:
         """Verify password against hash"""
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+            return password_service.verify(password, hashed_password)
+        except PasswordServiceBusy:
+            raise
         except Exception:
             return False
     
@@ -38,8 +39,12 @@ class CustomerService:
     # CRUD OPERATIONS
     # ================================================================
     
-    def get_customers(self, page=1, limit=50, status=None, min_loyalty_points=None, include_deleted=False, sort_by=None):
-        """Get customers with pagination and filters - handles all customer queries"""
+    def get_customers(self, page=1, limit=50, status=None, min_loyalty_points=None, include_deleted=False, sort_by=None,
+                      cursor=None, total='approximate'):
+        """
+        Get customers with pagination and filters - handles all customer queries
+        Pass the previous response's next_cursor as `cursor` for keyset paging.
+        """
         try:
             query = {}
             
@@ -51,59 +56,40 @@ class CustomerService:
             if min_loyalty_points:
                 query['loyalty_points'] = {'$gte': min_loyalty_points}
             
-            # Handle sorting
-            sort_options = {}
+            # Handle sorting (ties broken by _id so cursors are stable)
             if sort_by == 'loyalty_desc':
-                sort_options = [('loyalty_points', -1)]
-            elif sort_by == 'date_desc':
-                sort_options = [('date_created', -1)]
+                sort_field = 'loyalty_points'
             else:
-                sort_options = [('date_created', -1)]  # Default sort
-                
-            skip = (page - 1) * limit
+                sort_field = 'date_created'  # Default sort, also 'date_desc'
             
-            # Execute query with sorting
-            if sort_options:
-                customers = list(self.customer_collection.find(query).sort(sort_options).skip(skip).limit(limit))
-            else:
-                customers = list(self.customer_collection.find(query).skip(skip).limit(limit))
-                
-            total = self.customer_collection.count_documents(query)
+            result = pagination_service.paginate(
+                self.customer_collection, query, sort_field=sort_field, direction=-1,
+                limit=limit, cursor=cursor, page=page, total=total
+            )
             
             return {
-                'customers': customers,
-                'total': total,
-                'page': page,
+                'customers': result['items'],
+                'total': result['total'],
+                'total_is_exact': result['total_is_exact'],
+                'page': result['page'],
                 'limit': limit,
-                'has_more': skip + limit < total,
+                'has_more': result['has_more'],
+                'next_cursor': result['next_cursor'],
                 'filters_applied': {
                     'status': status,
                     'min_loyalty_points': min_loyalty_points,
                     'include_deleted': include_deleted
                 }
             }
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error getting customers: {str(e)}")
     
     def generate_customer_id(self):
         """Generate sequential CUST-##### format ID"""
         try:
-            pipeline = [
-                {"$match": {"_id": {"$regex": "^CUST-"}}},
-                {"$addFields": {
-                    "id_number": {
-                        "$toInt": {"$substr": ["$_id", 5, -1]}
-                    }
-                }},
-                {"$sort": {"id_number": -1}},
-                {"$limit": 1}
-            ]
-            
-            result = list(self.customer_collection.aggregate(pipeline))
-            next_number = (result[0]["id_number"] + 1) if result else 1
-            
-            return f"CUST-{next_number:05d}"  # 5 digits
-            
+            return sequence_service.next_id('customers')
         except Exception as e:
             logger.error(f"Error generating customer ID: {e}")
             import time
@@ -241,6 +227,7 @@ class CustomerService:
             if result.modified_count == 0:
                 return old_customer
 
+            token_cache_service.invalidate_subject(customer_id)
             updated_customer = self.customer_collection.find_one({'_id': customer_id})
 
             if current_user and self.audit_service:
@@ -285,6 +272,8 @@ class CustomerService:
             )
             
             success = result.modified_count > 0
+            if success:
+                token_cache_service.invalidate_subject(customer_id)
             
             if success and current_user and self.audit_service:
                 try:
@@ -325,6 +314,8 @@ class CustomerService:
             )
             
             success = result.modified_count > 0
+            if success:
+                token_cache_service.invalidate_subject(customer_id)
             
             if success and current_user and self.audit_service:
                 try:
@@ -383,6 +374,8 @@ class CustomerService:
             # Delete the customer record
             result = self.customer_collection.delete_one({'_id': customer_id})
             success = result.deleted_count > 0
+            if success:
+                token_cache_service.invalidate_subject(customer_id)
             
             # Audit logging
             if success and current_user and self.audit_service:
@@ -429,16 +422,22 @@ class CustomerService:
             if not customer:
                 return None
             
-            if self.verify_password(password, customer['password']):
-                # Update last login timestamp
+            valid, new_hash = password_service.verify_and_rehash(password, customer['password'])
+            if valid:
+                # Update last login timestamp (and the hash if its cost changed)
+                login_update = {'last_updated': datetime.utcnow()}
+                if new_hash:
+                    login_update['password'] = new_hash
                 self.customer_collection.update_one(
                     {'_id': customer['_id']},
-                    {'$set': {'last_updated': datetime.utcnow()}}
+                    {'$set': login_update}
                 )
                 return customer
             
             return None
             
+        except PasswordServiceBusy:
+            raise
         except Exception as e:
             raise Exception(f"Error authenticating customer: {str(e)}")
     
@@ -464,6 +463,8 @@ class CustomerService:
             
             return result.modified_count > 0
             
+        except PasswordServiceBusy:
+            raise
         except Exception as e:
             raise Exception(f"Error changing password: {str(e)}")
     
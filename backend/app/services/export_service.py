@@ -0,0 +1,225 @@
+# app/services/export_service.py
+"""
+Streaming file exports.
+
+Rows come from a generator over a MongoDB cursor and are encoded chunk by
+chunk into a StreamingHttpResponse, so an export of any size runs in
+constant memory and is never capped. Supported formats:
+
+    csv      plain CSV
+    csv.gz   gzip-compressed CSV (also accepted as 'gzip')
+    xlsx     openpyxl write-only workbook, spooled to a temp file first
+             because the zip container can only be finalised at the end
+"""
+
+import csv
+import io
+import os
+import tempfile
+import zlib
+from datetime import datetime
+from decouple import config
+from django.http import StreamingHttpResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Documents fetched per cursor round-trip during exports
+EXPORT_BATCH_SIZE = config('EXPORT_BATCH_SIZE', default=2000, cast=int)
+# CSV rows buffered before a chunk is handed to the response
+EXPORT_CHUNK_ROWS = 500
+XLSX_READ_CHUNK = 64 * 1024
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'csv.gz': ('application/gzip', 'csv.gz'),
+    'gzip': ('application/gzip', 'csv.gz'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# ================================================================
+# SALES EXPORT (the sales log export view and the sales_export job)
+# ================================================================
+
+SALES_EXPORT_HEADER = [
+    'Transaction ID',
+    'Transaction Date',
+    'Customer ID',
+    'Item Code',
+    'Item Name',
+    'Quantity',
+    'Unit Price',
+    'Total Price',
+    'Payment Method',
+    'Sales Type',
+    'Status',
+    'Tax Amount',
+    'Total Amount'
+]
+
+# Only the exported columns leave the database
+SALES_EXPORT_PROJECTION = {
+    'transaction_date': 1,
+    'customer_id': 1,
+    'item_list.item_code': 1,
+    'item_list.item_name': 1,
+    'item_list.quantity': 1,
+    'item_list.unit_price': 1,
+    'item_list.total_price': 1,
+    'payment_method': 1,
+    'sales_type': 1,
+    'status': 1,
+    'tax_amount': 1,
+    'total_amount': 1
+}
+
+
+def sales_export_rows(transactions):
+    """One SALES_EXPORT_HEADER row per item, produced lazily while the export streams"""
+    exported = 0
+    for transaction in transactions:
+        transaction_id = str(transaction.get('_id', ''))
+        transaction_date = transaction.get('transaction_date', '')
+        customer_id = str(transaction.get('customer_id', ''))
+        payment_method = transaction.get('payment_method', '')
+        sales_type = transaction.get('sales_type', '')
+        status_val = transaction.get('status', '')
+        tax_amount = transaction.get('tax_amount', 0)
+        total_amount = transaction.get('total_amount', 0)
+
+        # Handle item list
+        item_list = transaction.get('item_list', [])
+        if not isinstance(item_list, list):
+            item_list = [item_list] if item_list else []
+
+        # Write one row per item
+        for item in item_list:
+            yield [
+                transaction_id,
+                transaction_date,
+                customer_id,
+                item.get('item_code', ''),
+                item.get('item_name', ''),
+                item.get('quantity', 0),
+                item.get('unit_price', 0),
+                item.get('total_price', 0),
+                payment_method,
+                sales_type,
+                status_val,
+                tax_amount,
+                total_amount
+            ]
+        exported += 1
+
+    logger.info(f"Successfully exported {exported} transactions")
+
+
+class ExportService:
+    """Encodes row generators as streamed CSV / gzip CSV / XLSX downloads"""
+
+    def streaming_response(self, rows, header, filename_base, file_format='csv', sheet_title='Export'):
+        """
+        Build a StreamingHttpResponse for `rows` (an iterable of lists).
+        Raises ValueError for an unknown format.
+        """
+        content_type, extension, stream = self._encode(rows, header, file_format, sheet_title)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename_base}_{timestamp}.{extension}"'
+        return response
+
+    def write_file(self, rows, header, directory, filename_base, file_format='csv', sheet_title='Export'):
+        """
+        Encode `rows` into a file under `directory` (background jobs).
+        Returns (path, filename, content type).
+        """
+        content_type, extension, stream = self._encode(rows, header, file_format, sheet_title)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"{filename_base}_{timestamp}.{extension}"
+        path = os.path.join(directory, filename)
+        try:
+            with open(path, 'wb') as destination:
+                for chunk in stream:
+                    destination.write(chunk)
+        except BaseException:
+            # Cancelled or failed: don't leave a truncated file behind
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return path, filename, content_type
+
+    def _encode(self, rows, header, file_format, sheet_title):
+        file_format = (file_format or 'csv').lower()
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError("Invalid format. Use 'csv', 'csv.gz' or 'xlsx'")
+
+        content_type, extension = EXPORT_FORMATS[file_format]
+        if extension == 'csv':
+            stream = self.csv_stream(rows, header)
+        elif extension == 'csv.gz':
+            stream = self.gzip_csv_stream(rows, header)
+        else:
+            stream = self.xlsx_stream(rows, header, sheet_title)
+        return content_type, extension, stream
+
+    def csv_stream(self, rows, header):
+        """Yield UTF-8 CSV chunks of EXPORT_CHUNK_ROWS rows"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+
+        pending = 0
+        for row in rows:
+            writer.writerow(row)
+            pending += 1
+            if pending >= EXPORT_CHUNK_ROWS:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate(0)
+                pending = 0
+
+        remainder = buffer.getvalue()
+        if remainder:
+            yield remainder.encode('utf-8')
+
+    def gzip_csv_stream(self, rows, header):
+        """Yield a gzip member incrementally from the CSV chunks"""
+        # wbits=31 -> gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in self.csv_stream(rows, header):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def xlsx_stream(self, rows, header, sheet_title='Export'):
+        """Write rows with openpyxl in write-only mode, then stream the file"""
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(title=sheet_title[:31])
+        sheet.append(header)
+        for row in rows:
+            sheet.append([self._xlsx_value(value) for value in row])
+
+        with tempfile.TemporaryFile() as spool:
+            workbook.save(spool)
+            spool.seek(0)
+            while True:
+                chunk = spool.read(XLSX_READ_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+
+    @staticmethod
+    def _xlsx_value(value):
+        # openpyxl only accepts scalars; ObjectIds, lists, etc. go in as text
+        if value is None or isinstance(value, (str, int, float, bool, datetime)):
+            return value
+        return str(value)
+
+
+# Singleton instance
+export_service = ExportService()
@@ -0,0 +1,330 @@
+# app/services/index_service.py
+"""
+Declarative index manifest.
+
+INDEX_MANIFEST lists every index the application relies on, by collection.
+`manage.py ensure_indexes` diffs it against the live database, creates what
+is missing and, on request, rebuilds indexes whose options changed. Live
+indexes the manifest does not declare are only dropped when they are listed
+in RETIRED_INDEXES or named explicitly (`--drop --allow-drop coll.name`).
+Services that bootstrap their own collections at runtime (jobs, token
+blacklist, rollups, ...) create their indexes from the same manifest with
+`index_service.ensure(...)` instead of keeping their own lists, and no
+service creates indexes from its constructor.
+
+canonical_queries() returns the hot query of each service, with representative
+values. `ensure_indexes --verify` explains each one against the live
+database and fails when a winning plan scans a whole collection.
+"""
+
+from datetime import datetime, timedelta
+from pymongo import IndexModel
+from .slow_query_service import plan_stages
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Index options that make two indexes on the same keys different
+COMPARED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression')
+
+
+def index(*keys, **options):
+    """One manifest entry: `index(('status', 1), ('created_at', -1), unique=True)`"""
+    return {'keys': list(keys), 'options': options}
+
+
+def index_name(keys):
+    """MongoDB's default name for an index on `keys`, e.g. status_1_created_at_-1"""
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+INDEX_MANIFEST = {
+    # ---------------- Catalog ----------------
+    'category': [
+        index(('_id', 1), ('isDeleted', 1)),
+        index(('category_id', 1)),
+        index(('category_id', 1), ('isDeleted', 1)),
+        index(('status', 1), ('isDeleted', 1)),
+        index(('category_name', 1)),
+        index(('category_name', 1), ('isDeleted', 1)),
+        index(('sub_categories.products.product_id', 1)),
+        index(('sub_categories.name', 1)),
+    ],
+    'products': [
+        index(('category_id', 1), ('isDeleted', 1)),
+        index(('category_id', 1), ('subcategory_name', 1)),
+        index(('subcategory_name', 1)),
+        index(('product_id', 1)),
+        index(('product_name', 1)),
+        index(('stock_quantity', 1)),
+        index(('barcode', 1)),
+        index(('product_code', 1)),
+    ],
+    'batches': [
+        index(('product_id', 1), ('status', 1), ('expiry_date', 1)),
+        index(('status', 1), ('expiry_date', 1)),
+    ],
+
+    # ---------------- Sales ----------------
+    'sales': [
+        index(('transaction_date', -1)),
+    ],
+    'sales_log': [
+        index(('transaction_date', -1)),
+        index(('customer_id', 1), ('transaction_date', -1)),
+        # "<job_id>:<row>" of background CSV imports; makes a resumed batch idempotent
+        index(('import_key', 1), unique=True, partialFilterExpression={'import_key': {'$exists': True}}),
+    ],
+    'online_transactions': [
+        index(('customer_id', 1), ('created_at', -1)),
+        index(('order_status', 1), ('created_at', -1)),
+    ],
+    'sales_rollups': [
+        index(('granularity', 1), ('date', 1)),
+    ],
+    'product_sales_daily': [
+        index(('date', 1), ('collection', 1)),
+    ],
+    'promotion_usage': [
+        index(('promotion_id', 1), ('used_at', 1)),
+        index(('used_at', 1)),
+        # Upsert key of migrate_promotion_usage; keeps re-runs from duplicating rows
+        index(('promotion_id', 1), ('legacy_index', 1), unique=True,
+              partialFilterExpression={'legacy_index': {'$exists': True}}),
+    ],
+
+    # ---------------- People ----------------
+    # Keyset pagination orders (pagination_service only creates sort indexes declared here)
+    'customers': [
+        index(('date_created', -1), ('_id', -1)),
+        index(('loyalty_points', -1), ('_id', -1)),
+    ],
+    'session_logs': [
+        index(('user_id', 1), ('login_time', -1)),
+        index(('status', 1), ('login_time', -1)),
+        index(('login_time', -1)),
+    ],
+    'notifications': [
+        index(('created_at', -1), ('_id', -1)),
+        index(('recipient_id', 1), ('created_at', -1)),
+        index(('is_read', 1), ('created_at', -1)),
+    ],
+    'audit_logs': [
+        index(('target_type', 1), ('target_id', 1), ('timestamp', -1)),
+        index(('user_id', 1), ('timestamp', -1)),
+    ],
+    'token_blacklist': [
+        index(('blacklisted_at', 1)),
+        index(('token_hash', 1)),
+        # Revoked tokens are useless once they expire; let MongoDB drop them
+        index(('expires_at', 1), expireAfterSeconds=0),
+    ],
+
+    # ---------------- Infrastructure ----------------
+    'outbox': [
+        index(('status', 1), ('available_at', 1)),
+        index(('claim', 1)),
+        # Delivered entries are kept a week for inspection, then MongoDB drops them
+        index(('completed_at', 1), expireAfterSeconds=7 * 24 * 3600, partialFilterExpression={'status': 'done'}),
+    ],
+    'jobs': [
+        index(('status', 1), ('created_at', 1)),
+        index(('created_by', 1), ('created_at', -1)),
+    ],
+    'slow_queries': [
+        index(('logged_at', -1)),
+    ],
+    # One document per sequence, looked up by _id (see sequence_service)
+    'counters': [],
+    # Lives in the local MongoDB; DatabaseManager ensures it before journaling
+    'failover_journal': [
+        index(('state', 1), ('_id', 1)),
+    ],
+}
+
+# Undeclared indexes `ensure_indexes --drop` may remove without being named
+# on the command line: "collection.index_name" of indexes the application
+# used to create and no longer needs.
+RETIRED_INDEXES = frozenset()
+
+
+def canonical_queries():
+    """The hot query of each service, with representative values (dates relative to now)"""
+    now = datetime.utcnow()
+    today = {'$gte': now - timedelta(days=1), '$lt': now}
+    return [
+        {'name': 'POS catalog', 'collection': 'category',
+         'filter': {'status': 'active', 'isDeleted': {'$ne': True}}},
+        {'name': 'Products by category', 'collection': 'products',
+         'filter': {'category_id': 'CTGY-001', 'isDeleted': {'$ne': True}}},
+        {'name': 'Batches by product', 'collection': 'batches',
+         'filter': {'product_id': 'PROD-00001', 'status': 'active'}, 'sort': [('expiry_date', 1)]},
+        {'name': 'Expiring batches', 'collection': 'batches',
+         'filter': {'status': 'active', 'expiry_date': {'$lte': now + timedelta(days=30)}},
+         'sort': [('expiry_date', 1)]},
+        {'name': 'Recent POS sales', 'collection': 'sales',
+         'filter': {'transaction_date': today}, 'sort': [('transaction_date', -1)], 'limit': 10},
+        {'name': 'Sales log by date', 'collection': 'sales_log',
+         'filter': {'transaction_date': today}},
+        {'name': 'Customer order history', 'collection': 'online_transactions',
+         'filter': {'customer_id': 'CUST-00001'}, 'sort': [('created_at', -1)], 'limit': 50},
+        {'name': 'Rollup range', 'collection': 'sales_rollups',
+         'filter': {'granularity': 'day', 'date': today}},
+        {'name': 'Customer list', 'collection': 'customers',
+         'filter': {'isDeleted': {'$ne': True}}, 'sort': [('date_created', -1), ('_id', -1)], 'limit': 50},
+        {'name': 'User session history', 'collection': 'session_logs',
+         'filter': {'user_id': 'USER-0001'}, 'sort': [('login_time', -1)], 'limit': 50},
+        {'name': 'Active sessions', 'collection': 'session_logs',
+         'filter': {'status': 'active'}, 'sort': [('login_time', -1)]},
+        {'name': 'Notifications for recipient', 'collection': 'notifications',
+         'filter': {'recipient_id': 'USER-0001', 'archived': {'$ne': True}},
+         'sort': [('created_at', -1)], 'limit': 50},
+        {'name': 'Notification list', 'collection': 'notifications',
+         'filter': {'archived': {'$ne': True}}, 'sort': [('created_at', -1), ('_id', -1)], 'limit': 50},
+        {'name': 'Audit trail of a record', 'collection': 'audit_logs',
+         'filter': {'target_type': 'product', 'target_id': 'PROD-00001'}, 'sort': [('timestamp', -1)], 'limit': 50},
+        {'name': 'Token blacklist refresh', 'collection': 'token_blacklist',
+         'filter': {'blacklisted_at': {'$gt': now - timedelta(seconds=30)}}},
+        {'name': 'Outbox claim', 'collection': 'outbox',
+         'filter': {'status': 'pending', 'available_at': {'$lte': now}}, 'sort': [('available_at', 1)], 'limit': 100},
+        {'name': 'Job queue', 'collection': 'jobs',
+         'filter': {'status': 'queued'}, 'sort': [('created_at', 1)], 'limit': 1},
+    ]
+
+
+class IndexService:
+    """Diffs, applies and verifies INDEX_MANIFEST"""
+
+    def __init__(self, manifest=None, retired=None):
+        self.manifest = manifest or INDEX_MANIFEST
+        self.retired = RETIRED_INDEXES if retired is None else frozenset(retired)
+
+    # ================================================================
+    # RUNTIME BOOTSTRAP
+    # ================================================================
+
+    def ensure(self, collection, name=None):
+        """Create the manifest indexes of one collection; used by self-bootstrapping services"""
+        specs = self.manifest.get(name or collection.name, [])
+        if specs:
+            collection.create_indexes([self._model(spec) for spec in specs])
+
+    def declares(self, collection_name, keys):
+        """Whether the manifest declares an index on exactly `keys` for the collection"""
+        wanted = _normalize_keys(keys)
+        return any(_normalize_keys(spec['keys']) == wanted for spec in self.manifest.get(collection_name, []))
+
+    # ================================================================
+    # DIFF AND APPLY
+    # ================================================================
+
+    def diff(self, db):
+        """
+        Per collection: manifest indexes that are missing, indexes whose options
+        differ from the manifest, and live indexes the manifest does not declare.
+        """
+        report = {}
+        for collection_name, specs in sorted(self.manifest.items()):
+            live = db[collection_name].index_information()
+            live_by_keys = {
+                _normalize_keys(info['key']): (name, info)
+                for name, info in live.items() if name != '_id_'
+            }
+            declared = set()
+            missing, changed = [], []
+            for spec in specs:
+                keys = _normalize_keys(spec['keys'])
+                declared.add(keys)
+                if keys not in live_by_keys:
+                    missing.append(spec)
+                    continue
+                live_name, info = live_by_keys[keys]
+                if _options(info) != _options(spec['options']):
+                    changed.append({'spec': spec, 'live_name': live_name, 'live_options': _options(info)})
+            extra = [name for keys, (name, _) in live_by_keys.items() if keys not in declared]
+            report[collection_name] = {'missing': missing, 'changed': changed, 'extra': sorted(extra)}
+        return report
+
+    def apply(self, db, report=None, drop=False, allow_drop=()):
+        """
+        Create missing indexes. With drop=True also rebuild changed indexes
+        and drop undeclared ones listed in RETIRED_INDEXES or `allow_drop`
+        ("collection.index_name"); any other undeclared index is kept and
+        reported as 'kept'. Returns the actions taken.
+        """
+        report = report or self.diff(db)
+        droppable = self.retired | set(allow_drop)
+        actions = []
+        for collection_name, entry in report.items():
+            collection = db[collection_name]
+            if drop:
+                for change in entry['changed']:
+                    collection.drop_index(change['live_name'])
+                    actions.append(('rebuilt', collection_name, change['live_name']))
+                for name in entry['extra']:
+                    if f'{collection_name}.{name}' not in droppable:
+                        actions.append(('kept', collection_name, name))
+                        continue
+                    collection.drop_index(name)
+                    actions.append(('dropped', collection_name, name))
+            to_create = entry['missing'] + ([change['spec'] for change in entry['changed']] if drop else [])
+            if to_create:
+                names = collection.create_indexes([self._model(spec) for spec in to_create])
+                actions.extend(('created', collection_name, name) for name in names)
+        return actions
+
+    # ================================================================
+    # VERIFICATION
+    # ================================================================
+
+    def verify(self, db, queries=None):
+        """Explain every canonical query; each result says whether its plan is a COLLSCAN"""
+        results = []
+        for query in queries or canonical_queries():
+            command = {'find': query['collection'], 'filter': query['filter']}
+            if query.get('sort'):
+                command['sort'] = dict(query['sort'])
+            if query.get('limit'):
+                command['limit'] = query['limit']
+            try:
+                explained = db.command({'explain': command, 'verbosity': 'queryPlanner'})
+                winning_plan = explained.get('queryPlanner', {}).get('winningPlan', {})
+                stages = plan_stages(winning_plan)
+                results.append({
+                    'name': query['name'],
+                    'collection': query['collection'],
+                    'stages': stages,
+                    'collscan': 'COLLSCAN' in stages,
+                    'error': None,
+                })
+            except Exception as e:
+                results.append({
+                    'name': query['name'],
+                    'collection': query['collection'],
+                    'stages': [],
+                    'collscan': None,
+                    'error': str(e),
+                })
+        return results
+
+    @staticmethod
+    def _model(spec):
+        options = dict(spec['options'])
+        options.setdefault('name', index_name(spec['keys']))
+        return IndexModel(spec['keys'], background=True, **options)
+
+
+def _normalize_keys(keys):
+    # The server reports directions as 1.0 / -1.0 on some versions
+    return tuple(
+        (field, int(direction) if isinstance(direction, (int, float)) else direction)
+        for field, direction in keys
+    )
+
+
+def _options(info):
+    return {key: info[key] for key in COMPARED_OPTIONS if key in info}
+
+
+# Singleton instance
+index_service = IndexService()
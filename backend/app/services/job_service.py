@@ -0,0 +1,584 @@
+# app/services/job_service.py
+"""
+Background jobs backed by MongoDB alone.
+
+Long-running work (product/sales imports, session cleanup with export,
+report exports) is stored as a document in the `jobs` collection and run by
+a pool of in-process worker threads, so the HTTP request returns a job ID
+immediately instead of holding a gunicorn worker until it times out.
+`manage.py run_jobs` runs the same workers in a dedicated process.
+
+A job moves queued -> running -> completed / failed / cancelled. While it
+runs, its handler reports progress (rows processed / total / percent)
+through a JobContext, which doubles as the heartbeat. Handlers that can
+resume save a checkpoint with their progress; when a worker dies, the job
+is claimed again once its lease expires and continues from that checkpoint.
+Cancellation is cooperative: it is noticed at the next progress report.
+A handler stuck in one long call keeps its lease with JobContext.heartbeat().
+
+Uploaded inputs and produced files live in JOB_FILES_DIR/<job_id>/.
+"""
+
+import os
+import shutil
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from bson import ObjectId
+from decouple import config
+from pymongo import ReturnDocument
+from ..database import db_manager
+from .service_registry import service_registry
+from .index_service import index_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = config('JOB_WORKERS', default=2, cast=int)
+JOB_POLL_SECONDS = config('JOB_POLL_SECONDS', default=2.0, cast=float)
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=600, cast=int)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+JOB_FILES_DIR = config('JOB_FILES_DIR', default=os.path.join('exports', 'jobs'))
+JOB_PROGRESS_INTERVAL_SECONDS = 1.0  # progress writes are throttled to this rate
+JOB_HEARTBEAT_SECONDS = max(1.0, JOB_LEASE_SECONDS / 4)  # lease renewal during blocking steps
+JOB_MAX_ERROR_ROWS = 1000            # per-row errors kept in a job result
+
+JOB_STATUSES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class JobContext:
+    """What a handler sees of its job: params, checkpoint, progress reporting"""
+
+    def __init__(self, service, job):
+        self._service = service
+        self._last_report = 0.0
+        self.job = job
+        self.job_id = job['_id']
+        self.params = job.get('params') or {}
+        self.checkpoint = job.get('checkpoint')
+        self.processed = (job.get('progress') or {}).get('processed', 0)
+        self.total = (job.get('progress') or {}).get('total')
+
+    def report(self, processed=None, total=None, message=None, checkpoint=None):
+        """
+        Record progress (and optionally a resumable checkpoint). Plain
+        progress is throttled; checkpoints are always written. Raises
+        JobCancelled once the job has been cancelled.
+        """
+        if processed is not None:
+            self.processed = processed
+        if total is not None:
+            self.total = total
+
+        now = time.monotonic()
+        if checkpoint is None and now - self._last_report < JOB_PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        job = self._service._write_progress(self.job_id, self.processed, self.total, message, checkpoint)
+        if job is None or job.get('cancel_requested'):
+            raise JobCancelled()
+
+    def track(self, iterable, total=None, message=None):
+        """Yield from `iterable`, reporting one processed item per element"""
+        processed = 0
+        self.report(0, total, message)
+        for item in iterable:
+            yield item
+            processed += 1
+            self.report(processed, message=message)
+
+    @contextmanager
+    def heartbeat(self):
+        """
+        Renew the lease from a side thread around a blocking step that cannot
+        report progress itself. Cancellation is noticed after the step returns.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(JOB_HEARTBEAT_SECONDS):
+                try:
+                    self._service._touch(self.job_id)
+                except Exception as e:
+                    logger.warning(f"Heartbeat for job {self.job_id} failed: {e}")
+
+        thread = threading.Thread(target=beat, name=f"job-heartbeat-{self.job_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def work_dir(self):
+        return self._service.work_dir(self.job_id)
+
+
+class JobService:
+    """Queues jobs in MongoDB and runs them on background worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._stop = False
+        self._pid = None
+        self._indexes_ready = False
+        self._handlers = {
+            'product_import': self._run_product_import,
+            'sales_import': self._run_sales_import,
+            'session_cleanup': self._run_session_cleanup,
+            'sales_export': self._run_sales_export,
+        }
+
+    @property
+    def collection(self):
+        return db_manager.get_database().jobs
+
+    # ================================================================
+    # SUBMIT / QUERY / CANCEL
+    # ================================================================
+
+    def submit(self, job_type, params=None, created_by=None, upload=None):
+        """
+        Queue a job and wake the workers. `upload` (a Django UploadedFile) is
+        stored in the job's directory and passed to the handler as
+        params['file_path'] / params['file_name'].
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type '{job_type}'")
+
+        self._ensure_indexes()
+        job_id = str(ObjectId())
+        params = dict(params or {})
+
+        if upload is not None:
+            file_name = os.path.basename(upload.name)
+            path = os.path.join(self.work_dir(job_id), file_name)
+            with open(path, 'wb') as destination:
+                for chunk in upload.chunks():
+                    destination.write(chunk)
+            params['file_path'] = path
+            params['file_name'] = file_name
+
+        now = datetime.utcnow()
+        job = {
+            '_id': job_id,
+            'type': job_type,
+            'params': params,
+            'status': 'queued',
+            'progress': {'processed': 0, 'total': None, 'percent': 0.0, 'message': 'Queued'},
+            'checkpoint': None,
+            'result': None,
+            'result_file': None,
+            'error': None,
+            'attempts': 0,
+            'cancel_requested': False,
+            'created_by': created_by,
+            'created_at': now,
+            'updated_at': now,
+        }
+        self.collection.insert_one(job)
+        logger.info(f"Queued {job_type} job {job_id}")
+
+        self.ensure_workers()
+        self._wakeup.set()
+        return job
+
+    def get_job(self, job_id):
+        return self.collection.find_one({'_id': job_id})
+
+    def list_jobs(self, job_type=None, status=None, created_by=None, limit=50):
+        query = {}
+        if job_type:
+            query['type'] = job_type
+        if status:
+            query['status'] = status
+        if created_by:
+            query['created_by'] = created_by
+        return list(self.collection.find(query, {'checkpoint': 0}).sort('created_at', -1).limit(int(limit)))
+
+    def cancel_job(self, job_id):
+        """
+        Queued jobs are cancelled at once; running ones stop at their next
+        progress report. Returns the updated job, or None if unknown.
+        """
+        now = datetime.utcnow()
+        job = self.collection.find_one_and_update(
+            {'_id': job_id, 'status': 'queued'},
+            {'$set': {'status': 'cancelled', 'cancel_requested': True, 'finished_at': now, 'updated_at': now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            return job
+
+        return self.collection.find_one_and_update(
+            {'_id': job_id},
+            {'$set': {'cancel_requested': True, 'updated_at': now}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def result_file(self, job):
+        """(path, download name, content type) of a finished job's file, else None"""
+        result_file = (job or {}).get('result_file')
+        if job.get('status') != 'completed' or not result_file or not os.path.exists(result_file['path']):
+            return None
+        return result_file['path'], result_file['filename'], result_file['content_type']
+
+    def serialize(self, job):
+        """JSON-friendly view of a job for the API"""
+        progress = job.get('progress') or {}
+        data = {
+            'job_id': job['_id'],
+            'type': job.get('type'),
+            'status': job.get('status'),
+            'progress': progress,
+            'attempts': job.get('attempts', 0),
+            'cancel_requested': job.get('cancel_requested', False),
+            'result': job.get('result'),
+            'has_result_file': bool(job.get('result_file')),
+            'error': job.get('error'),
+            'created_by': job.get('created_by'),
+        }
+        for field in ('created_at', 'started_at', 'finished_at', 'updated_at'):
+            value = job.get(field)
+            data[field] = value.isoformat() if isinstance(value, datetime) else value
+        return data
+
+    def work_dir(self, job_id):
+        path = os.path.join(JOB_FILES_DIR, str(job_id))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def purge_finished(self, older_than_days=7):
+        """Delete finished jobs (and their files) older than the given age"""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        query = {'status': {'$in': list(FINISHED_STATUSES)}, 'finished_at': {'$lt': cutoff}}
+        job_ids = [job['_id'] for job in self.collection.find(query, {'_id': 1})]
+        for job_id in job_ids:
+            shutil.rmtree(os.path.join(JOB_FILES_DIR, str(job_id)), ignore_errors=True)
+        if job_ids:
+            self.collection.delete_many({'_id': {'$in': job_ids}})
+        return len(job_ids)
+
+    # ================================================================
+    # WORKERS
+    # ================================================================
+
+    def ensure_workers(self, count=None):
+        """Start the worker pool once per process (restarted after fork)"""
+        count = JOB_WORKERS if count is None else count
+        if count <= 0:
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and any(worker.is_alive() for worker in self._workers):
+                return
+
+            self._pid = os.getpid()
+            self._stop = False
+            self._workers = [
+                threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                for i in range(count)
+            ]
+            for worker in self._workers:
+                worker.start()
+            logger.info(f"Started {count} job workers")
+
+    def stop_workers(self):
+        self._stop = True
+        self._wakeup.set()
+
+    def _worker_loop(self):
+        while not self._stop:
+            try:
+                ran = self.run_once()
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+                ran = False
+
+            if not ran:
+                self._wakeup.wait(JOB_POLL_SECONDS)
+                self._wakeup.clear()
+
+    def run_once(self):
+        """Claim and run one job. Returns False when nothing was due."""
+        self._reap_cancelled()
+        job = self._claim()
+        if job is None:
+            return False
+        self._run(job)
+        return True
+
+    def _claim(self):
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=JOB_LEASE_SECONDS)
+        return self.collection.find_one_and_update(
+            {
+                'cancel_requested': {'$ne': True},
+                '$or': [
+                    {'status': 'queued'},
+                    # A worker died mid-job: resume from its checkpoint
+                    {'status': 'running', 'heartbeat_at': {'$lt': stale}},
+                ]
+            },
+            {
+                '$set': {
+                    'status': 'running',
+                    'worker': f"{os.getpid()}:{threading.current_thread().name}",
+                    'heartbeat_at': now,
+                    'updated_at': now
+                },
+                '$min': {'started_at': now},
+                '$inc': {'attempts': 1}
+            },
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _reap_cancelled(self):
+        """
+        A worker died after its job was asked to stop: _claim won't resume
+        such a job, so finish it as cancelled once its lease has expired.
+        """
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=JOB_LEASE_SECONDS)
+        result = self.collection.update_many(
+            {'status': 'running', 'cancel_requested': True, 'heartbeat_at': {'$lt': stale}},
+            {'$set': {
+                'status': 'cancelled',
+                'finished_at': now,
+                'updated_at': now,
+                'progress.message': 'Cancelled'
+            }}
+        )
+        if result.modified_count:
+            logger.info(f"Finalized {result.modified_count} stale cancelled jobs")
+
+    def _run(self, job):
+        job_id = job['_id']
+        if job.get('attempts', 0) > JOB_MAX_ATTEMPTS:
+            self._finish(job_id, 'failed', error=f"Gave up after {JOB_MAX_ATTEMPTS} attempts")
+            return
+
+        context = JobContext(self, job)
+        if job.get('checkpoint'):
+            logger.info(f"Resuming {job['type']} job {job_id} from checkpoint")
+
+        try:
+            outcome = self._handlers[job['type']](context) or {}
+        except JobCancelled:
+            logger.info(f"Job {job_id} cancelled")
+            self._finish(job_id, 'cancelled', processed=context.processed, total=context.total)
+            return
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['type']}) failed: {e}\n{traceback.format_exc()}")
+            self._finish(job_id, 'failed', error=str(e), processed=context.processed, total=context.total)
+            return
+
+        self._finish(
+            job_id, 'completed',
+            result=outcome.get('result'),
+            result_file=outcome.get('file'),
+            processed=context.processed,
+            total=context.total
+        )
+
+    def _write_progress(self, job_id, processed, total, message, checkpoint):
+        now = datetime.utcnow()
+        update = {
+            'progress.processed': processed,
+            'progress.total': total,
+            'progress.percent': self._percent(processed, total),
+            'heartbeat_at': now,
+            'updated_at': now
+        }
+        if message is not None:
+            update['progress.message'] = message
+        if checkpoint is not None:
+            update['checkpoint'] = checkpoint
+        return self.collection.find_one_and_update(
+            {'_id': job_id},
+            {'$set': update},
+            projection={'cancel_requested': 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _touch(self, job_id):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {'_id': job_id, 'status': 'running'},
+            {'$set': {'heartbeat_at': now, 'updated_at': now}}
+        )
+
+    def _finish(self, job_id, status, result=None, result_file=None, error=None, processed=None, total=None):
+        now = datetime.utcnow()
+        update = {
+            'status': status,
+            'result': result,
+            'result_file': result_file,
+            'error': error,
+            'finished_at': now,
+            'updated_at': now,
+            'progress.message': status.capitalize()
+        }
+        if processed is not None:
+            update['progress.processed'] = processed
+            update['progress.total'] = total
+            update['progress.percent'] = 100.0 if status == 'completed' else self._percent(processed, total)
+        self.collection.update_one({'_id': job_id}, {'$set': update})
+
+    @staticmethod
+    def _percent(processed, total):
+        if not total:
+            return None if processed else 0.0
+        return round(min(100.0, processed * 100.0 / total), 1)
+
+    def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        try:
+            index_service.ensure(self.collection, 'jobs')
+            self._indexes_ready = True
+        except Exception as e:
+            logger.warning(f"Could not create jobs indexes: {e}")
+
+    # ================================================================
+    # HANDLERS (each returns {'result': ..., 'file': ...})
+    # ================================================================
+
+    def _run_product_import(self, context):
+        from .product_service import ProductService
+        from .product_import_service import product_import_service
+
+        params = context.params
+        results = product_import_service.import_file(
+            params['file_path'],
+            params.get('file_type', 'csv'),
+            params.get('validate_only', False),
+            notifier=service_registry.get(ProductService),
+            progress=context.report,
+            resume=context.checkpoint
+        )
+        return {'result': results}
+
+    def _run_sales_import(self, context):
+        import csv
+        import io
+        from ..kpi_views.sales_bulk_views import SalesLogBulkImportView
+
+        with open(context.params['file_path'], 'rb') as source:
+            transactions = list(csv.DictReader(io.StringIO(source.read().decode('utf-8'))))
+
+        view = SalesLogBulkImportView()
+        # Resumed batches rely on the unique import_key index
+        index_service.ensure(view.sales_service.sales_log_collection, 'sales_log')
+        total = len(transactions)
+        state = context.checkpoint or {
+            'next_row': 0, 'successful': 0, 'failed': 0, 'total_amount': 0.0, 'failed_transactions': []
+        }
+        context.report(state['next_row'], total, 'Importing sales')
+
+        for batch_start in range(state['next_row'], total, view.BATCH_SIZE):
+            batch = transactions[batch_start:batch_start + view.BATCH_SIZE]
+            created, failed = view._import_batch(batch, batch_start, transactions, job_id=context.job_id)
+
+            state['next_row'] = batch_start + len(batch)
+            state['successful'] += len(created)
+            state['failed'] += len(failed)
+            state['total_amount'] = round(
+                state['total_amount'] + sum(invoice.get('total_amount', 0) for invoice in created), 2
+            )
+            room = JOB_MAX_ERROR_ROWS - len(state['failed_transactions'])
+            if room > 0:
+                state['failed_transactions'].extend(failed[:room])
+            context.report(state['next_row'], total, 'Importing sales', checkpoint=state)
+
+        file_name = context.params.get('file_name', 'CSV import')
+        if total:
+            view.sales_service.send_import_summary(
+                file_name, total, state['successful'], state['failed'], state['total_amount']
+            )
+
+        success_rate = (state['successful'] / total * 100) if total else 0
+        return {'result': {
+            'message': 'CSV import completed',
+            'summary': {
+                'total_processed': total,
+                'successful': state['successful'],
+                'failed': state['failed'],
+                'success_rate': round(success_rate, 2)
+            },
+            'failed_transactions': state['failed_transactions'],
+            'failed_transactions_truncated': state['failed'] > len(state['failed_transactions']),
+            'warnings': view._validate_transactions(transactions)['warnings']
+        }}
+
+    def _run_session_cleanup(self, context):
+        from .session_services import SessionLogService
+
+        params = context.params
+        context.report(0, 1, 'Exporting and cleaning up sessions')
+        export_path = os.path.join(context.work_dir(), 'session_cleanup_export.csv')
+        with context.heartbeat():
+            result = service_registry.get(SessionLogService).manual_cleanup_with_export(
+                start_date=params.get('start_date'),
+                end_date=params.get('end_date'),
+                export_path=export_path,
+                dry_run=params.get('dry_run', False)
+            )
+        if not result.get('success'):
+            raise Exception(result.get('error', 'Session cleanup failed'))
+
+        context.report(1, 1)
+        result_file = None
+        if result.get('export_file') and os.path.exists(result['export_file']):
+            result_file = {
+                'path': result['export_file'],
+                'filename': os.path.basename(result['export_file']),
+                'content_type': 'text/csv'
+            }
+        return {'result': result, 'file': result_file}
+
+    def _run_sales_export(self, context):
+        from .saleslog_service import SalesLogService
+        from .export_service import export_service, SALES_EXPORT_HEADER, SALES_EXPORT_PROJECTION, sales_export_rows
+
+        params = context.params
+        filters = params.get('filters') or {}
+        file_format = params.get('file_format', 'csv')
+
+        sales_service = service_registry.get(SalesLogService)
+        total = sales_service.sales_log_collection.count_documents(sales_service._build_export_query(filters))
+        transactions = context.track(
+            sales_service.iter_transactions_for_export(filters, projection=SALES_EXPORT_PROJECTION),
+            total=total,
+            message='Exporting sales'
+        )
+
+        path, filename, content_type = export_service.write_file(
+            sales_export_rows(transactions),
+            SALES_EXPORT_HEADER,
+            context.work_dir(),
+            'sales_export',
+            file_format,
+            sheet_title='Sales'
+        )
+        return {
+            'result': {'exported_transactions': context.processed, 'file_format': file_format},
+            'file': {'path': path, 'filename': filename, 'content_type': content_type}
+        }
+
+
+# Singleton instance
+job_service = JobService()
@@ -0,0 +1,330 @@
+# app/services/metrics_service.py
+"""
+Request and MongoDB command metrics in Prometheus text format.
+
+`mongo_command_listener` is attached to the clients db_manager creates.
+Every command it sees is charged to the request that issued it: the
+RequestMetricsMiddleware opens a request scope in a context variable, the
+listener appends to it without locking, and the middleware folds the scope
+into the process-wide aggregates once per request. Commands issued outside
+a request (outbox and job workers, management commands) are charged to the
+`background` endpoint.
+
+Endpoints are labelled by their URL route pattern, not the raw path, so
+label cardinality stays bounded. Reply sizes are estimated by re-encoding
+one reply in METRICS_REPLY_BYTES_SAMPLE (0 disables it), which keeps the
+listener cheap enough to leave on.
+
+Metrics are per process. With several server workers each scrape sees the
+worker that answered it; the `pid` label tells them apart.
+"""
+
+import bisect
+import contextvars
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict
+from decouple import config
+from pymongo import monitoring
+import bson
+import logging
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_REPLY_BYTES_SAMPLE = config('METRICS_REPLY_BYTES_SAMPLE', default=10, cast=int)
+METRICS_SLOWEST_COMMANDS = config('METRICS_SLOWEST_COMMANDS', default=10, cast=int)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BACKGROUND_ENDPOINT = 'background'
+
+# Commands that are connection chatter rather than application queries
+IGNORED_COMMANDS = frozenset(('hello', 'ismaster', 'isMaster', 'ping', 'saslStart', 'saslContinue',
+                              'endSessions', 'buildInfo', 'getnonce', 'authenticate'))
+
+_current_scope = contextvars.ContextVar('metrics_request_scope', default=None)
+
+
+class RequestScope:
+    """MongoDB activity of a single request"""
+
+    __slots__ = ('endpoint', 'started', 'pending', 'commands', 'failed', 'command_seconds',
+                 'documents', 'reply_bytes')
+
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.pending = {}           # request_id -> (command, collection)
+        self.commands = []          # (command, collection, seconds)
+        self.failed = []            # command names
+        self.command_seconds = 0.0
+        self.documents = 0
+        self.reply_bytes = 0
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsService:
+    """Process-wide aggregates plus the Prometheus exposition"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collectors = []  # callables returning [(name, help, value)] gauges at scrape time
+        self._reset()
+
+    def _reset(self):
+        self.started_at = time.time()
+        self.request_latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))     # (method, endpoint)
+        self.request_commands = defaultdict(lambda: Histogram(COMMAND_COUNT_BUCKETS))  # endpoint
+        self.requests = defaultdict(int)              # (method, endpoint, status)
+        self.command_counts = defaultdict(int)        # (endpoint, command)
+        self.command_seconds = defaultdict(float)     # (endpoint, command)
+        self.command_failures = defaultdict(int)      # (endpoint, command)
+        self.reply_documents = defaultdict(int)       # endpoint
+        self.reply_bytes = defaultdict(int)           # endpoint
+        self.slowest = []                             # min-heap of (seconds, endpoint, command, collection)
+        self._sampled = 0
+
+    # ================================================================
+    # REQUEST SCOPE
+    # ================================================================
+
+    def begin_request(self):
+        """Open a scope for the current request; returns the token for end_request"""
+        scope = RequestScope()
+        return scope, _current_scope.set(scope)
+
+    def end_request(self, scope, token, method, endpoint, status_code):
+        _current_scope.reset(token)
+        elapsed = time.perf_counter() - scope.started
+        scope.endpoint = endpoint
+        with self._lock:
+            self.request_latency[(method, endpoint)].observe(elapsed)
+            self.request_commands[endpoint].observe(len(scope.commands))
+            self.requests[(method, endpoint, status_code)] += 1
+            self._fold(scope, endpoint)
+        return elapsed
+
+    def add_collector(self, collector):
+        """Register a callable whose (name, help, value) gauges are appended to every scrape"""
+        self._collectors.append(collector)
+
+    @staticmethod
+    def current_scope():
+        return _current_scope.get()
+
+    def _fold(self, scope, endpoint):
+        for command, collection, seconds in scope.commands:
+            key = (endpoint, command)
+            self.command_counts[key] += 1
+            self.command_seconds[key] += seconds
+            self._track_slowest(seconds, endpoint, command, collection)
+        for command in scope.failed:
+            self.command_failures[(endpoint, command)] += 1
+        self.reply_documents[endpoint] += scope.documents
+        self.reply_bytes[endpoint] += scope.reply_bytes
+
+    def _track_slowest(self, seconds, endpoint, command, collection):
+        entry = (seconds, endpoint, command, collection or '')
+        if len(self.slowest) < METRICS_SLOWEST_COMMANDS:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def _record_background(self, command, collection, seconds, documents, reply_bytes, failed=False):
+        with self._lock:
+            key = (BACKGROUND_ENDPOINT, command)
+            if failed:
+                self.command_failures[key] += 1
+                return
+            self.command_counts[key] += 1
+            self.command_seconds[key] += seconds
+            self.reply_documents[BACKGROUND_ENDPOINT] += documents
+            self.reply_bytes[BACKGROUND_ENDPOINT] += reply_bytes
+            self._track_slowest(seconds, BACKGROUND_ENDPOINT, command, collection)
+
+    def _sample_bytes(self, reply):
+        """Estimated size of a reply; only every Nth reply is actually measured"""
+        if METRICS_REPLY_BYTES_SAMPLE <= 0:
+            return 0
+        self._sampled += 1
+        if self._sampled % METRICS_REPLY_BYTES_SAMPLE:
+            return 0
+        try:
+            return len(bson.encode(reply)) * METRICS_REPLY_BYTES_SAMPLE
+        except Exception:
+            return 0
+
+    # ================================================================
+    # EXPOSITION
+    # ================================================================
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        pid = str(os.getpid())
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def sample(name, labels, value):
+            labels = dict(labels, pid=pid)
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {_number(value)}")
+
+        def histogram(name, labels, hist):
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                sample(f"{name}_bucket", dict(labels, le=_number(bound)), cumulative)
+            sample(f"{name}_bucket", dict(labels, le='+Inf'), hist.count)
+            sample(f"{name}_sum", labels, hist.total)
+            sample(f"{name}_count", labels, hist.count)
+
+        with self._lock:
+            metric('pos_process_start_time_seconds', 'gauge', 'Unix time the metrics were last reset')
+            sample('pos_process_start_time_seconds', {}, self.started_at)
+
+            metric('pos_http_requests_total', 'counter', 'HTTP requests by route and status')
+            for (method, endpoint, status_code), value in sorted(self.requests.items()):
+                sample('pos_http_requests_total',
+                       {'method': method, 'endpoint': endpoint, 'status': status_code}, value)
+
+            metric('pos_http_request_duration_seconds', 'histogram', 'HTTP request latency by route')
+            for (method, endpoint), hist in sorted(self.request_latency.items()):
+                histogram('pos_http_request_duration_seconds', {'method': method, 'endpoint': endpoint}, hist)
+
+            metric('pos_mongo_commands_per_request', 'histogram', 'MongoDB commands issued per request')
+            for endpoint, hist in sorted(self.request_commands.items()):
+                histogram('pos_mongo_commands_per_request', {'endpoint': endpoint}, hist)
+
+            metric('pos_mongo_commands_total', 'counter', 'MongoDB commands by route and command')
+            for (endpoint, command), value in sorted(self.command_counts.items()):
+                sample('pos_mongo_commands_total', {'endpoint': endpoint, 'command': command}, value)
+
+            metric('pos_mongo_command_seconds_total', 'counter', 'Time spent in MongoDB commands')
+            for (endpoint, command), value in sorted(self.command_seconds.items()):
+                sample('pos_mongo_command_seconds_total', {'endpoint': endpoint, 'command': command}, value)
+
+            metric('pos_mongo_command_failures_total', 'counter', 'MongoDB commands that failed')
+            for (endpoint, command), value in sorted(self.command_failures.items()):
+                sample('pos_mongo_command_failures_total', {'endpoint': endpoint, 'command': command}, value)
+
+            metric('pos_mongo_reply_documents_total', 'counter', 'Documents returned by MongoDB')
+            for endpoint, value in sorted(self.reply_documents.items()):
+                sample('pos_mongo_reply_documents_total', {'endpoint': endpoint}, value)
+
+            metric('pos_mongo_reply_bytes_total', 'counter', 'Estimated bytes returned by MongoDB (sampled)')
+            for endpoint, value in sorted(self.reply_bytes.items()):
+                sample('pos_mongo_reply_bytes_total', {'endpoint': endpoint}, value)
+
+            metric('pos_mongo_slowest_command_seconds', 'gauge', 'Slowest MongoDB commands seen by this process')
+            for rank, (seconds, endpoint, command, collection) in enumerate(sorted(self.slowest, reverse=True), 1):
+                sample('pos_mongo_slowest_command_seconds', {
+                    'rank': rank, 'endpoint': endpoint, 'command': command, 'collection': collection
+                }, seconds)
+
+        # Outside the lock: collectors may query the database
+        for collector in self._collectors:
+            try:
+                gauges = collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+                continue
+            for name, help_text, value in gauges:
+                if value is None:
+                    continue
+                metric(name, 'gauge', help_text)
+                sample(name, {}, value)
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Charges every MongoDB command to the request that issued it"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._background = {}  # request_id -> (command, collection), for commands outside a request
+
+    def started(self, event):
+        if not METRICS_ENABLED or event.command_name in IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        scope = _current_scope.get()
+        pending = scope.pending if scope is not None else self._background
+        pending[event.request_id] = (event.command_name, collection)
+
+    def succeeded(self, event):
+        scope = _current_scope.get()
+        pending = scope.pending if scope is not None else self._background
+        started = pending.pop(event.request_id, None)
+        if started is None:
+            return
+        command, collection = started
+        seconds = event.duration_micros / 1e6
+        documents = _reply_documents(event.reply)
+        reply_bytes = self.metrics._sample_bytes(event.reply)
+
+        if scope is None:
+            self.metrics._record_background(command, collection, seconds, documents, reply_bytes)
+            return
+        scope.commands.append((command, collection, seconds))
+        scope.command_seconds += seconds
+        scope.documents += documents
+        scope.reply_bytes += reply_bytes
+
+    def failed(self, event):
+        scope = _current_scope.get()
+        pending = scope.pending if scope is not None else self._background
+        started = pending.pop(event.request_id, None)
+        if started is None:
+            return
+        if scope is None:
+            self.metrics._record_background(started[0], started[1], 0, 0, 0, failed=True)
+            return
+        scope.failed.append(started[0])
+
+
+def _reply_documents(reply):
+    cursor = reply.get('cursor') if hasattr(reply, 'get') else None
+    if isinstance(cursor, dict):
+        batch = cursor.get('firstBatch', cursor.get('nextBatch'))
+        return len(batch) if batch is not None else 0
+    return 0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Singleton instances
+metrics_service = MetricsService()
+mongo_command_listener = MongoCommandListener(metrics_service)
@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta
 from ..database import db_manager
+from .sequence_service import sequence_service
+from .outbox_service import outbox_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,8 +21,7 @@ class OnlineTransactionService:
 
     # ------------------------- Helpers -------------------------
     def _generate_order_id(self) -> str:
-        count = self.online_transactions.count_documents({}) + 1
-        return f"ONLINE-{count:06d}"
+        return sequence_service.next_id('online_transactions')
 
     def _compute_items(self, items):
         computed = []
@@ -138,7 +139,21 @@ class OnlineTransactionService:
             'updated_at': now_utc,
         }
 
-        self.online_transactions.insert_one(order_record)
+        # Earned points are applied by the outbox worker, written together
+        # with the order so a crash cannot lose them
+        # Note: points_earned will be 0 if customer used loyalty points
+        points_earned = order_record.get('loyalty_points_earned', 0)
+        effects = []
+        if points_earned > 0 and customer:
+            effects.append(outbox_service.effect(
+                'loyalty',
+                customer_id=customer_id,
+                points=points_earned,
+                reason=f"Earned from order {order_id}",
+                order_id=order_id
+            ))
+
+        outbox_service.record('online_transactions', order_record, effects, source='online')
         doc = order_record
 
         # Deduct loyalty points from customer balance if points were redeemed
@@ -163,30 +178,6 @@ class OnlineTransactionService:
                 # Log error but don't fail the order creation
                 logger.error(f"Failed to deduct loyalty points for order {order_id}: {e}")
 
-        # Award loyalty points earned from this purchase
-        # Note: points_earned will be 0 if customer used loyalty points
-        points_earned = order_record.get('loyalty_points_earned', 0)
-        if points_earned > 0 and customer:
-            try:
-                self.customers.update_one(
-                    {'_id': customer_id},
-                    {
-                        '$inc': {'loyalty_points': points_earned},
-                        '$set': {'last_updated': now_utc},
-                        '$push': {
-                            'loyalty_history': {
-                                'points': points_earned,
-                                'reason': f"Earned from order {order_id}",
-                                'date': now_utc,
-                                'order_id': order_id
-                            }
-                        }
-                    }
-                )
-            except Exception as e:
-                # Log error but don't fail the order creation
-                logger.error(f"Failed to award loyalty points for order {order_id}: {e}")
-
         return {
             'success': True,
             'data': {
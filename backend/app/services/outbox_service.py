@@ -0,0 +1,356 @@
+# app/services/outbox_service.py
+"""
+Transactional outbox for sale side-effects.
+
+Recording a sale used to also insert notifications, audit entries, order
+history and loyalty updates on the cashier's request. Those side-effects are
+now written as small `outbox` documents together with the sale (inside one
+multi-document transaction where the deployment supports it) and delivered
+by a pool of background worker threads, which batch them by type with
+`insert_many` / `bulk_write` and retry failures with exponential backoff.
+
+Delivery is at-least-once. Loyalty and order-history effects are guarded by
+the outbox entry ID so a retried batch never applies them twice. Delivered
+entries get a `completed_at` and are removed by a TTL index a week later.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from bson import ObjectId
+from decouple import config
+from pymongo import UpdateOne
+from ..database import db_manager, supports_transactions
+from .sales_rollup_service import sales_rollup_service, ROLLUP_COLLECTIONS
+from .index_service import index_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKERS = config('OUTBOX_WORKERS', default=2, cast=int)
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=100, cast=int)
+OUTBOX_POLL_SECONDS = config('OUTBOX_POLL_SECONDS', default=1.0, cast=float)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_LEASE_SECONDS = 300  # a claimed entry is handed out again after this long
+OUTBOX_MAX_BACKOFF_SECONDS = 600
+
+
+class OutboxService:
+    """Writes side-effects next to the sale and drains them in the background"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._stop = False
+        self._pid = None
+        self._delivered_total = 0
+        self._failed_total = 0
+        self._indexes_ready = False
+        self._handlers = {
+            'notification': self._deliver_notifications,
+            'audit': self._deliver_audit_logs,
+            'order_history': self._deliver_order_history,
+            'loyalty': self._deliver_loyalty,
+        }
+
+    @property
+    def collection(self):
+        return db_manager.get_database().outbox
+
+    # ================================================================
+    # WRITE SIDE
+    # ================================================================
+
+    @staticmethod
+    def effect(effect_type, **payload):
+        """Describe one side-effect, e.g. effect('notification', title=..., message=...)"""
+        return {'type': effect_type, 'payload': payload}
+
+    def _build_entries(self, effects, source=None):
+        now = datetime.utcnow()
+        return [
+            {
+                '_id': ObjectId(),
+                'type': effect['type'],
+                'payload': effect['payload'],
+                'source': source,
+                'status': 'pending',
+                'attempts': 0,
+                'created_at': now,
+                'available_at': now,
+            }
+            for effect in effects
+        ]
+
+    def enqueue(self, effects, source=None, session=None):
+        """Queue side-effects; pass `session` to join an open transaction"""
+        if not effects:
+            return []
+
+        entries = self._build_entries(effects, source)
+        self.collection.insert_many(entries, session=session)
+        self._notify_workers()
+        return [entry['_id'] for entry in entries]
+
+    def record(self, collection_name, document, effects, source=None):
+        """
+        Insert a sale document and its side-effects as one operation.
+
+        Inside a transaction when the deployment supports it; otherwise the
+        outbox entries are written right after the sale, which only leaves
+        side-effects (never the sale) at risk if the process dies in between.
+
+        The sale's dashboard rollups are incremented after the sale is
+        stored, never inside the transaction: every sale in an hour hits the
+        same rollup document, and holding it in a transaction would make
+        concurrent sales conflict. A lost increment is logged and repaired by
+        check_sales_rollups --fix.
+        """
+        db = db_manager.get_database()
+        collection = db[collection_name]
+
+        if effects and supports_transactions(db):
+            def callback(session):
+                result = collection.insert_one(document, session=session)
+                self.enqueue(effects, source=source, session=session)
+                return result
+
+            # Retried on transient errors (write conflicts) and unknown commit results
+            with db.client.start_session() as session:
+                result = session.with_transaction(callback)
+        else:
+            result = collection.insert_one(document)
+            try:
+                self.enqueue(effects, source=source)
+            except Exception as e:
+                logger.error(f"Failed to queue side-effects for {collection_name} {result.inserted_id}: {e}")
+
+        if collection_name in ROLLUP_COLLECTIONS:
+            sales_rollup_service.record_sale(collection_name, document)
+        return result
+
+    # ================================================================
+    # WORKERS
+    # ================================================================
+
+    def ensure_workers(self, count=None):
+        """Start the worker pool once per process (restarted after fork)"""
+        count = OUTBOX_WORKERS if count is None else count
+        if count <= 0:
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and any(worker.is_alive() for worker in self._workers):
+                return
+
+            self._pid = os.getpid()
+            self._stop = False
+            self._ensure_indexes()
+            self._workers = [
+                threading.Thread(target=self._worker_loop, name=f"outbox-worker-{i}", daemon=True)
+                for i in range(count)
+            ]
+            for worker in self._workers:
+                worker.start()
+            logger.info(f"Started {count} outbox workers")
+
+    def stop_workers(self):
+        self._stop = True
+        self._wakeup.set()
+
+    def _ensure_indexes(self):
+        # Includes the TTL index that removes delivered entries
+        if self._indexes_ready:
+            return
+        try:
+            index_service.ensure(self.collection, 'outbox')
+            self._indexes_ready = True
+        except Exception as e:
+            logger.warning(f"Could not create outbox indexes: {e}")
+
+    def _notify_workers(self):
+        self.ensure_workers()
+        self._wakeup.set()
+
+    def _worker_loop(self):
+        while not self._stop:
+            try:
+                processed = self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}")
+                processed = 0
+
+            if not processed:
+                self._wakeup.wait(OUTBOX_POLL_SECONDS)
+                self._wakeup.clear()
+
+    def drain_once(self, batch_size=None):
+        """Claim and deliver one batch. Returns the number of entries handled."""
+        entries = self._claim_batch(batch_size or OUTBOX_BATCH_SIZE)
+        if not entries:
+            return 0
+
+        by_type = {}
+        for entry in entries:
+            by_type.setdefault(entry['type'], []).append(entry)
+
+        for effect_type, typed_entries in by_type.items():
+            handler = self._handlers.get(effect_type)
+            try:
+                if handler is None:
+                    raise ValueError(f"No outbox handler for '{effect_type}'")
+                handler(typed_entries)
+                self._mark_done(typed_entries)
+            except Exception as e:
+                logger.warning(f"Outbox delivery of {len(typed_entries)} '{effect_type}' entries failed: {e}")
+                self._schedule_retry(typed_entries, e)
+
+        return len(entries)
+
+    def _claim_batch(self, batch_size):
+        now = datetime.utcnow()
+        ready = {
+            '$or': [
+                {'status': 'pending', 'available_at': {'$lte': now}},
+                # Entries held by a worker that died mid-batch
+                {'status': 'processing', 'claimed_at': {'$lt': now - timedelta(seconds=OUTBOX_LEASE_SECONDS)}},
+            ]
+        }
+        candidate_ids = [
+            entry['_id'] for entry in
+            self.collection.find(ready, {'_id': 1}).sort('available_at', 1).limit(batch_size)
+        ]
+        if not candidate_ids:
+            return []
+
+        claim = str(ObjectId())
+        self.collection.update_many(
+            {'_id': {'$in': candidate_ids}, **ready},
+            {'$set': {'status': 'processing', 'claim': claim, 'claimed_at': now}}
+        )
+        return list(self.collection.find({'claim': claim, 'status': 'processing'}))
+
+    def _mark_done(self, entries):
+        self.collection.update_many(
+            {'_id': {'$in': [entry['_id'] for entry in entries]}},
+            {'$set': {'status': 'done', 'completed_at': datetime.utcnow()}, '$unset': {'claim': ''}}
+        )
+        self._delivered_total += len(entries)
+
+    def _schedule_retry(self, entries, error):
+        now = datetime.utcnow()
+        operations = []
+        for entry in entries:
+            attempts = entry.get('attempts', 0) + 1
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                update = {'$set': {'status': 'failed', 'attempts': attempts, 'last_error': str(error), 'failed_at': now}}
+                self._failed_total += 1
+            else:
+                backoff = min(OUTBOX_MAX_BACKOFF_SECONDS, 2 ** attempts)
+                update = {'$set': {
+                    'status': 'pending',
+                    'attempts': attempts,
+                    'last_error': str(error),
+                    'available_at': now + timedelta(seconds=backoff)
+                }}
+            update['$unset'] = {'claim': ''}
+            operations.append(UpdateOne({'_id': entry['_id']}, update))
+        self.collection.bulk_write(operations, ordered=False)
+
+    # ================================================================
+    # HANDLERS (one batch of same-type entries each)
+    # ================================================================
+
+    def _deliver_notifications(self, entries):
+        from notifications.services import notification_service
+        notification_service.create_notifications_bulk([entry['payload'] for entry in entries])
+
+    def _deliver_audit_logs(self, entries):
+        from .audit_service import AuditLogService
+        AuditLogService().create_audit_logs_bulk([entry['payload'] for entry in entries])
+
+    def _deliver_order_history(self, entries):
+        db = db_manager.get_database()
+        operations = []
+        for entry in entries:
+            payload = entry['payload']
+            order_data = payload.get('order_data') or {}
+            operations.append(UpdateOne(
+                {
+                    '_id': payload['customer_id'],
+                    'isDeleted': {'$ne': True},
+                    'order_history.outbox_id': {'$ne': entry['_id']}
+                },
+                {
+                    '$push': {'order_history': {
+                        'order_id': order_data.get('order_id'),
+                        'total_amount': order_data.get('total_amount', 0),
+                        'items': order_data.get('items', []),
+                        'date': entry['created_at'],
+                        'status': order_data.get('status', 'completed'),
+                        'outbox_id': entry['_id']
+                    }},
+                    '$set': {'last_purchase': entry['created_at'], 'last_updated': datetime.utcnow()}
+                }
+            ))
+        db.customers.bulk_write(operations, ordered=False)
+
+    def _deliver_loyalty(self, entries):
+        db = db_manager.get_database()
+        operations = []
+        for entry in entries:
+            payload = entry['payload']
+            operations.append(UpdateOne(
+                {'_id': payload['customer_id'], 'loyalty_history.outbox_id': {'$ne': entry['_id']}},
+                {
+                    '$inc': {'loyalty_points': payload['points']},
+                    '$set': {'last_updated': datetime.utcnow()},
+                    '$push': {'loyalty_history': {
+                        'points': payload['points'],
+                        'reason': payload.get('reason', ''),
+                        'date': entry['created_at'],
+                        'order_id': payload.get('order_id'),
+                        'outbox_id': entry['_id']
+                    }}
+                }
+            ))
+        db.customers.bulk_write(operations, ordered=False)
+
+    # ================================================================
+    # METRICS
+    # ================================================================
+
+    def get_metrics(self):
+        """Queue depth per status/type and the age of the oldest pending entry"""
+        now = datetime.utcnow()
+        depth = {'pending': 0, 'processing': 0, 'failed': 0}
+        by_type = {}
+        pipeline = [
+            {'$match': {'status': {'$in': ['pending', 'processing', 'failed']}}},
+            {'$group': {'_id': {'status': '$status', 'type': '$type'}, 'count': {'$sum': 1}}}
+        ]
+        for row in self.collection.aggregate(pipeline):
+            status, effect_type = row['_id']['status'], row['_id']['type']
+            depth[status] += row['count']
+            by_type.setdefault(effect_type, {})[status] = row['count']
+
+        oldest = self.collection.find_one(
+            {'status': {'$in': ['pending', 'processing']}},
+            {'created_at': 1},
+            sort=[('created_at', 1)]
+        )
+        lag_seconds = (now - oldest['created_at']).total_seconds() if oldest else 0.0
+
+        return {
+            'queue_depth': depth,
+            'by_type': by_type,
+            'lag_seconds': round(lag_seconds, 3),
+            'workers_alive': sum(1 for worker in self._workers if worker.is_alive()),
+            'delivered_total': self._delivered_total,
+            'failed_total': self._failed_total,
+        }
+
+
+# Singleton instance - one worker pool per process
+outbox_service = OutboxService()
@@ -0,0 +1,175 @@
+# app/services/pagination_service.py
+"""
+Keyset (cursor) pagination for listing endpoints.
+
+A page is fetched with a range condition on (sort field, _id) instead of
+skip(), so page 10,000 costs the same as page 1 when a compound
+{sort field, _id} index exists. The index must be declared in
+INDEX_MANIFEST; it is created from there on first use. Cursors are opaque
+URL-safe tokens carrying the last row's sort value and _id.
+
+Totals are optional:
+    'approximate'  estimated_document_count() for unfiltered listings,
+                   otherwise count_documents() capped at
+                   PAGINATION_APPROX_COUNT_LIMIT (default)
+    'exact'        count_documents()
+    'none'         no count at all
+
+Legacy page/limit requests keep working through skip() and receive a
+next_cursor so clients can switch over.
+"""
+
+import base64
+import json
+import threading
+from bson import json_util
+from decouple import config
+from .index_service import index_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+PAGINATION_APPROX_COUNT_LIMIT = config('PAGINATION_APPROX_COUNT_LIMIT', default=10000, cast=int)
+TOTAL_MODES = ('approximate', 'exact', 'none')
+
+
+class PaginationService:
+    """Builds keyset pages over any pymongo collection"""
+
+    def __init__(self):
+        self._indexed = set()
+        self._lock = threading.Lock()
+
+    # ================================================================
+    # CURSOR TOKENS
+    # ================================================================
+
+    def encode_cursor(self, sort_field, direction, document):
+        payload = {'f': sort_field, 'd': direction, 'i': document['_id']}
+        if sort_field != '_id':
+            payload['v'] = document.get(sort_field)
+        raw = json_util.dumps(payload).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, token, sort_field, direction):
+        """Return (sort value, _id); ValueError for tampered or foreign tokens"""
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        except (ValueError, TypeError, json.JSONDecodeError):
+            raise ValueError('Invalid pagination cursor')
+
+        if not isinstance(payload, dict) or payload.get('f') != sort_field or payload.get('d') != direction or 'i' not in payload:
+            raise ValueError('Pagination cursor does not match this listing')
+        return payload.get('v'), payload['i']
+
+    @staticmethod
+    def total_mode(value):
+        """Normalise a ?total= query parameter"""
+        value = (value or 'approximate').lower()
+        if value not in TOTAL_MODES:
+            raise ValueError(f"total must be one of {', '.join(TOTAL_MODES)}")
+        return value
+
+    # ================================================================
+    # PAGING
+    # ================================================================
+
+    def paginate(self, collection, query=None, sort_field='_id', direction=-1, limit=50,
+                 cursor=None, page=None, projection=None, total='approximate'):
+        """
+        Fetch one page. With `cursor` the page starts after that row;
+        otherwise `page` (1-based, default 1) is served with skip().
+
+        Returns {'items', 'limit', 'has_more', 'next_cursor', 'total',
+        'total_is_exact', 'page'}; page is None for cursor requests.
+        """
+        query = query or {}
+        limit = max(1, int(limit))
+        total = self.total_mode(total)
+        self._ensure_sort_index(collection, sort_field, direction)
+
+        sort = [('_id', direction)] if sort_field == '_id' else [(sort_field, direction), ('_id', direction)]
+
+        if cursor:
+            value, last_id = self.decode_cursor(cursor, sort_field, direction)
+            find_query = {'$and': [query, self._after(sort_field, direction, value, last_id)]} if query \
+                else self._after(sort_field, direction, value, last_id)
+            rows = list(collection.find(find_query, projection).sort(sort).limit(limit + 1))
+            page = None
+        else:
+            page = max(1, int(page or 1))
+            rows = list(collection.find(query, projection).sort(sort).skip((page - 1) * limit).limit(limit + 1))
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = self.encode_cursor(sort_field, direction, rows[-1]) if has_more else None
+
+        count, exact = self._count(collection, query, total)
+        return {
+            'items': rows,
+            'limit': limit,
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+            'total': count,
+            'total_is_exact': exact,
+            'page': page
+        }
+
+    def _after(self, sort_field, direction, value, last_id):
+        """Range condition for rows strictly after (value, last_id) in sort order"""
+        id_op = '$gt' if direction > 0 else '$lt'
+        if sort_field == '_id':
+            return {'_id': {id_op: last_id}}
+
+        # Missing/null sort values sort lowest: last when descending,
+        # first when ascending
+        if value is None:
+            tie = {sort_field: None, '_id': {id_op: last_id}}
+            return tie if direction < 0 else {'$or': [tie, {sort_field: {'$ne': None}}]}
+
+        value_op = '$gt' if direction > 0 else '$lt'
+        conditions = [
+            {sort_field: {value_op: value}},
+            {sort_field: value, '_id': {id_op: last_id}}
+        ]
+        if direction < 0:
+            conditions.append({sort_field: None})
+        return {'$or': conditions}
+
+    def _count(self, collection, query, mode):
+        if mode == 'none':
+            return None, False
+        if mode == 'exact':
+            return collection.count_documents(query), True
+        if not query:
+            return collection.estimated_document_count(), False
+
+        capped = collection.count_documents(query, limit=PAGINATION_APPROX_COUNT_LIMIT)
+        return capped, capped < PAGINATION_APPROX_COUNT_LIMIT
+
+    def _ensure_sort_index(self, collection, sort_field, direction):
+        if sort_field == '_id':
+            return
+        key = (collection.database.name, collection.name, sort_field, direction)
+        if key in self._indexed:
+            return
+        with self._lock:
+            if key in self._indexed:
+                return
+            keys = [(sort_field, direction), ('_id', direction)]
+            if not index_service.declares(collection.name, keys):
+                logger.warning(
+                    f"No keyset index for {collection.name} sorted by {sort_field} {direction}; "
+                    f"declare {keys} in INDEX_MANIFEST"
+                )
+            else:
+                try:
+                    index_service.ensure(collection)
+                except Exception as e:
+                    logger.warning(f"Could not create keyset index on {collection.name}.{sort_field}: {e}")
+            self._indexed.add(key)
+
+
+# Singleton instance
+pagination_service = PaginationService()
@@ -0,0 +1,155 @@
+# app/services/password_service.py
+"""
+Bounded worker pool for bcrypt.
+
+bcrypt is deliberately slow, and hashing on the request thread let a burst
+of logins (shift change, a customer-app promo) take every CPU the workers
+had. Password hashing and verification now run on a small dedicated thread
+pool (bcrypt releases the GIL, so PASSWORD_WORKERS caps how many cores it
+can use). At most PASSWORD_QUEUE_LIMIT calls may wait behind the running
+ones; beyond that a call is rejected at once with PasswordServiceBusy,
+which the login views turn into a 503 with Retry-After.
+
+Hashes are created with BCRYPT_ROUNDS. When a user logs in with a hash
+made at a different cost, the password is rehashed at the configured cost
+and the caller stores the new hash.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from decouple import config
+import bcrypt
+import logging
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=12, cast=int)
+PASSWORD_WORKERS = config('PASSWORD_WORKERS', default=max(1, (os.cpu_count() or 2) // 2), cast=int)
+PASSWORD_QUEUE_LIMIT = config('PASSWORD_QUEUE_LIMIT', default=32, cast=int)
+PASSWORD_TIMEOUT_SECONDS = config('PASSWORD_TIMEOUT_SECONDS', default=10, cast=float)
+PASSWORD_RETRY_AFTER_SECONDS = 2
+
+
+class PasswordServiceBusy(Exception):
+    """Raised when the bcrypt pool is saturated; answer 503 and let the client retry"""
+
+    retry_after = PASSWORD_RETRY_AFTER_SECONDS
+
+
+class PasswordService:
+    """Runs bcrypt on a bounded executor"""
+
+    def __init__(self, workers=None, queue_limit=None, rounds=None):
+        self.workers = workers or PASSWORD_WORKERS
+        self.queue_limit = PASSWORD_QUEUE_LIMIT if queue_limit is None else queue_limit
+        self.rounds = rounds or BCRYPT_ROUNDS
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self.rejected = 0
+
+    # ================================================================
+    # PUBLIC API
+    # ================================================================
+
+    def hash(self, password):
+        """bcrypt hash of `password` at the configured cost"""
+        if not password:
+            raise ValueError("Password cannot be empty")
+        return self._run(self._hash, password)
+
+    def verify(self, password, hashed):
+        """True when `password` matches `hashed`; malformed input is simply False"""
+        if not password or not hashed:
+            return False
+        return self._run(self._check, password, hashed)
+
+    def verify_and_rehash(self, password, hashed):
+        """
+        Verify a login and upgrade the hash when its cost is out of date.
+
+        Returns (valid, new_hash); new_hash is None unless the caller should
+        store it. A saturated pool only skips the upgrade, never the login.
+        """
+        valid = self.verify(password, hashed)
+        if not valid or not self.needs_rehash(hashed):
+            return valid, None
+        try:
+            return True, self.hash(password)
+        except PasswordServiceBusy:
+            return True, None
+        except Exception as e:
+            logger.warning(f"Password rehash failed: {e}")
+            return True, None
+
+    def needs_rehash(self, hashed):
+        """True when `hashed` is a bcrypt hash made with a different cost"""
+        try:
+            parts = hashed.split('$')
+            return parts[1].startswith('2') and int(parts[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return False
+
+    def stats(self):
+        with self._lock:
+            in_use = 0 if self._slots is None else self.workers + self.queue_limit - self._slots._value
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": in_use,
+            "rejected": self.rejected,
+        }
+
+    # ================================================================
+    # EXECUTOR
+    # ================================================================
+
+    def _hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+    @staticmethod
+    def _check(password, hashed):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        except Exception:
+            return False
+
+    def _run(self, fn, *args):
+        executor, slots = self._ensure_executor()
+        if not slots.acquire(blocking=False):
+            self.rejected += 1
+            logger.warning("Password pool saturated; rejecting request")
+            raise PasswordServiceBusy("Too many sign-in attempts in progress, please retry shortly")
+
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=PASSWORD_TIMEOUT_SECONDS)
+        except FutureTimeout:
+            future.cancel()
+            self.rejected += 1
+            raise PasswordServiceBusy("Sign-in is taking too long, please retry shortly")
+
+    def _ensure_executor(self):
+        with self._lock:
+            # Threads do not survive a fork; each worker process gets its own pool
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='bcrypt'
+                )
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+
+# Singleton instance
+password_service = PasswordService()
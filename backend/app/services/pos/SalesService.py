@@ -1,7 +1,10 @@
 from datetime import datetime
 from bson import ObjectId
 from ...database import db_manager
-from notifications.services import notification_service
+from ..outbox_service import outbox_service
+from ..sales_rollup_service import sales_rollup_service
+from ..export_service import EXPORT_BATCH_SIZE
+from ..pagination_service import pagination_service
 from .promotionCon import PromoConnection
 
 class SalesService:
@@ -80,11 +83,12 @@ class SalesService:
                 'last_updated': datetime.utcnow()
             }
 
-            result = self.sales_collection.insert_one(sales_record)
-            sales_record['_id'] = str(result.inserted_id)
-
-            # Send notification
-            self._send_sale_notification(sales_record, 'pos_sale_created')
+            # The notification is delivered by the outbox worker, written
+            # in the same operation as the sale
+            sales_record['_id'] = ObjectId()
+            effect = self._sale_notification_effect(sales_record, 'pos_sale_created')
+            outbox_service.record('sales', sales_record, [effect], source='pos')
+            sales_record['_id'] = str(sales_record['_id'])
 
             return {
                 'success': True,
@@ -98,46 +102,9 @@ class SalesService:
     def _create_sales_log(self, sale_data, source):
         """Create sales log style record"""
         try:
-            # Convert POS format to sales log format if needed
-            if 'items' in sale_data and isinstance(sale_data['items'], list):
-                # Convert POS items format to sales log item_list format
-                item_list = []
-                for item in sale_data['items']:
-                    item_list.append({
-                        'item_code': item.get('product_id', ''),
-                        'item_name': item.get('product_name', ''),
-                        'quantity': item.get('quantity', 0),
-                        'unit_price': item.get('price', 0),
-                        'total_price': item.get('price', 0) * item.get('quantity', 0),
-                        'unit_of_measure': item.get('unit', 'pc'),
-                        'tax_amount': 0,
-                        'imported_from_csv': source == 'csv'
-                    })
-            else:
-                item_list = sale_data.get('item_list', [])
-
-            sales_log_record = {
-                'customer_id': ObjectId(sale_data['customer_id']) if sale_data.get('customer_id') else None,
-                'user_id': ObjectId(sale_data['user_id']) if sale_data.get('user_id') else None,
-                'transaction_date': sale_data.get('transaction_date', datetime.utcnow()),
-                'total_amount': sale_data['total_amount'],
-                'status': sale_data.get('status', 'completed'),
-                'payment_method': sale_data.get('payment_method', 'cash'),
-                'sales_type': sale_data.get('sales_type', 'retail'),
-                'tax_rate': sale_data.get('tax_rate', 0),
-                'tax_amount': sale_data.get('tax_amount', 0),
-                'is_taxable': sale_data.get('is_taxable', False),
-                'notes': sale_data.get('notes', ''),
-                'item_list': item_list,
-                'source': source,
-                'sync_logs': sale_data.get('sync_logs', [])
-            }
-
-            result = self.sales_log_collection.insert_one(sales_log_record)
-            sales_log_record['_id'] = str(result.inserted_id)
-
-            # Send notification
-            self._send_sale_notification(sales_log_record, f'{source}_sale_created')
+            sales_log_record = self.build_sales_log_record(sale_data, source)
+            effect = self._sale_notification_effect(sales_log_record, f'{source}_sale_created')
+            outbox_service.record('sales_log', sales_log_record, [effect], source=source)
 
             return {
                 'success': True,
@@ -148,45 +115,125 @@ class SalesService:
         except Exception as e:
             raise Exception(f"Error creating sales log: {str(e)}")
 
-    def _send_sale_notification(self, sale_record, notification_type):
-        """Send notification for sale creation"""
+    def build_sales_log_record(self, sale_data, source):
+        """Map POS or sales-log style input to a sales_log document (with a new _id)"""
+        # Convert POS format to sales log format if needed
+        if 'items' in sale_data and isinstance(sale_data['items'], list):
+            # Convert POS items format to sales log item_list format
+            item_list = []
+            for item in sale_data['items']:
+                item_list.append({
+                    'item_code': item.get('product_id', ''),
+                    'item_name': item.get('product_name', ''),
+                    'quantity': item.get('quantity', 0),
+                    'unit_price': item.get('price', 0),
+                    'total_price': item.get('price', 0) * item.get('quantity', 0),
+                    'unit_of_measure': item.get('unit', 'pc'),
+                    'tax_amount': 0,
+                    'imported_from_csv': source == 'csv'
+                })
+        else:
+            item_list = sale_data.get('item_list', [])
+
+        return {
+            '_id': ObjectId(),
+            'customer_id': ObjectId(sale_data['customer_id']) if sale_data.get('customer_id') else None,
+            'user_id': ObjectId(sale_data['user_id']) if sale_data.get('user_id') else None,
+            'transaction_date': sale_data.get('transaction_date', datetime.utcnow()),
+            'total_amount': sale_data['total_amount'],
+            'status': sale_data.get('status', 'completed'),
+            'payment_method': sale_data.get('payment_method', 'cash'),
+            'sales_type': sale_data.get('sales_type', 'retail'),
+            'tax_rate': sale_data.get('tax_rate', 0),
+            'tax_amount': sale_data.get('tax_amount', 0),
+            'is_taxable': sale_data.get('is_taxable', False),
+            'notes': sale_data.get('notes', ''),
+            'item_list': item_list,
+            'source': source,
+            'sync_logs': sale_data.get('sync_logs', [])
+        }
+
+    def bulk_create_sales_logs(self, records, existing_ok=False):
+        """
+        Insert prepared sales_log documents (see build_sales_log_record) with
+        one unordered insert_many and add them to the rollups in one merged
+        bulk write. No per-sale notification is queued; bulk callers send a
+        single summary instead.
+
+        With existing_ok every record carries an `import_key` (unique index,
+        see INDEX_MANIFEST) and is upserted on it instead: a record whose key
+        is already stored counts as inserted but is not added to the rollups
+        again, which makes a resumed import replaying its batch idempotent.
+
+        Returns (inserted documents, [{'index': position, 'error': message}]).
+        """
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        if not records:
+            return [], []
+
+        errors = []
+        upserted = None
         try:
-            total_amount = sale_record.get('total_amount', 0)
-            source = sale_record.get('source', 'unknown')
-            
-            if notification_type == 'pos_sale_created':
-                title = "POS Sale Completed"
-                message = f"New POS transaction completed for ₱{total_amount}"
-                priority = "low"
-            elif notification_type == 'csv_sale_created':
-                title = "CSV Sale Imported"
-                message = f"Sale imported from CSV for ₱{total_amount}"
-                priority = "low"
-            elif notification_type == 'manual_sale_created':
-                title = "Manual Sale Entered"
-                message = f"Manual sale entry for ₱{total_amount}"
-                priority = "low"
+            if existing_ok:
+                result = self.sales_log_collection.bulk_write([
+                    UpdateOne({'import_key': record['import_key']}, {'$setOnInsert': record}, upsert=True)
+                    for record in records
+                ], ordered=False)
+                upserted = set(result.upserted_ids)
             else:
-                title = "Sale Created"
-                message = f"New sale recorded for ₱{total_amount}"
-                priority = "low"
+                self.sales_log_collection.insert_many(records, ordered=False)
+        except BulkWriteError as e:
+            errors = [
+                {'index': error['index'], 'error': error.get('errmsg', 'Write failed')}
+                for error in e.details.get('writeErrors', [])
+            ]
+            if existing_ok:
+                upserted = {item['index'] for item in e.details.get('upserted', [])}
 
-            notification_service.create_notification(
-                title=title,
-                message=message,
-                priority=priority,
-                notification_type="sales",
-                metadata={
-                    "sale_id": str(sale_record.get('_id', '')),
-                    "total_amount": total_amount,
-                    "source": source,
-                    "payment_method": sale_record.get('payment_method', ''),
-                    "action_type": notification_type
-                }
-            )
+        failed = {error['index'] for error in errors}
+        inserted = [record for position, record in enumerate(records) if position not in failed]
+        new = [
+            record for position, record in enumerate(records)
+            if position not in failed and (upserted is None or position in upserted)
+        ]
+        if new:
+            sales_rollup_service.record_sales('sales_log', new)
+        return inserted, errors
 
-        except Exception as notification_error:
-            print(f"Failed to create sale notification: {notification_error}")
+    def _sale_notification_effect(self, sale_record, notification_type):
+        """Build the outbox effect announcing a new sale"""
+        total_amount = sale_record.get('total_amount', 0)
+        source = sale_record.get('source', 'unknown')
+
+        if notification_type == 'pos_sale_created':
+            title = "POS Sale Completed"
+            message = f"New POS transaction completed for ₱{total_amount}"
+        elif notification_type == 'csv_sale_created':
+            title = "CSV Sale Imported"
+            message = f"Sale imported from CSV for ₱{total_amount}"
+        elif notification_type == 'manual_sale_created':
+            title = "Manual Sale Entered"
+            message = f"Manual sale entry for ₱{total_amount}"
+        else:
+            title = "Sale Created"
+            message = f"New sale recorded for ₱{total_amount}"
+
+        return outbox_service.effect(
+            'notification',
+            title=title,
+            message=message,
+            priority="low",
+            notification_type="sales",
+            metadata={
+                "sale_id": str(sale_record.get('_id', '')),
+                "total_amount": total_amount,
+                "source": source,
+                "payment_method": sale_record.get('payment_method', ''),
+                "action_type": notification_type
+            }
+        )
 
     def get_pos_sale_by_id(self, sale_id):
         """Get a POS sale by ID from sales collection only"""
@@ -269,12 +316,15 @@ class SalesService:
             # Remove _id from update_data if present
             update_data.pop('_id', None)
             
-            result = self.sales_log_collection.update_one(
+            before = self.sales_log_collection.find_one_and_update(
                 {"_id": log_id},
                 {"$set": update_data}
             )
             
-            if result.modified_count > 0:
+            if before is not None:
+                sales_rollup_service.replace_sale(
+                    'sales_log', before, self.sales_log_collection.find_one({"_id": log_id})
+                )
                 return self.get_sales_log_by_id(log_id)
             else:
                 return None
@@ -290,9 +340,11 @@ class SalesService:
             if isinstance(log_id, str):
                 log_id = ObjectId(log_id)
             
-            result = self.sales_log_collection.delete_one({"_id": log_id})
+            deleted = self.sales_log_collection.find_one_and_delete({"_id": log_id})
+            if deleted is not None:
+                sales_rollup_service.remove_sale('sales_log', deleted)
             
-            return result.deleted_count > 0
+            return deleted is not None
             
         except Exception as e:
             raise Exception(f"Error deleting sales log: {str(e)}")
@@ -313,12 +365,12 @@ class SalesService:
         except Exception as e:
             raise Exception(f"Error retrieving sales logs: {str(e)}")
 
-    def get_sales_logs_paginated(self, page=1, page_size=50, filters=None):
+    def get_sales_logs_paginated(self, page=1, page_size=50, filters=None, cursor=None, total='approximate'):
         """
         ✅ MISSING METHOD: Get sales logs with advanced pagination and filtering
+        Pass the previous response's next_cursor as `cursor` for keyset paging.
         """
         try:
-            skip = (page - 1) * page_size
             query = {}
             
             # Apply filters if provided
@@ -341,98 +393,102 @@ class SalesService:
                         pass  # Skip invalid customer_id
             
             # Get logs with pagination
-            logs = list(self.sales_log_collection.find(query).skip(skip).limit(page_size))
-            total_count = self.sales_log_collection.count_documents(query)
-            total_pages = (total_count + page_size - 1) // page_size
-            
-            # Convert ObjectIds
-            for log in logs:
-                self.convert_object_id(log)
+            result = pagination_service.paginate(
+                self.sales_log_collection, query, sort_field='_id', direction=1,
+                limit=page_size, cursor=cursor, page=page, total=total
+            )
+            total_count = result['total']
+            total_pages = (total_count + page_size - 1) // page_size if total_count is not None else None
             
             return {
-                "data": logs,
+                "data": [self.convert_object_id(log) for log in result['items']],
                 "pagination": {
-                    "current_page": page,
+                    "current_page": result['page'],
                     "page_size": page_size,
                     "total_records": total_count,
+                    "total_is_exact": result['total_is_exact'],
                     "total_pages": total_pages,
-                    "has_next": page < total_pages,
-                    "has_prev": page > 1
+                    "has_next": result['has_more'],
+                    "has_prev": bool(cursor) or page > 1,
+                    "next_cursor": result['next_cursor']
                 },
                 "filters_applied": filters or {}
             }
             
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving paginated sales logs: {str(e)}")
 
     def get_sales_logs_for_export(self, filters=None):
         """
-        ✅ MISSING METHOD: Get sales logs for export with filtering
+        ✅ MISSING METHOD: Get sales logs for export with filtering (no row cap)
         """
         try:
-            query = {}
-            
-            # Apply filters if provided
-            if filters:
-                # Date range filtering
-                if filters.get('start_date') and filters.get('end_date'):
-                    try:
-                        from django.utils.dateparse import parse_date
-                        from datetime import time
-                        
-                        # Parse dates
-                        if isinstance(filters['start_date'], str):
-                            start_date = parse_date(filters['start_date'])
-                        else:
-                            start_date = filters['start_date']
-                        
-                        if isinstance(filters['end_date'], str):
-                            end_date = parse_date(filters['end_date'])
-                        else:
-                            end_date = filters['end_date']
-                        
-                        if start_date and end_date:
-                            start_datetime = datetime.combine(start_date, time.min)
-                            end_datetime = datetime.combine(end_date, time.max)
-                            query['transaction_date'] = {
-                                '$gte': start_datetime, 
-                                '$lte': end_datetime
-                            }
-                    except Exception as date_error:
-                        print(f"Date parsing error: {date_error}")
-                
-                # Other filters
-                if filters.get('sales_type'):
-                    query['sales_type'] = filters['sales_type']
-                if filters.get('payment_method'):
-                    query['payment_method'] = filters['payment_method']
-                if filters.get('status'):
-                    query['status'] = filters['status']
-                if filters.get('source'):
-                    query['source'] = filters['source']
-                if filters.get('customer_id'):
-                    try:
-                        query['customer_id'] = ObjectId(filters['customer_id'])
-                    except:
-                        pass
-            
-            print(f"Export query: {query}")
-            
-            # Get transactions with a reasonable limit for export
-            transactions = list(self.sales_log_collection.find(query).limit(10000))
-            
-            print(f"Found {len(transactions)} transactions for export")
-            
-            # Convert ObjectIds to strings
-            for transaction in transactions:
+            return [
                 self.convert_object_id(transaction)
-            
-            return transactions
-            
+                for transaction in self.iter_sales_logs_for_export(filters)
+            ]
         except Exception as e:
             print(f"Error in get_sales_logs_for_export: {str(e)}")
             raise Exception(f"Error retrieving sales logs for export: {str(e)}")
 
+    def iter_sales_logs_for_export(self, filters=None, projection=None, batch_size=EXPORT_BATCH_SIZE):
+        """Cursor over the export rows, fetched `batch_size` documents at a time"""
+        query = self._build_export_query(filters)
+        print(f"Export query: {query}")
+        return self.sales_log_collection.find(query, projection).batch_size(batch_size)
+
+    def _build_export_query(self, filters=None):
+        """Mongo query for the export filters"""
+        query = {}
+        
+        # Apply filters if provided
+        if filters:
+            # Date range filtering
+            if filters.get('start_date') and filters.get('end_date'):
+                try:
+                    from django.utils.dateparse import parse_date
+                    from datetime import time
+                    
+                    # Parse dates
+                    if isinstance(filters['start_date'], str):
+                        start_date = parse_date(filters['start_date'])
+                    else:
+                        start_date = filters['start_date']
+                    
+                    if isinstance(filters['end_date'], str):
+                        end_date = parse_date(filters['end_date'])
+                    else:
+                        end_date = filters['end_date']
+                    
+                    if start_date and end_date:
+                        start_datetime = datetime.combine(start_date, time.min)
+                        end_datetime = datetime.combine(end_date, time.max)
+                        query['transaction_date'] = {
+                            '$gte': start_datetime, 
+                            '$lte': end_datetime
+                        }
+                except Exception as date_error:
+                    print(f"Date parsing error: {date_error}")
+            
+            # Other filters
+            if filters.get('sales_type'):
+                query['sales_type'] = filters['sales_type']
+            if filters.get('payment_method'):
+                query['payment_method'] = filters['payment_method']
+            if filters.get('status'):
+                query['status'] = filters['status']
+            if filters.get('source'):
+                query['source'] = filters['source']
+            if filters.get('customer_id'):
+                try:
+                    query['customer_id'] = ObjectId(filters['customer_id'])
+                except:
+                    pass
+        
+        return query
+
     def get_sales_by_date_range(self, start_date, end_date, source=None):
         """
         ✅ COMPLETE THIS METHOD: Get sales by date range
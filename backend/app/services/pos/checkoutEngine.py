@@ -0,0 +1,287 @@
+from bson import ObjectId
+from pymongo import UpdateOne
+from ...database import db_manager, supports_transactions
+from ..outbox_service import outbox_service
+from ..sales_rollup_service import sales_rollup_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Only the fields checkout actually needs from each product
+CHECKOUT_PRODUCT_PROJECTION = {
+    'product_name': 1,
+    'SKU': 1,
+    'stock': 1,
+    'low_stock_threshold': 1,
+    'category_id': 1,
+    'subcategory_name': 1,
+    'sub_category': 1,
+    'cost_price': 1,
+    'selling_price': 1,
+    'supplier_id': 1,
+    'isDeleted': 1,
+}
+
+
+class CheckoutEngine:
+    """
+    Batched stock handling for POS checkout.
+
+    The whole cart is resolved with a single `$in` query and stock is
+    decremented with a single `bulk_write` of conditional `$inc` updates
+    (guarded by `stock >= qty`). On replica sets the decrement and the sale
+    insert run in one multi-document transaction; on a standalone server a
+    failed guard is compensated so no partial decrement is left behind.
+    """
+
+    def __init__(self, db=None):
+        self.db = db if db is not None else db_manager.get_database()
+        self.products_collection = self.db.products
+        self.sales_collection = self.db.sales
+        self._supports_transactions = None
+
+    # ================================================================
+    # HELPERS
+    # ================================================================
+
+    @staticmethod
+    def product_key(product_id):
+        """Products use PROD-##### string IDs; legacy ones may be ObjectIds"""
+        if isinstance(product_id, ObjectId):
+            return product_id
+        product_id = str(product_id)
+        if ObjectId.is_valid(product_id):
+            return ObjectId(product_id)
+        return product_id
+
+    @staticmethod
+    def aggregate_quantities(checkout_data):
+        """Sum quantities per product so repeated cart lines share one guard"""
+        quantities = {}
+        for item in checkout_data:
+            key = str(item['product_id'])
+            quantities[key] = quantities.get(key, 0) + int(item['quantity'])
+        return quantities
+
+    def supports_transactions(self):
+        if self._supports_transactions is None:
+            self._supports_transactions = supports_transactions(self.db)
+        return self._supports_transactions
+
+    # ================================================================
+    # READ PHASE
+    # ================================================================
+
+    def load_cart_products(self, checkout_data, session=None):
+        """Fetch every product in the cart with one query, keyed by str(_id)"""
+        keys = {self.product_key(item['product_id']) for item in checkout_data}
+        if not keys:
+            return {}
+
+        cursor = self.products_collection.find(
+            {'_id': {'$in': list(keys)}, 'isDeleted': {'$ne': True}},
+            CHECKOUT_PRODUCT_PROJECTION,
+            session=session
+        )
+        return {str(product['_id']): product for product in cursor}
+
+    def find_shortfalls(self, checkout_data, products):
+        """
+        Compare the cart against loaded products.
+        Returns one entry per cart line that cannot be fulfilled.
+        """
+        quantities = self.aggregate_quantities(checkout_data)
+        shortfalls = []
+
+        for line, item in enumerate(checkout_data):
+            product_id = str(item['product_id'])
+            product = products.get(product_id)
+
+            if not product:
+                shortfalls.append({
+                    'line': line,
+                    'product_id': product_id,
+                    'product_name': item.get('product_name'),
+                    'requested': int(item['quantity']),
+                    'available': 0,
+                    'reason': 'not_found'
+                })
+                continue
+
+            available = product.get('stock', 0)
+            requested = quantities[product_id]
+            if available < requested:
+                shortfalls.append({
+                    'line': line,
+                    'product_id': product_id,
+                    'product_name': product.get('product_name'),
+                    'requested': requested,
+                    'available': available,
+                    'reason': 'insufficient_stock'
+                })
+
+        return shortfalls
+
+    def stock_warnings(self, checkout_data, products):
+        """
+        Work out low/out-of-stock warnings from the already loaded products.
+        Returns (alert_type, product, current_stock, new_stock, quantity_sold)
+        tuples, one per product.
+        """
+        warnings = []
+        for product_id, quantity_sold in self.aggregate_quantities(checkout_data).items():
+            product = products.get(product_id)
+            if not product:
+                continue
+
+            current_stock = product.get('stock', 0)
+            new_stock = current_stock - quantity_sold
+            if new_stock <= 0:
+                warnings.append(('out_of_stock', product, current_stock, new_stock, quantity_sold))
+            elif new_stock <= product.get('low_stock_threshold', 5):
+                warnings.append(('low_stock', product, current_stock, new_stock, quantity_sold))
+
+        return warnings
+
+    # ================================================================
+    # WRITE PHASE
+    # ================================================================
+
+    def commit(self, checkout_data, sales_record=None, effects=None):
+        """
+        Decrement stock for the cart (and insert the sale, if given) atomically.
+        `effects` are outbox side-effects (notifications ...) queued with the sale.
+
+        Returns {'success', 'shortfalls', 'transactional'}. When any guard
+        fails nothing is written and `shortfalls` lists the offending lines.
+        """
+        if self.supports_transactions():
+            return self._commit_in_transaction(checkout_data, sales_record, effects)
+        return self._commit_with_compensation(checkout_data, sales_record, effects)
+
+    def _stock_operations(self, quantities, extra_update=None):
+        operations = []
+        for product_id, quantity in quantities.items():
+            update = {'$inc': {'stock': -quantity}}
+            if extra_update:
+                for operator, fields in extra_update.items():
+                    update.setdefault(operator, {}).update(fields)
+            operations.append(UpdateOne(
+                {'_id': self.product_key(product_id), 'stock': {'$gte': quantity}},
+                update
+            ))
+        return operations
+
+    def _commit_in_transaction(self, checkout_data, sales_record, effects=None):
+        """
+        Run the decrement, sale insert and outbox entries in one transaction
+        (the sale's rollups are added after it commits).
+        with_transaction retries the whole callback on TransientTransactionError
+        (e.g. a WriteConflict with a concurrent checkout) and the commit on
+        UnknownTransactionCommitResult, so a busy register does not fail sales.
+        """
+        quantities = self.aggregate_quantities(checkout_data)
+        operations = self._stock_operations(quantities)
+
+        def callback(session):
+            result = self.products_collection.bulk_write(operations, ordered=False, session=session)
+
+            if result.matched_count != len(operations):
+                # Read inside the transaction so the shortfall reflects
+                # the same snapshot the guards were evaluated against
+                products = self.load_cart_products(checkout_data, session=session)
+                session.abort_transaction()
+                return {
+                    'success': False,
+                    'shortfalls': self.find_shortfalls(checkout_data, products),
+                    'transactional': True
+                }
+
+            if sales_record is not None:
+                self.sales_collection.insert_one(sales_record, session=session)
+            outbox_service.enqueue(effects, source='pos', session=session)
+            return {'success': True, 'shortfalls': [], 'transactional': True}
+
+        with self.db.client.start_session() as session:
+            outcome = session.with_transaction(callback)
+
+        # After the commit: every sale of the hour increments the same rollup
+        # documents, which inside the transaction would serialize checkouts.
+        # A lost increment is only logged (check_sales_rollups --fix repairs it).
+        if outcome['success'] and sales_record is not None:
+            sales_rollup_service.record_sale('sales', sales_record)
+        return outcome
+
+    def _commit_with_compensation(self, checkout_data, sales_record, effects=None):
+        """
+        Standalone servers have no transactions. Each decrement tags the
+        product with a checkout token so a partial bulk can be identified and
+        rolled back with a single compensating bulk_write.
+        """
+        quantities = self.aggregate_quantities(checkout_data)
+        token = str(ObjectId())
+        # The touched products are known; keep the token lookups on _id
+        # instead of scanning products for an unindexed array value
+        tagged = {
+            '_id': {'$in': [self.product_key(product_id) for product_id in quantities]},
+            'pending_checkouts': token
+        }
+        operations = self._stock_operations(
+            quantities, extra_update={'$addToSet': {'pending_checkouts': token}}
+        )
+
+        result = self.products_collection.bulk_write(operations, ordered=False)
+
+        if result.matched_count != len(operations):
+            applied = self.products_collection.find(tagged, {'_id': 1})
+            rollback = [
+                UpdateOne(
+                    {'_id': product['_id'], 'pending_checkouts': token},
+                    {
+                        '$inc': {'stock': quantities[str(product['_id'])]},
+                        '$pull': {'pending_checkouts': token}
+                    }
+                )
+                for product in applied
+            ]
+            if rollback:
+                self.products_collection.bulk_write(rollback, ordered=False)
+
+            products = self.load_cart_products(checkout_data)
+            return {
+                'success': False,
+                'shortfalls': self.find_shortfalls(checkout_data, products),
+                'transactional': False
+            }
+
+        try:
+            if sales_record is not None:
+                self.sales_collection.insert_one(sales_record)
+        except Exception:
+            self.products_collection.bulk_write([
+                UpdateOne(
+                    {'_id': self.product_key(product_id), 'pending_checkouts': token},
+                    {
+                        '$inc': {'stock': quantity},
+                        '$pull': {'pending_checkouts': token}
+                    }
+                )
+                for product_id, quantity in quantities.items()
+            ], ordered=False)
+            raise
+
+        self.products_collection.update_many(
+            tagged,
+            {'$pull': {'pending_checkouts': token}}
+        )
+
+        if sales_record is not None:
+            sales_rollup_service.record_sale('sales', sales_record)
+
+        try:
+            outbox_service.enqueue(effects, source='pos')
+        except Exception as e:
+            # The sale is already durable; only its side-effects are lost
+            logger.error(f"Failed to queue checkout side-effects: {e}")
+
+        return {'success': True, 'shortfalls': [], 'transactional': False}
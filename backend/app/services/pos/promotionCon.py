@@ -1,6 +1,9 @@
 from datetime import datetime
 from bson import ObjectId
 from ...database import db_manager
+from .checkoutEngine import CheckoutEngine
+from ..outbox_service import outbox_service
+from ..sales_rollup_service import sales_rollup_service
 
 class PromoConnection:
     def __init__(self):
@@ -9,6 +12,7 @@ class PromoConnection:
         self.categories_collection = self.db.categories
         self.products_collection = self.db.products  # Fixed typo
         self.sales_collection = self.db.sales
+        self.checkout_engine = CheckoutEngine(self.db)
 
     def convert_object_id(self, document):
         """Convert ObjectId to string for JSON serialization - Enhanced version"""
@@ -38,110 +42,90 @@ class PromoConnection:
     # STOCK NOTIFICATION METHODS
     # ================================================================
 
-    def check_low_stock_warnings(self, checkout_data, current_user=None):
+    def check_low_stock_warnings(self, checkout_data, current_user=None, products=None):
         """Check if any products will go below low stock threshold and send notifications"""
-        warnings = []
+        warnings, effects = self._stock_alerts(checkout_data, current_user, products)
         
-        for item in checkout_data:
-            product = self.products_collection.find_one({'_id': ObjectId(item['product_id'])})
-            
-            if product:
-                current_stock = product.get('stock', 0)
-                quantity_sold = item['quantity']
-                low_stock_threshold = product.get('low_stock_threshold', 5)
-                
-                new_stock = current_stock - quantity_sold
-                product_name = product.get('product_name', 'Unknown Product')
-                
-                # Check for different stock warning levels
-                if new_stock <= 0:
-                    warning_msg = f"⚠️ {product_name} will be OUT OF STOCK!"
-                    warnings.append(warning_msg)
-                    
-                    # Send OUT OF STOCK notification
-                    self._send_stock_notification(
-                        'out_of_stock', 
-                        product, 
-                        current_stock, 
-                        new_stock, 
-                        quantity_sold,
-                        current_user
-                    )
-                    
-                elif new_stock <= low_stock_threshold:
-                    warning_msg = f"🔶 {product_name} will be LOW STOCK ({new_stock} remaining)"
-                    warnings.append(warning_msg)
-                    
-                    # Send LOW STOCK notification
-                    self._send_stock_notification(
-                        'low_stock', 
-                        product, 
-                        current_stock, 
-                        new_stock, 
-                        quantity_sold,
-                        current_user
-                    )
+        try:
+            outbox_service.enqueue(effects, source='pos')
+        except Exception as notification_error:
+            # Log the notification error but don't fail the main operation
+            print(f"❌ Failed to queue stock notifications: {notification_error}")
         
         return warnings
 
-    def _send_stock_notification(self, alert_type, product, current_stock, new_stock, quantity_sold, current_user=None):
-        """Send notification for stock-related alerts"""
-        try:
+    def _stock_alerts(self, checkout_data, current_user=None, products=None):
+        """Return (warning messages, outbox notification effects) for the cart"""
+        warnings = []
+        effects = []
+        
+        # One $in query for the whole cart unless the caller already loaded it
+        if products is None:
+            products = self.checkout_engine.load_cart_products(checkout_data)
+        
+        for alert_type, product, current_stock, new_stock, quantity_sold in self.checkout_engine.stock_warnings(checkout_data, products):
             product_name = product.get('product_name', 'Unknown Product')
-            product_id = str(product.get('_id', ''))
-            low_stock_threshold = product.get('low_stock_threshold', 5)
             
-            # Configure notification based on alert type
             if alert_type == 'out_of_stock':
-                title = "⚠️ PRODUCT OUT OF STOCK"
-                message = f"'{product_name}' is now OUT OF STOCK after selling {quantity_sold} units"
-                priority = "urgent"
-                
-            elif alert_type == 'low_stock':
-                title = "🔶 LOW STOCK ALERT"
-                message = f"'{product_name}' is running low on stock. Only {new_stock} units remaining (threshold: {low_stock_threshold})"
-                priority = "high"
-                
+                warnings.append(f"⚠️ {product_name} will be OUT OF STOCK!")
             else:
-                return  # Unknown alert type
-            
-            # Common metadata for both alert types
-            metadata = {
-                "product_id": product_id,
-                "product_name": product_name,
-                "sku": product.get('SKU', ''),
-                "category_id": product.get('category_id', ''),
-                "current_stock": current_stock,
-                "new_stock": new_stock,
-                "quantity_sold": quantity_sold,
-                "low_stock_threshold": low_stock_threshold,
-                "alert_type": alert_type,
-                "action_type": "stock_alert",
-                "cashier_id": current_user.get('_id') if current_user else None,
-                "cashier_name": current_user.get('username') if current_user else None,
-                "cost_price": product.get('cost_price', 0),
-                "selling_price": product.get('selling_price', 0),
-                "supplier_id": product.get('supplier_id'),
-                "reorder_suggested": new_stock <= low_stock_threshold
-            }
-            
-            # Import notification service
-            from notifications.services import notification_service
+                warnings.append(f"🔶 {product_name} will be LOW STOCK ({new_stock} remaining)")
             
-            # Send the notification
-            notification_service.create_notification(
-                title=title,
-                message=message,
-                priority=priority,
-                notification_type="inventory",  # Different type for inventory alerts
-                metadata=metadata
-            )
-            
-            print(f"📢 Stock notification sent: {title} for {product_name}")
-            
-        except Exception as notification_error:
-            # Log the notification error but don't fail the main operation
-            print(f"❌ Failed to create {alert_type} notification for product {product.get('product_name', 'Unknown')}: {notification_error}")
+            effects.append(self._stock_notification_effect(
+                alert_type, 
+                product, 
+                current_stock, 
+                new_stock, 
+                quantity_sold,
+                current_user
+            ))
+        
+        return warnings, effects
+
+    def _stock_notification_effect(self, alert_type, product, current_stock, new_stock, quantity_sold, current_user=None):
+        """Build the outbox notification effect for a stock alert"""
+        product_name = product.get('product_name', 'Unknown Product')
+        product_id = str(product.get('_id', ''))
+        low_stock_threshold = product.get('low_stock_threshold', 5)
+        
+        # Configure notification based on alert type
+        if alert_type == 'out_of_stock':
+            title = "⚠️ PRODUCT OUT OF STOCK"
+            message = f"'{product_name}' is now OUT OF STOCK after selling {quantity_sold} units"
+            priority = "urgent"
+        else:
+            title = "🔶 LOW STOCK ALERT"
+            message = f"'{product_name}' is running low on stock. Only {new_stock} units remaining (threshold: {low_stock_threshold})"
+            priority = "high"
+        
+        # Common metadata for both alert types
+        metadata = {
+            "product_id": product_id,
+            "product_name": product_name,
+            "sku": product.get('SKU', ''),
+            "category_id": product.get('category_id', ''),
+            "current_stock": current_stock,
+            "new_stock": new_stock,
+            "quantity_sold": quantity_sold,
+            "low_stock_threshold": low_stock_threshold,
+            "alert_type": alert_type,
+            "action_type": "stock_alert",
+            "cashier_id": current_user.get('_id') if current_user else None,
+            "cashier_name": current_user.get('username') if current_user else None,
+            "cost_price": product.get('cost_price', 0),
+            "selling_price": product.get('selling_price', 0),
+            "supplier_id": product.get('supplier_id'),
+            "reorder_suggested": new_stock <= low_stock_threshold
+        }
+        
+        return outbox_service.effect(
+            'notification',
+            title=title,
+            message=message,
+            priority=priority,
+            notification_type="inventory",  # Different type for inventory alerts
+            metadata=metadata
+        )
 
     def check_all_low_stock_products(self):
         """Check all products for low stock and send batch notification - Fixed version"""
@@ -187,27 +171,25 @@ class PromoConnection:
             print(f"❌ Error checking all low stock products: {e}")
             return []
 
-    def validate_stock_availability(self, checkout_data):
+    def validate_stock_availability(self, checkout_data, products=None):
         """Ensure all items have sufficient stock before processing sale"""
-        for item in checkout_data:
-            product = self.products_collection.find_one({'_id': ObjectId(item['product_id'])})
-            
-            if not product:
-                return {
-                    'valid': False,
-                    'message': f"Product {item['product_id']} not found"
-                }
-            
-            current_stock = product.get('stock', 0)
-            requested_quantity = item['quantity']
-            
-            if current_stock < requested_quantity:
-                return {
-                    'valid': False,
-                    'message': f"Insufficient stock for {product['product_name']}. Available: {current_stock}, Requested: {requested_quantity}"
-                }
+        if products is None:
+            products = self.checkout_engine.load_cart_products(checkout_data)
         
-        return {'valid': True, 'message': 'All items available'}
+        shortfalls = self.checkout_engine.find_shortfalls(checkout_data, products)
+        if shortfalls:
+            return {
+                'valid': False,
+                'message': self._shortfall_message(shortfalls[0]),
+                'shortfalls': shortfalls
+            }
+        
+        return {'valid': True, 'message': 'All items available', 'shortfalls': []}
+
+    def _shortfall_message(self, shortfall):
+        if shortfall['reason'] == 'not_found':
+            return f"Product {shortfall['product_id']} not found"
+        return f"Insufficient stock for {shortfall['product_name']}. Available: {shortfall['available']}, Requested: {shortfall['requested']}"
 
     # ================================================================
     # RECEIPT AND INVENTORY METHODS
@@ -225,28 +207,15 @@ class PromoConnection:
         }
 
     def update_inventory(self, checkout_data):
-        """Reduce product quantities after sale"""
+        """Reduce product quantities after sale (single guarded bulk_write)"""
         try:
-            for item in checkout_data:
-                print(f"🔄 Processing item: {item}")
-                
-                # Get product details
-                product_id = item["product_id"]
-                quantity_sold = item["quantity"]
-                
-                print(f"📦 Reducing stock for product {product_id} by {quantity_sold}")
-                
-                # Update inventory - use 'stock' field
-                result = self.products_collection.update_one(
-                    {'_id': ObjectId(product_id)},
-                    {'$inc': {'stock': -quantity_sold}}
-                )
-                
-                # Check if update was successful
-                if result.modified_count == 1:
-                    print(f"✅ Stock updated for product {product_id}")
-                else:
-                    print(f"⚠️ Warning: Product {product_id} not found or not updated")
+            result = self.checkout_engine.commit(checkout_data)
+            
+            if not result['success']:
+                raise Exception(self._shortfall_message(result['shortfalls'][0]))
+            
+            print(f"✅ Stock updated for {len(checkout_data)} cart lines")
+            return result
                     
         except Exception as e:
             print(f"❌ Error updating inventory: {str(e)}")
@@ -256,6 +225,24 @@ class PromoConnection:
     # SALES AND TRANSACTION METHODS
     # ================================================================
 
+    def _build_sales_record(self, sales_data):
+        """Shape a sales document from checkout totals"""
+        return {
+            'sale_id': str(ObjectId()),  # Generate unique sale ID
+            'items': sales_data['items'],  # List of purchased items
+            'total_amount': sales_data['total_amount'],
+            'total_discount': sales_data.get('total_discount', 0),
+            'final_amount': sales_data.get('final_amount', sales_data['total_amount']),
+            'promotion_applied': sales_data.get('promotion_applied', None),
+            'payment_method': sales_data.get('payment_method', 'cash'),
+            'cashier_id': sales_data.get('cashier_id', None),
+            'customer_id': sales_data.get('customer_id', None),
+            'transaction_date': datetime.utcnow(),
+            'status': 'completed',
+            'created_at': datetime.utcnow(),
+            'last_updated': datetime.utcnow()
+        }
+
     def create_sales(self, sales_data):
         """Creates a sales transaction record in the database"""
         try:
@@ -268,25 +255,12 @@ class PromoConnection:
                         'data': None
                     }
                 
-            sales_record ={
-                'sale_id': str(ObjectId()),  # Generate unique sale ID
-                'items': sales_data['items'],  # List of purchased items
-                'total_amount': sales_data['total_amount'],
-                'total_discount': sales_data.get('total_discount', 0),
-                'final_amount': sales_data.get('final_amount', sales_data['total_amount']),
-                'promotion_applied': sales_data.get('promotion_applied', None),
-                'payment_method': sales_data.get('payment_method', 'cash'),
-                'cashier_id': sales_data.get('cashier_id', None),
-                'customer_id': sales_data.get('customer_id', None),
-                'transaction_date': datetime.utcnow(),
-                'status': 'completed',
-                'created_at': datetime.utcnow(),
-                'last_updated': datetime.utcnow()
-            }
+            sales_record = self._build_sales_record(sales_data)
 
             result = self.sales_collection.insert_one(sales_record)
 
             if result.inserted_id:
+                sales_rollup_service.record_sale('sales', sales_record)
                 sales_record['_id'] = str(result.inserted_id)
                 print(f"✅ Sales transaction created: {sales_record['sale_id']}")
                 print(f"💰 Total amount: ₱{sales_record['final_amount']}")
@@ -310,28 +284,33 @@ class PromoConnection:
             raise Exception(f"Error creating sales transaction: {str(e)}")
 
     def pos_transaction(self, checkout_data, promotion_name=None, cashier_id=None):
-        """Complete POS transaction: apply promotions + save sales record + check stock + update inventory"""
+        """
+        Complete POS transaction: check stock + apply promotions + save sales record + update inventory.
+        
+        The cart is loaded with one query and the stock decrement plus sale
+        insert are committed together by CheckoutEngine, so a cart of any size
+        costs a handful of round-trips and never leaves a partial write.
+        """
         try:
             # Get current user info for notifications
             current_user = None
             if cashier_id:
                 current_user = {'_id': cashier_id, 'username': f'cashier_{cashier_id}'}
             
-            # Step 1: Validate stock availability
-            stock_validation = self.validate_stock_availability(checkout_data)
+            # Step 1: Load every cart product at once and validate stock
+            products = self.checkout_engine.load_cart_products(checkout_data)
+            stock_validation = self.validate_stock_availability(checkout_data, products)
             if not stock_validation['valid']:
                 return {
                     'success': False,
                     'message': stock_validation['message'],
+                    'shortfalls': stock_validation['shortfalls'],
                     'data': None
                 }
             
-            # Step 2: Check for low stock warnings BEFORE processing sale
-            stock_warnings = self.check_low_stock_warnings(checkout_data, current_user)
-            
-            # Step 3: Apply promotions and calculate totals
+            # Step 2: Apply promotions and calculate totals
             if promotion_name:
-                checkoutResult = self.checkout_list(checkout_data, promotion_name)
+                checkoutResult = self.checkout_list(checkout_data, promotion_name, products)
                 total_amount = checkoutResult['final_total']
                 discount = checkoutResult['total_discount']
                 promo_applied = promotion_name if checkoutResult['success'] else None
@@ -340,8 +319,8 @@ class PromoConnection:
                 discount = 0
                 promo_applied = None
 
-            # Step 4: Prepare sales data
-            sales_data = {
+            # Step 3: Prepare sales record
+            sales_record = self._build_sales_record({
                 'items': checkout_data,
                 'total_amount': sum(item['price'] * item['quantity'] for item in checkout_data),
                 'total_discount': discount,
@@ -349,31 +328,38 @@ class PromoConnection:
                 'promotion_applied': promo_applied,
                 'cashier_id': cashier_id,
                 'payment_method': 'cash'
-            }
+            })
 
-            # Step 5: Save transaction
-            sales_result = self.create_sales(sales_data)
+            # Step 4: Low stock warnings, computed from the products loaded in Step 1.
+            # Their notifications are queued in the outbox together with the sale.
+            stock_warnings, alert_effects = self._stock_alerts(checkout_data, current_user, products)
 
-            # Step 6: Update inventory after successful sale
-            if sales_result['success']:
-                self.update_inventory(checkout_data)
-                print("📦 Inventory updated successfully")
+            # Step 5: Decrement stock and save the sale atomically. Stock may
+            # have moved since Step 1, so the guarded write has the final say.
+            commit_result = self.checkout_engine.commit(checkout_data, sales_record, alert_effects)
+            if not commit_result['success']:
+                return {
+                    'success': False,
+                    'message': self._shortfall_message(commit_result['shortfalls'][0]),
+                    'shortfalls': commit_result['shortfalls'],
+                    'data': None
+                }
+            sales_record['_id'] = str(sales_record['_id'])
+            print(f"✅ Sales transaction created: {sales_record['sale_id']}")
 
-            # Step 7: Generate receipt
-            receipt = None
-            if sales_result['success']:
-                receipt = self.generate_receipt(sales_result['data'])
+            # Step 6: Generate receipt
+            receipt = self.generate_receipt(sales_record)
 
-            # Step 8: Prepare response
+            # Step 7: Prepare response
             response = {
-                'success': sales_result["success"],
+                'success': True,
                 'message': 'Transaction Complete',
                 'checkout_details': {
                     'final_total': total_amount,
                     'total_discount': discount,
                     'promotion_applied': promo_applied
                 },
-                'sales_record': sales_result['data'],
+                'sales_record': sales_record,
                 'receipt': receipt
             }
             
@@ -388,7 +374,7 @@ class PromoConnection:
         except Exception as e:
             raise Exception(f"Error completing POS transaction: {str(e)}")
 
-    def checkout_list(self, checkout_data, promotion_name):
+    def checkout_list(self, checkout_data, promotion_name, products=None):
         """Checks the categories of the products, and see if the products are in the Promotion"""
         try:
             promotion = self.promotions_collection.find_one({
@@ -417,6 +403,9 @@ class PromoConnection:
 
             affected_subcategories = [sub['sub_category_name'] for sub in connection_result['data']['affected_subcategories']]
         
+            if products is None:
+                products = self.checkout_engine.load_cart_products(checkout_data)
+
             # Process checkout items
             final_total = 0
             total_discount = 0
@@ -427,10 +416,7 @@ class PromoConnection:
                 item_total = price * quantity
                         
                 # Check if this product is in any affected subcategory
-                product = self.products_collection.find_one({
-                    '_id': ObjectId(product_id),
-                    'isDeleted': {'$ne': True}
-                })
+                product = products.get(str(product_id))
                         
                 if product and product.get('sub_category') in affected_subcategories:
                     # Apply discount
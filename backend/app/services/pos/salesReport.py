@@ -1,23 +1,24 @@
 from datetime import date, time, timedelta, datetime
 from bson import ObjectId
 from ...database import db_manager
+from ..sales_rollup_service import (
+    sales_rollup_service, REPORT_TIMEZONE, local_to_utc, utc_to_local, local_today
+)
 from .promotionCon import PromoConnection
 
+# period_type -> $dateTrunc unit
+PERIOD_UNITS = {'hourly': 'hour', 'daily': 'day', 'weekly': 'week', 'monthly': 'month'}
+PERIOD_PLURALS = {'hourly': 'hours', 'daily': 'days', 'weekly': 'weeks', 'monthly': 'months'}
+
+EMPTY_TOTALS = {'count': 0, 'revenue': 0, 'gross': 0, 'discounts': 0}
+
 class SalesReport:
     """
     Clean Sales Report API - No redundant methods
     Three core methods handle all reporting needs
     """
     def __init__(self):
-       # self.db = db_manager.get_database()
-        if db_manager.connect_to_cloud():
-            client = db_manager.current_client
-            self.db = client['pos_system']  # pos_system might be on cloud
-        else:
-            raise Exception("Could not connect to MongoDB")
-        # 🐛 DEBUG: Check what database we're connected to
-        print(f"🔍 Connected to database: {self.db.name}")
-        print(f"🔍 Available collections: {self.db.list_collection_names()}")
+        self.db = db_manager.get_database()
         
         self.sales_collection = self.db.sales 
         self.sales_log_collection = self.db.sales_log  
@@ -63,116 +64,38 @@ class SalesReport:
             get_sales_summary(None, ['manual', 'csv'])
         """
         try:
-            # Build date filter
-            date_filter = {}
+            match = {}
             if date_range:
-                date_filter = {
-                    'transaction_date': {
-                        '$gte': date_range['start'],
-                        '$lte': date_range['end']
-                    }
-                }
-            
-            # Build source filter
-            source_filter = {}
+                match['transaction_date'] = {'$gte': date_range['start'], '$lte': date_range['end']}
             if include_source:
-                source_filter = {'source': {'$in': include_source}}
-            
-            # Combine filters
-            query = {}
-            if date_filter and source_filter:
-                query = {'$and': [date_filter, source_filter]}
-            elif date_filter:
-                query = date_filter
-            elif source_filter:
-                query = source_filter
-    
-            # 🐛 DEBUG: Add these lines to see what's happening
-            print(f"🔍 DEBUG - Query being used: {query}")
-            print(f"🔍 DEBUG - Date range: {date_range}")
-            print(f"🔍 DEBUG - Include source: {include_source}")
-
-            # Get data from both collections
-            pos_sales = list(self.sales_collection.find(query))
-            log_sales = list(self.sales_log_collection.find(query))
-
-            # 🐛 DEBUG: Check what we found
-            print(f"🔍 DEBUG - POS sales found: {len(pos_sales)}")
-            print(f"🔍 DEBUG - Log sales found: {len(log_sales)}")
-            print(f"🔍 DEBUG - Sales collection name: {self.sales_collection.name}")
-            print(f"🔍 DEBUG - Log collection name: {self.sales_log_collection.name}")
-
-            if log_sales:
-                print(f"🔍 DEBUG - First log sale: {log_sales[0]}")
-            else:
-                print("🔍 DEBUG - No log sales found, checking raw query...")
-                # Test raw query
-                raw_count = self.sales_log_collection.count_documents(query)
-                print(f"🔍 DEBUG - Raw count from sales_log: {raw_count}")
-                
-                # Test with empty query
-                total_count = self.sales_log_collection.count_documents({})
-                print(f"🔍 DEBUG - Total documents in sales_log: {total_count}")
-
-            # Get data from both collections
-            pos_sales = list(self.sales_collection.find(query))
-            log_sales = list(self.sales_log_collection.find(query))
-            
-            # Calculate totals
-            pos_totals = self._calculate_pos_totals(pos_sales)
-            log_totals = self._calculate_log_totals(log_sales)
-            
-            # Combine totals
-            combined_totals = {
-                'total_transactions': pos_totals['count'] + log_totals['count'],
-                'total_revenue': round(pos_totals['revenue'] + log_totals['revenue'], 2),
-                'gross_revenue': round(pos_totals['gross'] + log_totals['gross'], 2),
-                'total_discounts': round(pos_totals['discounts'], 2),
-                'average_transaction': 0
-            }
-            
-            # Calculate average
-            if combined_totals['total_transactions'] > 0:
-                combined_totals['average_transaction'] = round(
-                    combined_totals['total_revenue'] / combined_totals['total_transactions'], 2
-                )
-            
-            # Source breakdown
-            source_breakdown = {
-                'pos': {
-                    'count': pos_totals['count'],
-                    'revenue': round(pos_totals['revenue'], 2),
-                    'percentage': 0
-                },
-                'manual_csv': {
-                    'count': log_totals['count'],
-                    'revenue': round(log_totals['revenue'], 2),
-                    'percentage': 0
+                match['source'] = {'$in': include_source}
+
+            # Totals per collection in one aggregation
+            totals = {}
+            for row in self.sales_collection.aggregate(self._totals_pipeline(match), allowDiskUse=True):
+                totals[row['_id']['stream']] = {
+                    'count': row['count'],
+                    'revenue': row['revenue'],
+                    'gross': row['gross'],
+                    'discounts': row['discounts']
                 }
-            }
-            
-            # Calculate percentages
-            if combined_totals['total_revenue'] > 0:
-                source_breakdown['pos']['percentage'] = round(
-                    (pos_totals['revenue'] / combined_totals['total_revenue']) * 100, 1
-                )
-                source_breakdown['manual_csv']['percentage'] = round(
-                    (log_totals['revenue'] / combined_totals['total_revenue']) * 100, 1
-                )
-            
+            combined_totals, source_breakdown = self._combine_totals(
+                totals.get('pos', EMPTY_TOTALS),
+                totals.get('manual_csv', EMPTY_TOTALS)
+            )
+
             # Recent transactions preview
             recent_transactions = []
-            for sale in pos_sales[-10:]:
+            for sale in self.sales_collection.find(match).sort('transaction_date', -1).limit(10):
                 recent_transactions.append(self._normalize_pos_transaction(sale))
-            for sale in log_sales[-10:]:
+            for sale in self.sales_log_collection.find(match).sort('transaction_date', -1).limit(10):
                 recent_transactions.append(self._normalize_log_transaction(sale))
-            
             recent_transactions.sort(key=lambda x: x['transaction_date'], reverse=True)
-            
+
             return {
                 'summary': combined_totals,
                 'source_breakdown': source_breakdown,
-                'transactions_preview': recent_transactions[:20],
+                'transactions_preview': recent_transactions,
                 'filters_applied': {
                     'date_range': date_range,
                     'include_source': include_source
@@ -235,7 +158,8 @@ class SalesReport:
         Args:
             start_date: Start date (date or datetime)
             end_date: End date (date or datetime)
-            period_type: 'daily', 'weekly', or 'monthly'
+            period_type: 'hourly', 'daily', 'weekly', or 'monthly'
+                (buckets follow the report timezone, weeks start on Monday)
             include_source: ['pos', 'manual', 'csv'] or None for all sources
         
         Returns:
@@ -247,44 +171,31 @@ class SalesReport:
             - Period comparisons
         """
         try:
-            if period_type == 'daily':
-                return self._get_daily_breakdown(start_date, end_date, include_source)
-            elif period_type == 'weekly':
-                return self._get_weekly_breakdown(start_date, end_date, include_source)
-            elif period_type == 'monthly':
-                return self._get_monthly_breakdown(start_date, end_date, include_source)
-            else:
-                raise ValueError("period_type must be 'daily', 'weekly', or 'monthly'")
+            if period_type not in PERIOD_UNITS:
+                raise ValueError("period_type must be 'hourly', 'daily', 'weekly', or 'monthly'")
+            return self._get_period_breakdown(start_date, end_date, period_type, include_source)
                 
         except Exception as e:
             raise Exception(f"Error getting sales by period: {str(e)}")
 
     # ================================================================
     # CONVENIENCE METHODS (Built on top of core API)
+    # Day-aligned periods are read from sales_rollups, not the raw sales
     # ================================================================
 
     def get_todays_sales(self):
         """Get today's sales summary"""
-        today = date.today()
-        date_range = {
-            'start': datetime.combine(today, time.min),
-            'end': datetime.combine(today, time.max)
-        }
-        return self.get_sales_summary(date_range)
+        today = local_today()
+        return self._get_rollup_summary(today, today)
 
     def get_weekly_sales(self):
         """Get this week's sales summary (Monday to Sunday)"""
-        today = date.today()
+        today = local_today()
         days_since_monday = today.weekday()
         start_of_week = today - timedelta(days=days_since_monday)
         end_of_week = start_of_week + timedelta(days=6)
         
-        date_range = {
-            'start': datetime.combine(start_of_week, time.min),
-            'end': datetime.combine(end_of_week, time.max)
-        }
-        
-        result = self.get_sales_summary(date_range)
+        result = self._get_rollup_summary(start_of_week, end_of_week)
         result['week_info'] = {
             'start_date': start_of_week.isoformat(),
             'end_date': end_of_week.isoformat(),
@@ -294,7 +205,7 @@ class SalesReport:
 
     def get_monthly_sales(self):
         """Get current month's sales summary"""
-        today = date.today()
+        today = local_today()
         start_of_month = date(today.year, today.month, 1)
         
         if today.month == 12:
@@ -302,12 +213,7 @@ class SalesReport:
         else:
             end_of_month = date(today.year, today.month + 1, 1) - timedelta(days=1)
         
-        date_range = {
-            'start': datetime.combine(start_of_month, time.min),
-            'end': datetime.combine(end_of_month, time.max)
-        }
-        
-        result = self.get_sales_summary(date_range)
+        result = self._get_rollup_summary(start_of_month, end_of_month)
         result['month_info'] = {
             'year': today.year,
             'month': today.month,
@@ -319,16 +225,11 @@ class SalesReport:
 
     def get_yearly_sales(self):
         """Get current year's sales summary"""
-        today = date.today()
+        today = local_today()
         start_of_year = date(today.year, 1, 1)
         end_of_year = date(today.year, 12, 31)
         
-        date_range = {
-            'start': datetime.combine(start_of_year, time.min),
-            'end': datetime.combine(end_of_year, time.max)
-        }
-        
-        result = self.get_sales_summary(date_range)
+        result = self._get_rollup_summary(start_of_year, end_of_year)
         result['year_info'] = {
             'year': today.year,
             'start_date': start_of_year.isoformat(),
@@ -371,19 +272,14 @@ class SalesReport:
 
     def get_previous_week_sales(self):
         """Get previous week's sales summary"""
-        today = date.today()
+        today = local_today()
         days_since_monday = today.weekday()
         start_of_current_week = today - timedelta(days=days_since_monday)
         
         start_of_previous_week = start_of_current_week - timedelta(days=7)
         end_of_previous_week = start_of_previous_week + timedelta(days=6)
         
-        date_range = {
-            'start': datetime.combine(start_of_previous_week, time.min),
-            'end': datetime.combine(end_of_previous_week, time.max)
-        }
-        
-        result = self.get_sales_summary(date_range)
+        result = self._get_rollup_summary(start_of_previous_week, end_of_previous_week)
         result['week_info'] = {
             'start_date': start_of_previous_week.isoformat(),
             'end_date': end_of_previous_week.isoformat(),
@@ -394,7 +290,7 @@ class SalesReport:
 
     def get_previous_month_sales(self):
         """Get previous month's sales summary"""
-        today = date.today()
+        today = local_today()
         
         if today.month == 1:
             prev_year = today.year - 1
@@ -410,12 +306,7 @@ class SalesReport:
         else:
             end_of_prev_month = date(prev_year, prev_month + 1, 1) - timedelta(days=1)
         
-        date_range = {
-            'start': datetime.combine(start_of_prev_month, time.min),
-            'end': datetime.combine(end_of_prev_month, time.max)
-        }
-        
-        result = self.get_sales_summary(date_range)
+        result = self._get_rollup_summary(start_of_prev_month, end_of_prev_month)
         result['month_info'] = {
             'year': prev_year,
             'month': prev_month,
@@ -450,6 +341,39 @@ class SalesReport:
     # HELPER METHODS (Internal use only)
     # ================================================================
 
+    def _get_rollup_summary(self, start_date, end_date):
+        """
+        get_sales_summary() for whole local days, built from the day rollups
+        plus a bounded preview query instead of loading every sale
+        """
+        totals = sales_rollup_service.get_totals(start_date, end_date, collections=['sales', 'sales_log'])
+        pos_totals = totals.get('sales', EMPTY_TOTALS)
+        log_totals = totals.get('sales_log', EMPTY_TOTALS)
+        combined_totals, source_breakdown = self._combine_totals(pos_totals, log_totals)
+
+        date_range = {
+            'start': self._local_to_utc(datetime.combine(start_date, time.min)),
+            'end': self._local_to_utc(datetime.combine(end_date + timedelta(days=1), time.min))
+        }
+        query = {'transaction_date': {'$gte': date_range['start'], '$lt': date_range['end']}}
+
+        recent_transactions = []
+        for sale in self.sales_collection.find(query).sort('transaction_date', -1).limit(10):
+            recent_transactions.append(self._normalize_pos_transaction(sale))
+        for sale in self.sales_log_collection.find(query).sort('transaction_date', -1).limit(10):
+            recent_transactions.append(self._normalize_log_transaction(sale))
+        recent_transactions.sort(key=lambda x: x['transaction_date'], reverse=True)
+
+        return {
+            'summary': combined_totals,
+            'source_breakdown': source_breakdown,
+            'transactions_preview': recent_transactions,
+            'filters_applied': {
+                'date_range': date_range,
+                'include_source': None
+            }
+        }
+
     def _get_all_transactions(self, date_range=None, include_source=None):
         """Get all individual transactions from both collections"""
         match_conditions = []
@@ -486,57 +410,214 @@ class SalesReport:
         unified_sales.sort(key=lambda x: x['transaction_date'], reverse=True)
         return unified_sales
 
-    def _get_daily_breakdown(self, start_date, end_date, include_source=None):
-        """Get day-by-day breakdown"""
+    def _get_period_breakdown(self, start_date, end_date, period_type, include_source=None):
+        """
+        Bucket sales from both collections in a single aggregation.
+        
+        `sales` and `sales_log` are merged with $unionWith and grouped per
+        ($dateTrunc bucket, collection) in the report timezone, so a
+        year-long chart is one round-trip instead of one query per day.
+        Buckets without sales are filled in afterwards.
+        """
+        unit = PERIOD_UNITS[period_type]
         if isinstance(start_date, datetime):
             start_date = start_date.date()
         if isinstance(end_date, datetime):
             end_date = end_date.date()
         
-        daily_breakdown = []
-        current_date = start_date
+        # Local calendar days -> UTC instants (transaction_date is naive UTC)
+        range_start = self._local_to_utc(datetime.combine(start_date, time.min))
+        range_end = self._local_to_utc(datetime.combine(end_date + timedelta(days=1), time.min))
         
-        while current_date <= end_date:
-            day_range = {
-                'start': datetime.combine(current_date, time.min),
-                'end': datetime.combine(current_date, time.max)
-            }
-            
-            day_summary = self.get_sales_summary(day_range, include_source)
-            
-            daily_data = {
-                'date': current_date.isoformat(),
-                'day_name': current_date.strftime('%A'),
-                'summary': day_summary['summary'],
-                'source_breakdown': day_summary['source_breakdown']
+        match = {'transaction_date': {'$gte': range_start, '$lt': range_end}}
+        if include_source:
+            match['source'] = {'$in': include_source}
+        
+        bucket = {'$dateTrunc': {
+            'date': '$transaction_date',
+            'unit': unit,
+            'timezone': REPORT_TIMEZONE,
+            'startOfWeek': 'monday'
+        }}
+        pipeline = self._totals_pipeline(match, bucket)
+        
+        totals_by_bucket = {}
+        for row in self.sales_collection.aggregate(pipeline, allowDiskUse=True):
+            local_start = self._utc_to_local(row['_id']['bucket'])
+            streams = totals_by_bucket.setdefault(local_start, {})
+            streams[row['_id']['stream']] = {
+                'count': row['count'],
+                'revenue': row['revenue'],
+                'gross': row['gross'],
+                'discounts': row['discounts']
             }
-            
-            daily_breakdown.append(daily_data)
-            current_date += timedelta(days=1)
         
-        total_revenue = sum(day['summary']['total_revenue'] for day in daily_breakdown)
-        total_transactions = sum(day['summary']['total_transactions'] for day in daily_breakdown)
+        breakdown = []
+        for local_start in self._period_starts(start_date, end_date, period_type):
+            streams = totals_by_bucket.get(local_start, {})
+            summary, source_breakdown = self._combine_totals(
+                streams.get('pos', EMPTY_TOTALS),
+                streams.get('manual_csv', EMPTY_TOTALS)
+            )
+            entry = self._period_labels(local_start, period_type)
+            entry['summary'] = summary
+            entry['source_breakdown'] = source_breakdown
+            breakdown.append(entry)
+        
+        total_revenue = sum(entry['summary']['total_revenue'] for entry in breakdown)
+        total_transactions = sum(entry['summary']['total_transactions'] for entry in breakdown)
+        plural = PERIOD_PLURALS[period_type]
         
         return {
-            'period_type': 'daily',
-            'breakdown': daily_breakdown,
+            'period_type': period_type,
+            'timezone': REPORT_TIMEZONE,
+            'breakdown': breakdown,
             'period_summary': {
                 'total_revenue': round(total_revenue, 2),
                 'total_transactions': total_transactions,
-                'total_days': len(daily_breakdown),
-                'average_daily_revenue': round(total_revenue / len(daily_breakdown), 2) if daily_breakdown else 0
+                f'total_{plural}': len(breakdown),
+                f'average_{period_type}_revenue': round(total_revenue / len(breakdown), 2) if breakdown else 0
             }
         }
 
-    def _get_weekly_breakdown(self, start_date, end_date, include_source=None):
-        """Get week-by-week breakdown"""
-        # Implementation for weekly grouping
-        return {'period_type': 'weekly', 'breakdown': [], 'period_summary': {}}
+    def _totals_pipeline(self, match, bucket=None):
+        """
+        `sales` and `sales_log` merged with $unionWith and totalled per
+        collection ('pos' / 'manual_csv'), and per bucket when one is given.
+        Run it on the sales collection.
+        """
+        def project(stream, revenue, discounts):
+            fields = {
+                '_id': 0,
+                'stream': {'$literal': stream},
+                'revenue': {'$ifNull': [revenue, 0]},
+                'gross': {'$ifNull': ['$total_amount', 0]},
+                'discounts': discounts
+            }
+            if bucket is not None:
+                fields['bucket'] = bucket
+            return {'$project': fields}
+
+        group_id = {'stream': '$stream'}
+        if bucket is not None:
+            group_id['bucket'] = '$bucket'
+        return [
+            {'$match': match},
+            project('pos', '$final_amount', {'$ifNull': ['$total_discount', 0]}),
+            {'$unionWith': {
+                'coll': self.sales_log_collection.name,
+                'pipeline': [
+                    {'$match': match},
+                    project('manual_csv', '$total_amount', {'$literal': 0})
+                ]
+            }},
+            {'$group': {
+                '_id': group_id,
+                'count': {'$sum': 1},
+                'revenue': {'$sum': '$revenue'},
+                'gross': {'$sum': '$gross'},
+                'discounts': {'$sum': '$discounts'}
+            }}
+        ]
+
+    def _period_starts(self, start_date, end_date, period_type):
+        """Local start of every bucket between the two dates, oldest first"""
+        last = datetime.combine(end_date, time.max)
+        
+        if period_type == 'hourly':
+            current, step = datetime.combine(start_date, time.min), timedelta(hours=1)
+        elif period_type == 'weekly':
+            current, step = datetime.combine(start_date - timedelta(days=start_date.weekday()), time.min), timedelta(weeks=1)
+        elif period_type == 'monthly':
+            current, step = datetime(start_date.year, start_date.month, 1), None
+        else:
+            current, step = datetime.combine(start_date, time.min), timedelta(days=1)
+        
+        while current <= last:
+            yield current
+            if step is not None:
+                current += step
+            elif current.month == 12:
+                current = datetime(current.year + 1, 1, 1)
+            else:
+                current = datetime(current.year, current.month + 1, 1)
+
+    def _period_labels(self, local_start, period_type):
+        """Descriptive fields for one bucket of the breakdown"""
+        if period_type == 'hourly':
+            return {
+                'date': local_start.date().isoformat(),
+                'hour': local_start.hour,
+                'period_start': local_start.isoformat()
+            }
+        if period_type == 'weekly':
+            week_end = local_start.date() + timedelta(days=6)
+            return {
+                'date': local_start.date().isoformat(),
+                'week_start': local_start.date().isoformat(),
+                'week_end': week_end.isoformat(),
+                'week_number': local_start.isocalendar()[1]
+            }
+        if period_type == 'monthly':
+            return {
+                'date': local_start.date().isoformat(),
+                'year': local_start.year,
+                'month': local_start.month,
+                'month_name': local_start.strftime('%B')
+            }
+        return {
+            'date': local_start.date().isoformat(),
+            'day_name': local_start.strftime('%A')
+        }
 
-    def _get_monthly_breakdown(self, start_date, end_date, include_source=None):
-        """Get month-by-month breakdown"""
-        # Implementation for monthly grouping
-        return {'period_type': 'monthly', 'breakdown': [], 'period_summary': {}}
+    def _local_to_utc(self, local_dt):
+        """Naive report-timezone datetime -> naive UTC datetime"""
+        return local_to_utc(local_dt)
+
+    def _utc_to_local(self, utc_dt):
+        """Naive (or aware) UTC datetime -> naive report-timezone datetime"""
+        return utc_to_local(utc_dt)
+
+    def _combine_totals(self, pos_totals, log_totals):
+        """Combined summary + source breakdown from per-collection totals"""
+        combined_totals = {
+            'total_transactions': pos_totals['count'] + log_totals['count'],
+            'total_revenue': round(pos_totals['revenue'] + log_totals['revenue'], 2),
+            'gross_revenue': round(pos_totals['gross'] + log_totals['gross'], 2),
+            'total_discounts': round(pos_totals.get('discounts', 0), 2),
+            'average_transaction': 0
+        }
+        
+        # Calculate average
+        if combined_totals['total_transactions'] > 0:
+            combined_totals['average_transaction'] = round(
+                combined_totals['total_revenue'] / combined_totals['total_transactions'], 2
+            )
+        
+        # Source breakdown
+        source_breakdown = {
+            'pos': {
+                'count': pos_totals['count'],
+                'revenue': round(pos_totals['revenue'], 2),
+                'percentage': 0
+            },
+            'manual_csv': {
+                'count': log_totals['count'],
+                'revenue': round(log_totals['revenue'], 2),
+                'percentage': 0
+            }
+        }
+        
+        # Calculate percentages
+        if combined_totals['total_revenue'] > 0:
+            source_breakdown['pos']['percentage'] = round(
+                (pos_totals['revenue'] / combined_totals['total_revenue']) * 100, 1
+            )
+            source_breakdown['manual_csv']['percentage'] = round(
+                (log_totals['revenue'] / combined_totals['total_revenue']) * 100, 1
+            )
+        
+        return combined_totals, source_breakdown
 
     def _calculate_pos_totals(self, pos_sales):
         """Calculate totals from POS sales"""
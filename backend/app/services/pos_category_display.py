@@ -11,41 +11,6 @@ class POSCategoryService:
         self.db = db_manager.get_database()
         self.category_collection = self.db.category
         self.product_collection = self.db.products
-        self._ensure_pos_indexes()
-
-    def _ensure_pos_indexes(self):
-        """Create indexes specifically optimized for POS operations"""
-        try:
-            # Essential POS indexes for string IDs
-            pos_indexes = [
-                # For category catalog loading
-                [("status", 1), ("isDeleted", 1)],
-                [("category_name", 1)],
-                [("category_id", 1)],  # String-based category ID index
-                
-                # For subcategory product lookups
-                [("sub_categories.products.product_id", 1)],
-                [("sub_categories.name", 1)]
-            ]
-            
-            for index_fields in pos_indexes:
-                self.category_collection.create_index(index_fields, background=True)
-            
-            # Product collection indexes for string IDs
-            product_indexes = [
-                [("product_id", 1)],  # String-based product ID
-                [("product_name", 1)],
-                [("stock_quantity", 1)],
-                [("barcode", 1)],
-                [("product_code", 1)]
-            ]
-            
-            for index_fields in product_indexes:
-                self.product_collection.create_index(index_fields, background=True)
-                
-            logger.info("POS indexes created successfully")
-        except Exception as e:
-            logger.warning(f"Could not create POS indexes: {e}")
 
     def get_pos_catalog_structure(self):
         """
@@ -0,0 +1,488 @@
+# app/services/product_import_service.py
+"""
+Vectorized product import.
+
+Supplier catalogs are processed a chunk of rows at a time:
+
+    1. validation pass - every chunk is checked with column-wise pandas
+       operations against lookup tables loaded once per import (categories
+       with their subcategories, suppliers, existing SKUs and names). Only
+       failing rows are ever touched individually, to format their errors.
+    2. import pass - when the whole file is valid, the chunks are read
+       again; product IDs are reserved in one counter round-trip per chunk,
+       SKUs are numbered from one in-memory block, and products plus their
+       initial batches are written with unordered insert_many.
+
+CSV files are read with `chunksize`, so memory is bounded by
+PRODUCT_IMPORT_CHUNK_ROWS rather than by the file size. Excel workbooks
+cannot be read incrementally by pandas and are sliced after loading.
+A single summary notification is sent per import.
+"""
+
+from datetime import datetime, timedelta, timezone
+from decouple import config
+from dateutil import parser as date_parser
+import pandas as pd
+from ..database import db_manager
+from .sequence_service import sequence_service, BATCH_SEQUENCE_PREFIX
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows validated / inserted per chunk
+PRODUCT_IMPORT_CHUNK_ROWS = config('PRODUCT_IMPORT_CHUNK_ROWS', default=5000, cast=int)
+
+REQUIRED_COLUMNS = ['product_name', 'selling_price', 'category_name']
+OPTIONAL_COLUMNS = ['subcategory_name', 'SKU', 'supplier_id', 'stock', 'cost_price', 'low_stock_threshold',
+                    'unit', 'status', 'barcode', 'description', 'expiry_date']
+TEXT_FIELDS = ['SKU', 'supplier_id', 'unit', 'status', 'barcode', 'description', 'expiry_date']
+
+EXPIRY_ALERT_DAYS = 30
+
+
+class ProductImportService:
+    """Validates and bulk-inserts product catalogs from CSV / Excel files"""
+
+    def __init__(self):
+        self.db = db_manager.get_database()
+        self.product_collection = self.db.products
+        self.batch_collection = self.db.batches
+
+    # ================================================================
+    # PUBLIC API
+    # ================================================================
+
+    def import_file(self, file_path, file_type='csv', validate_only=False, notifier=None,
+                    progress=None, resume=None):
+        """
+        Validate and import a product file. Returns the same result shape as
+        the previous row-by-row importer. `notifier` is the ProductService
+        used for the summary notification.
+
+        Background jobs pass `progress(processed, total, message, checkpoint)`
+        and the last checkpoint as `resume`; chunks already imported before
+        an interruption are skipped.
+        """
+        progress = progress or (lambda *args, **kwargs: None)
+        if file_type not in ('csv', 'xlsx', 'xls'):
+            raise ValueError(f"Unsupported file type: {file_type}")
+
+        lookups = self._load_lookups()
+
+        # Pass 1: validate everything before writing anything
+        validation_errors = []
+        missing_categories = {}
+        valid_rows = 0
+        total_rows = 0
+        for chunk in self._read_chunks(file_path, file_type):
+            frame, errors = self._validate_chunk(chunk, lookups, missing_categories)
+            validation_errors.extend(errors)
+            valid_rows += int(frame['valid'].sum())
+            total_rows += len(chunk)
+            progress(total_rows, None, 'Validating')
+
+        missing_categories_list = [
+            {'category_name': cat, 'subcategories': list(subcats)}
+            for cat, subcats in missing_categories.items()
+        ]
+
+        if validate_only:
+            return {
+                'valid': len(validation_errors) == 0 and len(missing_categories) == 0,
+                'total_rows': total_rows,
+                'valid_products': valid_rows,
+                'errors': validation_errors,
+                'missing_categories': missing_categories_list,
+                'message': 'Validation completed' if not validation_errors else 'Validation failed'
+            }
+
+        if validation_errors:
+            return {
+                'success': False,
+                'total_rows': total_rows,
+                'valid_products': valid_rows,
+                'errors': validation_errors,
+                'missing_categories': missing_categories_list,
+                'message': f'Import failed: {len(validation_errors)} validation error(s) found'
+            }
+
+        # Pass 2: build and insert chunk by chunk
+        resume = resume or {}
+        stats = resume.get('stats') or {'successful': 0, 'batches_created': 0, 'failed': [], 'skipped': []}
+        sku_counter = [self.product_collection.count_documents({'isDeleted': {'$ne': True}})]
+        imported_rows = 0
+        progress(0, total_rows, 'Importing products')
+        for chunk_number, chunk in enumerate(self._read_chunks(file_path, file_type)):
+            imported_rows += len(chunk)
+            if chunk_number < resume.get('next_chunk', 0):
+                continue
+            frame, _ = self._validate_chunk(chunk, lookups, {})
+            self._import_chunk(frame, lookups, sku_counter, stats, notifier)
+            progress(imported_rows, total_rows, 'Importing products',
+                     checkpoint={'next_chunk': chunk_number + 1, 'stats': stats})
+
+        successful = stats['successful']
+        failed = stats['failed']
+        skipped = stats['skipped']
+        message = f'Import completed: {successful} created, {len(failed)} failed, {len(skipped)} skipped'
+
+        if notifier is not None and total_rows:
+            notifier._send_product_notification(
+                'import_completed',
+                f"{successful} products",
+                None,
+                {
+                    "total_rows": total_rows,
+                    "successful_creations": successful,
+                    "failed_creations": len(failed),
+                    "skipped": len(skipped),
+                    "batches_created": stats['batches_created'],
+                    "custom_message": message
+                }
+            )
+
+        logger.info(message)
+        return {
+            'success': True,
+            'total_rows': total_rows,
+            'successful': successful,
+            'failed': len(failed),
+            'skipped': len(skipped),
+            'failed_details': failed,
+            'skipped_details': skipped,
+            'missing_categories': missing_categories_list,
+            'message': message
+        }
+
+    # ================================================================
+    # READING
+    # ================================================================
+
+    def _read_chunks(self, file_path, file_type):
+        """Yield DataFrames of at most PRODUCT_IMPORT_CHUNK_ROWS rows"""
+        if file_type == 'csv':
+            reader = pd.read_csv(file_path, dtype=str, chunksize=PRODUCT_IMPORT_CHUNK_ROWS)
+            first = True
+            for chunk in reader:
+                if first:
+                    self._check_columns(chunk)
+                    first = False
+                yield chunk
+            if first:
+                raise ValueError("The import file is empty")
+            return
+
+        frame = pd.read_excel(file_path, dtype=str)
+        self._check_columns(frame)
+        for start in range(0, len(frame), PRODUCT_IMPORT_CHUNK_ROWS):
+            yield frame.iloc[start:start + PRODUCT_IMPORT_CHUNK_ROWS]
+
+    def _check_columns(self, frame):
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in frame.columns]
+        if missing_columns:
+            raise ValueError(
+                f"Missing required columns: {', '.join(missing_columns)}. "
+                f"Required columns are: {', '.join(REQUIRED_COLUMNS)}"
+            )
+
+    # ================================================================
+    # LOOKUP TABLES (one query each per import)
+    # ================================================================
+
+    def _load_lookups(self):
+        categories = {}
+        for category in self.db.category.find({'isDeleted': False}, {'category_name': 1, 'sub_categories': 1}):
+            subcategory_names = set()
+            for subcat in category.get('sub_categories', []) or []:
+                if isinstance(subcat, dict) and 'name' in subcat:
+                    subcategory_names.add(subcat['name'])
+                elif isinstance(subcat, str):
+                    subcategory_names.add(subcat)
+            # First match wins, like find_one did
+            categories.setdefault(category.get('category_name'), {
+                'category_id': str(category['_id']),
+                'prefix': (category.get('category_name') or 'PROD')[:4].upper(),
+                'subcategories': subcategory_names
+            })
+
+        skus = set()
+        names = set()
+        for product in self.product_collection.find({'isDeleted': {'$ne': True}}, {'SKU': 1, 'product_name': 1}):
+            if product.get('SKU'):
+                skus.add(product['SKU'])
+            if product.get('product_name'):
+                names.add(str(product['product_name']).strip().lower())
+
+        return {
+            'categories': categories,
+            'suppliers': set(self.db.suppliers.distinct('_id')),
+            'skus': skus,
+            'names': names
+        }
+
+    # ================================================================
+    # VALIDATION (vectorized)
+    # ================================================================
+
+    def _validate_chunk(self, chunk, lookups, missing_categories):
+        """
+        Normalise a chunk into typed columns plus a 'valid' mask and return
+        (frame, row error messages in file order).
+        """
+        frame = pd.DataFrame(index=chunk.index)
+        frame['row_num'] = chunk.index + 2
+
+        def text(column):
+            if column not in chunk.columns:
+                return pd.Series(pd.NA, index=chunk.index, dtype='object')
+            values = chunk[column].astype('string').str.strip()
+            return values.mask(values == '').astype('object')
+
+        def number(column):
+            raw = text(column)
+            values = pd.to_numeric(raw, errors='coerce')
+            return values, raw.notna() & values.isna()
+
+        frame['product_name'] = text('product_name')
+        frame['category_name'] = text('category_name')
+        frame['subcategory_name'] = text('subcategory_name')
+        for field in TEXT_FIELDS:
+            frame[field] = text(field)
+
+        frame['selling_price'], bad_selling = number('selling_price')
+        frame['cost_price'], bad_cost = number('cost_price')
+        frame['stock'], bad_stock = number('stock')
+        frame['low_stock_threshold'], bad_threshold = number('low_stock_threshold')
+
+        categories = lookups['categories']
+        category_info = frame['category_name'].map(categories)
+        frame['category_id'] = category_info.map(lambda info: info['category_id'] if isinstance(info, dict) else None)
+        frame['category_prefix'] = category_info.map(lambda info: info['prefix'] if isinstance(info, dict) else None)
+
+        has_category = frame['category_name'].notna()
+        category_missing = has_category & category_info.isna()
+        subcategory_missing = has_category & category_info.notna() & frame['subcategory_name'].notna() & pd.Series(
+            [
+                subcat not in info['subcategories'] if isinstance(info, dict) and isinstance(subcat, str) else False
+                for info, subcat in zip(category_info, frame['subcategory_name'])
+            ],
+            index=frame.index
+        )
+
+        has_stock = frame['stock'] > 0
+        checks = [
+            (frame['product_name'].isna(), "Product name is required"),
+            (frame['selling_price'].isna() | (frame['selling_price'] <= 0), "Selling price must be greater than 0"),
+            (~has_category, "Category name is required"),
+            (category_missing, "Category '{category_name}' not found"),
+            (subcategory_missing, "Subcategory '{subcategory_name}' not found under category '{category_name}'"),
+            (has_stock & (frame['cost_price'].isna() | (frame['cost_price'] <= 0)),
+             "Cost price is required when stock is provided"),
+            (has_stock & frame['expiry_date'].isna(), "Expiry date is required when stock is provided"),
+            (bad_selling, "Selling price must be a valid number"),
+            (bad_cost, "Cost price must be a valid number"),
+            (bad_stock, "Stock must be a valid integer"),
+            (bad_threshold, "Low stock threshold must be a valid integer"),
+        ]
+
+        invalid = pd.Series(False, index=frame.index)
+        messages = []
+        for order, (mask, template) in enumerate(checks):
+            mask = mask.fillna(False).astype(bool)
+            invalid |= mask
+            for index in frame.index[mask]:
+                row = frame.loc[index]
+                messages.append((row['row_num'], order, f"Row {row['row_num']}: " + template.format(
+                    category_name=row['category_name'], subcategory_name=row['subcategory_name']
+                )))
+
+        for index in frame.index[category_missing | subcategory_missing]:
+            category_name = frame.at[index, 'category_name']
+            subcategory_name = frame.at[index, 'subcategory_name']
+            missing = missing_categories.setdefault(category_name, set())
+            if isinstance(subcategory_name, str):
+                missing.add(subcategory_name)
+
+        frame['valid'] = ~invalid
+        messages.sort(key=lambda message: (message[0], message[1]))
+        return frame, [message[2] for message in messages]
+
+    # ================================================================
+    # IMPORT
+    # ================================================================
+
+    def _import_chunk(self, frame, lookups, sku_counter, stats, notifier):
+        """Resolve duplicates, build documents and bulk-insert one chunk"""
+        frame = frame[frame['valid']]
+        if frame.empty:
+            return
+
+        documents = []
+        batch_specs = []
+        now = datetime.utcnow()
+        now_aware = datetime.now(timezone.utc)
+        expiry_dates = self._parse_dates(frame['expiry_date'])
+        name_prefixes = frame['product_name'].str.split().str[:2].str.join('').str[:4].str.upper()
+
+        for index, row in zip(frame.index, frame.to_dict('records')):
+            product_name = row['product_name']
+            sku = row['SKU']
+
+            # Supplied SKU already in the catalog -> skipped, as before
+            if isinstance(sku, str) and sku in lookups['skus']:
+                stats['skipped'].append({'product': product_name, 'reason': f"SKU {sku} already exists"})
+                continue
+
+            error = None
+            if isinstance(row['supplier_id'], str) and row['supplier_id'] not in lookups['suppliers']:
+                error = f"Supplier with ID {row['supplier_id']} not found"
+            elif product_name.lower() in lookups['names']:
+                error = f"Product with name '{product_name}' already exists"
+            if error:
+                stats['failed'].append({'product': product_name, 'error': f"Error creating product: {error}"})
+                continue
+
+            if not isinstance(sku, str):
+                sku = self._next_sku(row['category_prefix'] or 'PROD', name_prefixes[index], sku_counter, lookups['skus'])
+
+            lookups['skus'].add(sku)
+            lookups['names'].add(product_name.lower())
+
+            stock = int(row['stock']) if pd.notna(row['stock']) else 0
+            cost_price = float(row['cost_price']) if pd.notna(row['cost_price']) else 0.0
+            document = {
+                'product_name': product_name,
+                'category_id': row['category_id'],
+                'subcategory_name': row['subcategory_name'] if isinstance(row['subcategory_name'], str) else 'General',
+                'SKU': sku,
+                'unit': row['unit'] if isinstance(row['unit'], str) else '',
+                'stock': stock,
+                'low_stock_threshold': int(row['low_stock_threshold']) if pd.notna(row['low_stock_threshold']) else 10,
+                'cost_price': cost_price,
+                'selling_price': float(row['selling_price']),
+                'status': row['status'] if isinstance(row['status'], str) else 'active',
+                'is_taxable': True,
+                'date_received': now,
+                'isDeleted': False,
+                'created_at': now,
+                'updated_at': now,
+                'total_stock': stock,
+                'oldest_batch_expiry': None,
+                'newest_batch_expiry': None,
+                'expiry_alert': False,
+                'sync_logs': [{
+                    'last_updated': now,
+                    'source': 'cloud',
+                    'status': 'pending',
+                    'details': {'action': 'imported'}
+                }]
+            }
+            for field in ('expiry_date', 'barcode', 'description', 'supplier_id'):
+                if isinstance(row[field], str):
+                    document[field] = row[field]
+
+            if stock > 0:
+                expiry = expiry_dates.get(index)
+                batch_specs.append((len(documents), expiry))
+                if expiry is not None:
+                    document['oldest_batch_expiry'] = expiry
+                    document['newest_batch_expiry'] = expiry
+                    document['expiry_alert'] = expiry <= now_aware + timedelta(days=EXPIRY_ALERT_DAYS)
+
+            documents.append(document)
+
+        if not documents:
+            return
+
+        # One counter round-trip for the whole chunk's product IDs
+        for document, product_id in zip(documents, sequence_service.reserve_block('products', len(documents))):
+            document['_id'] = product_id
+
+        inserted_ids = self._insert_many(self.product_collection, documents, stats, key='product_name')
+        stats['successful'] += len(inserted_ids)
+
+        batches = self._build_batches(documents, batch_specs, inserted_ids, now_aware)
+        if batches:
+            batch_ids = self._insert_many(self.batch_collection, batches, stats, key='product_id')
+            stats['batches_created'] += len(batch_ids)
+
+    def _build_batches(self, documents, batch_specs, inserted_ids, now_aware):
+        """Initial batch documents for inserted products that came with stock"""
+        specs = [
+            (documents[position], expiry) for position, expiry in batch_specs
+            if documents[position]['_id'] in inserted_ids
+        ]
+        if not specs:
+            return []
+
+        first_ids = sequence_service.open_sequences(
+            f"{BATCH_SEQUENCE_PREFIX}{product['_id']}" for product, _ in specs
+        )
+        batch_number = f"INITIAL-{datetime.utcnow().strftime('%Y%m%d')}"
+
+        batches = []
+        for product, expiry in specs:
+            batches.append({
+                '_id': first_ids[f"{BATCH_SEQUENCE_PREFIX}{product['_id']}"],
+                'product_id': product['_id'],
+                'batch_number': batch_number,
+                'quantity_received': product['stock'],
+                'quantity_remaining': product['stock'],
+                'cost_price': product['cost_price'],
+                'expiry_date': expiry,
+                'expected_delivery_date': None,
+                'date_received': now_aware,
+                'supplier_id': product.get('supplier_id'),
+                'status': 'active',
+                'created_at': now_aware,
+                'updated_at': now_aware,
+                'notes': '',
+                'sync_logs': [{
+                    'last_updated': datetime.utcnow(),
+                    'source': 'cloud',
+                    'status': 'pending',
+                    'details': {'action': 'created'}
+                }]
+            })
+        return batches
+
+    def _insert_many(self, collection, documents, stats, key):
+        """Unordered insert; returns the set of _ids that were written"""
+        from pymongo.errors import BulkWriteError
+
+        try:
+            collection.insert_many(documents, ordered=False)
+            return {document['_id'] for document in documents}
+        except BulkWriteError as e:
+            failed_positions = {error['index'] for error in e.details.get('writeErrors', [])}
+            for error in e.details.get('writeErrors', []):
+                document = documents[error['index']]
+                stats['failed'].append({'product': document.get(key, 'Unknown'), 'error': error.get('errmsg', 'Write failed')})
+            return {
+                document['_id'] for position, document in enumerate(documents)
+                if position not in failed_positions
+            }
+
+    def _next_sku(self, category_prefix, name_prefix, sku_counter, existing_skus):
+        """CATEGORY-NAME-NUMBER, numbered from one in-memory block per import"""
+        while True:
+            sku_counter[0] += 1
+            sku = f"{category_prefix}-{name_prefix}-{sku_counter[0]:03d}"
+            if sku not in existing_skus:
+                return sku
+
+    def _parse_dates(self, values):
+        """Parse each distinct expiry string once; returns {index: aware datetime}"""
+        parsed = {}
+        for value in values.dropna().unique():
+            try:
+                date = date_parser.parse(value)
+                parsed[value] = date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+            except (ValueError, OverflowError) as e:
+                logger.warning(f"Could not parse expiry_date '{value}': {e}")
+                parsed[value] = None
+        return {index: parsed.get(value) for index, value in values.dropna().items()}
+
+
+# Singleton instance
+product_import_service = ProductImportService()
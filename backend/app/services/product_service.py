@@ -1,10 +1,13 @@
 import re 
 from datetime import datetime
 from ..database import db_manager
+from .service_registry import service_registry
+from .sequence_service import sequence_service
+from .query_builders import find_options, products_query
 from ..models import Product
 from notifications.services import notification_service
 from .batch_service import BatchService
-import pandas as pd
+from .product_import_service import product_import_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,7 +19,7 @@ class ProductService:
         self.category_collection = self.db.category
         self.supplier_collection = self.db.suppliers
         self.branch_collection = self.db.branches
-        self.batch_service = BatchService()
+        self.batch_service = service_registry.get(BatchService)
         
     def validate_foreign_keys(self, product_data):
         """Validate that foreign key references exist - using string IDs"""
@@ -113,31 +116,8 @@ class ProductService:
             logger.error(f"Failed to send product notification: {e}")
         
     def generate_product_id(self):
-        """Generate sequential PROD-##### ID"""
-        try:
-            # Get the highest existing product ID number
-            pipeline = [
-                {'$match': {'_id': {'$regex': r'^PROD-\d{5}$'}}},
-                {'$project': {
-                    'id_number': {
-                        '$toInt': {
-                            '$substr': ['$_id', 5, -1]  # Extract number after "PROD-"
-                        }
-                    }
-                }},
-                {'$sort': {'id_number': -1}},
-                {'$limit': 1}
-            ]
-            
-            result = list(self.product_collection.aggregate(pipeline))
-            next_number = (result[0]['id_number'] + 1) if result else 1
-            
-            return f"PROD-{next_number:05d}"
-        
-        except Exception:
-            # Fallback: count all products + 1
-            count = self.product_collection.count_documents({}) + 1
-            return f"PROD-{count:05d}"
+        """Generate sequential PROD-##### ID from the shared counter"""
+        return sequence_service.next_id('products')
 
     def add_sync_log(self, source='cloud', status='synced', details=None):
         """Helper method to create sync log entries"""
@@ -397,42 +377,8 @@ class ProductService:
     def get_all_products(self, filters=None, include_deleted=False):
         """Get all products with optional filters"""
         try:
-            query = {}
-            
-            # By default, exclude deleted products unless specifically requested
-            if not include_deleted:
-                query['isDeleted'] = {'$ne': True}
-            
-            if filters:
-                # Category filter
-                if filters.get('category_id'):
-                    query['category_id'] = filters['category_id']
-                
-                # Subcategory filter
-                if filters.get('subcategory_name'):
-                    query['subcategory_name'] = filters['subcategory_name']
-                
-                # Status filter
-                if filters.get('status'):
-                    query['status'] = filters['status']
-                
-                # Stock level filter
-                if filters.get('stock_level'):
-                    if filters['stock_level'] == 'out_of_stock':
-                        query['stock'] = 0
-                    elif filters['stock_level'] == 'low_stock':
-                        query['$expr'] = {'$lte': ['$stock', '$low_stock_threshold']}
-                
-                # Search filter
-                if filters.get('search'):
-                    search_regex = {'$regex': filters['search'], '$options': 'i'}
-                    query['$or'] = [
-                        {'product_name': search_regex},
-                        {'SKU': search_regex},
-                        {'_id': search_regex}
-                    ]
-            
-            products = list(self.product_collection.find(query).sort('product_name', 1))
+            spec = products_query(filters, include_deleted)
+            products = list(self.product_collection.find(**find_options(spec)))
             return products
         
         except Exception as e:
@@ -1006,10 +952,6 @@ class ProductService:
                         if cost_price is None or float(cost_price) == 0:
                             raise ValueError("Cost price is required when initial stock is provided")
                     
-                    # Generate sequential product ID for each product
-                    product_id = self.generate_product_id()
-                    product_data['_id'] = product_id
-                    
                     # Validate foreign keys
                     self.validate_foreign_keys(product_data)
                     
@@ -1105,6 +1047,11 @@ class ProductService:
             if validated_products:
                 logger.info(f"Inserting {len(validated_products)} validated products...")
                 
+                # Reserve sequential product IDs in one counter round-trip
+                product_ids = sequence_service.reserve_block('products', len(validated_products))
+                for product_data, product_id in zip(validated_products, product_ids):
+                    product_data['_id'] = product_id
+                
                 insert_result = self.product_collection.insert_many(validated_products, ordered=False)
                 
                 # Get inserted products
@@ -1238,252 +1185,12 @@ class ProductService:
         Import products from CSV or Excel file with detailed validation
         Now uses category_name instead of category_id
         Subcategory is OPTIONAL - products can be imported without subcategory
+        Validation and inserts are vectorized/chunked in ProductImportService
         """
         try:
-            # Read file based on type
-            if file_type == 'csv':
-                df = pd.read_csv(file_path)
-            elif file_type in ['xlsx', 'xls']:
-                df = pd.read_excel(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {file_type}")
-            
-            # ✅ FIXED: subcategory_name is now optional
-            required_columns = ['product_name', 'selling_price', 'category_name']
-            optional_columns = ['subcategory_name', 'SKU', 'supplier_id', 'stock', 'cost_price', 'low_stock_threshold', 
-                            'unit', 'status', 'barcode', 'description', 'expiry_date']
-            
-            # Check for missing required columns
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                raise ValueError(
-                    f"Missing required columns: {', '.join(missing_columns)}. "
-                    f"Required columns are: {', '.join(required_columns)}"
-                )
-            
-            # Validate each row
-            validation_errors = []
-            valid_products = []
-            skipped_products = []
-            missing_categories = {}
-            
-            for index, row in df.iterrows():
-                row_num = index + 2
-                errors = []
-                
-                # Validate required fields
-                if pd.isna(row.get('product_name')) or not str(row.get('product_name')).strip():
-                    errors.append(f"Row {row_num}: Product name is required")
-                
-                if pd.isna(row.get('selling_price')) or row.get('selling_price') <= 0:
-                    errors.append(f"Row {row_num}: Selling price must be greater than 0")
-                
-                # Validate category_name (REQUIRED)
-                category_name_raw = row.get('category_name', '')
-                category_name = str(category_name_raw).strip() if not pd.isna(category_name_raw) else ''
-                
-                if not category_name:
-                    errors.append(f"Row {row_num}: Category name is required")
-                
-                # ✅ FIXED: Subcategory is now OPTIONAL - default to None if blank
-                subcategory_name_raw = row.get('subcategory_name', '')
-                subcategory_name = str(subcategory_name_raw).strip() if not pd.isna(subcategory_name_raw) and str(subcategory_name_raw).strip() else None
-                
-                # Look up category using correct collection name
-                category = None
-                category_id = None
-                if category_name:
-                    category = self.db.category.find_one({
-                        'category_name': category_name,
-                        'isDeleted': False
-                    })
-                    
-                    if not category:
-                        # Track missing category
-                        if category_name not in missing_categories:
-                            missing_categories[category_name] = set()
-                        if subcategory_name:
-                            missing_categories[category_name].add(subcategory_name)
-                        errors.append(f"Row {row_num}: Category '{category_name}' not found")
-                    else:
-                        category_id = str(category['_id'])
-                        
-                        # ✅ FIXED: Only validate subcategory if one was provided
-                        if subcategory_name and category:
-                            subcategories = category.get('sub_categories', [])
-                            
-                            # Handle both list of strings and list of dicts
-                            subcategory_names = []
-                            for subcat in subcategories:
-                                if isinstance(subcat, dict) and 'name' in subcat:
-                                    subcategory_names.append(subcat['name'])
-                                elif isinstance(subcat, str):
-                                    subcategory_names.append(subcat)
-                            
-                            if subcategory_name not in subcategory_names:
-                                if category_name not in missing_categories:
-                                    missing_categories[category_name] = set()
-                                missing_categories[category_name].add(subcategory_name)
-                                errors.append(f"Row {row_num}: Subcategory '{subcategory_name}' not found under category '{category_name}'")
-                
-                # Validate stock and cost_price relationship
-                stock = row.get('stock', 0)
-                cost_price = row.get('cost_price', 0)
-                expiry_date = row.get('expiry_date')
-                
-                if not pd.isna(stock) and stock > 0:
-                    if pd.isna(cost_price) or cost_price <= 0:
-                        errors.append(f"Row {row_num}: Cost price is required when stock is provided")
-                    
-                    if pd.isna(expiry_date) or not str(expiry_date).strip():
-                        errors.append(f"Row {row_num}: Expiry date is required when stock is provided")
-                
-                # Validate numeric fields
-                try:
-                    if not pd.isna(row.get('selling_price')):
-                        float(row['selling_price'])
-                except (ValueError, TypeError):
-                    errors.append(f"Row {row_num}: Selling price must be a valid number")
-                
-                try:
-                    if not pd.isna(row.get('cost_price')):
-                        float(row['cost_price'])
-                except (ValueError, TypeError):
-                    errors.append(f"Row {row_num}: Cost price must be a valid number")
-                
-                try:
-                    if not pd.isna(row.get('stock')):
-                        int(row['stock'])
-                except (ValueError, TypeError):
-                    errors.append(f"Row {row_num}: Stock must be a valid integer")
-                
-                try:
-                    if not pd.isna(row.get('low_stock_threshold')):
-                        int(row['low_stock_threshold'])
-                except (ValueError, TypeError):
-                    errors.append(f"Row {row_num}: Low stock threshold must be a valid integer")
-                
-                if errors:
-                    validation_errors.extend(errors)
-                else:
-                    # ✅ FIXED: Build product data - subcategory is optional
-                    product_data = {
-                        'product_name': str(row['product_name']).strip(),
-                        'selling_price': float(row['selling_price']),
-                        'category_id': category_id,
-                    }
-                    
-                    # ✅ FIXED: Only add subcategory if provided
-                    if subcategory_name:
-                        product_data['subcategory_name'] = subcategory_name
-                    
-                    # Add other optional fields
-                    if not pd.isna(row.get('SKU')):
-                        product_data['SKU'] = str(row['SKU']).strip()
-                    
-                    if not pd.isna(row.get('supplier_id')):
-                        product_data['supplier_id'] = str(row['supplier_id']).strip()
-                    
-                    if not pd.isna(row.get('stock')):
-                        product_data['stock'] = int(row['stock'])
-                    
-                    if not pd.isna(row.get('cost_price')):
-                        product_data['cost_price'] = float(row['cost_price'])
-                    
-                    if not pd.isna(row.get('low_stock_threshold')):
-                        product_data['low_stock_threshold'] = int(row['low_stock_threshold'])
-                    
-                    if not pd.isna(row.get('unit')):
-                        product_data['unit'] = str(row['unit']).strip()
-                    
-                    if not pd.isna(row.get('status')):
-                        product_data['status'] = str(row['status']).strip()
-                    
-                    if not pd.isna(row.get('barcode')):
-                        product_data['barcode'] = str(row['barcode']).strip()
-                    
-                    if not pd.isna(row.get('description')):
-                        product_data['description'] = str(row['description']).strip()
-                    
-                    if not pd.isna(row.get('expiry_date')):
-                        product_data['expiry_date'] = str(row['expiry_date']).strip()
-                    
-                    valid_products.append(product_data)
-            
-            # Convert missing_categories set to list for JSON serialization
-            missing_categories_list = [
-                {'category_name': cat, 'subcategories': list(subcats)}
-                for cat, subcats in missing_categories.items()
-            ]
-            
-            # If validation only, return results with missing categories
-            if validate_only:
-                return {
-                    'valid': len(validation_errors) == 0 and len(missing_categories) == 0,
-                    'total_rows': len(df),
-                    'valid_products': len(valid_products),
-                    'errors': validation_errors,
-                    'missing_categories': missing_categories_list,
-                    'message': 'Validation completed' if not validation_errors else 'Validation failed'
-                }
-            
-            # If there are validation errors, don't proceed with import
-            if validation_errors:
-                return {
-                    'success': False,
-                    'total_rows': len(df),
-                    'valid_products': len(valid_products),
-                    'errors': validation_errors,
-                    'missing_categories': missing_categories_list,
-                    'message': f'Import failed: {len(validation_errors)} validation error(s) found'
-                }
-            
-            # Proceed with import
-            successful = []
-            failed = []
-            
-            for product_data in valid_products:
-                try:
-                    # Check if SKU exists (if SKU is provided)
-                    if 'SKU' in product_data:
-                        existing = self.db.products.find_one({
-                            'SKU': product_data['SKU'],
-                            'isDeleted': False
-                        })
-                        if existing:
-                            skipped_products.append({
-                                'product': product_data['product_name'],
-                                'reason': f"SKU {product_data['SKU']} already exists"
-                            })
-                            continue
-                    
-                    # Create product
-                    new_product = self.create_product(product_data)
-                    successful.append(new_product)
-                    
-                    logger.info(f"✅ Successfully created: {product_data['product_name']}")
-                    
-                except Exception as e:
-                    error_msg = str(e)
-                    logger.error(f"❌ FAILED to create '{product_data.get('product_name', 'Unknown')}': {error_msg}")
-                    
-                    failed.append({
-                        'product': product_data.get('product_name', 'Unknown'),
-                        'error': error_msg
-                    })
-            
-            return {
-                'success': True,
-                'total_rows': len(df),
-                'successful': len(successful),
-                'failed': len(failed),
-                'skipped': len(skipped_products),
-                'failed_details': failed,
-                'skipped_details': skipped_products,
-                'missing_categories': missing_categories_list,
-                'message': f'Import completed: {len(successful)} created, {len(failed)} failed, {len(skipped_products)} skipped'
-            }
-            
+            return product_import_service.import_file(
+                file_path, file_type, validate_only, notifier=self
+            )
         except Exception as e:
             raise Exception(f"Import failed: {str(e)}")
                 
@@ -1591,7 +1298,7 @@ class ProductService:
         failed_deletions = []
         
         # Create service instance to use existing methods
-        service = ProductService()
+        service = service_registry.get(ProductService)
         
         for product_id in product_ids:
             try:
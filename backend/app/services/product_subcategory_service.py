@@ -1,5 +1,6 @@
 from datetime import datetime
 from ..database import db_manager
+from .service_registry import service_registry
 import logging
 import re
 from .audit_service import AuditLogService
@@ -230,7 +231,7 @@ class ProductSubcategoryService:
             from ..models import Category
             from .category_service import CategoryService
             
-            category_service = CategoryService()
+            category_service = service_registry.get(CategoryService)
             category_id = category_service.generate_category_id()
             
             uncategorized_data = {
@@ -464,7 +465,7 @@ class ProductSubcategoryService:
             if removal_type == "move_to_none" and target_category_id:
                 # Step 1: Move to None subcategory within same category
                 from .category_service import CategoryService
-                category_service = CategoryService()
+                category_service = service_registry.get(CategoryService)
                 return category_service.move_product_to_none_subcategory(
                     product_id, target_category_id, current_user
                 )
@@ -0,0 +1,238 @@
+# app/services/promotion_index.py
+"""
+In-process compiled index of the currently active promotions.
+
+`apply_promotion_to_order` used to load and scan every active promotion on
+each order. The index groups them once by product_id and category_id (plus
+an "applies to all" bucket ordered by discount value), so an order only
+touches the promotions its own products and categories point at.
+
+Promotion writes bump a version stamp in the `counters` collection; every
+process compares it with the version it compiled and rebuilds on change.
+The index also expires itself when the next promotion starts or ends.
+"""
+
+import os
+import threading
+from datetime import datetime
+from decouple import config
+from pymongo import ReturnDocument
+from ..database import db_manager
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROMOTION_INDEX_VERSION_ID = 'promotion_index:version'
+# How long a process trusts its index before re-reading the version stamp.
+# Changes made in the same process are picked up immediately.
+PROMOTION_INDEX_CHECK_SECONDS = config('PROMOTION_INDEX_CHECK_SECONDS', default=2.0, cast=float)
+
+SUPPORTED_TYPES = ('percentage', 'fixed_amount', 'buy_x_get_y')
+
+
+def discount_value(promotion):
+    """The promotion's discount_value as a number; missing or malformed values count as 0"""
+    try:
+        return float(promotion.get('discount_value') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CompiledPromotions:
+    """Immutable lookup tables built from one snapshot of active promotions"""
+
+    def __init__(self, version, promotions, now):
+        self.version = version
+        self.built_at = now
+        self.promotions = {}
+        self.rank = {}            # position in created_at desc order (tie-break)
+        self.by_product = {}      # product_id -> [promotion_id]
+        self.by_category = {}     # category_id -> [promotion_id]
+        self.all_percentage = []  # target_type 'all', best value first
+        self.all_fixed = []
+        self.all_bxgy = []
+        self.expires_at = None
+
+        for promotion in promotions:
+            start_date = promotion.get('start_date')
+            end_date = promotion.get('end_date')
+
+            if start_date and start_date > now:
+                # Not live yet; rebuild when it starts
+                self._expire_no_later_than(start_date)
+                continue
+            if end_date:
+                self._expire_no_later_than(end_date)
+            if promotion.get('type') not in SUPPORTED_TYPES:
+                continue
+
+            promotion_id = promotion['promotion_id']
+            self.promotions[promotion_id] = promotion
+            self.rank[promotion_id] = len(self.rank)
+
+            target_type = promotion.get('target_type')
+            if target_type == 'all':
+                bucket = {
+                    'percentage': self.all_percentage,
+                    'fixed_amount': self.all_fixed,
+                    'buy_x_get_y': self.all_bxgy,
+                }[promotion['type']]
+                bucket.append(promotion_id)
+            elif target_type in ('products', 'categories'):
+                lookup = self.by_product if target_type == 'products' else self.by_category
+                for target_id in set(str(target) for target in promotion.get('target_ids', [])):
+                    lookup.setdefault(target_id, []).append(promotion_id)
+
+        # A promotion saved without discount_value gives no discount; it must not break the sort
+        value_order = lambda promotion_id: (-discount_value(self.promotions[promotion_id]), self.rank[promotion_id])
+        self.all_percentage.sort(key=value_order)
+        self.all_fixed.sort(key=value_order)
+
+    def _expire_no_later_than(self, moment):
+        if self.expires_at is None or moment < self.expires_at:
+            self.expires_at = moment
+
+    def __len__(self):
+        return len(self.promotions)
+
+    def is_expired(self, now):
+        return self.expires_at is not None and now > self.expires_at
+
+    def candidates(self, order_data):
+        """
+        Promotions that can apply to the order, each with the order amount
+        it covers. Returns (promotion, eligible_amount) pairs.
+
+        Cost depends on the order's distinct products/categories and the
+        few best "all" promotions, not on how many promotions are active.
+        """
+        items = order_data.get('items', [])
+        if not items:
+            return []
+
+        product_amounts = {}
+        category_amounts = {}
+        for item in items:
+            line_amount = item.get('price', 0) * item.get('quantity', 1)
+            if item.get('product_id') is not None:
+                key = str(item['product_id'])
+                product_amounts[key] = product_amounts.get(key, 0.0) + line_amount
+            if item.get('category_id'):
+                key = str(item['category_id'])
+                category_amounts[key] = category_amounts.get(key, 0.0) + line_amount
+
+        eligible = {}
+        for lookup, amounts in ((self.by_product, product_amounts), (self.by_category, category_amounts)):
+            for target_id, amount in amounts.items():
+                for promotion_id in lookup.get(target_id, ()):
+                    eligible[promotion_id] = eligible.get(promotion_id, 0.0) + amount
+
+        total_amount = order_data.get('total_amount', 0)
+        for promotion_id in self._best_of_all_bucket(self.all_percentage, lambda value: value):
+            eligible[promotion_id] = total_amount
+        for promotion_id in self._best_of_all_bucket(self.all_fixed, lambda value: min(value, total_amount)):
+            eligible[promotion_id] = total_amount
+        for promotion_id in self.all_bxgy:
+            eligible[promotion_id] = total_amount
+
+        return [(self.promotions[promotion_id], amount) for promotion_id, amount in eligible.items()]
+
+    def _best_of_all_bucket(self, bucket, effective_value):
+        """
+        Walk a value-ordered "all" bucket up to the first promotion without a
+        usage limit: nothing after it can give a bigger discount. Promotions
+        that tie with it on the effective discount are kept for the tie-break.
+        """
+        selected = []
+        cutoff = None
+        for promotion_id in bucket:
+            promotion = self.promotions[promotion_id]
+            value = effective_value(discount_value(promotion))
+            if cutoff is not None and value < cutoff:
+                break
+            selected.append(promotion_id)
+            if cutoff is None and not promotion.get('usage_limit'):
+                cutoff = value
+        return selected
+
+
+class PromotionIndex:
+    """Per-process cache of CompiledPromotions, invalidated by a version stamp"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._checked_at = None
+        self._dirty = True
+        self._pid = os.getpid()
+
+    @property
+    def counters(self):
+        return db_manager.get_database().counters
+
+    def bump_version(self):
+        """Call after any write that can change which promotions are active"""
+        self._dirty = True
+        try:
+            counter = self.counters.find_one_and_update(
+                {'_id': PROMOTION_INDEX_VERSION_ID},
+                {'$inc': {'seq': 1}, '$set': {'updated_at': datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return counter['seq']
+        except Exception as e:
+            logger.error(f"Error bumping promotion index version: {e}")
+            return None
+
+    def get(self):
+        """Return the compiled index, rebuilding it if it is stale"""
+        now = datetime.utcnow()
+        compiled = self._compiled
+
+        if compiled is not None and not self._needs_check(now) and not compiled.is_expired(now):
+            return compiled
+
+        version = self._read_version()
+        with self._lock:
+            compiled = self._compiled
+            if (
+                compiled is None
+                or self._dirty
+                or self._pid != os.getpid()
+                or compiled.version != version
+                or compiled.is_expired(now)
+            ):
+                compiled = self._build(version, now)
+                self._compiled = compiled
+                self._dirty = False
+                self._pid = os.getpid()
+            self._checked_at = now
+        return compiled
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _needs_check(self, now):
+        if self._dirty or self._pid != os.getpid() or self._checked_at is None:
+            return True
+        return (now - self._checked_at).total_seconds() >= PROMOTION_INDEX_CHECK_SECONDS
+
+    def _read_version(self):
+        counter = self.counters.find_one({'_id': PROMOTION_INDEX_VERSION_ID}, {'seq': 1})
+        return counter.get('seq', 0) if counter else 0
+
+    def _build(self, version, now):
+        promotions = db_manager.get_database().promotions.find({
+            'isDeleted': {'$ne': True},
+            'status': 'active',
+            'end_date': {'$gte': now}
+        }, {'usage_history': 0}).sort('created_at', -1)
+
+        compiled = CompiledPromotions(version, promotions, now)
+        logger.info(f"Compiled promotion index v{version} with {len(compiled)} active promotions")
+        return compiled
+
+
+# Singleton instance - one compiled index per process
+promotion_index = PromotionIndex()
@@ -1,6 +1,10 @@
 from bson import ObjectId
 from datetime import datetime, timedelta, timezone 
 from ..database import db_manager 
+from .service_registry import service_registry
+from .index_service import index_service
+from .sequence_service import sequence_service
+from .promotion_index import promotion_index, discount_value
 from ..models import Promotions
 from notifications.services import NotificationService
 from .audit_service import AuditLogService
@@ -10,42 +14,37 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Promotion documents never carry their usage history; each use is a row
+# in the append-only `promotion_usage` collection instead
+PROMOTION_READ_PROJECTION = {'usage_history': 0}
+
 class PromotionService:
+    _usage_indexes_ready = False
+
     def __init__(self):
         """Initialize PromotionService with audit logging"""
         self.db = db_manager.get_database()
         self.collection = self.db.promotions
+        self.usage_collection = self.db.promotion_usage
         self.audit_service = AuditLogService()
         self.notification_service = NotificationService()
-        self.product_service = ProductService()
-        self.category_service = CategoryService()
+        self.product_service = service_registry.get(ProductService)
+        self.category_service = service_registry.get(CategoryService)
+        self._ensure_usage_indexes()
         
-    def generate_promotion_id(self):
-        """Generate sequential PROM-#### ID"""
+    def _ensure_usage_indexes(self):
+        """Index promotion_usage for per-promotion reports (once per process)"""
+        if PromotionService._usage_indexes_ready:
+            return
         try:
-            pipeline = [
-                {"$match": {"_id": {"$regex": "^PROM-\\d{4}$"}}},  # Changed to use _id
-                {"$project": {
-                    "numeric_part": {
-                        "$toInt": {"$substr": ["$_id", 5, -1]}  # Changed to use _id
-                    }
-                }},
-                {"$sort": {"numeric_part": -1}},
-                {"$limit": 1}
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            if result:
-                next_number = result[0]["numeric_part"] + 1
-            else:
-                next_number = 1
-                
-            return f"PROM-{next_number:04d}"  # This returns a string
-            
+            index_service.ensure(self.usage_collection, 'promotion_usage')
+            PromotionService._usage_indexes_ready = True
         except Exception as e:
-            logger.error(f"Error generating promotion ID: {e}")
-            count = self.collection.count_documents({}) + 1
-            return f"PROM-{count:04d}"
+            logger.warning(f"Could not create promotion_usage indexes: {e}")
+        
+    def generate_promotion_id(self):
+        """Generate sequential PROM-#### ID"""
+        return sequence_service.next_id('promotions')
         
     def create_promotion(self, promotion_data):
         """Create new promotion with PROM-#### ID and audit logging"""
@@ -79,7 +78,6 @@ class PromotionService:
                 'usage_limit': promotion_data.get('usage_limit'),
                 'current_usage': 0,
                 'total_revenue_impact': 0.0,
-                'usage_history': [],
                 'created_by': promotion_data.get('created_by'),
                 'created_at': datetime.utcnow(),
                 'updated_at': datetime.utcnow(),
@@ -88,6 +86,7 @@ class PromotionService:
             
             # Insert promotion - now _id will be the string promotion_id
             self.collection.insert_one(promotion)
+            promotion_index.bump_version()
             
             # Log successful creation
             try:
@@ -189,6 +188,7 @@ class PromotionService:
                 {'promotion_id': promotion_id},
                 update_doc
             )
+            promotion_index.bump_version()
             
             # Get updated promotion
             updated_promotion = self.collection.find_one({'promotion_id': promotion_id})
@@ -317,6 +317,7 @@ class PromotionService:
                     }
                 }
             )
+            promotion_index.bump_version()
             
             # Get updated promotion
             updated_promotion = self.collection.find_one({'promotion_id': promotion_id})
@@ -364,9 +365,9 @@ class PromotionService:
     def apply_promotion_to_order(self, order_data, customer_id=None):
         """Apply promotion to order with detailed usage audit"""
         try:
-            # Get active promotions
-            active_promotions = self.get_active_promotions()
-            if not active_promotions['success'] or not active_promotions['promotions']:
+            # Only the promotions this order's products/categories point at
+            compiled = promotion_index.get()
+            if not len(compiled):
                 return {
                     'success': True,
                     'discount_applied': 0.0,
@@ -374,21 +375,36 @@ class PromotionService:
                     'message': 'No active promotions available'
                 }
             
+            scored = []
+            for promotion, eligible_amount in compiled.candidates(order_data):
+                discount = self._discount_for_eligible_amount(promotion, eligible_amount, order_data)
+                scored.append((discount, promotion))
+            
+            # Best discount first; ties go to the newest promotion
+            scored.sort(key=lambda entry: (-entry[0], compiled.rank[entry[1]['promotion_id']]))
+            current_usage = self._get_current_usage([
+                promotion['promotion_id'] for discount, promotion in scored
+                if discount > 0 and promotion.get('usage_limit')
+            ])
+            
             best_promotion = None
             best_discount = 0.0
             evaluation_log = []
             
-            # Evaluate each promotion and log the process
-            for promotion in active_promotions['promotions']:
-                discount = self._calculate_promotion_discount(promotion, order_data)
+            # Evaluate each candidate and log the process
+            for discount, promotion in scored:
+                usage_limit_ok = self._check_usage_limit({
+                    **promotion,
+                    'current_usage': current_usage.get(promotion['promotion_id'], promotion.get('current_usage', 0))
+                })
                 evaluation_log.append({
                     'promotion_id': promotion['promotion_id'],
                     'calculated_discount': discount,
                     'eligible': discount > 0,
-                    'usage_limit_ok': self._check_usage_limit(promotion)
+                    'usage_limit_ok': usage_limit_ok
                 })
                 
-                if discount > best_discount and self._check_usage_limit(promotion):
+                if best_promotion is None and discount > 0 and usage_limit_ok:
                     best_promotion = promotion
                     best_discount = discount
             
@@ -404,7 +420,7 @@ class PromotionService:
                         'promotions_evaluated': evaluation_log,
                         'reason': 'no_applicable_promotions'
                     },
-                    metadata={'available_promotions': len(active_promotions['promotions'])}
+                    metadata={'available_promotions': len(compiled)}
                 )
                 
                 return {
@@ -438,12 +454,12 @@ class PromotionService:
                         'id': best_promotion['promotion_id'],
                         'name': best_promotion['name'],
                         'type': best_promotion['type'],
-                        'discount_value': best_promotion['discount_value']
+                        'discount_value': best_promotion.get('discount_value')
                     }
                 },
                 metadata={
                     'promotion_type': best_promotion['type'],
-                    'usage_count_after': best_promotion['current_usage'] + 1,
+                    'usage_count_after': current_usage.get(best_promotion['promotion_id'], best_promotion.get('current_usage', 0)) + 1,
                     'revenue_impact': best_discount
                 }
             )
@@ -646,6 +662,7 @@ class PromotionService:
                 # Hard delete - remove from database
                 self.collection.delete_one({'promotion_id': promotion_id})
                 action = 'promotion_hard_deleted'
+            promotion_index.bump_version()
             
             # Log successful deletion
             self.audit_service.log_action(
@@ -718,6 +735,7 @@ class PromotionService:
             
             # Permanently delete
             result = self.collection.delete_one({'promotion_id': promotion_id})
+            promotion_index.bump_version()
             
             return {
                 'success': result.deleted_count > 0,
@@ -764,6 +782,7 @@ class PromotionService:
                     }
                 }
             )
+            promotion_index.bump_version()
             
             # Log restoration
             self.audit_service.log_action(
@@ -795,7 +814,7 @@ class PromotionService:
             
             skip = (page - 1) * limit
             
-            deleted_promotions = list(self.collection.find(query)
+            deleted_promotions = list(self.collection.find(query, PROMOTION_READ_PROJECTION)
                                     .sort('deleted_at', -1)
                                     .skip(skip)
                                     .limit(limit))
@@ -901,7 +920,7 @@ class PromotionService:
                 'status': 'active',
                 'start_date': {'$lte': now},
                 'end_date': {'$gte': now}
-            }).sort('created_at', -1))
+            }, PROMOTION_READ_PROJECTION).sort('created_at', -1))
             
             return {
                 'success': True,
@@ -916,7 +935,7 @@ class PromotionService:
     def get_promotion_by_id(self, promotion_id):
         """Retrieve specific promotion by PROM-#### ID"""
         try:
-            promotion = self.collection.find_one({'promotion_id': promotion_id})
+            promotion = self.collection.find_one({'promotion_id': promotion_id}, PROMOTION_READ_PROJECTION)
             
             if not promotion:
                 return {'success': False, 'message': 'Promotion not found'}
@@ -956,7 +975,7 @@ class PromotionService:
             sort_direction = -1 if sort_order.lower() == 'desc' else 1
             
             # Execute query
-            promotions = list(self.collection.find(query)
+            promotions = list(self.collection.find(query, PROMOTION_READ_PROJECTION)
                             .sort(sort_by, sort_direction)
                             .skip(skip)
                             .limit(limit))
@@ -1092,6 +1111,10 @@ class PromotionService:
                 except (ValueError, TypeError):
                     errors.append('usage_limit must be a valid integer')
             
+            # Validate Buy X Get Y configuration
+            if promotion_data.get('type') == 'buy_x_get_y':
+                errors.extend(self._validate_bxgy_config(promotion_data.get('discount_config') or {}))
+            
             return {
                 'is_valid': len(errors) == 0,
                 'errors': errors,
@@ -1106,6 +1129,31 @@ class PromotionService:
                 'message': f'Validation error: {str(e)}'
             }
 
+    def _validate_bxgy_config(self, discount_config):
+        """Validate Buy X Get Y discount_config keys"""
+        errors = []
+        
+        for field in ['buy_quantity', 'get_quantity']:
+            if field in discount_config:
+                try:
+                    if int(discount_config[field]) <= 0:
+                        errors.append(f'discount_config.{field} must be greater than 0')
+                except (ValueError, TypeError):
+                    errors.append(f'discount_config.{field} must be a valid integer')
+        
+        for field in ['max_sets', 'max_free_units', 'max_discount']:
+            if discount_config.get(field) is not None:
+                try:
+                    if float(discount_config[field]) < 0:
+                        errors.append(f'discount_config.{field} cannot be negative')
+                except (ValueError, TypeError):
+                    errors.append(f'discount_config.{field} must be a valid number')
+        
+        if discount_config.get('stacking', 'mixed') not in ['mixed', 'per_line']:
+            errors.append('discount_config.stacking must be one of: mixed, per_line')
+        
+        return errors
+
     def _validate_promotion_update(self, update_data, existing_promotion):
         """Validate promotion update data"""
         try:
@@ -1145,7 +1193,13 @@ class PromotionService:
                         errors.append('percentage discount cannot exceed 100%')
                 except (ValueError, TypeError):
                     errors.append('discount_value must be a valid number')
-            
+
+            # Validate the Buy X Get Y configuration the promotion will have after the update
+            if 'discount_config' in update_data or 'type' in update_data:
+                if update_data.get('type', existing_promotion.get('type')) == 'buy_x_get_y':
+                    discount_config = update_data.get('discount_config', existing_promotion.get('discount_config'))
+                    errors.extend(self._validate_bxgy_config(discount_config or {}))
+
             # Validate target changes
             if 'target_ids' in update_data and update_data.get('target_ids'):
                 target_type = update_data.get('target_type', existing_promotion.get('target_type'))
@@ -1231,12 +1285,20 @@ class PromotionService:
                 return 0.0
             
             eligible_amount = self._get_eligible_order_amount(promotion, order_data)
+            return self._discount_for_eligible_amount(promotion, eligible_amount, order_data)
             
+        except Exception as e:
+            logger.error(f"Error calculating promotion discount: {e}")
+            return 0.0
+
+    def _discount_for_eligible_amount(self, promotion, eligible_amount, order_data):
+        """Discount for a promotion once the order amount it covers is known"""
+        try:
             if promotion['type'] == 'percentage':
-                return eligible_amount * (promotion['discount_value'] / 100)
+                return eligible_amount * (discount_value(promotion) / 100)
             
             elif promotion['type'] == 'fixed_amount':
-                return min(promotion['discount_value'], eligible_amount)
+                return min(discount_value(promotion), eligible_amount)
             
             elif promotion['type'] == 'buy_x_get_y':
                 return self._calculate_bxgy_discount(promotion, order_data)
@@ -1294,32 +1356,78 @@ class PromotionService:
             return 0.0
 
     def _calculate_bxgy_discount(self, promotion, order_data):
-        """Calculate Buy X Get Y discount"""
+        """
+        Calculate Buy X Get Y discount.
+        
+        Works on (price, quantity) runs instead of one entry per unit, so a
+        500-unit line costs the same as a 1-unit line. discount_config keys:
+            buy_quantity / get_quantity  - buy X, get Y free (default 2 / 1)
+            stacking       - 'mixed' (units from any eligible line form a set,
+                             default) or 'per_line' (each product on its own)
+            repeat         - False applies the offer at most once per order
+            max_sets       - cap on sets applied per order
+            max_free_units - cap on free units per order
+            max_discount   - cap on the discount amount per order
+        The cheapest eligible units are the ones given free.
+        """
         try:
-            # Basic BXGY implementation - can be enhanced based on specific requirements
-            discount_config = promotion.get('discount_config', {})
-            buy_quantity = discount_config.get('buy_quantity', 2)
-            get_quantity = discount_config.get('get_quantity', 1)
-            
-            eligible_items = []
-            for item in order_data.get('items', []):
-                if promotion['target_type'] == 'all' or \
-                (promotion['target_type'] == 'products' and item.get('product_id') in promotion['target_ids']) or \
-                (promotion['target_type'] == 'categories' and item.get('category_id') in promotion['target_ids']):
-                    eligible_items.extend([item] * item.get('quantity', 1))
-            
-            if len(eligible_items) < buy_quantity:
+            discount_config = promotion.get('discount_config', {}) or {}
+            buy_quantity = int(discount_config.get('buy_quantity', 2))
+            get_quantity = int(discount_config.get('get_quantity', 1))
+            if buy_quantity <= 0 or get_quantity <= 0:
                 return 0.0
             
-            # Sort by price (lowest first for maximum customer benefit)
-            eligible_items.sort(key=lambda x: x.get('price', 0))
-            
-            # Calculate how many free items customer gets
-            sets_qualified = len(eligible_items) // (buy_quantity + get_quantity)
-            free_items = sets_qualified * get_quantity
+            runs = self._bxgy_eligible_runs(promotion, order_data)
+            if not runs:
+                return 0.0
             
-            # Calculate discount (sum of cheapest items that are free)
-            discount = sum(item.get('price', 0) for item in eligible_items[:free_items])
+            max_sets = discount_config.get('max_sets')
+            if discount_config.get('repeat', True) is False:
+                max_sets = 1 if max_sets is None else min(int(max_sets), 1)
+            
+            set_size = buy_quantity + get_quantity
+            if discount_config.get('stacking', 'mixed') == 'per_line':
+                # Each product forms its own sets; when capped, sets on the
+                # cheapest products are used first
+                free_runs = []
+                sets_left = None if max_sets is None else int(max_sets)
+                for price, quantity in sorted(runs.values()):
+                    sets = quantity // set_size
+                    if sets_left is not None:
+                        sets = min(sets, sets_left)
+                        sets_left -= sets
+                    if sets:
+                        free_runs.append((price, sets * get_quantity))
+                free_units = sum(quantity for price, quantity in free_runs)
+            else:
+                # Merge equal prices so the walk is over distinct price points
+                price_runs = {}
+                for price, quantity in runs.values():
+                    price_runs[price] = price_runs.get(price, 0) + quantity
+                free_runs = sorted(price_runs.items())
+                
+                total_units = sum(price_runs.values())
+                if total_units < buy_quantity:
+                    return 0.0
+                sets = total_units // set_size
+                if max_sets is not None:
+                    sets = min(sets, int(max_sets))
+                free_units = sets * get_quantity
+            
+            if discount_config.get('max_free_units') is not None:
+                free_units = min(free_units, int(discount_config['max_free_units']))
+            
+            # Walk the cheapest runs until the free units are used up
+            discount = 0.0
+            for price, quantity in free_runs:
+                if free_units <= 0:
+                    break
+                units = min(free_units, quantity)
+                discount += price * units
+                free_units -= units
+            
+            if discount_config.get('max_discount') is not None:
+                discount = min(discount, float(discount_config['max_discount']))
             
             return discount
             
@@ -1327,6 +1435,24 @@ class PromotionService:
             logger.error(f"Error calculating BXGY discount: {e}")
             return 0.0
 
+    def _bxgy_eligible_runs(self, promotion, order_data):
+        """Eligible order lines collapsed to {product: (price, quantity)}"""
+        target_type = promotion['target_type']
+        target_ids = set(promotion.get('target_ids', []))
+        
+        runs = {}
+        for item in order_data.get('items', []):
+            if target_type == 'all' or \
+            (target_type == 'products' and item.get('product_id') in target_ids) or \
+            (target_type == 'categories' and item.get('category_id') in target_ids):
+                quantity = int(item.get('quantity', 1))
+                if quantity <= 0:
+                    continue
+                price = item.get('price', 0)
+                key = (item.get('product_id'), price)
+                runs[key] = (price, runs.get(key, (price, 0))[1] + quantity)
+        return runs
+
     def _check_usage_limit(self, promotion):
         """Check if promotion usage limit reached"""
         try:
@@ -1341,10 +1467,30 @@ class PromotionService:
             logger.error(f"Error checking usage limit: {e}")
             return False
 
+    def _get_current_usage(self, promotion_ids):
+        """Live usage counts for usage-limited promotions (the index may be stale)"""
+        if not promotion_ids:
+            return {}
+        
+        cursor = self.collection.find(
+            {'promotion_id': {'$in': promotion_ids}},
+            {'promotion_id': 1, 'current_usage': 1}
+        )
+        return {promotion['promotion_id']: promotion.get('current_usage', 0) for promotion in cursor}
+
     def _track_promotion_usage(self, promotion_id, usage_data):
         """Track when promotion is used on orders"""
         try:
-            # Update promotion usage statistics
+            # One append-only row per use keeps the promotion document small
+            self.usage_collection.insert_one({
+                'promotion_id': promotion_id,
+                'customer_id': usage_data.get('customer_id'),
+                'discount_amount': usage_data['discount_amount'],
+                'order_summary': usage_data.get('order_summary', {}),
+                'used_at': usage_data['used_at']
+            })
+            
+            # Pre-aggregated counters on the promotion
             self.collection.update_one(
                 {'promotion_id': promotion_id},
                 {
@@ -1352,18 +1498,8 @@ class PromotionService:
                         'current_usage': 1,
                         'total_revenue_impact': usage_data['discount_amount']
                     },
-                    '$push': {
-                        'usage_history': {
-                            'customer_id': usage_data.get('customer_id'),
-                            'discount_amount': usage_data['discount_amount'],
-                            'order_summary': usage_data.get('order_summary', {}),
-                            'used_at': usage_data['used_at']
-                        }
-                    },
-                    '$set': {
-                        'last_used_at': usage_data['used_at'],
-                        'updated_at': datetime.utcnow()
-                    }
+                    '$max': {'last_used_at': usage_data['used_at']},
+                    '$set': {'updated_at': datetime.utcnow()}
                 }
             )
             
@@ -1388,6 +1524,7 @@ class PromotionService:
                     }
                 }
             )
+            promotion_index.bump_version()
             
             # Generate final usage report
             usage_report = self._generate_usage_report(promotion_id)
@@ -1443,6 +1580,7 @@ class PromotionService:
                     }
                 }
             )
+            promotion_index.bump_version()
             
             # Log deactivation
             self.audit_service.log_action(
@@ -1517,6 +1655,8 @@ class PromotionService:
             if start_date and end_date:
                 match_query['created_at'] = {'$gte': start_date, '$lte': end_date}
             
+            # current_usage / total_revenue_impact are the counters
+            # _track_promotion_usage keeps with $inc; no promotion_usage scan
             pipeline = [
                 {'$match': match_query},
                 {'$group': {
@@ -1546,18 +1686,39 @@ class PromotionService:
     def _generate_usage_report(self, promotion_id):
         """Generate comprehensive usage report for promotion"""
         try:
-            promotion = self.collection.find_one({'promotion_id': promotion_id})
+            promotion = self.collection.find_one({'promotion_id': promotion_id}, PROMOTION_READ_PROJECTION)
             if not promotion:
                 return {}
             
-            usage_history = promotion.get('usage_history', [])
+            pipeline = [
+                {'$match': {'promotion_id': promotion_id}},
+                {'$group': {
+                    '_id': '$customer_id',
+                    'uses': {'$sum': 1},
+                    'discount': {'$sum': '$discount_amount'},
+                    'first_used_at': {'$min': '$used_at'},
+                    'last_used_at': {'$max': '$used_at'}
+                }},
+                {'$group': {
+                    '_id': None,
+                    'total_uses': {'$sum': '$uses'},
+                    'unique_customers': {'$sum': 1},
+                    'total_discount': {'$sum': '$discount'},
+                    'first_used_at': {'$min': '$first_used_at'},
+                    'last_used_at': {'$max': '$last_used_at'}
+                }}
+            ]
+            usage = next(self.usage_collection.aggregate(pipeline), {})
             
             return {
                 'promotion_id': promotion_id,
                 'promotion_name': promotion['name'],
-                'total_customers': len(usage_history),
-                'total_discount': sum(usage['discount_amount'] for usage in usage_history),
+                'total_customers': usage.get('total_uses', 0),
+                'unique_customers': usage.get('unique_customers', 0),
+                'total_discount': usage.get('total_discount', 0),
                 'revenue_impact': promotion.get('total_revenue_impact', 0),
+                'first_used_at': usage['first_used_at'].isoformat() if usage.get('first_used_at') else None,
+                'last_used_at': usage['last_used_at'].isoformat() if usage.get('last_used_at') else None,
                 'period': {
                     'start_date': promotion['start_date'].isoformat(),
                     'end_date': promotion['end_date'].isoformat(),
@@ -1567,4 +1728,4 @@ class PromotionService:
             
         except Exception as e:
             logger.error(f"Error generating usage report for {promotion_id}: {e}")
-            return {}
\ No newline at end of file
+            return {}
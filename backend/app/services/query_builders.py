@@ -0,0 +1,139 @@
+# app/services/query_builders.py
+"""
+Read queries shared by the sync services and the async (motor) read path.
+
+Each builder returns a find spec, a dict with the `filter` and optionally
+`sort`, `limit` and `projection`. `find_options(spec)` turns it into
+keyword arguments accepted by both pymongo's and motor's `find()`:
+
+    collection.find(**find_options(products_query(filters)))
+
+Keeping the queries here means the WSGI endpoints and their async twins
+(app.kpi_views.async_read_views) cannot drift apart, and the index
+manifest has one place to look at for the hot read shapes.
+"""
+
+from datetime import datetime, timedelta
+
+
+def find_options(spec):
+    """Keyword arguments for Collection.find() from a find spec"""
+    options = {'filter': spec['filter']}
+    for key in ('projection', 'sort', 'limit'):
+        if spec.get(key):
+            options[key] = spec[key]
+    return options
+
+
+# ================================================================
+# NOTIFICATIONS
+# ================================================================
+
+def notifications_query(recipient_id=None, notification_type=None, is_read=None, limit=50, include_archived=False):
+    """Newest notifications, optionally for one recipient / type / read state"""
+    query = {}
+
+    # Exclude archived notifications by default
+    if not include_archived:
+        query['archived'] = {'$ne': True}
+
+    if recipient_id:
+        query['recipient_id'] = str(recipient_id)
+    if notification_type:
+        query['notification_type'] = notification_type
+    if is_read is not None:
+        query['is_read'] = is_read
+
+    return {'filter': query, 'sort': [('created_at', -1)], 'limit': limit}
+
+
+def recent_notifications_query(limit=10, hours=None, include_archived=False):
+    """Last `limit` notifications, or those of the last `hours` hours"""
+    spec = notifications_query(limit=limit, include_archived=include_archived)
+    if hours:
+        spec['filter']['created_at'] = {'$gte': datetime.utcnow() - timedelta(hours=hours)}
+    return spec
+
+
+# ================================================================
+# ONLINE ORDERS
+# ================================================================
+
+# Fields the order status endpoints read; the rest of the order is not sent over the wire
+ORDER_STATUS_FIELDS = ('customer_id', 'order_status', 'status_history', 'updated_at')
+
+
+def order_status_query(order_id):
+    return {'filter': {'_id': order_id}, 'projection': {field: 1 for field in ORDER_STATUS_FIELDS}}
+
+
+# ================================================================
+# CATALOG
+# ================================================================
+
+def categories_query(include_deleted=False):
+    query = {}
+    if not include_deleted:
+        query['isDeleted'] = {'$ne': True}
+    return {'filter': query}
+
+
+def subcategory_products_filter(category_id, subcategory_name):
+    """Live products of one subcategory (the count shown next to it)"""
+    return {
+        'category_id': category_id,
+        'subcategory_name': subcategory_name,
+        'isDeleted': {'$ne': True},
+    }
+
+
+def subcategory_counts_pipeline(category_ids):
+    """
+    Live product counts per (category_id, subcategory_name) for many
+    categories in one round trip; the same numbers as counting
+    subcategory_products_filter() for each subcategory.
+    """
+    return [
+        {'$match': {'category_id': {'$in': list(category_ids)}, 'isDeleted': {'$ne': True}}},
+        {'$group': {'_id': {'category_id': '$category_id', 'subcategory_name': '$subcategory_name'}, 'count': {'$sum': 1}}},
+    ]
+
+
+def products_query(filters=None, include_deleted=False):
+    """Product listing filters (category, subcategory, status, stock level, search), by name"""
+    query = {}
+
+    # By default, exclude deleted products unless specifically requested
+    if not include_deleted:
+        query['isDeleted'] = {'$ne': True}
+
+    if filters:
+        # Category filter
+        if filters.get('category_id'):
+            query['category_id'] = filters['category_id']
+
+        # Subcategory filter
+        if filters.get('subcategory_name'):
+            query['subcategory_name'] = filters['subcategory_name']
+
+        # Status filter
+        if filters.get('status'):
+            query['status'] = filters['status']
+
+        # Stock level filter
+        if filters.get('stock_level'):
+            if filters['stock_level'] == 'out_of_stock':
+                query['stock'] = 0
+            elif filters['stock_level'] == 'low_stock':
+                query['$expr'] = {'$lte': ['$stock', '$low_stock_threshold']}
+
+        # Search filter
+        if filters.get('search'):
+            search_regex = {'$regex': filters['search'], '$options': 'i'}
+            query['$or'] = [
+                {'product_name': search_regex},
+                {'SKU': search_regex},
+                {'_id': search_regex}
+            ]
+
+    return {'filter': query, 'sort': [('product_name', 1)]}
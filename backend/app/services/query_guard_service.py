@@ -0,0 +1,246 @@
+# app/services/query_guard_service.py
+"""
+N+1 query detection and query budgets.
+
+A second pymongo CommandListener (next to the metrics one) counts the
+commands issued inside a guard scope and reduces each one to a "shape":
+command, collection and filter with every value replaced by `?`. When the
+same shape repeats QUERY_GUARD_REPEAT_THRESHOLD times in one scope, which
+is what a `find_one` inside a loop looks like, the guard logs it together
+with the application frame that issued it. The stack is captured only at
+that moment, never per command.
+
+Scopes are opened by QueryGuardMiddleware for every request, and by
+`query_budget(...)`, which works as a view decorator or a context manager:
+
+    @query_budget(20)
+    def post(self, request): ...
+
+    with query_budget(5, 'low stock warnings'):
+        engine.stock_warnings(cart, products)
+
+QUERY_GUARD selects the mode: `off` (production default), `log` (default
+when DEBUG is on) or `raise`, which makes budget overruns and repeated
+shapes raise QueryBudgetExceeded so test runs fail. Responses carry an
+X-Query-Count header while the guard is on, and X-Query-Budget when the
+view declared one, so the HTTP test scripts can check budgets too.
+"""
+
+import contextvars
+import os
+import traceback
+from collections import Counter
+from contextlib import ContextDecorator
+from decouple import config
+from pymongo import monitoring
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUERY_GUARD = config('QUERY_GUARD', default='')
+QUERY_GUARD_REPEAT_THRESHOLD = config('QUERY_GUARD_REPEAT_THRESHOLD', default=5, cast=int)
+QUERY_GUARD_MODES = ('off', 'log', 'raise')
+
+IGNORED_COMMANDS = frozenset(('hello', 'ismaster', 'isMaster', 'ping', 'saslStart', 'saslContinue',
+                              'endSessions', 'buildInfo', 'getnonce', 'authenticate',
+                              'commitTransaction', 'abortTransaction', 'getMore', 'killCursors'))
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_active_scopes = contextvars.ContextVar('query_guard_scopes', default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A guarded block issued more MongoDB commands than it declared, or repeated one shape"""
+
+
+class GuardScope:
+    """Commands seen by one request or query_budget block"""
+
+    __slots__ = ('label', 'budget', 'declared', 'count', 'shapes', 'reported', 'violations')
+
+    def __init__(self, label, budget=None):
+        self.label = label
+        self.budget = budget
+        self.declared = budget  # reported in X-Query-Budget; a view's budget lands on its request
+        self.count = 0
+        self.shapes = Counter()
+        self.reported = set()
+        self.violations = []
+
+
+class QueryGuardService:
+    """Opens guard scopes and decides whether violations log or raise"""
+
+    @property
+    def mode(self):
+        mode = (QUERY_GUARD or '').strip().lower()
+        if mode in QUERY_GUARD_MODES:
+            return mode
+        try:
+            from django.conf import settings
+            return 'log' if getattr(settings, 'DEBUG', False) else 'off'
+        except Exception:
+            return 'off'
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def begin(self, label, budget=None):
+        scope = GuardScope(label, budget)
+        token = _active_scopes.set(_active_scopes.get() + (scope,))
+        return scope, token
+
+    def end(self, scope, token, strict=None):
+        """
+        Close a scope, check its budget and return it. In raise mode (or with
+        strict=True) any violation recorded in the scope raises here: pymongo
+        swallows exceptions from listeners, so repeats can only fail the test
+        once the guarded block is over.
+        """
+        _active_scopes.reset(token)
+        if scope.budget is not None and scope.count > scope.budget:
+            self._violation(scope, f"{scope.label}: {scope.count} MongoDB commands, budget is {scope.budget}")
+        if scope.violations and (strict is True or (strict is None and self.mode == 'raise')):
+            raise QueryBudgetExceeded('; '.join(scope.violations))
+        return scope
+
+    def current_scopes(self):
+        return _active_scopes.get()
+
+    # ================================================================
+    # COMMAND TRACKING
+    # ================================================================
+
+    def on_command(self, event):
+        scopes = _active_scopes.get()
+        if not scopes or event.command_name in IGNORED_COMMANDS:
+            return
+
+        shape = command_shape(event.command_name, event.command)
+        for scope in scopes:
+            scope.count += 1
+
+        # Repeats are reported once, by the outermost scope (normally the request)
+        root = scopes[0]
+        root.shapes[shape] += 1
+        if root.shapes[shape] == QUERY_GUARD_REPEAT_THRESHOLD and shape not in root.reported:
+            root.reported.add(shape)
+            self._violation(
+                root,
+                f"{root.label}: same query shape issued {QUERY_GUARD_REPEAT_THRESHOLD}+ times "
+                f"(likely N+1) {shape} at {call_site()}"
+            )
+
+    def _violation(self, scope, message):
+        scope.violations.append(message)
+        logger.warning(message)
+
+
+class query_budget(ContextDecorator):
+    """
+    Declare how many MongoDB commands a view or block may issue.
+
+    Overruns and repeated shapes raise QueryBudgetExceeded on exit when
+    QUERY_GUARD=raise (or strict=True) and are logged otherwise. With the guard off and strict unset, the
+    decorator costs nothing.
+    """
+
+    def __init__(self, limit, label=None, strict=None):
+        self.limit = limit
+        self.label = label
+        self.strict = strict
+        self._open = []
+
+    def __call__(self, func):
+        if self.label is None:
+            self.label = getattr(func, '__qualname__', repr(func))
+        return super().__call__(func)
+
+    def _recreate_cm(self):
+        # A decorated view may run on several threads at once
+        return query_budget(self.limit, self.label, self.strict)
+
+    def __enter__(self):
+        if self.strict is None and not query_guard_service.enabled:
+            self._open.append(None)
+            return self
+        scope, token = query_guard_service.begin(self.label or 'query_budget', self.limit)
+        self._open.append((scope, token))
+        request_scope = _active_scopes.get()[0]
+        if request_scope is not scope and request_scope.declared is None:
+            request_scope.declared = self.limit
+        return scope
+
+    def __exit__(self, exc_type, exc, tb):
+        opened = self._open.pop()
+        if opened is None:
+            return False
+        scope, token = opened
+        if exc_type is not None:
+            _active_scopes.reset(token)
+            return False
+        query_guard_service.end(scope, token, self.strict)
+        return False
+
+
+class QueryGuardListener(monitoring.CommandListener):
+    """Feeds started commands to the guard; does nothing outside a guard scope"""
+
+    def started(self, event):
+        if _active_scopes.get():
+            query_guard_service.on_command(event)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# ================================================================
+# SHAPES AND CALL SITES
+# ================================================================
+
+def command_shape(command_name, command):
+    """`find products {"_id": ?}` style description with values stripped"""
+    collection = command.get(command_name)
+    if command_name == 'find':
+        query = command.get('filter', {})
+    elif command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes') or [{}]
+        query = statements[0].get('q', {})
+    elif command_name in ('findAndModify', 'count', 'distinct'):
+        query = command.get('query', {})
+    elif command_name == 'aggregate':
+        query = [next(iter(stage), '?') for stage in command.get('pipeline', [])]
+    else:
+        query = None
+    return f"{command_name} {collection}" + (f" {_strip_values(query)}" if query is not None else '')
+
+
+def _strip_values(value):
+    if isinstance(value, dict):
+        return '{' + ', '.join(f'"{key}": {_strip_values(val)}' for key, val in sorted(value.items())) + '}'
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, str) and item.startswith('$') for item in value):
+            return '[' + ', '.join(value) + ']'  # aggregate stage names
+        return '[' + (_strip_values(value[0]) if value and isinstance(value[0], dict) else '?') + ']'
+    return '?'
+
+
+def call_site(*skip_files):
+    """Innermost application frame on the current stack, as file:line in function"""
+    skipped = {os.path.abspath(__file__)} | {os.path.abspath(path) for path in skip_files}
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = os.path.abspath(frame.filename)
+        if not filename.startswith(APP_ROOT) or filename in skipped:
+            continue
+        return f"{os.path.relpath(filename, os.path.dirname(APP_ROOT))}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+# Singleton instances
+query_guard_service = QueryGuardService()
+query_guard_listener = QueryGuardListener()
@@ -3,6 +3,7 @@ from ..models import SalesLog
 import bcrypt
 from notifications.services import notification_service
 from .pos.SalesService import SalesService
+from .top_items_service import top_items_service
 from collections import defaultdict
 from datetime import datetime, timedelta
 
@@ -18,36 +19,12 @@ class SalesDisplayService():
         Includes option to filter out voided transactions
         """
         try:
-            # Build query filter
-            query_filter = {}
-            
-            # Date filtering
-            if start_date or end_date:
-                date_filter = {}
-                if start_date:
-                    # Convert string to datetime if needed
-                    if isinstance(start_date, str):
-                        start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                    date_filter['$gte'] = start_date
-                if end_date:
-                    if isinstance(end_date, str):
-                        end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                    # Include entire end date by setting to end of day
-                    end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-                    date_filter['$lte'] = end_date
-                
-                if date_filter:
-                    query_filter['transaction_date'] = date_filter
-            
-            # Exclude voided transactions unless specifically included
-            if not include_voided:
-                query_filter['status'] = {'$ne': 'voided'}
-            
-            print(f"🔍 Query filter: {query_filter}")
-            
-            # Fetch sales data with the filter
-            sales = list(self.sales_collection.find(query_filter))
-            print(f"📊 Found {len(sales)} sales records")
+            # Sold quantity / sales per product, grouped in MongoDB
+            ranked = top_items_service.top_items(
+                ['sales'], self._to_day(start_date), self._to_day(end_date),
+                limit=None, include_voided=include_voided
+            )
+            print(f"📊 Found {len(ranked)} products sold in range")
             
             # Process products, categories, batches (keep your existing logic)
             products = self.fetch_all_products()
@@ -67,24 +44,8 @@ class SalesDisplayService():
                 if product_id:
                     product_id_to_stock_remaining[product_id] += qty_remaining
 
-            # Aggregate sales items for the filtered period
-            product_id_to_sold_qty = defaultdict(int)
-            product_id_to_total_sales = defaultdict(float)
-
-            def accumulate_items(container):
-                for doc in container:
-                    # Skip voided transactions unless included
-                    if not include_voided and doc.get('status') == 'voided':
-                        continue
-                    
-                    for item in doc.get('items', []):
-                        pid = item.get('product_id')
-                        if not pid:
-                            continue
-                        product_id_to_sold_qty[pid] += item.get('quantity', 0)
-                        product_id_to_total_sales[pid] += item.get('subtotal', 0.0)
-
-            accumulate_items(sales)
+            product_id_to_sold_qty = {item['key']: item['quantity'] for item in ranked}
+            product_id_to_total_sales = {item['key']: item['amount'] for item in ranked}
 
             # Build display list per product
             display_rows = []
@@ -162,47 +123,51 @@ class SalesDisplayService():
 
     # Keep your existing methods but update them to use transaction_date
     def top_selling_items(self, start_date=None, end_date=None, limit=10):
-        """Updated to use transaction_date and exclude voided by default"""
+        """Top POS + online items for the local days in range, excluding voided sales"""
         try:
-            query_filter = {'status': {'$ne': 'voided'}}
-            
-            if start_date or end_date:
-                date_filter = {}
-                if start_date:
-                    if isinstance(start_date, str):
-                        start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                    date_filter['$gte'] = start_date
-                if end_date:
-                    if isinstance(end_date, str):
-                        end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-                    end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-                    date_filter['$lte'] = end_date
-                
-                if date_filter:
-                    query_filter['transaction_date'] = date_filter
-            
-            sales = list(self.sales_collection.find(query_filter))
-            online_transactions = list(self.online_transactions_collection.find(query_filter))
-            
-            # Rest of your existing logic...
-            item_totals = defaultdict(lambda: {"product_name": "", "total_quantity": 0, "total_sales": 0.0})
-            for sale in sales + online_transactions:
-                for item in sale.get("items", []):
-                    pid = item["product_id"]
-                    item_totals[pid]["product_name"] = item.get("product_name", "")
-                    item_totals[pid]["total_quantity"] += item.get("quantity", 0)
-                    item_totals[pid]["total_sales"] += item.get("subtotal", 0)
-            
-            result = sorted([
-                {"product_id": pid, **data}
-                for pid, data in item_totals.items()
-            ], key=lambda x: x["total_sales"], reverse=True)
-            return result[:limit]
-            
+            return self._ranked_items(['sales', 'online_transactions'], start_date, end_date, limit)
         except Exception as e:
             print(f"❌ Error in top_selling_items: {str(e)}")
             return []
 
+    def top_selling_pos_items(self, start_date=None, end_date=None, limit=None):
+        """Ranked POS items (all of them unless limit is given)"""
+        try:
+            return self._ranked_items(['sales'], start_date, end_date, limit)
+        except Exception as e:
+            print(f"❌ Error in top_selling_pos_items: {str(e)}")
+            return []
+
+    def top_selling_online_items(self, start_date=None, end_date=None, limit=None):
+        """Ranked online order items (all of them unless limit is given)"""
+        try:
+            return self._ranked_items(['online_transactions'], start_date, end_date, limit)
+        except Exception as e:
+            print(f"❌ Error in top_selling_online_items: {str(e)}")
+            return []
+
+    def _ranked_items(self, collections, start_date, end_date, limit):
+        ranked = top_items_service.top_items(
+            collections, self._to_day(start_date), self._to_day(end_date), limit=limit
+        )
+        return [
+            {
+                "product_id": item['key'],
+                "product_name": item['name'],
+                "total_quantity": item['quantity'],
+                "total_sales": item['amount']
+            }
+            for item in ranked
+        ]
+
+    def _to_day(self, value):
+        """ISO string / datetime / date -> date (None stays None)"""
+        if not value:
+            return None
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return value.date() if isinstance(value, datetime) else value
+
     # Keep your existing helper methods
     def fetch_all_products(self):
         products = list(self.db.products.find({}))
@@ -0,0 +1,521 @@
+# app/services/sales_rollup_service.py
+"""
+Pre-aggregated sales counters for dashboards.
+
+Every recorded sale does one `$inc` upsert into its hour document and one
+into its day document in `sales_rollups`. A document covers one
+(granularity, local bucket, collection, source, branch) combination and
+holds count / revenue / gross / discounts. Dashboard summaries then read a
+handful of day documents instead of every sale in the period.
+
+With PRODUCT_SALES_COUNTERS enabled each sale line is also counted in
+`product_sales_daily` (one document per local day, collection and product),
+which lets top-item rankings for any day range skip the raw sales.
+
+Buckets follow the store's local time (settings.TIME_ZONE). History is
+rebuilt with `manage.py rebuild_sales_rollups` and verified with
+`manage.py check_sales_rollups`.
+"""
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from decouple import config
+from pymongo import UpdateOne
+from ..database import db_manager
+from .index_service import index_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sales are stored in naive UTC; rollups follow the store's local day
+REPORT_TIMEZONE = getattr(settings, 'TIME_ZONE', 'Asia/Manila')
+DEFAULT_BRANCH_ID = 1
+PRODUCT_SALES_COUNTERS = config('PRODUCT_SALES_COUNTERS', default=False, cast=bool)
+
+# collection -> default source, the fields that hold its amounts and
+# where its line items live
+ROLLUP_COLLECTIONS = {
+    'sales': {
+        'default_source': 'pos',
+        'revenue': 'final_amount',
+        'gross': 'total_amount',
+        'discounts': 'total_discount',
+        'items': {'field': 'items', 'key': 'product_id', 'name': 'product_name',
+                  'amount': 'subtotal', 'unit_price': 'price'},
+    },
+    'sales_log': {
+        'default_source': 'manual',
+        'revenue': 'total_amount',
+        'gross': 'total_amount',
+        'discounts': None,
+        'items': {'field': 'item_list', 'key': 'item_name', 'name': 'item_name',
+                  'amount': 'total_price', 'unit_price': 'unit_price'},
+    },
+    'online_transactions': {
+        'default_source': 'online',
+        'revenue': 'total_amount',
+        'gross': 'subtotal',
+        'discounts': 'points_discount',
+        'items': {'field': 'items', 'key': 'product_id', 'name': 'product_name',
+                  'amount': 'subtotal', 'unit_price': 'price'},
+    },
+}
+
+ROLLUP_FIELDS = ('count', 'revenue', 'gross', 'discounts')
+PRODUCT_FIELDS = ('quantity', 'amount', 'invoice_amount', 'lines')
+
+
+def local_to_utc(local_dt):
+    """Naive report-timezone datetime -> naive UTC datetime"""
+    return local_dt.replace(tzinfo=ZoneInfo(REPORT_TIMEZONE)).astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+
+def utc_to_local(utc_dt):
+    """Naive (or aware) UTC datetime -> naive report-timezone datetime"""
+    if utc_dt.tzinfo is None:
+        utc_dt = utc_dt.replace(tzinfo=dt_timezone.utc)
+    return utc_dt.astimezone(ZoneInfo(REPORT_TIMEZONE)).replace(tzinfo=None)
+
+
+def local_today():
+    return utc_to_local(datetime.utcnow()).date()
+
+
+def local_day_bounds(start_day=None, end_day=None):
+    """transaction_date condition covering whole local days (either end optional)"""
+    bounds = {}
+    if start_day:
+        bounds['$gte'] = local_to_utc(datetime.combine(start_day, time.min))
+    if end_day:
+        bounds['$lt'] = local_to_utc(datetime.combine(end_day + timedelta(days=1), time.min))
+    return bounds
+
+
+class SalesRollupService:
+    """Maintains and reads the `sales_rollups` collection"""
+
+    _indexes_ready = False
+
+    @property
+    def collection(self):
+        return db_manager.get_database().sales_rollups
+
+    @property
+    def product_collection(self):
+        return db_manager.get_database().product_sales_daily
+
+    def _ensure_indexes(self):
+        if SalesRollupService._indexes_ready:
+            return
+        try:
+            index_service.ensure(self.collection, 'sales_rollups')
+            index_service.ensure(self.product_collection, 'product_sales_daily')
+            SalesRollupService._indexes_ready = True
+        except Exception as e:
+            logger.warning(f"Could not create sales_rollups indexes: {e}")
+
+    # ================================================================
+    # WRITE SIDE
+    # ================================================================
+
+    def record_sale(self, collection_name, document, session=None):
+        """
+        Add one sale to its hour and day rollups.
+
+        Inside a transaction (session given) errors propagate so the sale and
+        its counters commit together. Otherwise the sale is already stored,
+        so a failed rollup is only logged; check_sales_rollups --fix repairs it.
+        """
+        self._apply(collection_name, [document], 1, session)
+
+    def record_sales(self, collection_name, documents, session=None):
+        """
+        Add many sales at once (bulk imports). Increments that land on the
+        same rollup/product bucket are merged, so one bulk_write per target
+        covers the whole batch.
+        """
+        self._apply(collection_name, documents, 1, session)
+
+    def remove_sale(self, collection_name, document, session=None):
+        """Take a deleted (or pre-update) sale back out of its rollups"""
+        self._apply(collection_name, [document], -1, session)
+
+    def replace_sale(self, collection_name, before, after):
+        """Move an edited sale's amounts from its old buckets to its new ones"""
+        if before:
+            self.remove_sale(collection_name, before)
+        if after:
+            self.record_sale(collection_name, after)
+
+    def rollup_operations(self, collection_name, documents, sign=1):
+        """[(target collection, merged UpdateOne list)] for a group of sales"""
+        rollup_updates = []
+        product_updates = []
+        for document in documents:
+            rollup_updates.extend(self._increment_operations(collection_name, document, sign))
+            if PRODUCT_SALES_COUNTERS:
+                product_updates.extend(self._product_operations(collection_name, document, sign))
+
+        writes = [(self.collection, self._merge_updates(rollup_updates))]
+        if PRODUCT_SALES_COUNTERS:
+            writes.append((self.product_collection, self._merge_updates(product_updates)))
+        return writes
+
+    def _apply(self, collection_name, documents, sign, session):
+        for target, operations in self.rollup_operations(collection_name, documents, sign):
+            if not operations:
+                continue
+            if session is not None:
+                target.bulk_write(operations, ordered=False, session=session)
+                continue
+            try:
+                target.bulk_write(operations, ordered=False)
+            except Exception as e:
+                ids = [str(document.get('_id')) for document in documents[:5]]
+                logger.error(f"Error updating {target.name} for {collection_name} {', '.join(ids)}: {e}")
+
+    @staticmethod
+    def _merge_updates(updates):
+        """Fold (_id, update) pairs on the same _id into one upsert each"""
+        merged = {}
+        for rollup_id, update in updates:
+            current = merged.get(rollup_id)
+            if current is None:
+                merged[rollup_id] = {operator: dict(fields) for operator, fields in update.items()}
+                continue
+            for field, value in update.get('$inc', {}).items():
+                current['$inc'][field] = current['$inc'].get(field, 0) + value
+            for field, value in update.get('$max', {}).items():
+                current.setdefault('$max', {})
+                if field not in current['$max'] or value > current['$max'][field]:
+                    current['$max'][field] = value
+            current['$set'].update(update.get('$set', {}))
+
+        return [UpdateOne({'_id': rollup_id}, update, upsert=True) for rollup_id, update in merged.items()]
+
+    def _increment_operations(self, collection_name, document, sign=1):
+        spec = ROLLUP_COLLECTIONS[collection_name]
+        transaction_date = document.get('transaction_date')
+        if not isinstance(transaction_date, datetime):
+            logger.warning(f"Sale {document.get('_id')} has no usable transaction_date, skipping rollup")
+            return []
+
+        local = utc_to_local(transaction_date)
+        amounts = {
+            'count': sign,
+            'revenue': sign * self._amount(document, spec['revenue']),
+            'gross': sign * self._amount(document, spec['gross']),
+            'discounts': sign * self._amount(document, spec['discounts']),
+        }
+        dimensions = {
+            'collection': collection_name,
+            'source': document.get('source') or spec['default_source'],
+            'branch_id': document.get('branch_id') or DEFAULT_BRANCH_ID,
+        }
+
+        now = datetime.utcnow()
+        operations = []
+        for granularity, bucket in (('hour', local.strftime('%Y-%m-%dT%H')), ('day', local.strftime('%Y-%m-%d'))):
+            operations.append((
+                self.rollup_id(granularity, bucket, dimensions),
+                {
+                    '$inc': amounts,
+                    '$set': {'updated_at': now},
+                    '$setOnInsert': {
+                        'granularity': granularity,
+                        'bucket': bucket,
+                        'date': bucket[:10],
+                        **dimensions
+                    }
+                }
+            ))
+        return operations
+
+    def _product_operations(self, collection_name, document, sign=1):
+        """(_id, update) per product line for product_sales_daily"""
+        transaction_date = document.get('transaction_date')
+        if not isinstance(transaction_date, datetime) or document.get('status') == 'voided':
+            return []
+
+        items = ROLLUP_COLLECTIONS[collection_name]['items']
+        lines = document.get(items['field']) or []
+        if isinstance(lines, dict):
+            lines = [lines]
+
+        day = utc_to_local(transaction_date).strftime('%Y-%m-%d')
+        invoice_amount = self._amount(document, 'total_amount')
+        totals = {}
+        for line in lines:
+            key = line.get(items['key']) if isinstance(line, dict) else None
+            if not key:
+                continue
+            quantity = self._amount(line, 'quantity')
+            amount = line.get(items['amount'])
+            if not isinstance(amount, (int, float)):
+                amount = quantity * self._amount(line, items['unit_price'])
+
+            entry = totals.setdefault(str(key), {
+                'name': line.get(items['name']) or '',
+                'unit_price': self._amount(line, items['unit_price']),
+                'quantity': 0, 'amount': 0, 'invoice_amount': 0, 'lines': 0
+            })
+            entry['quantity'] += sign * quantity
+            entry['amount'] += sign * amount
+            entry['invoice_amount'] += sign * invoice_amount
+            entry['lines'] += sign
+
+        now = datetime.utcnow()
+        operations = []
+        for key, entry in totals.items():
+            update = {
+                '$inc': {field: entry[field] for field in PRODUCT_FIELDS},
+                '$set': {'updated_at': now},
+                '$setOnInsert': {'date': day, 'collection': collection_name, 'key': key}
+            }
+            if sign > 0:
+                update['$set'].update({'name': entry['name'], 'unit_price': entry['unit_price']})
+                update['$max'] = {'latest_transaction_date': transaction_date}
+            operations.append((f"{day}|{collection_name}|{key}", update))
+        return operations
+
+    @staticmethod
+    def _amount(document, field):
+        if not field:
+            return 0
+        value = document.get(field)
+        return value if isinstance(value, (int, float)) else 0
+
+    @staticmethod
+    def rollup_id(granularity, bucket, dimensions):
+        return f"{granularity}|{bucket}|{dimensions['collection']}|{dimensions['source']}|{dimensions['branch_id']}"
+
+    # ================================================================
+    # READ SIDE
+    # ================================================================
+
+    def get_totals(self, start_day, end_day, collections=None, include_source=None, branch_id=None):
+        """
+        Sum day rollups between two local dates (inclusive).
+        Returns {collection: {'count', 'revenue', 'gross', 'discounts'}}.
+        """
+        self._ensure_indexes()
+        query = {
+            'granularity': 'day',
+            'date': {'$gte': start_day.isoformat(), '$lte': end_day.isoformat()}
+        }
+        if collections:
+            query['collection'] = {'$in': list(collections)}
+        if include_source:
+            query['source'] = {'$in': include_source}
+        if branch_id is not None:
+            query['branch_id'] = branch_id
+
+        totals = {}
+        for rollup in self.collection.find(query, {'collection': 1, **{field: 1 for field in ROLLUP_FIELDS}}):
+            bucket = totals.setdefault(rollup['collection'], {field: 0 for field in ROLLUP_FIELDS})
+            for field in ROLLUP_FIELDS:
+                bucket[field] += rollup.get(field, 0)
+        return totals
+
+    # ================================================================
+    # REBUILD & CONSISTENCY
+    # ================================================================
+
+    def aggregate_from_source(self, collection_name, start_day, end_day, granularity='hour'):
+        """
+        Recompute rollups for local dates [start_day, end_day] from the raw
+        collection. Returns {rollup_id: document}.
+        """
+        spec = ROLLUP_COLLECTIONS[collection_name]
+        bucket_format = '%Y-%m-%dT%H' if granularity == 'hour' else '%Y-%m-%d'
+        amount = lambda field: {'$ifNull': [f'${field}', 0]} if field else {'$literal': 0}
+
+        pipeline = [
+            {'$match': {'transaction_date': {**local_day_bounds(start_day, end_day), '$type': 'date'}}},
+            {'$group': {
+                '_id': {
+                    'bucket': {'$dateToString': {
+                        'format': bucket_format,
+                        'date': '$transaction_date',
+                        'timezone': REPORT_TIMEZONE
+                    }},
+                    'source': {'$ifNull': ['$source', spec['default_source']]},
+                    'branch_id': {'$ifNull': ['$branch_id', DEFAULT_BRANCH_ID]}
+                },
+                'count': {'$sum': 1},
+                'revenue': {'$sum': amount(spec['revenue'])},
+                'gross': {'$sum': amount(spec['gross'])},
+                'discounts': {'$sum': amount(spec['discounts'])}
+            }}
+        ]
+
+        now = datetime.utcnow()
+        rollups = {}
+        for row in db_manager.get_database()[collection_name].aggregate(pipeline, allowDiskUse=True):
+            dimensions = {
+                'collection': collection_name,
+                'source': row['_id']['source'],
+                'branch_id': row['_id']['branch_id'],
+            }
+            bucket = row['_id']['bucket']
+            rollup_id = self.rollup_id(granularity, bucket, dimensions)
+            rollups[rollup_id] = {
+                '_id': rollup_id,
+                'granularity': granularity,
+                'bucket': bucket,
+                'date': bucket[:10],
+                **dimensions,
+                **{field: row[field] for field in ROLLUP_FIELDS},
+                'updated_at': now,
+                'rebuilt_at': now
+            }
+        return rollups
+
+    def item_lines_pipeline(self, collection_name, start_day=None, end_day=None, include_voided=False):
+        """
+        $match/$unwind/$project stages that turn a sales collection into one
+        {key, name, quantity, amount, invoice_amount, unit_price,
+        transaction_date} row per non-voided line item. Date bounds are
+        local days and go into the leading $match so the index is used.
+        """
+        items = ROLLUP_COLLECTIONS[collection_name]['items']
+        field = items['field']
+        line = lambda name: f"${field}.{name}"
+
+        match = {} if include_voided else {'status': {'$ne': 'voided'}}
+        if start_day or end_day:
+            match['transaction_date'] = local_day_bounds(start_day, end_day)
+
+        quantity = {'$ifNull': [line('quantity'), 0]}
+        return [
+            {'$match': match},
+            {'$unwind': f"${field}"},
+            {'$match': {f"{field}.{items['key']}": {'$nin': [None, '']}}},
+            {'$project': {
+                '_id': 0,
+                'key': {'$toString': line(items['key'])},
+                'name': {'$ifNull': [line(items['name']), '']},
+                'quantity': quantity,
+                'amount': {'$ifNull': [line(items['amount']), {
+                    '$multiply': [quantity, {'$ifNull': [line(items['unit_price']), 0]}]
+                }]},
+                'invoice_amount': {'$ifNull': ['$total_amount', 0]},
+                'unit_price': {'$ifNull': [line(items['unit_price']), 0]},
+                'transaction_date': 1
+            }}
+        ]
+
+    def aggregate_products_from_source(self, collection_name, start_day, end_day):
+        """Recompute product_sales_daily documents for local dates [start_day, end_day]"""
+        pipeline = self.item_lines_pipeline(collection_name, start_day, end_day) + [
+            {'$match': {'transaction_date': {'$type': 'date'}}},
+            {'$group': {
+                '_id': {
+                    'date': {'$dateToString': {
+                        'format': '%Y-%m-%d',
+                        'date': '$transaction_date',
+                        'timezone': REPORT_TIMEZONE
+                    }},
+                    'key': '$key'
+                },
+                'name': {'$last': '$name'},
+                'unit_price': {'$last': '$unit_price'},
+                'quantity': {'$sum': '$quantity'},
+                'amount': {'$sum': '$amount'},
+                'invoice_amount': {'$sum': '$invoice_amount'},
+                'lines': {'$sum': 1},
+                'latest_transaction_date': {'$max': '$transaction_date'}
+            }}
+        ]
+
+        now = datetime.utcnow()
+        documents = []
+        for row in db_manager.get_database()[collection_name].aggregate(pipeline, allowDiskUse=True):
+            day, key = row['_id']['date'], row['_id']['key']
+            documents.append({
+                '_id': f"{day}|{collection_name}|{key}",
+                'date': day,
+                'collection': collection_name,
+                'key': key,
+                'name': row['name'],
+                'unit_price': row['unit_price'],
+                **{field: row[field] for field in PRODUCT_FIELDS},
+                'latest_transaction_date': row['latest_transaction_date'],
+                'updated_at': now,
+                'rebuilt_at': now
+            })
+        return documents
+
+    def rebuild(self, start_day, end_day, dry_run=False, products=None):
+        """
+        Replace every rollup between two local dates with values recomputed
+        from sales, sales_log and online_transactions (and product_sales_daily
+        too when product counters are on). Returns the number of documents
+        written.
+        """
+        products = PRODUCT_SALES_COUNTERS if products is None else products
+        self._ensure_indexes()
+        date_filter = {'date': {'$gte': start_day.isoformat(), '$lte': end_day.isoformat()}}
+
+        targets = [(self.collection, [])]
+        for collection_name in ROLLUP_COLLECTIONS:
+            hourly = self.aggregate_from_source(collection_name, start_day, end_day, 'hour')
+            daily = self.aggregate_from_source(collection_name, start_day, end_day, 'day')
+            targets[0][1].extend(hourly.values())
+            targets[0][1].extend(daily.values())
+
+        if products:
+            targets.append((self.product_collection, []))
+            for collection_name in ROLLUP_COLLECTIONS:
+                targets[1][1].extend(self.aggregate_products_from_source(collection_name, start_day, end_day))
+
+        written = sum(len(documents) for _, documents in targets)
+        if dry_run:
+            return written
+
+        for target, documents in targets:
+            target.delete_many(date_filter)
+            for start in range(0, len(documents), 1000):
+                target.insert_many(documents[start:start + 1000], ordered=False)
+        return written
+
+    def find_inconsistencies(self, start_day, end_day, tolerance=0.01):
+        """
+        Compare stored day rollups with the raw collections.
+        Returns one entry per (date, collection) whose totals disagree.
+        """
+        expected = {}
+        for collection_name in ROLLUP_COLLECTIONS:
+            for rollup in self.aggregate_from_source(collection_name, start_day, end_day, 'day').values():
+                key = (rollup['date'], collection_name)
+                totals = expected.setdefault(key, {field: 0 for field in ROLLUP_FIELDS})
+                for field in ROLLUP_FIELDS:
+                    totals[field] += rollup[field]
+
+        actual = {}
+        for rollup in self.collection.find({
+            'granularity': 'day',
+            'date': {'$gte': start_day.isoformat(), '$lte': end_day.isoformat()}
+        }):
+            key = (rollup['date'], rollup['collection'])
+            totals = actual.setdefault(key, {field: 0 for field in ROLLUP_FIELDS})
+            for field in ROLLUP_FIELDS:
+                totals[field] += rollup.get(field, 0)
+
+        empty = {field: 0 for field in ROLLUP_FIELDS}
+        mismatches = []
+        for key in sorted(set(expected) | set(actual)):
+            want, have = expected.get(key, empty), actual.get(key, empty)
+            if any(abs(want[field] - have[field]) > tolerance for field in ROLLUP_FIELDS):
+                mismatches.append({
+                    'date': key[0],
+                    'collection': key[1],
+                    'expected': want,
+                    'actual': have
+                })
+        return mismatches
+
+
+# Singleton instance
+sales_rollup_service = SalesRollupService()
@@ -5,6 +5,12 @@ from ..models import SalesLog
 import bcrypt
 from notifications.services import notification_service
 from .pos.SalesService import SalesService
+from .sales_rollup_service import sales_rollup_service, local_day_bounds
+from .outbox_service import outbox_service
+from .top_items_service import top_items_service
+from .export_service import EXPORT_BATCH_SIZE
+from .pagination_service import pagination_service
+from django.utils.dateparse import parse_date
 
 class SalesLogService():
     def __init__(self):
@@ -36,6 +42,61 @@ class SalesLogService():
         except Exception as e:
             raise Exception(f"Error creating invoice: {str(e)}")
     
+    def bulk_create_invoices(self, invoices_data, existing_ok=False):
+        """
+        Batched create_invoice for imports: maps every invoice, writes them
+        with one unordered insert_many and returns (created invoices,
+        [{'index': position in invoices_data, 'error': message}]).
+
+        An invoice may carry an `import_key`; with existing_ok, one whose key
+        is already stored counts as created (see bulk_create_sales_logs).
+        """
+        records = []
+        positions = []
+        errors = []
+        for index, invoice_data in enumerate(invoices_data):
+            try:
+                record = self.sales_service.build_sales_log_record(invoice_data, 'manual')
+                if invoice_data.get('import_key') is not None:
+                    record['import_key'] = invoice_data['import_key']
+                records.append(record)
+                positions.append(index)
+            except Exception as e:
+                errors.append({'index': index, 'error': f"Error creating invoice: {str(e)}"})
+
+        try:
+            inserted, write_errors = self.sales_service.bulk_create_sales_logs(records, existing_ok=existing_ok)
+        except Exception as e:
+            raise Exception(f"Error creating invoices: {str(e)}")
+
+        errors.extend(
+            {'index': positions[error['index']], 'error': f"Error creating invoice: {error['error']}"}
+            for error in write_errors
+        )
+        errors.sort(key=lambda error: error['index'])
+        return [self.sales_service.convert_object_id(record) for record in inserted], errors
+
+    def send_import_summary(self, file_name, total_rows, successful, failed, total_amount):
+        """One notification per bulk import instead of one per invoice"""
+        try:
+            outbox_service.enqueue([outbox_service.effect(
+                'notification',
+                title="Sales Import Completed",
+                message=f"Imported {successful} of {total_rows} sales from {file_name} (₱{total_amount:,.2f}), {failed} failed",
+                priority="medium" if failed else "low",
+                notification_type="sales",
+                metadata={
+                    "file_name": file_name,
+                    "total_rows": total_rows,
+                    "successful": successful,
+                    "failed": failed,
+                    "total_amount": total_amount,
+                    "action_type": "csv_import_completed"
+                }
+            )], source='csv')
+        except Exception as e:
+            print(f"Failed to queue import summary notification: {e}")
+
     def _create_invoice_original(self, invoice_data):
         """
         Original create_invoice method as fallback
@@ -50,6 +111,7 @@ class SalesLogService():
             
             # Insert into MongoDB
             result = self.sales_log_collection.insert_one(invoice_dict)
+            sales_rollup_service.record_sale('sales_log', invoice_dict)
             
             # Update the invoice object with the inserted ID
             invoice._id = result.inserted_id
@@ -108,9 +170,9 @@ class SalesLogService():
             raise Exception(f"Error retrieving invoice (fallback): {str(e)}")
 
     def get_all_invoices(self, limit=100, skip=0):
-        """Get all invoices with pagination"""
+        """Get all invoices with offset pagination (see get_invoices_page for cursors)"""
         try:
-            invoices = list(self.sales_log_collection.find().skip(skip).limit(limit))
+            invoices = list(self.sales_log_collection.find().sort('_id', 1).skip(skip).limit(limit))
             
             # Convert ObjectIds to strings
             for invoice in invoices:
@@ -120,6 +182,37 @@ class SalesLogService():
             
         except Exception as e:
             raise Exception(f"Error retrieving invoices: {str(e)}")
+
+    def get_invoices_page(self, limit=20, page=None, cursor=None, filters=None, total='approximate'):
+        """
+        One page of invoices in insertion order. Pass the previous page's
+        next_cursor as `cursor` for keyset paging; `page` uses skip().
+        """
+        try:
+            query = {}
+            filters = filters or {}
+            if filters.get('customer_id'):
+                # customer_id is stored as an ObjectId or a plain string
+                customer_ids = [filters['customer_id']]
+                if ObjectId.is_valid(filters['customer_id']):
+                    customer_ids.append(ObjectId(filters['customer_id']))
+                query['customer_id'] = {'$in': customer_ids}
+            if filters.get('sales_type'):
+                query['sales_type'] = filters['sales_type']
+            if filters.get('status'):
+                query['status'] = filters['status']
+
+            result = pagination_service.paginate(
+                self.sales_log_collection, query, sort_field='_id', direction=1,
+                limit=limit, cursor=cursor, page=page, total=total
+            )
+            result['items'] = [self.convert_object_id(invoice) for invoice in result['items']]
+            return result
+
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error retrieving invoices: {str(e)}")
     
     def update_invoice(self, invoice_id, update_data):
         """Update an existing invoice"""
@@ -130,12 +223,15 @@ class SalesLogService():
             # Remove _id from update_data if present
             update_data.pop('_id', None)
             
-            result = self.sales_log_collection.update_one(
+            before = self.sales_log_collection.find_one_and_update(
                 {"_id": invoice_id},
                 {"$set": update_data}
             )
             
-            if result.modified_count > 0:
+            if before is not None:
+                sales_rollup_service.replace_sale(
+                    'sales_log', before, self.sales_log_collection.find_one({"_id": invoice_id})
+                )
                 return self.get_invoice_by_id(invoice_id)
             else:
                 return None
@@ -149,86 +245,91 @@ class SalesLogService():
             if isinstance(invoice_id, str):
                 invoice_id = ObjectId(invoice_id)
             
-            result = self.sales_log_collection.delete_one({"_id": invoice_id})
+            deleted = self.sales_log_collection.find_one_and_delete({"_id": invoice_id})
+            if deleted is not None:
+                sales_rollup_service.remove_sale('sales_log', deleted)
             
-            return result.deleted_count > 0
+            return deleted is not None
             
         except Exception as e:
             raise Exception(f"Error deleting invoice: {str(e)}")
 
     def get_transactions_for_export(self, filters=None):
-        """Get transactions for CSV export with optional filtering"""
+        """Get transactions for CSV export with optional filtering (no row cap)"""
         try:
-            query = {}
-            
-            # Apply filters if provided
-            if filters:
-                # Date range filtering
-                if filters.get('start_date') and filters.get('end_date'):
-                    try:
-                        from django.utils.dateparse import parse_date
-                        from datetime import time
-                        
-                        # Parse start date
-                        if isinstance(filters['start_date'], str):
-                            start_date = parse_date(filters['start_date'])
-                        else:
-                            start_date = filters['start_date']
-                        
-                        # Parse end date
-                        if isinstance(filters['end_date'], str):
-                            end_date = parse_date(filters['end_date'])
-                        else:
-                            end_date = filters['end_date']
-                        
-                        if start_date and end_date:
-                            start_datetime = datetime.combine(start_date, time.min)
-                            end_datetime = datetime.combine(end_date, time.max)
-                            query['transaction_date'] = {
-                                '$gte': start_datetime, 
-                                '$lte': end_datetime
-                            }
-                    except Exception as date_error:
-                        print(f"Date parsing error: {date_error}")
-                        # Continue without date filter if parsing fails
-                
-                # Sales type filtering
-                if filters.get('sales_type'):
-                    query['sales_type'] = filters['sales_type']
-                
-                # Payment method filtering
-                if filters.get('payment_method'):
-                    query['payment_method'] = filters['payment_method']
-                
-                # Status filtering
-                if filters.get('status'):
-                    query['status'] = filters['status']
-                
-                # Customer ID filtering
-                if filters.get('customer_id'):
-                    try:
-                        customer_id = ObjectId(filters['customer_id'])
-                        query['customer_id'] = customer_id
-                    except Exception:
-                        # Skip invalid customer_id
-                        pass
-            
-            print(f"Export query: {query}")  # Debug log
-            
-            # Get transactions from MongoDB with a reasonable limit
-            transactions = list(self.sales_log_collection.find(query).limit(10000))
-            
-            print(f"Found {len(transactions)} transactions for export")  # Debug log
-            
-            # Convert ObjectIds to strings for processing
-            for transaction in transactions:
+            return [
                 self.convert_object_id(transaction)
-            
-            return transactions
-            
+                for transaction in self.iter_transactions_for_export(filters)
+            ]
         except Exception as e:
-            print(f"Error in get_transactions_for_export: {str(e)}")
             raise Exception(f"Error retrieving transactions for export: {str(e)}")
+
+    def iter_transactions_for_export(self, filters=None, projection=None, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Cursor over the export rows, fetched `batch_size` documents at a time.
+        Pass the exported columns as `projection` to keep documents small.
+        """
+        query = self._build_export_query(filters)
+        print(f"Export query: {query}")  # Debug log
+        return self.sales_log_collection.find(query, projection).batch_size(batch_size)
+
+    def _build_export_query(self, filters=None):
+        """Mongo query for the export filters (dates, type, payment, status, customer)"""
+        query = {}
+        
+        # Apply filters if provided
+        if filters:
+            # Date range filtering
+            if filters.get('start_date') and filters.get('end_date'):
+                try:
+                    from django.utils.dateparse import parse_date
+                    from datetime import time
+                    
+                    # Parse start date
+                    if isinstance(filters['start_date'], str):
+                        start_date = parse_date(filters['start_date'])
+                    else:
+                        start_date = filters['start_date']
+                    
+                    # Parse end date
+                    if isinstance(filters['end_date'], str):
+                        end_date = parse_date(filters['end_date'])
+                    else:
+                        end_date = filters['end_date']
+                    
+                    if start_date and end_date:
+                        start_datetime = datetime.combine(start_date, time.min)
+                        end_datetime = datetime.combine(end_date, time.max)
+                        query['transaction_date'] = {
+                            '$gte': start_datetime, 
+                            '$lte': end_datetime
+                        }
+                except Exception as date_error:
+                    print(f"Date parsing error: {date_error}")
+                    # Continue without date filter if parsing fails
+            
+            # Sales type filtering
+            if filters.get('sales_type'):
+                query['sales_type'] = filters['sales_type']
+            
+            # Payment method filtering
+            if filters.get('payment_method'):
+                query['payment_method'] = filters['payment_method']
+            
+            # Status filtering
+            if filters.get('status'):
+                query['status'] = filters['status']
+            
+            # Customer ID filtering
+            if filters.get('customer_id'):
+                try:
+                    customer_id = ObjectId(filters['customer_id'])
+                    query['customer_id'] = customer_id
+                except Exception:
+                    # Skip invalid customer_id
+                    pass
+        
+        return query
         
         
 class SalesLogItemReport():
@@ -270,11 +371,8 @@ class SalesItemHistory():
                 document['transaction_date'] = document['transaction_date'].isoformat()
         return document
 
-    def fetch_item_history(self, page=1, page_size=50):
+    def fetch_item_history(self, page=1, page_size=50, cursor=None, total='approximate'):
         try:
-            # Calculate skip value for pagination
-            skip = (page - 1) * page_size
-            
             # Use projection to fetch only specific fields
             projection = {
                 "_id": 1,
@@ -288,30 +386,36 @@ class SalesItemHistory():
                 "item_list.unit_price":1, 
             }
             
-            # Fetch documents with pagination
-            invoices = list(self.sales_log_collection.find({}, projection).skip(skip).limit(page_size))
+            # Fetch documents with keyset (cursor) or page pagination
+            result = pagination_service.paginate(
+                self.sales_log_collection, {}, sort_field='_id', direction=1, limit=page_size,
+                cursor=cursor, page=page, projection=projection, total=total
+            )
             
-            # Get total count for pagination info
-            total_count = self.sales_log_collection.count_documents({})
-            total_pages = (total_count + page_size - 1) // page_size  # Ceiling division
+            # Total is approximate unless total='exact' was requested
+            total_count = result['total']
+            total_pages = (total_count + page_size - 1) // page_size if total_count is not None else None
             
             # Convert ObjectIds to strings
-            for invoice in invoices:
-                self.convert_object_id(invoice)
+            invoices = [self.convert_object_id(invoice) for invoice in result['items']]
             
             # Return data with pagination info
             return {
                 "data": invoices,
                 "pagination": {
-                    "current_page": page,
+                    "current_page": result['page'],
                     "page_size": page_size,
                     "total_records": total_count,
+                    "total_is_exact": result['total_is_exact'],
                     "total_pages": total_pages,
-                    "has_next": page < total_pages,
-                    "has_prev": page > 1
+                    "has_next": result['has_more'],
+                    "has_prev": bool(cursor) or page > 1,
+                    "next_cursor": result['next_cursor']
                 }
             }
             
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error retrieving invoices: {str(e)}")
         
@@ -336,48 +440,17 @@ class SalesTopItem():
 
     def fetch_top_item(self, limit=5):
         try:
-            projection = {
-                "item_list.item_name": 1,
-                "total_amount": 1
-            }
-            
-            invoices = list(self.sales_log_collection.find({}, projection))
+            # Ranked in MongoDB; each item is credited with its invoice total.
+            # This ranking has always counted voided invoices too.
+            ranked = top_items_service.top_items(
+                ['sales_log'], limit=limit, sort_by='invoice_amount', include_voided=True
+            )
             total_count = self.sales_log_collection.count_documents({})
-            
-            item_totals = {}
-            
-            for invoice in invoices:
-                # Check if invoice has item_list and total_amount
-                if 'item_list' in invoice and 'total_amount' in invoice:
-                    total_amount = invoice['total_amount']
-                    
-                    # Handle case where item_list might be a list of items
-                    if isinstance(invoice['item_list'], list):
-                        for item in invoice['item_list']:
-                            if 'item_name' in item:
-                                item_name = item['item_name']
-                                if item_name in item_totals:
-                                    item_totals[item_name] += total_amount
-                                else:
-                                    item_totals[item_name] = total_amount
-                    
-                    # Handle case where item_list has direct item_name
-                    elif 'item_name' in invoice['item_list']:
-                        item_name = invoice['item_list']['item_name']
-                        if item_name in item_totals:
-                            item_totals[item_name] += total_amount
-                        else:
-                            item_totals[item_name] = total_amount
-            
-            # Convert to list of dictionaries and sort by total amount (descending)
-            result = [
-                {"item_name": name, "total_amount": amount} 
-                for name, amount in item_totals.items()
+
+            top_items = [
+                {"item_name": item['key'], "total_amount": item['invoice_amount']}
+                for item in ranked
             ]
-            result.sort(key=lambda x: x['total_amount'], reverse=True)
-            
-            # Limit the results to the specified number
-            top_items = result[:limit]
             
             return {
                 "items": top_items,
@@ -391,127 +464,32 @@ class SalesTopItem():
 
     def fetch_all_top_item(self, start_date=None, end_date=None, frequency='monthly'):
         try:
-            projection = {
-                "item_list.item_name": 1,
-                "item_list.quantity": 1,
-                "item_list.unit_price": 1,
-                "total_amount": 1,
-                "transaction_date": 1,
-            }
-            
-            # Build date filter query
-            date_filter = {}
+            if isinstance(start_date, str):
+                start_date = parse_date(start_date)
+            if isinstance(end_date, str):
+                end_date = parse_date(end_date)
+
+            # Whole local days, same as the sales reports
+            query_filter = {}
             if start_date or end_date:
-                date_filter["transaction_date"] = {}
-                if start_date:
-                    # Convert date to datetime for proper MongoDB querying
-                    from datetime import datetime, time
-                    if isinstance(start_date, str):
-                        from django.utils.dateparse import parse_date
-                        start_date = parse_date(start_date)
-                    if start_date:  # Check if parsing was successful
-                        start_datetime = datetime.combine(start_date, time.min)
-                        date_filter["transaction_date"]["$gte"] = start_datetime
-                if end_date:
-                    # Convert date to datetime for proper MongoDB querying
-                    if isinstance(end_date, str):
-                        from django.utils.dateparse import parse_date
-                        end_date = parse_date(end_date)
-                    if end_date:  # Check if parsing was successful
-                        end_datetime = datetime.combine(end_date, time.max)
-                        date_filter["transaction_date"]["$lte"] = end_datetime
-            
-            # Apply the filter to the query
-            query_filter = date_filter if date_filter else {}
-            
-            print(f"MongoDB Query Filter: {query_filter}")  # Debug log
-            print(f"Date range: {start_date} to {end_date}, Frequency: {frequency}")  # Debug log
-            
-            invoices = list(self.sales_log_collection.find(query_filter, projection))
+                query_filter["transaction_date"] = local_day_bounds(start_date, end_date)
+
+            ranked = top_items_service.top_items(
+                ['sales_log'], start_date, end_date, limit=None, sort_by='invoice_amount', include_voided=True
+            )
             total_count = self.sales_log_collection.count_documents(query_filter)
-            
-            print(f"Found {len(invoices)} invoices matching date filter")  # Debug log
-            
-            item_totals = {}
-            
-            for invoice in invoices:
-                # Check if invoice has item_list and total_amount
-                if 'item_list' in invoice and 'total_amount' in invoice:
-                    total_amount = invoice['total_amount']
-                    transaction_date = invoice.get('transaction_date')
-                    
-                    # Handle case where item_list might be a list of items
-                    if isinstance(invoice['item_list'], list):
-                        for item in invoice['item_list']:
-                            if 'item_name' in item:
-                                item_name = item['item_name']
-                                quantity = item.get('quantity', 0)
-                                unit_price = item.get('unit_price', 0)
-                                
-                                if item_name in item_totals:
-                                    item_totals[item_name]['total_amount'] += total_amount
-                                    item_totals[item_name]['total_quantity'] += quantity
-                                    # For unit_price, we might want to track average or just keep the latest
-                                    # Here I'm keeping the most recent unit_price
-                                    item_totals[item_name]['unit_price'] = unit_price
-                                    # Keep the most recent transaction date
-                                    if transaction_date and (not item_totals[item_name]['latest_transaction_date'] or 
-                                                        transaction_date > item_totals[item_name]['latest_transaction_date']):
-                                        item_totals[item_name]['latest_transaction_date'] = transaction_date
-                                else:
-                                    item_totals[item_name] = {
-                                        'total_amount': total_amount,
-                                        'total_quantity': quantity,
-                                        'unit_price': unit_price,
-                                        'latest_transaction_date': transaction_date
-                                    }
-                    
-                    # Handle case where item_list has direct item_name
-                    elif 'item_name' in invoice['item_list']:
-                        item_name = invoice['item_list']['item_name']
-                        quantity = invoice['item_list'].get('quantity', 0)
-                        unit_price = invoice['item_list'].get('unit_price', 0)
-                        
-                        if item_name in item_totals:
-                            item_totals[item_name]['total_amount'] += total_amount
-                            item_totals[item_name]['total_quantity'] += quantity
-                            item_totals[item_name]['unit_price'] = unit_price
-                            # Keep the most recent transaction date
-                            if transaction_date and (not item_totals[item_name]['latest_transaction_date'] or 
-                                                transaction_date > item_totals[item_name]['latest_transaction_date']):
-                                item_totals[item_name]['latest_transaction_date'] = transaction_date
-                        else:
-                            item_totals[item_name] = {
-                                'total_amount': total_amount,
-                                'total_quantity': quantity,
-                                'unit_price': unit_price,
-                                'latest_transaction_date': transaction_date
-                            }
-            
-            # Convert to list of dictionaries and sort by total amount (descending)
-            # Handle None values in latest_transaction_date
+
             result = []
-            for name, data in item_totals.items():
-                # Handle None transaction date by converting to string
-                latest_date = data['latest_transaction_date']
-                if latest_date:
-                    if hasattr(latest_date, 'isoformat'):
-                        latest_date_str = latest_date.isoformat()
-                    else:
-                        latest_date_str = str(latest_date)
-                else:
-                    latest_date_str = None
-                
+            for item in ranked:
+                latest_date = item.get('latest_transaction_date')
                 result.append({
-                    "item_name": name, 
-                    "total_amount": data['total_amount'],
-                    "total_quantity": data['total_quantity'],
-                    "unit_price": data['unit_price'],
-                    "latest_transaction_date": latest_date_str
+                    "item_name": item['key'],
+                    "total_amount": item['invoice_amount'],
+                    "total_quantity": item['quantity'],
+                    "unit_price": item['unit_price'],
+                    "latest_transaction_date": latest_date.isoformat() if hasattr(latest_date, 'isoformat') else latest_date
                 })
             
-            result.sort(key=lambda x: x['total_amount'], reverse=True)
-            
             # Prepare safe date strings for response
             start_date_str = None
             end_date_str = None
@@ -541,7 +519,4 @@ class SalesTopItem():
             }
             
         except Exception as e:
-            print(f"Error in fetch_all_top_item: {str(e)}")  # Debug log
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")  # Full error details
             raise Exception(f"Error retrieving invoices with date filter: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,337 @@
+# app/services/sequence_service.py
+"""
+Counter-backed ID allocation.
+
+Every human-readable ID (PROD-#####, NOTIF-######, AUD-###### ...) is handed
+out from a single document per sequence in the `counters` collection using an
+atomic `find_one_and_update($inc)`. This replaces the old "aggregate the whole
+collection for the max number" approach, which was O(collection size) per
+insert and let concurrent inserts race to the same number.
+
+High-volume sequences reserve a block of numbers per process and hand them
+out from memory, so most inserts need no round-trip at all.
+
+While a process is failed over to the local MongoDB (see DatabaseManager),
+the local counters may lag Atlas, so numbers come from a separate
+`failover:<name>` counter started FAILOVER_ID_OFFSET above the local one.
+IDs handed out during an outage therefore cannot collide with IDs Atlas
+handed out meanwhile, and the journaled inserts replay cleanly.
+"""
+
+import os
+import re
+import threading
+from datetime import datetime
+from decouple import config
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from ..database import db_manager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# name -> how the sequence is formatted and where its existing maximum lives.
+# `block_size` is how many numbers a process reserves at once; keep it at 1
+# for low-volume sequences so their IDs stay gap-free.
+SEQUENCES = {
+    'products': {'collection': 'products', 'prefix': 'PROD-', 'width': 5, 'block_size': 1},
+    'notifications': {'collection': 'notifications', 'prefix': 'NOTIF-', 'width': 6, 'block_size': 50},
+    'audit_logs': {'collection': 'audit_logs', 'prefix': 'AUD-', 'width': 6, 'block_size': 50},
+    'customers': {'collection': 'customers', 'prefix': 'CUST-', 'width': 5, 'block_size': 1},
+    'users': {'collection': 'users', 'prefix': 'USER-', 'width': 4, 'block_size': 1},
+    'suppliers': {'collection': 'suppliers', 'prefix': 'SUPP-', 'width': 3, 'block_size': 1},
+    'promotions': {'collection': 'promotions', 'prefix': 'PROM-', 'width': 4, 'block_size': 1},
+    'category': {'collection': 'category', 'prefix': 'CTGY-', 'width': 3, 'block_size': 1},
+    'subcategory': {
+        'collection': 'category', 'prefix': 'SUBCAT-', 'width': 5, 'block_size': 1,
+        'field': 'sub_categories.subcategory_id', 'unwind': 'sub_categories'
+    },
+    'session_logs': {'collection': 'session_logs', 'prefix': 'SESS-', 'width': 5, 'block_size': 20},
+    'online_transactions': {'collection': 'online_transactions', 'prefix': 'ONLINE-', 'width': 6, 'block_size': 1},
+}
+
+# Counters used while failed over to the local MongoDB, and how far above the
+# local counter they start
+FAILOVER_SEQUENCE_PREFIX = 'failover:'
+FAILOVER_ID_OFFSET = config('FAILOVER_ID_OFFSET', default=1000000, cast=int)
+
+# Batch IDs are numbered per product (BATCH-00001-001, BATCH-00001-002, ...),
+# so each product gets its own counter named "batches:<product_id>".
+BATCH_SEQUENCE_PREFIX = 'batches:'
+
+
+class SequenceService:
+    """Hands out formatted sequential IDs from the `counters` collection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = {}      # name -> [next_number, last_number]
+        self._seeded = set()   # sequences known to have a counter document
+        self._failover_seeded = set()  # (sequence, failover number) already offset
+        self._pid = os.getpid()
+
+    @property
+    def collection(self):
+        # Resolved lazily so importing this module never touches the network
+        return db_manager.get_database().counters
+
+    # ================================================================
+    # PUBLIC API
+    # ================================================================
+
+    def next_id(self, name):
+        """Return the next formatted ID for a sequence, e.g. 'PROD-00042'"""
+        return self.format_id(name, self.next_number(name))
+
+    def next_number(self, name):
+        """Return the next raw number for a sequence"""
+        definition = self._get_definition(name)
+        block_size = definition.get('block_size', 1)
+
+        with self._lock:
+            self._reset_after_fork()
+
+            block = self._blocks.get(name)
+            if block and block[0] <= block[1]:
+                number = block[0]
+                block[0] += 1
+                return number
+
+            first, last = self._allocate(name, block_size)
+            if last > first:
+                self._blocks[name] = [first + 1, last]
+            else:
+                self._blocks.pop(name, None)
+            return first
+
+    def reserve_block(self, name, count):
+        """
+        Reserve `count` consecutive IDs in one round-trip for bulk inserts.
+        Returns the formatted IDs in order.
+        """
+        count = int(count)
+        if count <= 0:
+            return []
+
+        with self._lock:
+            self._reset_after_fork()
+            first, last = self._allocate(name, count)
+
+        return [self.format_id(name, number) for number in range(first, last + 1)]
+
+    def open_sequences(self, names):
+        """
+        Start many brand-new sequences at 1 in a single bulk write (e.g. the
+        per-product batch counters of freshly imported products). Returns
+        {name: first formatted ID}; a counter that already existed falls
+        back to a normal next_id().
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+
+        now = datetime.utcnow()
+        result = self.collection.bulk_write([
+            UpdateOne(
+                {'_id': name},
+                {'$setOnInsert': {'seq': 1, 'created_at': now, 'updated_at': now}},
+                upsert=True
+            )
+            for name in names
+        ], ordered=False)
+
+        opened = set(result.upserted_ids.values())
+        first_ids = {}
+        for name in names:
+            if name in opened:
+                self._seeded.add(name)
+                first_ids[name] = self.format_id(name, 1)
+            else:
+                first_ids[name] = self.next_id(name)
+        return first_ids
+
+    def peek_next_id(self, name):
+        """Show the next ID the counter would hand out without consuming it"""
+        self._ensure_seeded(name)
+        counter = self.collection.find_one({'_id': name}, {'seq': 1})
+        current = counter.get('seq', 0) if counter else 0
+        return self.format_id(name, current + 1)
+
+    def format_id(self, name, number):
+        definition = self._get_definition(name)
+        return f"{definition['prefix']}{number:0{definition['width']}d}"
+
+    def seed_sequence(self, name):
+        """
+        Raise the counter to the highest number already used in the target
+        collection. `$max` makes this idempotent and never moves a counter
+        backwards, so it is safe to run against a live system.
+        """
+        current_max = self._scan_current_max(name)
+        self.collection.update_one(
+            {'_id': name},
+            {
+                '$max': {'seq': current_max},
+                '$setOnInsert': {'created_at': datetime.utcnow()},
+                '$set': {'seeded_at': datetime.utcnow()}
+            },
+            upsert=True
+        )
+        self._seeded.add(name)
+        return current_max
+
+    def seed_batch_sequences(self):
+        """Seed one counter per product from the existing batch IDs"""
+        pipeline = [
+            {'$match': {'_id': {'$regex': r'^BATCH-.+-\d+$'}, 'product_id': {'$type': 'string'}}},
+            {'$project': {
+                'product_id': 1,
+                'sequence': {'$toInt': {'$arrayElemAt': [{'$split': ['$_id', '-']}, -1]}}
+            }},
+            {'$group': {'_id': '$product_id', 'max_number': {'$max': '$sequence'}}}
+        ]
+
+        seeded = {}
+        for row in db_manager.get_database().batches.aggregate(pipeline):
+            name = f"{BATCH_SEQUENCE_PREFIX}{row['_id']}"
+            self.collection.update_one(
+                {'_id': name},
+                {
+                    '$max': {'seq': row['max_number']},
+                    '$setOnInsert': {'created_at': datetime.utcnow()},
+                    '$set': {'seeded_at': datetime.utcnow()}
+                },
+                upsert=True
+            )
+            self._seeded.add(name)
+            seeded[name] = row['max_number']
+        return seeded
+
+    # ================================================================
+    # INTERNALS
+    # ================================================================
+
+    def _get_definition(self, name):
+        if name.startswith(BATCH_SEQUENCE_PREFIX):
+            product_suffix = name[len(BATCH_SEQUENCE_PREFIX):].replace('PROD-', '')
+            return {
+                'collection': 'batches',
+                'prefix': f"BATCH-{product_suffix}-",
+                'width': 3,
+                'block_size': 1,
+                'product_id': name[len(BATCH_SEQUENCE_PREFIX):]
+            }
+
+        definition = SEQUENCES.get(name)
+        if definition is None:
+            raise ValueError(f"Unknown ID sequence '{name}'")
+        return definition
+
+    def _reset_after_fork(self):
+        # A block reserved before fork would otherwise be handed out twice
+        if self._pid != os.getpid():
+            self._blocks.clear()
+            self._pid = os.getpid()
+
+    def _allocate(self, name, count):
+        """Atomically advance the counter by `count`; returns (first, last)"""
+        if db_manager.failed_over:
+            counter_name = f"{FAILOVER_SEQUENCE_PREFIX}{name}"
+            self._ensure_failover_seeded(name, counter_name)
+        else:
+            counter_name = name
+            self._ensure_seeded(name)
+
+        for attempt in range(2):
+            try:
+                counter = self.collection.find_one_and_update(
+                    {'_id': counter_name},
+                    {
+                        '$inc': {'seq': count},
+                        '$set': {'updated_at': datetime.utcnow()}
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                last = counter['seq']
+                return last - count + 1, last
+            except DuplicateKeyError:
+                # Two processes upserted the same new counter; the retry
+                # will find the document the other one created.
+                if attempt:
+                    raise
+
+    def _ensure_seeded(self, name):
+        """
+        Make sure a counter exists before the first $inc. Without this a
+        fresh `counters` collection would start at 1 and collide with IDs
+        already in use. Checked once per process per sequence.
+        """
+        if name in self._seeded:
+            return
+
+        if self.collection.find_one({'_id': name}, {'_id': 1}) is None:
+            logger.warning(f"Counter '{name}' not seeded, seeding from current maximum")
+            self.seed_sequence(name)
+        self._seeded.add(name)
+
+    def _ensure_failover_seeded(self, name, counter_name):
+        """
+        Raise the failover counter to FAILOVER_ID_OFFSET above the local
+        counter, once per process per failover. `$max` keeps numbers handed
+        out in earlier outages from being reused.
+        """
+        key = (name, db_manager.failovers)
+        if key in self._failover_seeded:
+            return
+
+        local = self.collection.find_one({'_id': name}, {'seq': 1})
+        base = local.get('seq', 0) if local else self._scan_current_max(name)
+        logger.warning(f"Failed over: allocating '{name}' IDs above {base + FAILOVER_ID_OFFSET}")
+        for attempt in range(2):
+            try:
+                self.collection.update_one(
+                    {'_id': counter_name},
+                    {
+                        '$max': {'seq': base + FAILOVER_ID_OFFSET},
+                        '$setOnInsert': {'created_at': datetime.utcnow()},
+                        '$set': {'seeded_at': datetime.utcnow()}
+                    },
+                    upsert=True
+                )
+                break
+            except DuplicateKeyError:
+                # Another process created the counter first; the retry raises it
+                if attempt:
+                    raise
+        self._failover_seeded.add(key)
+
+    def _scan_current_max(self, name):
+        """Find the highest number used so far (only run while seeding)"""
+        definition = self._get_definition(name)
+        prefix = definition['prefix']
+        field = definition.get('field', '_id')
+
+        pipeline = []
+        if definition.get('product_id'):
+            pipeline.append({'$match': {'product_id': definition['product_id']}})
+        if definition.get('unwind'):
+            pipeline.append({'$unwind': f"${definition['unwind']}"})
+        pipeline.extend([
+            {'$match': {field: {'$regex': f"^{re.escape(prefix)}\\d+$"}}},
+            {'$project': {
+                'numeric_part': {'$toInt': {'$substr': [f"${field}", len(prefix), -1]}}
+            }},
+            {'$group': {'_id': None, 'max_number': {'$max': '$numeric_part'}}}
+        ])
+
+        collection = db_manager.get_database()[definition['collection']]
+        result = list(collection.aggregate(pipeline))
+        if result and result[0]['max_number'] is not None:
+            return result[0]['max_number']
+        return 0
+
+
+# Singleton instance - one block cache per process
+sequence_service = SequenceService()
@@ -0,0 +1,137 @@
+# app/services/service_registry.py
+"""
+Process-wide service registry.
+
+Views used to build their services per request (`ProductService()` in a
+view's `__init__` or handler), and each construction resolved collections,
+built nested services (ProductService builds a BatchService, CategoryService
+an AuditLogService, ...) and sometimes queried the database. The services
+hold no per-request state, so one instance per worker process is enough:
+
+    product_service = service_registry.get(ProductService)
+
+Instances are created on first use, once per class, under a per-class
+lock. They keep lazy database handles (see app.database), so instances
+built before a fork, for example by a preloading server, keep working in
+the forked workers.
+
+Lifecycle hooks are optional methods on the service: `warm_up()` runs when
+the registry warms the service at worker boot, `close()` runs on shutdown.
+SERVICE_WARMUP (on by default) makes the WSGI entry point build every
+service in WARM_SERVICES before the first request arrives; with a
+preloading server this happens once, in the master, before the fork.
+"""
+
+import atexit
+import threading
+import time
+from decouple import config
+from django.utils.module_loading import import_string
+import logging
+
+logger = logging.getLogger(__name__)
+
+SERVICE_WARMUP = config('SERVICE_WARMUP', default=True, cast=bool)
+
+# Services built at worker boot, in order; anything else is built on first use
+WARM_SERVICES = (
+    'app.services.auth_services.AuthService',
+    'app.services.user_service.UserService',
+    'app.services.customer_service.CustomerService',
+    'app.services.product_service.ProductService',
+    'app.services.category_service.CategoryService',
+    'app.services.batch_service.BatchService',
+    'app.services.supplier_service.SupplierService',
+    'app.services.promotions_service.PromotionService',
+    'app.services.session_services.SessionLogService',
+    'app.services.session_services.SessionDisplayService',
+    'app.services.saleslog_service.SalesLogService',
+    'app.services.sales_display_service.SalesDisplayService',
+    'app.services.online_transactions_service.OnlineTransactionService',
+    'app.services.pos.SalesService.SalesService',
+    'app.services.pos.salesReport.SalesReport',
+    'app.services.pos.promotionCon.PromoConnection',
+)
+
+
+class ServiceRegistry:
+    """One lazily built instance per service class"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_locks = {}  # cls -> lock; a slow build only blocks callers of that service
+        self._instances = {}
+        self._build_seconds = {}
+        self.warmed = False
+
+    def get(self, cls):
+        """The shared instance of `cls`, built on first use"""
+        instance = self._instances.get(cls)
+        if instance is None:
+            instance = self._build(cls)
+        return instance
+
+    def _build(self, cls):
+        with self._lock:
+            build_lock = self._build_locks.setdefault(cls, threading.RLock())
+        with build_lock:
+            instance = self._instances.get(cls)
+            if instance is not None:
+                return instance
+            started = time.perf_counter()
+            instance = cls()
+            self._build_seconds[cls] = time.perf_counter() - started
+            self._instances[cls] = instance
+            logger.debug(f"Built {cls.__name__} in {self._build_seconds[cls] * 1000:.1f} ms")
+            return instance
+
+    # ================================================================
+    # LIFECYCLE
+    # ================================================================
+
+    def warm_up(self, paths=WARM_SERVICES):
+        """Build the listed services and run their warm_up hooks; failures are logged, not raised"""
+        started = time.perf_counter()
+        failed = []
+        for path in paths:
+            try:
+                instance = self.get(import_string(path))
+                hook = getattr(instance, 'warm_up', None)
+                if callable(hook):
+                    hook()
+            except Exception as e:
+                failed.append(path)
+                logger.warning(f"Could not warm up {path}: {e}")
+        self.warmed = True
+        elapsed = time.perf_counter() - started
+        logger.info(f"Warmed {len(paths) - len(failed)} services in {elapsed * 1000:.0f} ms")
+        return {'seconds': elapsed, 'failed': failed}
+
+    def shutdown(self):
+        """Run close hooks and forget every instance"""
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+            self._build_seconds.clear()
+            self.warmed = False
+        for instance in instances:
+            hook = getattr(instance, 'close', None)
+            if callable(hook):
+                try:
+                    hook()
+                except Exception as e:
+                    logger.warning(f"Error closing {type(instance).__name__}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'warmed': self.warmed,
+                'services': {
+                    cls.__name__: round(seconds * 1000, 2) for cls, seconds in self._build_seconds.items()
+                },
+            }
+
+
+# Singleton instance
+service_registry = ServiceRegistry()
+atexit.register(service_registry.shutdown)
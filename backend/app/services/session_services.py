@@ -2,6 +2,7 @@ import csv
 import os
 from datetime import datetime, timedelta
 from ..database import db_manager
+from .sequence_service import sequence_service
 from notifications.services import notification_service
 import logging
 import threading
@@ -20,41 +21,7 @@ class SessionLogService:
     def generate_session_id(self):
         """Generate sequential SESS-##### ID"""
         try:
-            # Use aggregation to find the highest existing session number
-            pipeline = [
-                {
-                    "$match": {
-                        "_id": {"$regex": "^SESS-"}
-                    }
-                },
-                {
-                    "$addFields": {
-                        "session_number": {
-                            "$toInt": {
-                                "$substr": ["$_id", 5, -1]
-                            }
-                        }
-                    }
-                },
-                {
-                    "$sort": {"session_number": -1}
-                },
-                {
-                    "$limit": 1
-                }
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            
-            if result:
-                next_number = result[0]["session_number"] + 1
-            else:
-                # Fallback to count-based method
-                count = self.collection.count_documents({"_id": {"$regex": "^SESS-"}})
-                next_number = count + 1
-            
-            return f"SESS-{next_number:05d}"
-            
+            return sequence_service.next_id('session_logs')
         except Exception as e:
             logger.error(f"Error generating session ID: {e}")
             # Emergency fallback
@@ -1163,14 +1130,18 @@ class SessionLogService:
                 "exported_count": 0
             }
 
-    def __del__(self):
-        """Cleanup when service is destroyed"""
+    def close(self):
+        """Stop the cleanup thread; called by the service registry on shutdown"""
         if hasattr(self, '_cleanup_thread') and self._cleanup_thread and self._cleanup_thread.is_alive():
             self._stop_cleanup = True
             try:
                 self._cleanup_thread.join(timeout=2)
             except:
                 pass
+
+    def __del__(self):
+        """Cleanup when service is destroyed"""
+        self.close()
     
 class SessionDisplayService:
     def __init__(self):
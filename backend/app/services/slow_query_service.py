@@ -0,0 +1,308 @@
+# app/services/slow_query_service.py
+"""
+Slow query log.
+
+A CommandListener on the db_manager clients times every read and write
+command. Commands slower than SLOW_QUERY_MS are logged with their shape
+(see query_guard_service.command_shape), duration and application call site.
+They are then handed to a background thread, which:
+
+* runs `explain` with executionStats for the command (at most once per
+  shape every SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS),
+* flags plans that contain a COLLSCAN, such as an unanchored `$regex` or a
+  `$expr` comparison between two fields, and
+* stores one document per slow execution in the capped `slow_queries`
+  collection (SLOW_QUERY_COLLECTION_MB), so the log never grows unbounded.
+
+The listener never blocks: if the hand-off queue is full, the entry is
+dropped and counted. `top_offenders()` ranks shapes by total time for the
+admin endpoint.
+"""
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from decouple import config
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid
+from bson import json_util
+from .query_guard_service import command_shape, call_site
+import logging
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200, cast=float)
+SLOW_QUERY_EXPLAIN = config('SLOW_QUERY_EXPLAIN', default=True, cast=bool)
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = config('SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS', default=300, cast=float)
+SLOW_QUERY_COLLECTION_MB = config('SLOW_QUERY_COLLECTION_MB', default=32, cast=int)
+SLOW_QUERY_QUEUE_SIZE = 1000
+
+# Commands `explain` accepts; everything else (inserts, admin commands) is only timed
+EXPLAINABLE_COMMANDS = frozenset(('find', 'aggregate', 'count', 'distinct', 'update', 'delete', 'findAndModify'))
+# Session and transaction fields that explain rejects or that tie it to the original operation
+STRIPPED_FIELDS = frozenset(('lsid', 'txnNumber', 'autocommit', 'startTransaction', 'readConcern',
+                             'writeConcern', 'cursor', 'maxTimeMS', 'comment', 'let', 'ordered'))
+EXPLAIN_COMMENT = 'slow-query-explain'
+
+
+class SlowQueryService:
+    """Collects slow commands, explains them off the request path and ranks them"""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=SLOW_QUERY_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+        self._last_explained = {}  # shape -> monotonic time of its last explain
+        self._collection_ready = False
+        self.dropped = 0
+
+    @property
+    def db(self):
+        # Imported here: app.database attaches this module's listener to its clients
+        from ..database import db_manager
+        return db_manager.get_database()
+
+    @property
+    def collection(self):
+        return self.db.slow_queries
+
+    # ================================================================
+    # RECORDING
+    # ================================================================
+
+    def record(self, entry):
+        """Queue a slow command for explain and storage; never blocks the caller"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._drain, name='slow-query-log', daemon=True)
+            self._worker.start()
+
+    def _drain(self):
+        while True:
+            entry = self._queue.get()
+            try:
+                self._store(entry)
+            except Exception as e:
+                logger.warning(f"Could not store slow query {entry.get('shape')}: {e}")
+
+    def _store(self, entry):
+        if SLOW_QUERY_EXPLAIN and entry['command_name'] in EXPLAINABLE_COMMANDS and self._explain_due(entry['shape']):
+            entry.update(self.explain(entry['database'], entry['command']))
+            if entry.get('collscan'):
+                logger.warning(
+                    f"Slow query uses a COLLSCAN: {entry['shape']} "
+                    f"({entry.get('docs_examined')} docs examined, {entry.get('n_returned')} returned) "
+                    f"at {entry['call_site']}"
+                )
+
+        self._ensure_collection()
+        entry.pop('command', None)
+        self.collection.insert_one(entry)
+
+    def _explain_due(self, shape):
+        now = time.monotonic()
+        last = self._last_explained.get(shape)
+        if last is not None and now - last < SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+            return False
+        self._last_explained[shape] = now
+        return True
+
+    def explain(self, database_name, command):
+        """Run explain(executionStats) for a captured command and summarize the winning plan"""
+        try:
+            client = self.db.client
+            result = client[database_name].command({
+                'explain': explainable_command(command),
+                'verbosity': 'executionStats',
+                'comment': EXPLAIN_COMMENT,
+            })
+        except Exception as e:
+            return {'explained': False, 'explain_error': str(e)}
+
+        planner = _find_key(result, 'queryPlanner') or {}
+        winning_plan = planner.get('winningPlan') or {}
+        stats = _find_key(result, 'executionStats') or {}
+        stages = plan_stages(winning_plan)
+        return {
+            'explained': True,
+            'explained_at': datetime.utcnow(),
+            'plan_stages': stages,
+            'collscan': 'COLLSCAN' in stages,
+            'index_names': sorted(set(_collect(winning_plan, 'indexName'))),
+            'docs_examined': stats.get('totalDocsExamined'),
+            'keys_examined': stats.get('totalKeysExamined'),
+            'n_returned': stats.get('nReturned'),
+            'explain_ms': stats.get('executionTimeMillis'),
+            # As JSON text: plans embed the query filter, whose $-keys older servers refuse to store
+            'winning_plan': json_util.dumps(winning_plan),
+        }
+
+    def _ensure_collection(self):
+        if self._collection_ready:
+            return
+        db = self.db
+        try:
+            db.create_collection('slow_queries', capped=True, size=SLOW_QUERY_COLLECTION_MB * 1024 * 1024)
+        except CollectionInvalid:
+            pass  # already exists
+        # Imported here: index_service reuses this module's plan helpers
+        from .index_service import index_service
+        index_service.ensure(db.slow_queries, 'slow_queries')
+        self._collection_ready = True
+
+    # ================================================================
+    # REPORTING
+    # ================================================================
+
+    def top_offenders(self, since_hours=24, limit=20, collscan_only=False):
+        """Shapes ranked by total time spent in their slow executions"""
+        try:
+            pipeline = [
+                {'$match': {'logged_at': {'$gte': datetime.utcnow() - timedelta(hours=since_hours)}}},
+                {'$group': {
+                    '_id': '$shape',
+                    'collection': {'$first': '$collection'},
+                    'count': {'$sum': 1},
+                    'total_ms': {'$sum': '$duration_ms'},
+                    'max_ms': {'$max': '$duration_ms'},
+                    'avg_ms': {'$avg': '$duration_ms'},
+                    'last_seen': {'$max': '$logged_at'},
+                    'collscan': {'$max': '$collscan'},
+                    'call_sites': {'$addToSet': '$call_site'},
+                }},
+            ]
+            if collscan_only:
+                # Only some executions of a shape get explained; judge the shape as a whole
+                pipeline.append({'$match': {'collscan': True}})
+            pipeline += [{'$sort': {'total_ms': -1}}, {'$limit': limit}]
+
+            offenders = list(self.collection.aggregate(pipeline))
+
+            # Attach the most recent plan of each shape
+            for offender in offenders:
+                explained = self.collection.find_one(
+                    {'shape': offender['_id'], 'explained': True},
+                    {'_id': 0, 'plan_stages': 1, 'index_names': 1, 'docs_examined': 1,
+                     'keys_examined': 1, 'n_returned': 1, 'explained_at': 1},
+                    sort=[('$natural', -1)]
+                )
+                offender['shape'] = offender.pop('_id')
+                offender['collscan'] = bool(offender.get('collscan'))
+                offender['call_sites'] = offender['call_sites'][:5]
+                offender['plan'] = explained
+            return offenders
+
+        except Exception as e:
+            raise Exception(f"Error getting slow query offenders: {str(e)}")
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'dropped': self.dropped, 'threshold_ms': SLOW_QUERY_MS}
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Times commands and passes the slow ones to slow_query_service"""
+
+    def __init__(self):
+        self._pending = {}  # (connection, request_id) -> started event
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE_COMMANDS and event.command_name != 'insert':
+            return
+        # Never log the log itself or the explains it runs
+        if event.command.get(event.command_name) == 'slow_queries' or event.command.get('comment') == EXPLAIN_COMMENT:
+            return
+        self._pending[(event.connection_id, event.request_id)] = event
+
+    def succeeded(self, event):
+        started = self._pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000.0
+        if duration_ms < SLOW_QUERY_MS:
+            return
+
+        shape = command_shape(started.command_name, started.command)
+        site = call_site(__file__)
+        logger.warning(f"Slow query {duration_ms:.0f} ms: {shape} at {site}")
+        slow_query_service.record({
+            'shape': shape,
+            'command_name': started.command_name,
+            'collection': started.command.get(started.command_name),
+            'database': started.database_name,
+            'duration_ms': round(duration_ms, 2),
+            'call_site': site,
+            'logged_at': datetime.utcnow(),
+            'explained': False,
+            'collscan': None,
+            'command': dict(started.command),
+        })
+
+    def failed(self, event):
+        self._pending.pop((event.connection_id, event.request_id), None)
+
+
+# ================================================================
+# EXPLAIN HELPERS
+# ================================================================
+
+def explainable_command(command):
+    """Copy of a captured command that `explain` will accept"""
+    explainable = {
+        key: value for key, value in command.items()
+        if not key.startswith('$') and key not in STRIPPED_FIELDS
+    }
+    # explain takes a single write statement
+    for field in ('updates', 'deletes'):
+        if explainable.get(field):
+            explainable[field] = explainable[field][:1]
+    return explainable
+
+
+def plan_stages(plan):
+    """Stage names of a winning plan, outermost first"""
+    return list(_collect(plan, 'stage'))
+
+
+def _collect(node, key):
+    if isinstance(node, dict):
+        if key in node and isinstance(node[key], str):
+            yield node[key]
+        for value in node.values():
+            yield from _collect(value, key)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _collect(item, key)
+
+
+def _find_key(node, key):
+    """First value stored under `key` anywhere in an explain result (aggregate nests it under $cursor)"""
+    if isinstance(node, dict):
+        if key in node:
+            return node[key]
+        for value in node.values():
+            found = _find_key(value, key)
+            if found is not None:
+                return found
+    elif isinstance(node, list):
+        for item in node:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+
+# Singleton instances
+slow_query_service = SlowQueryService()
+slow_query_listener = SlowQueryListener()
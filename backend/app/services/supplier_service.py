@@ -1,6 +1,7 @@
 import re
 from datetime import datetime
 from ..database import db_manager
+from .sequence_service import sequence_service
 from ..models import Supplier
 from notifications.services import NotificationService
 import logging
@@ -46,28 +47,7 @@ class SupplierService:
     
     def generate_supplier_id(self):
         """Generate sequential SUPP-### ID"""
-        try:
-            pipeline = [
-                {'$match': {'_id': {'$regex': r'^SUPP-\d{3}$'}}},
-                {'$project': {
-                    'id_number': {
-                        '$toInt': {
-                            '$substr': ['$_id', 5, -1]
-                        }
-                    }
-                }},
-                {'$sort': {'id_number': -1}},
-                {'$limit': 1}
-            ]
-            
-            result = list(self.supplier_collection.aggregate(pipeline))
-            next_number = (result[0]['id_number'] + 1) if result else 1
-            
-            return f"SUPP-{next_number:03d}"
-        
-        except Exception:
-            count = self.supplier_collection.count_documents({}) + 1
-            return f"SUPP-{count:03d}"
+        return sequence_service.next_id('suppliers')
     
     def add_sync_log(self, source='cloud', status='synced', details=None):
         """Helper method to create sync log entries"""
@@ -0,0 +1,268 @@
+# app/services/token_cache_service.py
+"""
+Per-process cache for JWT verification.
+
+Verifying a bearer token used to cost a `token_blacklist` lookup plus a
+`users` (and sometimes `customers`) lookup on every request. This module
+keeps two in-memory structures instead:
+
+* a TTL/LRU cache of decoded payloads and resolved principals, keyed by the
+  SHA-256 of the token, so a repeat request never decodes or looks up the
+  user again until the entry expires (TOKEN_CACHE_TTL_SECONDS, never past the
+  token's own `exp`);
+* the set of blacklisted token hashes. It is loaded once and then refreshed
+  incrementally (only entries newer than the last refresh are read) at most
+  every TOKEN_BLACKLIST_REFRESH_SECONDS.
+
+A logout is applied to the local process immediately and reaches every other
+worker at its next refresh, so a revoked token stops working everywhere
+within TOKEN_BLACKLIST_REFRESH_SECONDS. If refreshing keeps failing for
+longer than TOKEN_BLACKLIST_MAX_STALE_SECONDS, verification fails closed.
+
+Profile changes made through UserService / CustomerService drop the cached
+principal in that process; other workers pick them up when their entry
+expires.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from decouple import config
+from ..database import db_manager
+from .index_service import index_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_TTL_SECONDS = config('TOKEN_CACHE_TTL_SECONDS', default=60, cast=float)
+TOKEN_CACHE_MAX_ENTRIES = config('TOKEN_CACHE_MAX_ENTRIES', default=10000, cast=int)
+TOKEN_BLACKLIST_REFRESH_SECONDS = config('TOKEN_BLACKLIST_REFRESH_SECONDS', default=5, cast=float)
+TOKEN_BLACKLIST_MAX_STALE_SECONDS = config('TOKEN_BLACKLIST_MAX_STALE_SECONDS', default=60, cast=float)
+# Re-read this much history on each refresh so entries written by a worker
+# whose clock is slightly behind ours are not skipped
+BLACKLIST_CLOCK_SKEW = timedelta(seconds=30)
+
+
+class TokenCacheService:
+    """Caches verified tokens and mirrors the token blacklist in memory"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._entries = OrderedDict()   # token hash -> entry dict
+        self._blacklist = {}            # token hash -> expires_at (datetime or None)
+        self._blacklist_loaded = False
+        self._blacklist_seen = None     # newest blacklisted_at read so far
+        self._blacklist_refreshed = 0.0  # monotonic time of the last successful refresh
+        self._indexes_ready = False
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def collection(self):
+        return db_manager.get_database().token_blacklist
+
+    @staticmethod
+    def token_hash(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    # ================================================================
+    # VERIFIED TOKEN CACHE
+    # ================================================================
+
+    def get_payload(self, token_hash):
+        """Cached payload for a verified token, or None"""
+        entry = self._get_entry(token_hash)
+        return entry['payload'] if entry else None
+
+    def put_payload(self, token_hash, payload):
+        """Remember a payload that just passed signature and expiry checks"""
+        expires_at = time.monotonic() + TOKEN_CACHE_TTL_SECONDS
+        exp = payload.get('exp')
+        if isinstance(exp, (int, float)):
+            # Never serve a token past its own expiry
+            expires_at = min(expires_at, time.monotonic() + (exp - time.time()))
+
+        with self._lock:
+            self._check_fork()
+            self._entries[token_hash] = {
+                'payload': payload,
+                'principal': None,
+                'subject': payload.get('sub'),
+                'expires_at': expires_at,
+            }
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > TOKEN_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def get_principal(self, token_hash):
+        """Cached user/customer profile resolved for this token, or None"""
+        entry = self._get_entry(token_hash)
+        return entry['principal'] if entry else None
+
+    def put_principal(self, token_hash, principal):
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is not None:
+                entry['principal'] = principal
+
+    def invalidate_subject(self, subject):
+        """Drop cached principals for a user/customer whose profile changed"""
+        subject = str(subject)
+        with self._lock:
+            for entry in self._entries.values():
+                if str(entry['subject']) == subject:
+                    entry['principal'] = None
+
+    def _get_entry(self, token_hash):
+        with self._lock:
+            self._check_fork()
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry['expires_at'] <= time.monotonic():
+                del self._entries[token_hash]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token_hash)
+            self.hits += 1
+            return entry
+
+    def _check_fork(self):
+        """A forked worker starts with an empty cache instead of the parent's"""
+        pid = os.getpid()
+        if self._pid != pid:
+            if self._pid is not None:
+                self._entries.clear()
+                self._blacklist.clear()
+                self._blacklist_loaded = False
+                self._blacklist_seen = None
+                self._blacklist_refreshed = 0.0
+            self._pid = pid
+
+    # ================================================================
+    # BLACKLIST
+    # ================================================================
+
+    def is_blacklisted(self, token_hash):
+        """True when the token was revoked; refreshes the local copy when due"""
+        self._refresh_blacklist()
+        with self._lock:
+            if token_hash not in self._blacklist:
+                return False
+            expires_at = self._blacklist[token_hash]
+            if expires_at is not None and expires_at <= datetime.utcnow():
+                # The token has expired anyway; JWT validation rejects it
+                del self._blacklist[token_hash]
+            return True
+
+    def revoke(self, token, expires_at=None):
+        """Blacklist a token here immediately and for other workers at their next refresh"""
+        token_hash = self.token_hash(token)
+        self._ensure_indexes()
+        self.collection.insert_one({
+            "token": token,
+            "token_hash": token_hash,
+            "blacklisted_at": datetime.utcnow(),
+            "expires_at": expires_at,
+        })
+        with self._lock:
+            self._check_fork()
+            self._blacklist[token_hash] = expires_at
+            self._entries.pop(token_hash, None)
+
+    def _refresh_blacklist(self, force=False):
+        with self._lock:
+            self._check_fork()
+            age = time.monotonic() - self._blacklist_refreshed
+            if self._blacklist_loaded and age < TOKEN_BLACKLIST_REFRESH_SECONDS and not force:
+                return
+
+        # One thread refreshes; the others keep using the current copy
+        # unless it has never been loaded or has gone stale
+        blocking = not self._blacklist_loaded or age >= TOKEN_BLACKLIST_MAX_STALE_SECONDS
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return
+        try:
+            with self._lock:
+                if self._blacklist_loaded and not force and \
+                        time.monotonic() - self._blacklist_refreshed < TOKEN_BLACKLIST_REFRESH_SECONDS:
+                    return
+                since = self._blacklist_seen
+
+            try:
+                self._load_blacklist(since)
+            except Exception as e:
+                logger.warning(f"Token blacklist refresh failed: {e}")
+                with self._lock:
+                    age = time.monotonic() - self._blacklist_refreshed
+                if not self._blacklist_loaded or age >= TOKEN_BLACKLIST_MAX_STALE_SECONDS:
+                    raise Exception(f"Error refreshing token blacklist: {str(e)}")
+        finally:
+            self._refresh_lock.release()
+
+    def _load_blacklist(self, since):
+        self._ensure_indexes()
+        query = {}
+        if since is not None:
+            query["blacklisted_at"] = {"$gte": since - BLACKLIST_CLOCK_SKEW}
+
+        now = datetime.utcnow()
+        loaded = {}
+        newest = since
+        cursor = self.collection.find(
+            query, {"_id": 0, "token": 1, "token_hash": 1, "blacklisted_at": 1, "expires_at": 1}
+        )
+        for doc in cursor:
+            expires_at = doc.get("expires_at")
+            if expires_at is not None and expires_at <= now:
+                continue
+            # Entries written before token_hash existed only carry the raw token
+            token_hash = doc.get("token_hash") or (doc.get("token") and self.token_hash(doc["token"]))
+            if token_hash:
+                loaded[token_hash] = expires_at
+            blacklisted_at = doc.get("blacklisted_at")
+            if blacklisted_at is not None and (newest is None or blacklisted_at > newest):
+                newest = blacklisted_at
+
+        with self._lock:
+            if since is None:
+                self._blacklist = loaded
+            else:
+                self._blacklist.update(loaded)
+                # Forget revoked tokens that have expired on their own
+                for token_hash in [h for h, exp in self._blacklist.items() if exp is not None and exp <= now]:
+                    del self._blacklist[token_hash]
+            for token_hash in loaded:
+                self._entries.pop(token_hash, None)
+            self._blacklist_seen = newest
+            self._blacklist_loaded = True
+            self._blacklist_refreshed = time.monotonic()
+
+    def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        try:
+            # Includes the TTL index that drops revoked tokens once they expire
+            index_service.ensure(self.collection, 'token_blacklist')
+            self._indexes_ready = True
+        except Exception as e:
+            logger.warning(f"Could not create token_blacklist indexes: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "blacklisted": len(self._blacklist),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Singleton instance
+token_cache_service = TokenCacheService()
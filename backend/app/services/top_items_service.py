@@ -0,0 +1,127 @@
+# app/services/top_items_service.py
+"""
+Top-k item rankings across the sales collections.
+
+Rankings run in MongoDB: each source's line items are unwound and
+projected into a common shape (see
+SalesRollupService.item_lines_pipeline), the sources are joined with
+$unionWith, and the result is grouped, sorted and cut with $limit. Only one
+row per product ever reaches Python, so memory stays flat as history grows.
+
+When PRODUCT_SALES_COUNTERS is on, the same ranking is answered from the
+product_sales_daily counters instead of the raw sales.
+"""
+
+from ..database import db_manager
+from .sales_rollup_service import sales_rollup_service, PRODUCT_SALES_COUNTERS
+import logging
+
+logger = logging.getLogger(__name__)
+
+RANK_FIELDS = ('amount', 'quantity', 'invoice_amount', 'lines')
+
+
+class TopItemsService:
+    """Ranks products by sales across sales, online_transactions and sales_log"""
+
+    def top_items(self, collections, start_day=None, end_day=None, limit=10,
+                  sort_by='amount', include_voided=False):
+        """
+        Rank line items for local dates [start_day, end_day] (either may be
+        None) across the given collections.
+
+        Returns a list of {key, name, quantity, amount, invoice_amount, lines,
+        unit_price, latest_transaction_date} sorted by `sort_by` descending;
+        `limit=None` returns every item.
+
+        Voided sales are left out unless include_voided=True, matching the
+        sales display reports. The sales_log rankings (SalesLogService's
+        fetch_top_item / fetch_all_top_item) pass include_voided=True to keep
+        the numbers they reported before; only the non-voided ranking can be
+        answered from the product_sales_daily counters.
+        """
+        if sort_by not in RANK_FIELDS:
+            raise ValueError(f"sort_by must be one of {', '.join(RANK_FIELDS)}")
+
+        try:
+            if PRODUCT_SALES_COUNTERS and not include_voided:
+                return self._from_counters(collections, start_day, end_day, limit, sort_by)
+            return self._from_sales(collections, start_day, end_day, limit, sort_by, include_voided)
+        except Exception as e:
+            raise Exception(f"Error ranking top items: {str(e)}")
+
+    def _from_sales(self, collections, start_day, end_day, limit, sort_by, include_voided):
+        db = db_manager.get_database()
+        first, *others = collections
+
+        pipeline = sales_rollup_service.item_lines_pipeline(first, start_day, end_day, include_voided)
+        for collection_name in others:
+            pipeline.append({'$unionWith': {
+                'coll': collection_name,
+                'pipeline': sales_rollup_service.item_lines_pipeline(
+                    collection_name, start_day, end_day, include_voided
+                )
+            }})
+        pipeline.append({'$group': {
+            '_id': '$key',
+            'name': {'$last': '$name'},
+            'unit_price': {'$last': '$unit_price'},
+            'quantity': {'$sum': '$quantity'},
+            'amount': {'$sum': '$amount'},
+            'invoice_amount': {'$sum': '$invoice_amount'},
+            'lines': {'$sum': 1},
+            'latest_transaction_date': {'$max': '$transaction_date'}
+        }})
+        pipeline.extend(self._rank_stages(limit, sort_by))
+
+        return list(db[first].aggregate(pipeline, allowDiskUse=True))
+
+    def _from_counters(self, collections, start_day, end_day, limit, sort_by):
+        match = {'collection': {'$in': list(collections)}}
+        if start_day or end_day:
+            match['date'] = {}
+            if start_day:
+                match['date']['$gte'] = start_day.isoformat()
+            if end_day:
+                match['date']['$lte'] = end_day.isoformat()
+
+        pipeline = [
+            {'$match': match},
+            {'$sort': {'date': 1}},
+            {'$group': {
+                '_id': '$key',
+                'name': {'$last': '$name'},
+                'unit_price': {'$last': '$unit_price'},
+                'quantity': {'$sum': '$quantity'},
+                'amount': {'$sum': '$amount'},
+                'invoice_amount': {'$sum': '$invoice_amount'},
+                'lines': {'$sum': '$lines'},
+                'latest_transaction_date': {'$max': '$latest_transaction_date'}
+            }},
+            # Counters of deleted sales are decremented, not removed
+            {'$match': {'lines': {'$gt': 0}}}
+        ]
+        pipeline.extend(self._rank_stages(limit, sort_by))
+
+        return list(sales_rollup_service.product_collection.aggregate(pipeline, allowDiskUse=True))
+
+    def _rank_stages(self, limit, sort_by):
+        stages = [{'$sort': {sort_by: -1, '_id': 1}}]
+        if limit:
+            stages.append({'$limit': int(limit)})
+        stages.append({'$project': {
+            '_id': 0,
+            'key': '$_id',
+            'name': 1,
+            'unit_price': 1,
+            'quantity': 1,
+            'amount': 1,
+            'invoice_amount': 1,
+            'lines': 1,
+            'latest_transaction_date': 1
+        }})
+        return stages
+
+
+# Singleton instance
+top_items_service = TopItemsService()
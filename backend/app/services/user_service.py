@@ -1,8 +1,11 @@
 from bson import ObjectId
 from datetime import datetime
 from ..database import db_manager
+from .sequence_service import sequence_service
+from .pagination_service import pagination_service
+from .token_cache_service import token_cache_service
+from .password_service import password_service, PasswordServiceBusy
 from ..models import User
-import bcrypt
 import logging
 from .audit_service import AuditLogService
 from notifications.services import  NotificationService
@@ -22,11 +25,7 @@ class UserService:
     
     def hash_password(self, password: str) -> str:
         """Hash password using bcrypt"""
-        if not password:
-            raise ValueError("Password cannot be empty")
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        return password_service.hash(password)
     
     def verify_password(self, password: str, hashed: str) -> bool:
         """Verify password against hash"""
@@ -34,7 +33,9 @@ class UserService:
             return False
         
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+            return password_service.verify(password, hashed)
+        except PasswordServiceBusy:
+            raise
         except Exception as e:
             logger.error(f"Password verification failed: {e}")
             return False
@@ -116,6 +117,7 @@ class UserService:
             )
             
             if result.modified_count > 0:
+                token_cache_service.invalidate_subject(user_id)
                 updated_user = self.collection.find_one({'_id': user_id})
                 
                 # Send appropriate notification
@@ -133,26 +135,10 @@ class UserService:
     def generate_user_id(self):
         """Generate sequential USER-#### format ID"""
         try:
-            # Find the highest existing USER ID
-            pipeline = [
-                {"$match": {"_id": {"$regex": "^USER-"}}},
-                {"$addFields": {
-                    "id_number": {
-                        "$toInt": {"$substr": ["$_id", 5, -1]}
-                    }
-                }},
-                {"$sort": {"id_number": -1}},
-                {"$limit": 1}
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            next_number = (result[0]["id_number"] + 1) if result else 1
-            
-            return f"USER-{next_number:04d}"
-            
+            return sequence_service.next_id('users')
         except Exception as e:
             logger.error(f"Error generating user ID: {e}")
-            # Fallback to timestamp-based ID if aggregation fails
+            # Fallback to timestamp-based ID if the counter is unavailable
             import time
             return f"USER-{int(time.time()) % 10000:04d}"
 
@@ -200,7 +186,9 @@ class UserService:
             logger.error(f"Error creating user: {str(e)}")
             raise Exception(f"Error creating user: {str(e)}")
         
-    def get_users(self, page=1, limit=50, status=None, include_deleted=False, search=None):
+    def get_users(self, page=1, limit=50, status=None, include_deleted=False, search=None,
+                  cursor=None, total='approximate'):
+        """Users in USER-#### order; pass next_cursor back as `cursor` for keyset paging"""
         try:
             query = {}
             if not include_deleted:
@@ -221,17 +209,22 @@ class UserService:
                 ]
                 query['$or'] = search_conditions
             
-            skip = (page - 1) * limit
-            users = list(self.collection.find(query).skip(skip).limit(limit))
-            total = self.collection.count_documents(query)
+            result = pagination_service.paginate(
+                self.collection, query, sort_field='_id', direction=1,
+                limit=limit, cursor=cursor, page=page, total=total
+            )
             
             return {
-                'users': users,
-                'total': total,
-                'page': page,
+                'users': result['items'],
+                'total': result['total'],
+                'total_is_exact': result['total_is_exact'],
+                'page': result['page'],
                 'limit': limit,
-                'has_more': skip + limit < total
+                'has_more': result['has_more'],
+                'next_cursor': result['next_cursor']
             }
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error getting users: {str(e)}")
     
@@ -310,6 +303,7 @@ class UserService:
             )
             
             if result.modified_count > 0:
+                token_cache_service.invalidate_subject(user_id)
                 # Send notification
                 user_name = user_to_delete.get('full_name', user_to_delete.get('username', 'User'))
                 self._send_user_notification('soft_deleted', user_name, user_id)
@@ -364,6 +358,7 @@ class UserService:
             )
             
             if result.modified_count > 0:
+                token_cache_service.invalidate_subject(user_id)
                 user_name = deleted_user.get('full_name', deleted_user.get('username', 'User'))
                 self._send_user_notification('restored', user_name, user_id)
                 
@@ -399,6 +394,7 @@ class UserService:
             result = self.collection.delete_one({'_id': user_id})
             
             if result.deleted_count > 0:
+                token_cache_service.invalidate_subject(user_id)
                 user_name = user_to_delete.get('full_name', user_to_delete.get('username', 'User'))
                 
                 # Critical notification
@@ -417,25 +413,30 @@ class UserService:
             logger.error(f"Error permanently deleting user {user_id}: {str(e)}")
             raise Exception(f"Error permanently deleting user: {str(e)}")
 
-    def get_disabled_users(self, page=1, limit=50):
-        """Get users with disabled status"""
+    def get_disabled_users(self, page=1, limit=50, cursor=None, total='approximate'):
+        """Users with disabled status, in USER-#### order; pass next_cursor back as `cursor`"""
         try:
             query = {
                 'status': 'disabled',
                 'isDeleted': {'$ne': True}  # Not actually deleted, just disabled
             }
             
-            skip = (page - 1) * limit
-            users = list(self.collection.find(query).skip(skip).limit(limit))
-            total = self.collection.count_documents(query)
+            result = pagination_service.paginate(
+                self.collection, query, sort_field='_id', direction=1,
+                limit=limit, cursor=cursor, page=page, total=total
+            )
             
             return {
-                'users': users,
-                'total': total,
-                'page': page,
+                'users': result['items'],
+                'total': result['total'],
+                'total_is_exact': result['total_is_exact'],
+                'page': result['page'],
                 'limit': limit,
-                'has_more': skip + limit < total
+                'has_more': result['has_more'],
+                'next_cursor': result['next_cursor']
             }
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"Error getting disabled users: {str(e)}")
         
\ No newline at end of file
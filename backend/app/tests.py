@@ -1,3 +1,175 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from pymongo.client_session import ClientSession
+from pymongo.errors import OperationFailure
+from rest_framework.test import APIRequestFactory
+
+from .kpi_views.job_views import JobCancelView, JobDetailView, JobListView
+from .kpi_views.user_views import DisabledUsersView
+from .services.pos.checkoutEngine import CheckoutEngine
+from .services.user_service import UserService
+
+
+PAGE = {
+    'items': [{'_id': 'USER-0002', 'status': 'disabled'}],
+    'total': 1,
+    'total_is_exact': False,
+    'page': None,
+    'has_more': False,
+    'next_cursor': None,
+}
+
+
+class DisabledUsersTests(SimpleTestCase):
+    """UserService.get_disabled_users and the /users/disabled/ view, without MongoDB"""
+
+    def setUp(self):
+        self.service = UserService.__new__(UserService)
+        self.service.collection = mock.sentinel.users
+
+    @mock.patch('app.services.user_service.pagination_service')
+    def test_get_disabled_users_pages_disabled_users(self, pagination_service):
+        pagination_service.paginate.return_value = PAGE
+
+        result = self.service.get_disabled_users(limit=20, cursor='abc', total='exact')
+
+        pagination_service.paginate.assert_called_once_with(
+            mock.sentinel.users,
+            {'status': 'disabled', 'isDeleted': {'$ne': True}},
+            sort_field='_id', direction=1, limit=20, cursor='abc', page=1, total='exact'
+        )
+        self.assertEqual(result['users'], PAGE['items'])
+        self.assertEqual(result['limit'], 20)
+
+    @mock.patch('app.services.user_service.pagination_service')
+    def test_get_disabled_users_defaults(self, pagination_service):
+        pagination_service.paginate.return_value = PAGE
+
+        self.service.get_disabled_users()
+
+        _, kwargs = pagination_service.paginate.call_args
+        self.assertEqual((kwargs['cursor'], kwargs['total'], kwargs['page']), (None, 'approximate', 1))
+
+    @mock.patch('app.decorators.authenticationDecorator.get_authenticated_user_from_jwt')
+    def test_view_threads_cursor_and_total(self, authenticate):
+        authenticate.return_value = {'user_id': 'USER-0001', 'role': 'admin'}
+        request = APIRequestFactory().get(
+            '/api/v1/users/disabled/', {'limit': 10, 'cursor': 'abc', 'total': 'exact'},
+            HTTP_AUTHORIZATION='Bearer token'
+        )
+
+        with mock.patch.object(UserService, 'get_disabled_users', return_value={'users': []}) as get_disabled_users, \
+                mock.patch('app.kpi_views.user_views.service_registry') as registry:
+            registry.get.return_value = UserService.__new__(UserService)
+            response = DisabledUsersView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        get_disabled_users.assert_called_once_with(page=1, limit=10, cursor='abc', total='exact')
+
+
+JOB = {'_id': 'JOB-1', 'type': 'sales_export', 'status': 'running', 'created_by': 'USER-0001'}
+
+
+@mock.patch('app.decorators.authenticationDecorator.get_authenticated_user_from_jwt')
+@mock.patch('app.kpi_views.job_views.job_service')
+class JobAccessTests(SimpleTestCase):
+    """Job endpoints need a signed-in user and only show non-admins their own jobs"""
+
+    def request(self, method, path, **params):
+        factory = APIRequestFactory()
+        return getattr(factory, method)(path, params, HTTP_AUTHORIZATION='Bearer token')
+
+    def test_anonymous_request_is_rejected(self, job_service, authenticate):
+        authenticate.return_value = None
+
+        response = JobDetailView.as_view()(self.request('get', '/api/v1/jobs/JOB-1/'), job_id='JOB-1')
+
+        self.assertEqual(response.status_code, 401)
+        job_service.get_job.assert_not_called()
+
+    def test_other_users_job_is_forbidden(self, job_service, authenticate):
+        authenticate.return_value = {'user_id': 'USER-0002', 'role': 'cashier'}
+        job_service.get_job.return_value = JOB
+
+        response = JobCancelView.as_view()(self.request('post', '/api/v1/jobs/JOB-1/cancel/'), job_id='JOB-1')
+
+        self.assertEqual(response.status_code, 403)
+        job_service.cancel_job.assert_not_called()
+
+    def test_admin_can_cancel_any_job(self, job_service, authenticate):
+        authenticate.return_value = {'user_id': 'USER-0003', 'role': 'admin'}
+        job_service.get_job.return_value = JOB
+        job_service.cancel_job.return_value = JOB
+        job_service.serialize.return_value = {'job_id': 'JOB-1'}
+
+        response = JobCancelView.as_view()(self.request('post', '/api/v1/jobs/JOB-1/cancel/'), job_id='JOB-1')
+
+        self.assertEqual(response.status_code, 200)
+        job_service.cancel_job.assert_called_once_with('JOB-1')
+
+    def test_list_is_scoped_to_the_caller(self, job_service, authenticate):
+        authenticate.return_value = {'user_id': 'USER-0002', 'role': 'cashier'}
+        job_service.list_jobs.return_value = []
+
+        response = JobListView.as_view()(self.request('get', '/api/v1/jobs/', created_by='USER-0001'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(job_service.list_jobs.call_args.kwargs['created_by'], 'USER-0002')
+
+
+class FakeSession:
+    """Just enough of a ClientSession to run pymongo's own with_transaction retry loop"""
+
+    with_transaction = ClientSession.with_transaction
+
+    def __init__(self):
+        self.in_transaction = False
+        self.started = 0
+        self.committed = 0
+
+    def start_transaction(self, *args, **kwargs):
+        self.in_transaction = True
+        self.started += 1
+
+    def abort_transaction(self):
+        self.in_transaction = False
+
+    def commit_transaction(self):
+        self.in_transaction = False
+        self.committed += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class CheckoutTransactionTests(SimpleTestCase):
+    """CheckoutEngine._commit_in_transaction retries transient transaction errors"""
+
+    def setUp(self):
+        self.session = FakeSession()
+        self.engine = CheckoutEngine.__new__(CheckoutEngine)
+        self.engine.db = mock.Mock()
+        self.engine.db.client.start_session.return_value = self.session
+        self.engine.products_collection = mock.Mock()
+        self.engine.sales_collection = mock.Mock()
+
+    @mock.patch('app.services.pos.checkoutEngine.outbox_service')
+    @mock.patch('app.services.pos.checkoutEngine.sales_rollup_service')
+    def test_write_conflict_is_retried(self, rollups, outbox):
+        write_conflict = OperationFailure(
+            'WriteConflict', code=112, details={'errorLabels': ['TransientTransactionError']}
+        )
+        self.engine.products_collection.bulk_write.side_effect = [write_conflict, mock.Mock(matched_count=1)]
+
+        result = self.engine._commit_in_transaction(
+            [{'product_id': 'PROD-00001', 'quantity': 2}], {'total_amount': 10}, effects=[]
+        )
+
+        self.assertTrue(result['success'])
+        self.assertEqual((self.session.started, self.session.committed), (2, 1))
+        self.engine.sales_collection.insert_one.assert_called_once()
+        rollups.record_sale.assert_called_once_with('sales', {'total_amount': 10})
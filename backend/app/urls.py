@@ -14,7 +14,10 @@ from .kpi_views.session_views import (
     SessionExportView,  
     ForceLogoutView,
     BulkSessionControlView, 
-    SystemStatusView
+    SystemStatusView,
+    OutboxMetricsView,
+    MetricsView,
+    SlowQueryView
 )
 
 from .kpi_views.user_views import (
@@ -26,6 +29,7 @@ from .kpi_views.user_views import (
     UserRestoreView,       
     UserHardDeleteView,     
     DeletedUsersView,       
+    DisabledUsersView,
 )
 
 from .kpi_views.customer_views import (
@@ -179,6 +183,13 @@ from .kpi_views.sales_bulk_views import (
     SalesLogExportView,
 )
 
+from .kpi_views.job_views import (
+    JobListView,
+    JobDetailView,
+    JobCancelView,
+    JobResultView,
+)
+
 from .kpi_views.promotion_views import (
      PromotionHealthCheckView,
     PromotionListView,
@@ -246,6 +257,9 @@ from .kpi_views.order_status_views import (
     GetOrderStatusView,
 )
 
+# Async read path (ASGI workers)
+from .kpi_views import async_read_views
+
 from .views import (
     APIDocumentationView,
 )
@@ -254,6 +268,15 @@ urlpatterns = [
     # ========== SYSTEM & HEALTH ==========
     path('', SystemStatusView.as_view(), name='system-status'),  # Root endpoint
     path('health/', HealthCheckView.as_view(), name='health-check'),
+    path('outbox/metrics/', OutboxMetricsView.as_view(), name='outbox-metrics'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('slow-queries/', SlowQueryView.as_view(), name='slow-queries'),
+    
+    # ========== BACKGROUND JOBS ==========
+    path('jobs/', JobListView.as_view(), name='job-list'),
+    path('jobs/<str:job_id>/', JobDetailView.as_view(), name='job-detail'),
+    path('jobs/<str:job_id>/cancel/', JobCancelView.as_view(), name='job-cancel'),
+    path('jobs/<str:job_id>/result/', JobResultView.as_view(), name='job-result'),
     path('docs/', APIDocumentationView.as_view(), name='api-documentation'),
     
     # ========== AUTHENTICATION ==========
@@ -278,6 +301,7 @@ urlpatterns = [
     # ========== USER MANAGEMENT ==========
     path('users/', UserListView.as_view(), name='user-list'),
     path('users/deleted/', DeletedUsersView.as_view(), name='deleted-users'),
+    path('users/disabled/', DisabledUsersView.as_view(), name='disabled-users'),
     path('users/email/<str:email>/', UserByEmailView.as_view(), name='user-by-email'),
     path('users/username/<str:username>/', UserByUsernameView.as_view(), name='user-by-username'),
     path('users/<str:user_id>/', UserDetailView.as_view(), name='user-detail'),
@@ -461,6 +485,12 @@ urlpatterns = [
     path('online/orders/<str:order_id>/status/', GetOrderStatusView.as_view(), name='get_order_status'),
     path('online/orders/<str:order_id>/update-status/', UpdateOrderStatusView.as_view(), name='update_order_status'),
     
+    # ========== ASYNC READ PATH (motor, for uvicorn workers) ==========
+    path('async/notifications/recent/', async_read_views.recent_notifications, name='async-recent-notifications'),
+    path('async/online/orders/<str:order_id>/status/', async_read_views.order_status, name='async-order-status'),
+    path('async/pos/catalog/', async_read_views.pos_catalog, name='async-pos-catalog'),
+    path('async/products/', async_read_views.product_list, name='async-product-list'),
+    
     # ========== PROMOTIONS ==========
     path('promotions/', PromotionListView.as_view(), name='promotion-list'),
     path('promotions/health/', PromotionHealthCheckView.as_view(), name='promotion-health'),
@@ -3,6 +3,9 @@ from datetime import datetime, timedelta
 from django.contrib.auth.models import User
 from django.http import JsonResponse
 from app.database import db_manager
+from app.services.sequence_service import sequence_service
+from app.services.pagination_service import pagination_service
+from app.services.query_builders import find_options, notifications_query, recent_notifications_query
 
 class NotificationService:
     def __init__(self):
@@ -16,29 +19,10 @@ class NotificationService:
     def generate_notification_id(self):
         """
         Generate sequential notification ID in format NOTIF-XXXXXX
-        Uses MongoDB aggregation to find the highest existing ID
+        Allocated from the `counters` collection (block-cached per process)
         """
         try:
-            pipeline = [
-                {'$match': {'_id': {'$regex': '^NOTIF-'}}},
-                {'$project': {
-                    'numericPart': {
-                        '$toInt': {'$substr': ['$_id', 6, -1]}  # Extract number after "NOTIF-"
-                    }
-                }},
-                {'$sort': {'numericPart': -1}},
-                {'$limit': 1}
-            ]
-            
-            result = list(self.collection.aggregate(pipeline))
-            
-            if result:
-                next_number = result[0]['numericPart'] + 1
-            else:
-                next_number = 1  # First notification
-            
-            return f"NOTIF-{next_number:06d}"  # Format as NOTIF-000001, NOTIF-000002, etc.
-            
+            return sequence_service.next_id('notifications')
         except Exception as e:
             raise Exception(f"Error generating notification ID: {str(e)}")
     
@@ -46,35 +30,42 @@ class NotificationService:
     # NOTIFICATION CREATION METHODS
     # ================================================================
     
+    def build_notification_document(self, title, message, recipient_id=None, recipient_username=None,
+                                    priority='medium', notification_type='system', metadata=None):
+        """Shape a notification document (without _id) the same way for single and bulk inserts"""
+        notification_doc = {
+            "title": title,
+            "message": message,
+            "priority": priority,
+            "is_read": False,
+            "archived": False,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+            "notification_type": notification_type,
+            "metadata": metadata or {}
+        }
+        
+        # Only add recipient info if provided
+        if recipient_id or recipient_username:
+            recipient = self._get_recipient(recipient_id, recipient_username)
+            if not recipient:
+                raise ValueError("Recipient not found")
+            
+            notification_doc.update({
+                "recipient_id": str(recipient.id),
+                "recipient_username": recipient.username
+            })
+        
+        return notification_doc
+
     def create_notification(self, title, message, recipient_id=None, recipient_username=None, 
                           priority='medium', notification_type='system', metadata=None):
         """Create a new notification"""
         try:
-            notification_id = self.generate_notification_id()
-            
-            notification_doc = {
-                "_id": notification_id,
-                "title": title,
-                "message": message,
-                "priority": priority,
-                "is_read": False,
-                "archived": False,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-                "notification_type": notification_type,
-                "metadata": metadata or {}
-            }
-            
-            # Only add recipient info if provided
-            if recipient_id or recipient_username:
-                recipient = self._get_recipient(recipient_id, recipient_username)
-                if not recipient:
-                    raise ValueError("Recipient not found")
-                
-                notification_doc.update({
-                    "recipient_id": str(recipient.id),
-                    "recipient_username": recipient.username
-                })
+            notification_doc = self.build_notification_document(
+                title, message, recipient_id, recipient_username, priority, notification_type, metadata
+            )
+            notification_doc = {"_id": self.generate_notification_id(), **notification_doc}
             
             self.collection.insert_one(notification_doc)
             
@@ -82,6 +73,28 @@ class NotificationService:
             
         except Exception as e:
             raise Exception(f"Error creating notification: {str(e)}")
+
+    def create_notifications_bulk(self, notifications):
+        """
+        Insert many notifications with one ID block reservation and one insert_many.
+        `notifications` is a list of create_notification keyword dicts.
+        """
+        try:
+            if not notifications:
+                return []
+            
+            notification_ids = sequence_service.reserve_block('notifications', len(notifications))
+            notification_docs = [
+                {"_id": notification_id, **self.build_notification_document(**kwargs)}
+                for notification_id, kwargs in zip(notification_ids, notifications)
+            ]
+            
+            self.collection.insert_many(notification_docs, ordered=False)
+            
+            return notification_docs
+            
+        except Exception as e:
+            raise Exception(f"Error creating notifications: {str(e)}")
     
     def create_inventory_alert(self, recipient_id, product_id, current_stock, product_name=None):
         """Create an inventory alert notification"""
@@ -108,22 +121,8 @@ class NotificationService:
     
     def get_notifications(self, recipient_id=None, notification_type=None, is_read=None, limit=50, include_archived=False):
         """Get notifications with filters"""
-        query = {}
-        
-        # Exclude archived notifications by default
-        if not include_archived:
-            query['archived'] = {'$ne': True}
-        
-        if recipient_id:
-            query['recipient_id'] = str(recipient_id)
-        if notification_type:
-            query['notification_type'] = notification_type
-        if is_read is not None:
-            query['is_read'] = is_read
-        
-        notifications = list(self.collection.find(query)
-                        .sort('created_at', -1)
-                        .limit(limit))
+        spec = notifications_query(recipient_id, notification_type, is_read, limit, include_archived)
+        notifications = list(self.collection.find(**find_options(spec)))
         
         return self._format_notifications(notifications)
     
@@ -140,20 +139,8 @@ class NotificationService:
     def get_recent_notifications(self, limit=10, hours=None, include_archived=False):
         """Get recent notifications (last X hours or last X notifications)"""
         try:
-            query = {}
-            
-            # Exclude archived notifications by default
-            if not include_archived:
-                query['archived'] = {'$ne': True}
-            
-            # If hours specified, filter by time
-            if hours:
-                time_threshold = datetime.utcnow() - timedelta(hours=hours)
-                query['created_at'] = {'$gte': time_threshold}
-            
-            notifications = list(self.collection.find(query)
-                            .sort('created_at', -1)
-                            .limit(limit))
+            spec = recent_notifications_query(limit, hours, include_archived)
+            notifications = list(self.collection.find(**find_options(spec)))
             
             return self._format_notifications(notifications)
             
@@ -172,9 +159,9 @@ class NotificationService:
             # Get total count for pagination
             total_count = self.collection.count_documents(query)
             
-            # Get notifications with pagination
+            # Get notifications with pagination (_id breaks created_at ties)
             notifications = list(self.collection.find(query)
-                                .sort('created_at', -1)
+                                .sort([('created_at', -1), ('_id', -1)])
                                 .skip(skip)
                                 .limit(limit))
             
@@ -185,6 +172,43 @@ class NotificationService:
         except Exception as e:
             raise Exception(f"Error getting all notifications: {str(e)}")
 
+    def get_notifications_page(self, limit=50, page=None, cursor=None, include_archived=False, total='approximate'):
+        """
+        Newest-first page of notifications. Pass the previous page's
+        next_cursor as `cursor` for keyset paging; `page` uses skip().
+        """
+        try:
+            query = {}
+            if not include_archived:
+                query['archived'] = {'$ne': True}
+            
+            result = pagination_service.paginate(
+                self.collection, query, sort_field='created_at', direction=-1,
+                limit=limit, cursor=cursor, page=page, total=total
+            )
+            result['items'] = self._format_notifications(result['items'])
+            return result
+            
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error getting notifications page: {str(e)}")
+
+    def _pagination_info(self, result, limit, cursor):
+        """Pagination block shared by the notification list endpoints"""
+        total_count = result['total']
+        total_pages = (total_count + limit - 1) // limit if total_count is not None else None
+        return {
+            'current_page': result['page'],
+            'total_pages': total_pages,
+            'total_count': total_count,
+            'total_is_exact': result['total_is_exact'],
+            'per_page': limit,
+            'has_next': result['has_more'],
+            'has_previous': bool(cursor) or (result['page'] or 1) > 1,
+            'next_cursor': result['next_cursor']
+        }
+
     def get_all_notifications_api(self, request):
         """API endpoint method for getting all notifications"""
         try:
@@ -192,35 +216,30 @@ class NotificationService:
             page = int(request.GET.get('page', 1))
             limit = int(request.GET.get('limit', 50))
             include_archived = request.GET.get('include_archived', 'false').lower() == 'true'
+            cursor = request.GET.get('cursor')
             
-            # Calculate skip for pagination
-            skip = (page - 1) * limit
-            
-            # Get notifications from service
-            notifications, total_count = self.get_all_notifications(
-                skip=skip,
+            # Get notifications from service (?cursor= for keyset paging)
+            result = self.get_notifications_page(
                 limit=limit,
-                include_archived=include_archived
+                page=page,
+                cursor=cursor,
+                include_archived=include_archived,
+                total=request.GET.get('total')
             )
             
-            # Calculate pagination info
-            total_pages = (total_count + limit - 1) // limit
-            has_next = page < total_pages
-            has_previous = page > 1
-            
             return JsonResponse({
                 'success': True,
-                'data': notifications,
-                'pagination': {
-                    'current_page': page,
-                    'total_pages': total_pages,
-                    'total_count': total_count,
-                    'per_page': limit,
-                    'has_next': has_next,
-                    'has_previous': has_previous
-                }
+                'data': result['items'],
+                'pagination': self._pagination_info(result, limit, cursor)
             })
             
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e),
+                'data': [],
+                'pagination': {}
+            }, status=400)
         except Exception as e:
             return JsonResponse({
                 'success': False,
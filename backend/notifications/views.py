@@ -238,35 +238,31 @@ def all_notifications(request):
         page = int(request.query_params.get('page', 1))
         limit = int(request.query_params.get('limit', 50))
         include_archived = request.query_params.get('include_archived', 'false').lower() == 'true'
+        cursor = request.query_params.get('cursor')
         
-        # Calculate skip for pagination
-        skip = (page - 1) * limit
-        
-        notifications, total_count = notification_service.get_all_notifications(
-            skip=skip,
+        # ?cursor= continues from the previous next_cursor; ?page= still works
+        result = notification_service.get_notifications_page(
             limit=limit,
-            include_archived=include_archived
+            page=page,
+            cursor=cursor,
+            include_archived=include_archived,
+            total=request.query_params.get('total')
         )
-        
-        # Calculate pagination info
-        total_pages = (total_count + limit - 1) // limit
-        has_next = page < total_pages
-        has_prev = page > 1
+        notifications = result['items']
+        pagination = notification_service._pagination_info(result, limit, cursor)
         
         return Response({
             'success': True,
-            'message': f'Retrieved {len(notifications)} notifications (page {page} of {total_pages})',
-            'pagination': {
-                'current_page': page,
-                'total_pages': total_pages,
-                'total_count': total_count,
-                'per_page': limit,
-                'has_next': has_next,
-                'has_previous': has_prev
-            },
+            'message': f"Retrieved {len(notifications)} notifications (page {pagination['current_page'] or 'cursor'} of {pagination['total_pages']})",
+            'pagination': pagination,
             'data': notifications
         })
         
+    except ValueError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
@@ -15,3 +15,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', os.getenv('DJANGO_SETTINGS_MODULE', 'settings.production'))
 
 application = get_wsgi_application()
+
+# Build the shared services now rather than inside the first requests
+from app.services.service_registry import service_registry, SERVICE_WARMUP
+
+if SERVICE_WARMUP:
+    service_registry.warm_up()
@@ -28,6 +28,15 @@ CUSTOMER_TOKEN = "YOUR_CUSTOMER_JWT_TOKEN_HERE"  # Get from customer login
 # Test order ID (you'll need an actual order ID)
 TEST_ORDER_ID = "ONLINE-000001"  # Replace with real order ID
 
+# MongoDB commands each endpoint may issue. Checked only when the server
+# runs with the query guard on (QUERY_GUARD=log/raise or DEBUG), which adds
+# the X-Query-Count header.
+QUERY_BUDGETS = {
+    "update_status": 10,
+    "get_status": 6,
+    "order_history": 8,
+}
+
 
 def print_section(title):
     """Print a section header."""
@@ -46,6 +55,19 @@ def print_response(response, title="Response"):
         print(response.text)
 
 
+def check_query_budget(response, name):
+    """Compare the server-reported MongoDB command count with QUERY_BUDGETS."""
+    count = response.headers.get("X-Query-Count")
+    if count is None:
+        return True
+    budget = QUERY_BUDGETS[name]
+    if int(count) > budget:
+        print(f"❌ FAIL: {name} issued {count} MongoDB commands (budget {budget})")
+        return False
+    print(f"✅ PASS: {name} issued {count} MongoDB commands (budget {budget})")
+    return True
+
+
 def test_update_status(order_id, status, notes="", token=ADMIN_TOKEN):
     """Test updating order status (POS staff)."""
     url = f"{BASE_URL}/online/orders/{order_id}/update-status/"
@@ -64,8 +86,9 @@ def test_update_status(order_id, status, notes="", token=ADMIN_TOKEN):
     
     response = requests.post(url, headers=headers, json=data)
     print_response(response, f"Update to {status}")
+    within_budget = check_query_budget(response, "update_status")
     
-    return response.status_code == 200
+    return response.status_code == 200 and within_budget
 
 
 def test_get_status(order_id, token=CUSTOMER_TOKEN):
@@ -79,6 +102,7 @@ def test_get_status(order_id, token=CUSTOMER_TOKEN):
     
     response = requests.get(url, headers=headers)
     print_response(response, "Current Status")
+    check_query_budget(response, "get_status")
     
     if response.status_code == 200:
         data = response.json()
@@ -112,6 +136,7 @@ def test_get_order_history(token=CUSTOMER_TOKEN):
     
     response = requests.get(url, headers=headers)
     print_response(response, "Order History")
+    check_query_budget(response, "order_history")
     
     if response.status_code == 200:
         data = response.json()